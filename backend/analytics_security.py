@@ -2,6 +2,11 @@
 Analytics Query Security Module
 
 Prevents SQL injection and validates all user inputs for analytics queries.
+
+Builders read either the source tables (quotes joined to the JSONB
+variables and the summaries) or, with use_facts=True, the flattened
+analytics_quote_facts table (migrations/060_analytics_facts.sql), which has
+the same columns typed and indexed, under the same q alias.
 """
 
 from typing import List, Dict, Any, Tuple
@@ -11,6 +16,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# One row per quote with variables and summary as columns
+ANALYTICS_FACTS_TABLE = "analytics_quote_facts"
+
+# Variables stored as NUMERIC in the facts table (the rest are TEXT)
+NUMERIC_VARIABLE_FIELDS = {'markup', 'discount'}
+
 
 class QuerySecurityValidator:
     """Validate and sanitize analytics queries"""
@@ -159,16 +170,53 @@ class QuerySecurityValidator:
         return safe_filters
 
 
+def variable_column(field: str, use_facts: bool = False) -> str:
+    """SQL expression of a whitelisted variable field, compared as text"""
+    if not use_facts:
+        return f"qcv.variables->>'{field}'"
+    if field in NUMERIC_VARIABLE_FIELDS:
+        return f"q.{field}::text"
+    return f"q.{field}"
+
+
+def variable_numeric_column(field: str, use_facts: bool = False) -> str:
+    """SQL expression of a variable field for SUM/AVG/MIN/MAX"""
+    if not use_facts:
+        return f"(qcv.variables->>'{field}')::numeric"
+    if field in NUMERIC_VARIABLE_FIELDS:
+        return f"q.{field}"
+    return f"q.{field}::numeric"
+
+
+def build_from_clause(needs_variable_join: bool, needs_summary_join: bool, use_facts: bool = False) -> str:
+    """FROM clause for the q alias, joining only what the query uses (1:1 joins)"""
+    if use_facts:
+        return f"FROM {ANALYTICS_FACTS_TABLE} q"
+
+    from_clause = "FROM quotes q"
+
+    if needs_variable_join:
+        from_clause += "\n            LEFT JOIN quote_calculation_variables qcv ON qcv.quote_id = q.id"
+
+    if needs_summary_join:
+        from_clause += "\n            LEFT JOIN quote_calculation_summaries qcs ON qcs.quote_id = q.id"
+
+    return from_clause
+
+
 def build_analytics_query(
     organization_id: UUID,
     filters: Dict[str, Any],
     selected_fields: List[str],
     limit: int = 1000,
-    offset: int = 0
+    offset: int = 0,
+    use_facts: bool = False
 ) -> Tuple[str, List[Any]]:
     """
     Build parameterized query with JOIN to quote_calculation_results.
 
+    With use_facts=True, reads analytics_quote_facts instead (no joins).
+
     Returns: (sql_query, parameters)
     """
     # Validate and sanitize inputs
@@ -198,13 +246,17 @@ def build_analytics_query(
     if quote_fields:
         select_clauses.extend(quote_fields)
 
-    # Variable fields from JSONB
+    # Variable fields from JSONB (typed columns in the facts table)
     for field in variable_fields:
-        select_clauses.append(f"qcv.variables->>'{field}' as {field}")
+        if use_facts:
+            select_clauses.append(f"q.{field}")
+        else:
+            select_clauses.append(f"qcv.variables->>'{field}' as {field}")
 
     # Summary fields (pre-aggregated quote-level totals)
+    summary_alias = 'q' if use_facts else 'qcs'
     for field in summary_fields:
-        select_clauses.append(f"qcs.{field}")
+        select_clauses.append(f"{summary_alias}.{field}")
 
     # Build WHERE clause with parameterized filters
     params = []
@@ -268,11 +320,11 @@ def build_analytics_query(
             has_variable_filters = True  # Mark that we need JOIN
             if isinstance(value, list):
                 placeholders = [f"${i}" for i in range(param_count, param_count + len(value))]
-                where_clauses.append(f"qcv.variables->>'{key}' = ANY(ARRAY[{','.join(placeholders)}])")
+                where_clauses.append(f"{variable_column(key, use_facts)} = ANY(ARRAY[{','.join(placeholders)}])")
                 params.extend(value)
                 param_count += len(value)
             else:
-                where_clauses.append(f"qcv.variables->>'{key}' = ${param_count}")
+                where_clauses.append(f"{variable_column(key, use_facts)} = ${param_count}")
                 params.append(value)
                 param_count += 1
 
@@ -281,13 +333,7 @@ def build_analytics_query(
     needs_summary_join = summary_fields
 
     # Build SQL with appropriate JOINs
-    from_clause = "FROM quotes q"
-
-    if needs_variable_join:
-        from_clause += "\n            LEFT JOIN quote_calculation_variables qcv ON qcv.quote_id = q.id"
-
-    if needs_summary_join:
-        from_clause += "\n            LEFT JOIN quote_calculation_summaries qcs ON qcs.quote_id = q.id"
+    from_clause = build_from_clause(bool(needs_variable_join), bool(needs_summary_join), use_facts)
 
     # Build SQL
     sql = f"""
@@ -306,11 +352,14 @@ def build_analytics_query(
 def build_aggregation_query(
     organization_id: UUID,
     filters: Dict[str, Any],
-    aggregations: Dict[str, Dict[str, str]]
+    aggregations: Dict[str, Dict[str, str]],
+    use_facts: bool = False
 ) -> Tuple[str, List[Any]]:
     """
     Build aggregation query with JOIN to quote_calculation_results.
 
+    With use_facts=True, reads analytics_quote_facts instead (no joins).
+
     aggregations format:
     {
         "total_import_vat": {"function": "sum", "label": "Total VAT"},
@@ -373,24 +422,26 @@ def build_aggregation_query(
                 else:
                     # For numeric variables, extract and aggregate
                     agg_clauses.append(
-                        f"COALESCE({func}((qcv.variables->>'{col_name}')::numeric), 0) as {field}"
+                        f"COALESCE({func}({variable_numeric_column(col_name, use_facts)}), 0) as {field}"
                     )
 
             elif col_name in QuerySecurityValidator.ALLOWED_FIELDS['quote_calculation_summaries']:
                 # Summary field (pre-aggregated quote totals)
                 needs_summary_join = True
+                summary_alias = 'q' if use_facts else 'qcs'
 
                 # Special handling for profit margin - calculate from revenue and COGS totals
                 if col_name == 'calc_af16_profit_margin':
                     # Calculate overall margin from aggregated revenue and COGS
                     # Margin = (total_revenue - total_cogs) / total_revenue
                     agg_clauses.append(
-                        f"CASE WHEN SUM(qcs.calc_ak16_final_price_total) > 0 "
-                        f"THEN (SUM(qcs.calc_ak16_final_price_total) - SUM(qcs.calc_ab16_cogs_total)) / SUM(qcs.calc_ak16_final_price_total) "
+                        f"CASE WHEN SUM({summary_alias}.calc_ak16_final_price_total) > 0 "
+                        f"THEN (SUM({summary_alias}.calc_ak16_final_price_total) - SUM({summary_alias}.calc_ab16_cogs_total)) "
+                        f"/ SUM({summary_alias}.calc_ak16_final_price_total) "
                         f"ELSE 0 END as {field}"
                     )
                 else:
-                    agg_clauses.append(f"COALESCE({func}(qcs.{col_name}), 0) as {field}")
+                    agg_clauses.append(f"COALESCE({func}({summary_alias}.{col_name}), 0) as {field}")
 
     if not agg_clauses:
         agg_clauses = ["COUNT(DISTINCT q.id) as quote_count"]
@@ -451,22 +502,16 @@ def build_aggregation_query(
             needs_variable_join = True
             if isinstance(value, list):
                 placeholders = [f"${i}" for i in range(param_count, param_count + len(value))]
-                where_clauses.append(f"qcv.variables->>'{key}' = ANY(ARRAY[{','.join(placeholders)}])")
+                where_clauses.append(f"{variable_column(key, use_facts)} = ANY(ARRAY[{','.join(placeholders)}])")
                 params.extend(value)
                 param_count += len(value)
             else:
-                where_clauses.append(f"qcv.variables->>'{key}' = ${param_count}")
+                where_clauses.append(f"{variable_column(key, use_facts)} = ${param_count}")
                 params.append(value)
                 param_count += 1
 
     # Build SQL with appropriate JOINs (1:1 only, no duplication!)
-    from_clause = "FROM quotes q"
-
-    if needs_variable_join:
-        from_clause += "\n            LEFT JOIN quote_calculation_variables qcv ON qcv.quote_id = q.id"
-
-    if needs_summary_join:
-        from_clause += "\n            LEFT JOIN quote_calculation_summaries qcs ON qcs.quote_id = q.id"
+    from_clause = build_from_clause(needs_variable_join, needs_summary_join, use_facts)
 
     sql = f"""
         SELECT {', '.join(agg_clauses)}
@@ -354,6 +354,7 @@ class SmartLeadCampaign(BaseModel):
     name: str
     status: Optional[str] = None
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 
 class SmartLeadSyncRequest(BaseModel):
@@ -19,7 +19,9 @@ Created: 2025-11-28
 
 import openpyxl
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from io import BytesIO
+from openpyxl.utils.cell import coordinate_to_tuple
+from typing import Dict, List, Optional, Any, Tuple
 from decimal import Decimal, InvalidOperation
 from pydantic import BaseModel, Field, validator
 from enum import Enum
@@ -158,29 +160,45 @@ class SimplifiedQuoteInput(BaseModel):
 # PARSER
 # ============================================================================
 
+# Header sections live in rows 1-15; product rows start at 16 (columns A-L)
+HEADER_LAST_ROW = 15
+PRODUCT_FIRST_ROW = 16
+SHEET_COLUMNS = 12
+
+
 class SimplifiedExcelParser:
     """
     Parser for simplified quote input template.
 
+    By default the workbook is opened in openpyxl read-only mode: the header
+    block is read once as a range and product rows are streamed in a single
+    pass, so memory stays flat for tenders with tens of thousands of lines.
+
     Usage:
         parser = SimplifiedExcelParser(file_path_or_bytes)
         quote_input = parser.parse()
     """
 
-    def __init__(self, source):
+    def __init__(self, source, read_only: bool = True):
         """
         Initialize parser.
 
         Args:
             source: File path (str) or file-like object (BytesIO)
+            read_only: Stream the sheet instead of loading every cell
+                (set False to get a regular editable worksheet)
         """
-        if isinstance(source, str):
-            self.workbook = openpyxl.load_workbook(source, data_only=True)
-        else:
-            self.workbook = openpyxl.load_workbook(source, data_only=True)
-
+        if read_only and isinstance(source, str):
+            # Read-only workbooks keep their source open until closed;
+            # load the bytes so no file handle outlives the parser
+            with open(source, 'rb') as f:
+                source = BytesIO(f.read())
+
+        self.read_only = read_only
+        self.workbook = openpyxl.load_workbook(source, read_only=read_only, data_only=True)
         self.sheet = self._find_sheet()
         self.errors: List[str] = []
+        self._header: Optional[Dict[Tuple[int, int], Any]] = None
 
     def _find_sheet(self):
         """Find the quote sheet"""
@@ -191,21 +209,57 @@ class SimplifiedExcelParser:
         # Try first sheet
         return self.workbook.active
 
+    def _load_header(self) -> Dict[Tuple[int, int], Any]:
+        """Read header block (rows 1-15) in one range scan"""
+        header = {}
+        rows = self.sheet.iter_rows(
+            min_row=1, max_row=HEADER_LAST_ROW, max_col=SHEET_COLUMNS, values_only=True
+        )
+        for row_idx, values in enumerate(rows, start=1):
+            for col_idx, value in enumerate(values, start=1):
+                if value is not None:
+                    header[(row_idx, col_idx)] = value
+        return header
+
+    def _cell_value(self, cell: str):
+        """Raw value of a header cell"""
+        if self._header is None:
+            self._header = self._load_header()
+        row, col = coordinate_to_tuple(cell)
+        if row <= HEADER_LAST_ROW and col <= SHEET_COLUMNS:
+            return self._header.get((row, col))
+        return self.sheet.cell(row=row, column=col).value
+
     def _get_value(self, cell: str, default=None):
         """Get cell value with default"""
-        value = self.sheet[cell].value
+        value = self._cell_value(cell)
         return value if value is not None else default
 
     def _get_string(self, cell: str, default: str = None) -> str:
         """Get cell value as string, converting numbers if needed"""
-        value = self.sheet[cell].value
+        return self._to_string(self._cell_value(cell), default)
+
+    def _get_decimal(self, cell: str, default: Decimal = Decimal("0")) -> Decimal:
+        """Get cell value as Decimal"""
+        return self._to_decimal(self._cell_value(cell), cell, default)
+
+    def _get_int(self, cell: str, default: int = 0) -> int:
+        """Get cell value as int"""
+        return self._to_int(self._cell_value(cell), cell, default)
+
+    def _get_currency(self, cell: str, default: Currency = Currency.EUR) -> Currency:
+        """Get cell value as Currency enum"""
+        return self._to_currency(self._cell_value(cell), cell, default)
+
+    @staticmethod
+    def _to_string(value, default: str = None) -> str:
+        """Convert raw value to string"""
         if value is None:
             return default
         return str(value)
 
-    def _get_decimal(self, cell: str, default: Decimal = Decimal("0")) -> Decimal:
-        """Get cell value as Decimal"""
-        value = self.sheet[cell].value
+    def _to_decimal(self, value, cell: str, default: Decimal = Decimal("0")) -> Decimal:
+        """Convert raw value to Decimal, recording an error for cell on failure"""
         if value is None:
             return default
         try:
@@ -214,9 +268,8 @@ class SimplifiedExcelParser:
             self.errors.append(f"Invalid number in cell {cell}: {value}")
             return default
 
-    def _get_int(self, cell: str, default: int = 0) -> int:
-        """Get cell value as int"""
-        value = self.sheet[cell].value
+    def _to_int(self, value, cell: str, default: int = 0) -> int:
+        """Convert raw value to int, recording an error for cell on failure"""
         if value is None:
             return default
         try:
@@ -225,9 +278,8 @@ class SimplifiedExcelParser:
             self.errors.append(f"Invalid integer in cell {cell}: {value}")
             return default
 
-    def _get_currency(self, cell: str, default: Currency = Currency.EUR) -> Currency:
-        """Get cell value as Currency enum"""
-        value = self.sheet[cell].value
+    def _to_currency(self, value, cell: str, default: Currency = Currency.EUR) -> Currency:
+        """Convert raw value to Currency, recording an error for cell on failure"""
         if value is None:
             return default
         try:
@@ -408,16 +460,21 @@ class SimplifiedExcelParser:
 
         return result
 
+    def _iter_product_rows(self):
+        """Yield (row number, values A-L) for rows from 16 down, single pass"""
+        rows = self.sheet.iter_rows(min_row=PRODUCT_FIRST_ROW, max_col=SHEET_COLUMNS, values_only=True)
+        for row, values in enumerate(rows, start=PRODUCT_FIRST_ROW):
+            if len(values) < SHEET_COLUMNS:
+                values = tuple(values) + (None,) * (SHEET_COLUMNS - len(values))
+            yield row, values
+
     def _parse_products(self) -> List[ProductInput]:
         """Parse ТОВАРЫ section (A14+)"""
         products = []
-        row = 16  # First product row
 
-        # Continue while there's data in column A (brand) or D (name)
-        while True:
-            brand = self._get_value(f"A{row}")
-            name = self._get_value(f"C{row}")
-            quantity = self._get_value(f"D{row}")
+        for row, values in self._iter_product_rows():
+            brand, sku, name, quantity, weight, currency, price, country, \
+                discount, customs_code, tariff, markup = values
 
             # Stop if row is empty
             if not name and not quantity:
@@ -425,30 +482,24 @@ class SimplifiedExcelParser:
 
             # Skip if no name
             if not name:
-                row += 1
                 continue
 
             product = ProductInput(
-                brand=self._get_string(f"A{row}"),
-                sku=self._get_string(f"B{row}"),
+                brand=self._to_string(brand),
+                sku=self._to_string(sku),
                 name=str(name),
-                quantity=self._get_int(f"D{row}", 1),
-                weight_kg=self._get_decimal(f"E{row}") if self._get_value(f"E{row}") else None,
-                currency=self._get_currency(f"F{row}", Currency.EUR),
-                base_price_vat=self._get_decimal(f"G{row}", Decimal("0")),
-                supplier_country=self._get_value(f"H{row}", "Турция"),
-                supplier_discount=self._get_decimal(f"I{row}", Decimal("0")),
-                customs_code=self._get_int(f"J{row}") if self._get_value(f"J{row}") else None,
-                import_tariff=self._get_decimal(f"K{row}", Decimal("0")),
-                markup=self._get_decimal(f"L{row}", Decimal("15")),
+                quantity=self._to_int(quantity, f"D{row}", 1),
+                weight_kg=self._to_decimal(weight, f"E{row}") if weight else None,
+                currency=self._to_currency(currency, f"F{row}", Currency.EUR),
+                base_price_vat=self._to_decimal(price, f"G{row}", Decimal("0")),
+                supplier_country=country if country is not None else "Турция",
+                supplier_discount=self._to_decimal(discount, f"I{row}", Decimal("0")),
+                customs_code=self._to_int(customs_code, f"J{row}") if customs_code else None,
+                import_tariff=self._to_decimal(tariff, f"K{row}", Decimal("0")),
+                markup=self._to_decimal(markup, f"L{row}", Decimal("15")),
             )
 
             products.append(product)
-            row += 1
-
-            # Safety limit
-            if row > 1000:
-                break
 
         return products
 
@@ -2,18 +2,104 @@
 Secure File Processing Service for Russian B2B Quotation System
 Handles Excel/CSV import with security validation and Russian business context
 """
+import codecs
+import csv
 import io
 import re
 import hashlib
 from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Tuple
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from fastapi import HTTPException, UploadFile
 from openpyxl import load_workbook
 
 
+# CSV dialect candidates in order of preference
+CSV_ENCODINGS = ['utf-8', 'cp1251', 'utf-8-sig', 'latin1']
+CSV_SEPARATORS = [',', ';', '\t']
+CSV_SNIFF_BYTES = 64 * 1024
+
+# Cleaned numeric strings that Decimal() accepts
+NUMERIC_STRING_PATTERN = r'-?(?:\d+\.?\d*|\.\d+)'
+
+
+def sniff_csv_format(content: bytes, sample_size: int = CSV_SNIFF_BYTES) -> Tuple[str, str]:
+    """
+    Detect CSV encoding and separator from the beginning of the file
+
+    Args:
+        content: Raw CSV bytes
+        sample_size: Number of leading bytes to inspect
+
+    Returns:
+        Tuple: (encoding, separator) - the first separator that splits the
+        header into more than one column, ',' if none does
+    """
+    sample = content[:sample_size]
+    if len(content) > sample_size:
+        # Cut at a line break so a multi-byte character is never split
+        sample = sample[:sample.rfind(b'\n') + 1] or sample
+
+    encodings = CSV_ENCODINGS
+    if content.startswith(codecs.BOM_UTF8):
+        encodings = ['utf-8-sig'] + [e for e in CSV_ENCODINGS if e != 'utf-8-sig']
+
+    for encoding in encodings:
+        try:
+            text = sample.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+
+        header = text.split('\n', 1)[0].rstrip('\r')
+        for sep in CSV_SEPARATORS:
+            if len(next(csv.reader([header], delimiter=sep), [])) > 1:
+                return encoding, sep
+        return encoding, CSV_SEPARATORS[0]
+
+    return CSV_ENCODINGS[-1], CSV_SEPARATORS[0]
+
+
+def read_csv_content(content: bytes, **read_options) -> pd.DataFrame:
+    """
+    Parse CSV bytes in a single pass using the sniffed encoding and separator
+
+    If the file stops decoding past the sniffed prefix, the remaining
+    encodings are tried in order.
+
+    Args:
+        content: Raw CSV bytes
+        **read_options: Extra pandas.read_csv options (dtype, nrows, ...)
+
+    Returns:
+        pd.DataFrame: Parsed data
+    """
+    encoding, sep = sniff_csv_format(content)
+    fallbacks = [e for e in CSV_ENCODINGS if e != encoding]
+
+    for candidate in [encoding] + fallbacks:
+        try:
+            return pd.read_csv(io.BytesIO(content), encoding=candidate, sep=sep, **read_options)
+        except UnicodeDecodeError as e:
+            decode_error = e
+
+    raise decode_error
+
+
+def _map_unique(values: pd.Series, transform) -> pd.Series:
+    """
+    Apply a column transform to distinct values only and broadcast back
+
+    Price lists repeat units, brands and prices heavily, so string
+    cleanup runs once per distinct value instead of once per row.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    transformed = transform(pd.Series(uniques, dtype=object)).to_numpy()
+    return pd.Series(transformed[codes], index=values.index, dtype=object)
+
+
 class SecureFileProcessor:
     """
     Secure file processing with Russian business context
@@ -239,6 +325,29 @@ class SecureFileProcessor:
 
         return value_str
 
+    def sanitize_column(self, values: pd.Series) -> pd.Series:
+        """
+        Column version of sanitize_cell_content
+
+        Args:
+            values: Column of cell values
+
+        Returns:
+            pd.Series: Sanitized strings ('' for empty cells)
+        """
+        return _map_unique(values, self._sanitize_unique)
+
+    def _sanitize_unique(self, values: pd.Series) -> pd.Series:
+        """sanitize_column on distinct values"""
+        blank = values.isna() | (values == '')
+        text = values.astype(str).str.strip()
+
+        injection_pattern = '|'.join(f'(?:{pattern})' for pattern in self.CSV_INJECTION_PATTERNS)
+        injected = text.str.contains(injection_pattern, flags=re.IGNORECASE, regex=True)
+        escaped = text.str.replace('<', '&lt;', regex=False).str.replace('>', '&gt;', regex=False)
+
+        return escaped.where(~injected, "'" + text).where(~blank, '')
+
     def normalize_column_names(self, columns: List[str]) -> Dict[str, str]:
         """
         Normalize column names using Russian/English mappings
@@ -322,6 +431,42 @@ class SecureFileProcessor:
                 detail=f"Invalid numeric value in field '{field_name}': {value} - {str(e)}"
             )
 
+    def parse_numeric_column(self, values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """
+        Column version of parse_numeric_value
+
+        Applies the same cleanup (currency symbols, spaces, comma/dot
+        separators) to the whole column at once.
+
+        Args:
+            values: Column of cell values
+
+        Returns:
+            Tuple: (cleaned numeric strings, mask of values that are not numbers)
+        """
+        cleaned = _map_unique(values, self._clean_numeric_unique)
+        return cleaned, ~cleaned.str.fullmatch(NUMERIC_STRING_PATTERN)
+
+    def _clean_numeric_unique(self, values: pd.Series) -> pd.Series:
+        """parse_numeric_column cleanup on distinct values"""
+        blank = values.isna() | (values == '')
+        text = values.astype(str).str.strip()
+        text = text.str.replace(r'[₽$€¥£]', '', regex=True).str.replace(' ', '', regex=False)
+
+        # Comma handling: thousands separator unless it is the only one near the end
+        has_comma = text.str.contains(',', regex=False)
+        has_dot = text.str.contains('.', regex=False)
+        decimal_comma = (
+            has_comma & ~has_dot
+            & (text.str.count(',') == 1)
+            & (text.str.rfind(',') > text.str.len() - 4)
+        )
+        text = text.where(~decimal_comma, text.str.replace(',', '.', regex=False))
+        text = text.where(~has_comma | decimal_comma, text.str.replace(',', '', regex=False))
+
+        text = text.str.replace(r'[^\d.-]', '', regex=True)
+        return text.where(~blank & (text != ''), '0')
+
     def process_excel_file(self, file: UploadFile) -> List[Dict[str, Any]]:
         """
         Process Excel file and extract quote items
@@ -390,38 +535,16 @@ class SecureFileProcessor:
             file_content = file.file.read()
             file.file.seek(0)
 
-            # Try different encodings
-            encodings = ['utf-8', 'cp1251', 'utf-8-sig', 'latin1']
-            df = None
-
-            for encoding in encodings:
-                try:
-                    # Try different separators
-                    separators = [',', ';', '\t']
-
-                    for sep in separators:
-                        try:
-                            df = pd.read_csv(
-                                io.BytesIO(file_content),
-                                encoding=encoding,
-                                sep=sep,
-                                dtype=str,
-                                na_filter=False,
-                                nrows=self.MAX_ROWS
-                            )
-
-                            # Check if we got meaningful data (more than 1 column)
-                            if len(df.columns) > 1:
-                                break
-
-                        except Exception:
-                            continue
-
-                    if df is not None and len(df.columns) > 1:
-                        break
-
-                except Exception:
-                    continue
+            # Dialect is sniffed on a prefix, then the file is parsed once
+            try:
+                df = read_csv_content(
+                    file_content,
+                    dtype=str,
+                    na_filter=False,
+                    nrows=self.MAX_ROWS
+                )
+            except (pd.errors.EmptyDataError, pd.errors.ParserError):
+                df = None
 
             if df is None or df.empty:
                 raise HTTPException(
@@ -483,17 +606,65 @@ class SecureFileProcessor:
                           f"Please ensure your file has columns for: {', '.join(required_fields)}"
                 )
 
-            # Process each row
-            items = []
-            errors = []
+            # Duplicate mappings (e.g. "name" and "product"): first column wins
+            df_mapped = df_mapped.loc[:, ~df_mapped.columns.duplicated()]
+
+            # Process whole columns; rows without description are skipped
+            def column(field: str, default: str) -> pd.Series:
+                if field in df_mapped.columns:
+                    return df_mapped[field]
+                return pd.Series(default, index=df_mapped.index, dtype=object)
+
+            description = self.sanitize_column(df_mapped['description'])
+            keep = (description != '').to_numpy()
 
-            for idx, row in df_mapped.iterrows():
-                try:
-                    item = self._process_row(row, idx + 1)
-                    if item:
-                        items.append(item)
-                except Exception as e:
-                    errors.append(f"Row {idx + 1}: {str(e)}")
+            raw_values = {
+                'quantity': column('quantity', '1'),
+                'unit_price': column('unit_price', '0'),
+                'line_total': column('line_total', ''),
+            }
+            quantity, bad_quantity = self.parse_numeric_column(raw_values['quantity'])
+            unit_price, bad_price = self.parse_numeric_column(raw_values['unit_price'])
+            line_total, bad_total = self.parse_numeric_column(raw_values['line_total'])
+
+            # Line total is computed when the cell is empty
+            line_total_raw = raw_values['line_total']
+            has_line_total = (line_total_raw.notna() & line_total_raw.astype(bool)).to_numpy()
+            bad_total &= has_line_total
+
+            # Report every invalid row, first invalid field per row
+            row_errors = np.select(
+                [bad_quantity.to_numpy(), bad_price.to_numpy(), bad_total.to_numpy()],
+                ['quantity', 'unit_price', 'line_total'],
+                default=''
+            )
+            errors = [
+                f"Row {idx + 1}: Error processing row data: "
+                f"Invalid numeric value in field '{field}': {raw_values[field].iloc[pos]}"
+                for pos, (idx, field) in enumerate(zip(df_mapped.index, row_errors))
+                if field and keep[pos]
+            ]
+            valid = keep & (row_errors == '')
+
+            quantity, unit_price = quantity[valid], unit_price[valid]
+            totals = line_total[valid].astype(float)
+            computed = ~has_line_total[valid]
+            totals[computed] = [
+                float(Decimal(qty) * Decimal(price))
+                for qty, price in zip(quantity[computed], unit_price[computed])
+            ]
+
+            fields = {
+                'description': description[valid].tolist(),
+                'quantity': quantity.astype(float).tolist(),
+                'unit_price': unit_price.astype(float).tolist(),
+                'line_total': totals.tolist(),
+            }
+            for field, default in (('unit', 'шт.'), ('category', ''), ('brand', ''), ('notes', ''),
+                                   ('product_code', ''), ('country_of_origin', '')):
+                fields[field] = self.sanitize_column(column(field, default))[valid].tolist()
+
+            items = [dict(zip(fields, values)) for values in zip(*fields.values())]
 
             if not items and errors:
                 raise HTTPException(
@@ -514,54 +685,6 @@ class SecureFileProcessor:
                 detail=f"Data processing error: {str(e)}"
             )
 
-    def _process_row(self, row: pd.Series, row_number: int) -> Optional[Dict[str, Any]]:
-        """
-        Process a single row into quote item
-
-        Args:
-            row: Pandas Series representing a row
-            row_number: Row number for error reporting
-
-        Returns:
-            Dict or None: Processed quote item or None if row should be skipped
-        """
-        try:
-            # Sanitize all string fields
-            description = self.sanitize_cell_content(row.get('description', ''))
-
-            if not description:
-                return None  # Skip rows without description
-
-            # Parse numeric fields
-            quantity = self.parse_numeric_value(row.get('quantity', '1'), 'quantity')
-            unit_price = self.parse_numeric_value(row.get('unit_price', '0'), 'unit_price')
-
-            # Calculate line total if not provided
-            line_total = row.get('line_total')
-            if line_total and pd.notna(line_total):
-                line_total = self.parse_numeric_value(line_total, 'line_total')
-            else:
-                line_total = quantity * unit_price
-
-            # Process optional fields
-            item = {
-                'description': description,
-                'quantity': float(quantity),
-                'unit_price': float(unit_price),
-                'line_total': float(line_total),
-                'unit': self.sanitize_cell_content(row.get('unit', 'шт.')),
-                'category': self.sanitize_cell_content(row.get('category', '')),
-                'brand': self.sanitize_cell_content(row.get('brand', '')),
-                'notes': self.sanitize_cell_content(row.get('notes', '')),
-                'product_code': self.sanitize_cell_content(row.get('product_code', '')),
-                'country_of_origin': self.sanitize_cell_content(row.get('country_of_origin', ''))
-            }
-
-            return item
-
-        except Exception as e:
-            raise ValueError(f"Error processing row data: {str(e)}")
-
     async def process_file(self, file: UploadFile) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """
         Main file processing method
@@ -0,0 +1,217 @@
+"""
+Outbound HTTP Client Pooling
+
+One shared httpx.AsyncClient for calls to external APIs (CBR, DaData,
+SmartLead). Replaces a new AsyncClient per request, so TLS handshakes and
+TCP connections are reused (keep-alive, HTTP/2 when h2 is installed).
+
+Retries are limited by a RetryBudget per upstream: when an API is down,
+retries stop once the budget is spent instead of multiplying the load by
+MAX_RETRIES. Upstreams with a published request rate (SmartLead) also get
+a RateLimiter, a token bucket shared by every caller in the process.
+
+Services accept an http_client argument; tests and benchmarks inject a
+client pointed at the replay server (tests/load/replay_server.py).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Timeouts (seconds); services may pass a per-request timeout
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+# Connection pool
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# Retry budget: each request earns RETRY_BUDGET_RATIO retries,
+# with at most RETRY_BUDGET_MAX_TOKENS banked
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MAX_TOKENS = float(os.getenv("RETRY_BUDGET_MAX_TOKENS", "10"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("HTTP2_ENABLED", "true").lower() != "false"
+
+
+# ============================================================================
+# RETRY BUDGET
+# ============================================================================
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent requests.
+
+    Every request deposits `ratio` tokens (up to `max_tokens`), every retry
+    withdraws one. A fresh budget starts full, so isolated failures are
+    always retried.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, max_tokens: float = RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self.retries = 0
+        self.rejected = 0
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def record_request(self) -> None:
+        """Call once per logical request (not per attempt)"""
+        self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def try_retry(self) -> bool:
+        """Withdraw one retry; False if the budget is spent"""
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.retries += 1
+            return True
+        self.rejected += 1
+        return False
+
+
+_retry_budgets: Dict[str, RetryBudget] = {}
+
+
+def get_retry_budget(name: str) -> RetryBudget:
+    """Get the shared retry budget for an upstream (e.g., "cbr")"""
+    budget = _retry_budgets.get(name)
+    if budget is None:
+        budget = _retry_budgets[name] = RetryBudget()
+    return budget
+
+
+# ============================================================================
+# RATE LIMITS
+# ============================================================================
+
+class RateLimiter:
+    """
+    Token bucket: `rate` requests per second, bursts of up to `burst`.
+
+    acquire() waits for a token. pause() (e.g. on 429 with Retry-After)
+    holds back every caller of the bucket, not just the one that was
+    rejected.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent (callers are served in order)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+                self.waited_seconds += delay
+                await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Send nothing for `seconds`; the bucket restarts empty"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(name: str, rate: float, burst: float) -> RateLimiter:
+    """Get the shared rate limiter for an upstream (created with rate/burst on first use)"""
+    limiter = _rate_limiters.get(name)
+    if limiter is None:
+        limiter = _rate_limiters[name] = RateLimiter(rate, burst)
+    return limiter
+
+
+# ============================================================================
+# SHARED CLIENT
+# ============================================================================
+
+# Global client and the event loop it belongs to
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_transport(**kwargs) -> httpx.AsyncHTTPTransport:
+    """Pooled transport with the configured limits and HTTP/2 setting"""
+    kwargs.setdefault("http2", HTTP2_ENABLED)
+    kwargs.setdefault("limits", httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    ))
+    return httpx.AsyncHTTPTransport(**kwargs)
+
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """New client with the shared settings (default: pooled transport)"""
+    return httpx.AsyncClient(
+        transport=transport or create_transport(),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        headers={"User-Agent": "kvota-backend"},
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared outbound HTTP client.
+
+    Created on first use. Connections belong to an event loop, so a call
+    from a different loop (e.g. a separate asyncio.run) gets a new client.
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = create_http_client()
+        _client_loop = loop
+        logger.info(
+            f"Outbound HTTP client initialized (http2={HTTP2_ENABLED}, "
+            f"max_connections={HTTP_MAX_CONNECTIONS})"
+        )
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client on application shutdown"""
+    global _client, _client_loop
+
+    if _client is not None:
+        if _client_loop is asyncio.get_running_loop():
+            await _client.aclose()
+        _client = None
+        _client_loop = None
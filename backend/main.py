@@ -132,6 +132,17 @@ async def lifespan(app: FastAPI):
     from services.activity_log_service import setup_log_worker
     await setup_log_worker()
 
+    # Scheduled reports: every replica competes for the dispatch lock, one runs them
+    if os.getenv("REPORT_SCHEDULER_ENABLED", "true").lower() == "true":
+        from services.report_scheduler_service import start_report_scheduler
+        if await start_report_scheduler(app.state.supabase):
+            print("✅ Report scheduler started")
+
+    # Parse the validation export template in the background (first export would take ~10s)
+    from services.export_validation_service import prewarm_template_snapshot
+    prewarm_template_snapshot()
+    print("✅ Validation export template prewarm started")
+
     print("🎯 API is ready to serve requests")
 
     # Send startup notification to Telegram
@@ -149,6 +160,19 @@ async def lifespan(app: FastAPI):
     await close_db_pool()
     print("✅ Database connection pool closed")
 
+    # Close shared outbound HTTP client (CBR, DaData, SmartLead)
+    from http_pool import close_http_client
+    await close_http_client()
+    print("✅ Outbound HTTP client closed")
+
+    # Close the task inbox LISTEN connection (opened by the first inbox stream)
+    from services.task_inbox_service import stop_inbox_listener
+    await stop_inbox_listener()
+
+    # Stop dispatching scheduled reports (another replica takes over the lock)
+    from services.report_scheduler_service import stop_report_scheduler
+    await stop_report_scheduler()
+
     # Stop exchange rate scheduler
     from services.exchange_rate_service import get_exchange_rate_service
     exchange_service = get_exchange_rate_service()
@@ -372,8 +396,8 @@ async def health_check_detailed(request: Request):
     """
     try:
         import psutil
-        from services.activity_log_service import log_queue
-        from routes.dashboard import dashboard_cache
+        from services.activity_log_service import get_log_metrics
+        from services.stats_service import get_stats_cache
 
         # Test database connection using singleton client
         result = request.app.state.supabase.table("roles").select("count", count="exact").limit(1).execute()
@@ -382,11 +406,11 @@ async def health_check_detailed(request: Request):
         process = psutil.Process()
         memory_mb = process.memory_info().rss / 1024 / 1024
 
-        # Get queue size
-        queue_size = log_queue.qsize()
+        # Activity log pipeline: queue depth, lag, drops
+        activity_log = get_log_metrics()
 
         # Get cache size
-        cache_size = len(dashboard_cache)
+        stats_cache = get_stats_cache()
 
         return {
             "status": "healthy",
@@ -394,11 +418,12 @@ async def health_check_detailed(request: Request):
             "metrics": {
                 "memory_mb": round(memory_mb, 2),
                 "cache_sizes": {
-                    "dashboard": cache_size,
-                    "max_dashboard": 100
+                    "dashboard": len(stats_cache),
+                    "max_dashboard": stats_cache.max_entries
                 },
-                "worker_queue_size": queue_size,
-                "max_queue_size": 10000
+                "worker_queue_size": activity_log["queue_size"],
+                "max_queue_size": activity_log["max_queue_size"],
+                "activity_log": activity_log
             },
             "timestamp": time.time()
         }
@@ -1,4 +1,5 @@
 from .bulk_importer import BulkQuoteImporter
+from .parallel_importer import ParallelQuoteImporter
 from .progress_tracker import ProgressTracker
 
-__all__ = ["BulkQuoteImporter", "ProgressTracker"]
+__all__ = ["BulkQuoteImporter", "ParallelQuoteImporter", "ProgressTracker"]
@@ -0,0 +1,360 @@
+"""
+Parallel Bulk Quote Importer
+
+Pipelined version of BulkQuoteImporter for large historical imports:
+
+    process pool (ExcelQuoteParser) -> bounded queue -> N writers (COPY)
+
+Workbooks are parsed in worker processes, so openpyxl no longer runs inside
+a database transaction. Writers pull batches off the queue, skip quote
+numbers that already exist and load quotes and items with
+copy_records_to_table, each on its own pooled connection. Committed files
+are appended to a checkpoint file so an interrupted import can be resumed.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+
+from excel_parser.quote_parser import ExcelQuoteParser
+from migration.bulk_importer import BulkQuoteImporter
+
+
+QUOTE_COLUMNS = ["id", "organization_id", "customer_id", "idn_quote", "status", "seller_company", "created_by"]
+ITEM_COLUMNS = ["quote_id", "product_name", "quantity", "base_price_vat", "line_number"]
+
+
+# ============================================================================
+# PARSING (runs in worker processes)
+# ============================================================================
+
+@dataclass
+class ParsedQuote:
+    """Quote parsed in a worker process, ready to be copied"""
+    filepath: str
+    quote_number: str
+    seller_company: Any
+    items: List[Tuple[str, Any, Any, int]]  # (product_name, quantity, base_price_vat, line_number)
+
+
+def quote_number_for(filepath: str, digest: str) -> str:
+    """
+    Quote number from filename (quote_001.xlsx -> КП-001)
+
+    Other filenames get a content-hash suffix rather than a timestamp, so a
+    resumed run maps the same file to the same number and parallel parsers
+    never collide.
+    """
+    stem = Path(filepath).stem
+    if stem.startswith("quote_"):
+        return f"КП-{stem.split('_')[1]}"
+    return f"КП-IMP-{digest[:12]}"
+
+
+def parse_quote_file(filepath: str) -> ParsedQuote:
+    """Parse one Excel quote into copy-ready rows"""
+    with open(filepath, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+
+    excel_data = ExcelQuoteParser(filepath).parse()
+
+    # Same placeholder item fields as BulkQuoteImporter
+    items = [
+        (f"Product {i+1}", product.get("quantity", 1), product.get("base_price_VAT", 0), i + 1)
+        for i, product in enumerate(excel_data.inputs["products"])
+    ]
+
+    return ParsedQuote(
+        filepath=filepath,
+        quote_number=quote_number_for(filepath, digest),
+        seller_company=excel_data.inputs["quote"].get("seller_company", "Unknown"),
+        items=items,
+    )
+
+
+# ============================================================================
+# CHECKPOINT
+# ============================================================================
+
+class ImportCheckpoint:
+    """
+    Append-only JSON lines log of files that no longer need importing
+
+    A file is identified by resolved path, size and mtime, so a file that
+    was edited after being imported is picked up again.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.done: Dict[str, Dict] = {}
+
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partial last line from an interrupted run
+                    self.done[entry["key"]] = entry
+
+    @staticmethod
+    def file_key(filepath: str) -> str:
+        stat = os.stat(filepath)
+        return f"{Path(filepath).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def is_done(self, filepath: str) -> bool:
+        try:
+            return self.file_key(filepath) in self.done
+        except OSError:
+            return False
+
+    def record(self, entries: List[Tuple[str, str, str]]):
+        """Persist (filepath, status, quote_number) entries"""
+        lines = []
+        for filepath, status, quote_number in entries:
+            entry = {"key": self.file_key(filepath), "status": status, "quote_number": quote_number}
+            self.done[entry["key"]] = entry
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        if self.path and lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+# ============================================================================
+# IMPORTER
+# ============================================================================
+
+class ParallelQuoteImporter(BulkQuoteImporter):
+    """Import Excel quotes with parallel parsing and COPY-based writers"""
+
+    def __init__(
+        self,
+        organization_id: str,
+        user_id: str,
+        batch_size: int = 50,
+        dry_run: bool = False,
+        parse_workers: Optional[int] = None,
+        writers: int = 4,
+        queue_size: int = 200,
+        checkpoint_path: Optional[str] = None,
+        parse_func: Callable[[str], ParsedQuote] = parse_quote_file
+    ):
+        """
+        Args:
+            organization_id: Organization UUID
+            user_id: Importer user UUID
+            batch_size: Quotes per writer transaction
+            dry_run: Parse and check duplicates without writing
+            parse_workers: Parser processes (default: CPU count)
+            writers: Concurrent writer connections
+            queue_size: Parsed quotes buffered between parsers and writers
+            checkpoint_path: JSON lines file used to resume interrupted imports
+            parse_func: Picklable file -> ParsedQuote function run in the pool
+        """
+        super().__init__(organization_id, user_id, batch_size, dry_run)
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.writers = writers
+        self.queue_size = queue_size
+        self.checkpoint = ImportCheckpoint(checkpoint_path)
+        self.parse_func = parse_func
+
+        self._claimed: Set[str] = set()
+        self._customer_id = None
+
+    async def import_files(self, file_paths: List[str], pool: Optional[asyncpg.Pool] = None) -> Dict:
+        """
+        Import multiple Excel files
+
+        Args:
+            file_paths: Excel file paths
+            pool: Existing connection pool (default: new pool on DATABASE_URL)
+
+        Returns:
+            Dict: Results as in BulkQuoteImporter plus "resumed" (files
+            already recorded in the checkpoint)
+        """
+        pending = [path for path in file_paths if not self.checkpoint.is_done(path)]
+        results = {
+            "total": len(file_paths),
+            "successful": 0,
+            "failed": 0,
+            "skipped": 0,
+            "resumed": len(file_paths) - len(pending),
+            "errors": []
+        }
+
+        if results["resumed"]:
+            print(f"⏩ Resuming: {results['resumed']} files already imported")
+        if not pending:
+            return results
+
+        self.tracker.start(len(pending))
+
+        owns_pool = pool is None
+        if owns_pool:
+            pool = await asyncpg.create_pool(
+                os.getenv("DATABASE_URL"),
+                min_size=1,
+                max_size=self.writers
+            )
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [asyncio.create_task(self._produce(pending, queue, results))]
+        tasks += [asyncio.create_task(self._write(pool, queue, results)) for _ in range(self.writers)]
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            failed = [task for task in done if task.exception() is not None]
+            if failed:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise failed[0].exception()
+        finally:
+            if owns_pool:
+                await pool.close()
+
+        self.tracker.finish()
+        return results
+
+    # ------------------------------------------------------------------
+    # Pipeline stages
+    # ------------------------------------------------------------------
+
+    async def _produce(self, file_paths: List[str], queue: asyncio.Queue, results: Dict):
+        """Parse files in the process pool and feed the queue, then stop writers"""
+        loop = asyncio.get_running_loop()
+        # Parsed results wait on queue.put while holding a slot: backpressure
+        in_flight = asyncio.Semaphore(self.parse_workers * 2)
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            async def parse(filepath: str):
+                async with in_flight:
+                    try:
+                        parsed = await loop.run_in_executor(executor, self.parse_func, filepath)
+                    except Exception as e:
+                        self._record_failure(results, filepath, e)
+                        return
+                    await queue.put(parsed)
+
+            await asyncio.gather(*(parse(filepath) for filepath in file_paths))
+
+        for _ in range(self.writers):
+            await queue.put(None)
+
+    async def _write(self, pool: asyncpg.Pool, queue: asyncio.Queue, results: Dict):
+        """Writer: take batches off the queue until the stop marker"""
+        async with pool.acquire() as conn:
+            finished = False
+            while not finished:
+                batch = []
+                item = await queue.get()
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size or queue.empty():
+                        break
+                    item = queue.get_nowait()
+                finished = item is None
+
+                if batch:
+                    await self._write_batch(conn, batch, results)
+
+    async def _write_batch(self, conn, batch: List[ParsedQuote], results: Dict):
+        """Deduplicate and copy one batch; isolate failing quotes on error"""
+        duplicates = []
+        candidates = []
+        for parsed in batch:
+            if parsed.quote_number in self._claimed:
+                duplicates.append(parsed)
+            else:
+                self._claimed.add(parsed.quote_number)
+                candidates.append(parsed)
+
+        if candidates:
+            rows = await conn.fetch(
+                "SELECT idn_quote FROM quotes WHERE organization_id = $1 AND idn_quote = ANY($2::text[])",
+                self.organization_id,
+                [parsed.quote_number for parsed in candidates]
+            )
+            existing = {row["idn_quote"] for row in rows}
+            duplicates += [parsed for parsed in candidates if parsed.quote_number in existing]
+            candidates = [parsed for parsed in candidates if parsed.quote_number not in existing]
+
+        imported = []
+        if self.dry_run:
+            imported = candidates
+        elif candidates:
+            try:
+                await self._copy_quotes(conn, candidates)
+                imported = candidates
+            except Exception:
+                # One bad file must not sink the batch: retry one by one
+                for parsed in candidates:
+                    try:
+                        await self._copy_quotes(conn, [parsed])
+                        imported.append(parsed)
+                    except Exception as e:
+                        self._claimed.discard(parsed.quote_number)
+                        self._record_failure(results, parsed.filepath, e)
+
+        for parsed in imported:
+            results["successful"] += 1
+            self.tracker.increment(status="✅", rows=len(parsed.items))
+        for parsed in duplicates:
+            results["skipped"] += 1
+            self.tracker.increment(status="⏭️", message="Duplicate")
+
+        if not self.dry_run:
+            self.checkpoint.record(
+                [(parsed.filepath, "imported", parsed.quote_number) for parsed in imported]
+                + [(parsed.filepath, "skipped", parsed.quote_number) for parsed in duplicates]
+            )
+
+    async def _copy_quotes(self, conn, quotes: List[ParsedQuote]):
+        """Copy quotes and their items in one transaction"""
+        if self._customer_id is None:
+            # One placeholder customer per run, as BulkQuoteImporter does
+            self._customer_id = await self._ensure_customer(conn, "Imported Customer")
+
+        quote_records = []
+        item_records = []
+        for parsed in quotes:
+            quote_id = uuid.uuid4()
+            quote_records.append((
+                quote_id,
+                self.organization_id,
+                self._customer_id,
+                parsed.quote_number,
+                "draft",
+                parsed.seller_company,
+                self.user_id
+            ))
+            item_records.extend((quote_id,) + item for item in parsed.items)
+
+        async with conn.transaction():
+            # Set RLS context for multi-tenant security
+            await conn.execute(
+                "SELECT set_config('request.jwt.claims', $1, true)",
+                f'{{"sub": "{self.user_id}", "role": "authenticated"}}'
+            )
+            await conn.copy_records_to_table("quotes", records=quote_records, columns=QUOTE_COLUMNS)
+            if item_records:
+                await conn.copy_records_to_table("quote_items", records=item_records, columns=ITEM_COLUMNS)
+
+    def _record_failure(self, results: Dict, filepath: str, error: Exception):
+        results["failed"] += 1
+        results["errors"].append({
+            "file": Path(filepath).name,
+            "error": str(error)
+        })
+        self.tracker.increment(status="❌", message=str(error))
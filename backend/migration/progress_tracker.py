@@ -1,5 +1,6 @@
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 
 
 class ProgressTracker:
@@ -12,19 +13,43 @@ class ProgressTracker:
         self.successful = 0
         self.failed = 0
         self.skipped = 0
+        self.rows = 0
 
     def start(self, total: int):
         """Start tracking"""
         self.total = total
         self.current = 0
+        self.rows = 0
         self.start_time = datetime.now()
 
         print(f"\n🚀 Starting import of {total} files...")
         print("=" * 60)
 
-    def increment(self, status: str = "✅", message: str = ""):
+    def elapsed_seconds(self) -> float:
+        """Seconds since start()"""
+        return (datetime.now() - self.start_time).total_seconds()
+
+    def throughput(self) -> float:
+        """Processed files per second since start()"""
+        elapsed = self.elapsed_seconds()
+        return self.current / elapsed if elapsed > 0 else 0.0
+
+    def rows_throughput(self) -> float:
+        """Imported product rows per second since start()"""
+        elapsed = self.elapsed_seconds()
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[timedelta]:
+        """Estimated time left at the current throughput (None until measurable)"""
+        rate = self.throughput()
+        if rate <= 0:
+            return None
+        return timedelta(seconds=(self.total - self.current) / rate)
+
+    def increment(self, status: str = "✅", message: str = "", rows: int = 0):
         """Update progress"""
         self.current += 1
+        self.rows += rows
 
         if status == "✅":
             self.successful += 1
@@ -39,19 +64,14 @@ class ProgressTracker:
         filled = int(bar_length * progress)
         bar = "█" * filled + "░" * (bar_length - filled)
 
-        # ETA
-        elapsed = datetime.now() - self.start_time
-        if self.current > 0:
-            avg_time = elapsed / self.current
-            remaining = avg_time * (self.total - self.current)
-            eta = f"ETA: {str(remaining).split('.')[0]}"
-        else:
-            eta = "ETA: calculating..."
+        # Throughput and ETA
+        remaining = self.eta()
+        eta = f"ETA: {str(remaining).split('.')[0]}" if remaining is not None else "ETA: calculating..."
 
         # Print status
         sys.stdout.write(
             f"\r{status} [{bar}] {self.current}/{self.total} "
-            f"({progress*100:.1f}%) | {eta} | "
+            f"({progress*100:.1f}%) | {self.throughput():.1f} files/s | {eta} | "
             f"✅ {self.successful} ❌ {self.failed} ⏭️ {self.skipped}"
         )
         sys.stdout.flush()
@@ -68,3 +88,4 @@ class ProgressTracker:
         print(f"   Successful: {self.successful}")
         print(f"   Failed:     {self.failed}")
         print(f"   Skipped:    {self.skipped}")
+        print(f"   Throughput: {self.throughput():.1f} files/s, {self.rows_throughput():.0f} rows/s")
@@ -0,0 +1,371 @@
+-- Migration: 059_kpi_rollups
+-- Description: Per-organization KPI rollup tables, maintained incrementally by triggers
+-- Created: 2026-10-18
+--
+-- Dashboard stats, customer stats and campaign totals read these small tables
+-- instead of aggregating quotes / customers / campaign_data on every request.
+--
+-- Rollups are updated by statement-level triggers with transition tables, so
+-- a bulk insert (quote save, customer import, SmartLead sync) costs one upsert
+-- per affected bucket, not one per row. Updates that don't touch a rolled-up
+-- column produce a zero delta and are skipped.
+--
+-- rebuild_kpi_rollups() recomputes everything from the source tables; the
+-- scheduler runs it nightly (scheduler.py) to repair any drift.
+--
+-- Rollup tables have no foreign keys: triggers may still run while an
+-- organization is being deleted. Rows of deleted organizations are removed
+-- by the next rebuild.
+
+-- ============================================================================
+-- 1. ROLLUP TABLES
+-- ============================================================================
+
+-- Non-deleted quotes by month (of created_at), status and currency
+CREATE TABLE IF NOT EXISTS org_quote_rollups (
+    organization_id UUID NOT NULL,
+    month DATE NOT NULL,
+    status TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    quote_count BIGINT NOT NULL DEFAULT 0,
+    total_amount NUMERIC NOT NULL DEFAULT 0,
+    total_profit_usd NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (organization_id, month, status, currency)
+);
+
+COMMENT ON TABLE org_quote_rollups IS 'Quote counts and sums per org/month/status/currency (trigger-maintained)';
+COMMENT ON COLUMN org_quote_rollups.month IS 'First day of the month of quotes.created_at';
+
+-- Customers by region, company type and status ('' = not set)
+CREATE TABLE IF NOT EXISTS org_customer_rollups (
+    organization_id UUID NOT NULL,
+    region TEXT NOT NULL,
+    company_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    customer_count BIGINT NOT NULL DEFAULT 0,
+    credit_limit_count BIGINT NOT NULL DEFAULT 0,
+    credit_limit_total NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (organization_id, region, company_type, status)
+);
+
+COMMENT ON TABLE org_customer_rollups IS 'Customer counts and credit limits per org/region/type/status (trigger-maintained)';
+COMMENT ON COLUMN org_customer_rollups.credit_limit_count IS 'Customers with a non-zero credit limit';
+
+-- campaign_data.metrics sums by source
+CREATE TABLE IF NOT EXISTS org_campaign_rollups (
+    organization_id UUID NOT NULL,
+    source TEXT NOT NULL,
+    campaign_count BIGINT NOT NULL DEFAULT 0,
+    sent_count NUMERIC NOT NULL DEFAULT 0,
+    open_count NUMERIC NOT NULL DEFAULT 0,
+    unique_open_count NUMERIC NOT NULL DEFAULT 0,
+    click_count NUMERIC NOT NULL DEFAULT 0,
+    unique_click_count NUMERIC NOT NULL DEFAULT 0,
+    reply_count NUMERIC NOT NULL DEFAULT 0,
+    bounce_count NUMERIC NOT NULL DEFAULT 0,
+    unsubscribed_count NUMERIC NOT NULL DEFAULT 0,
+    interested_count NUMERIC NOT NULL DEFAULT 0,
+    total_leads NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (organization_id, source)
+);
+
+COMMENT ON TABLE org_campaign_rollups IS 'Campaign metric sums per org/source (trigger-maintained)';
+
+-- Only the backend (service role) reads rollups
+ALTER TABLE org_quote_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE org_customer_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE org_campaign_rollups ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. DELTA HELPERS
+-- ============================================================================
+
+-- Numeric metric from campaign_data.metrics; anything that isn't a JSON
+-- number counts as 0 (a bad value must not fail the write)
+CREATE OR REPLACE FUNCTION kpi_metric(p_metrics JSONB, p_key TEXT)
+RETURNS NUMERIC AS $$
+    SELECT CASE WHEN jsonb_typeof(p_metrics -> p_key) = 'number'
+                THEN (p_metrics ->> p_key)::NUMERIC
+                ELSE 0 END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION apply_quote_rollup_delta(p_delta org_quote_rollups[])
+RETURNS VOID AS $$
+    INSERT INTO org_quote_rollups AS r
+        (organization_id, month, status, currency, quote_count, total_amount, total_profit_usd)
+    SELECT organization_id, month, status, currency,
+           SUM(quote_count), SUM(total_amount), SUM(total_profit_usd)
+    FROM unnest(p_delta)
+    GROUP BY organization_id, month, status, currency
+    HAVING SUM(quote_count) <> 0 OR SUM(total_amount) <> 0 OR SUM(total_profit_usd) <> 0
+    ORDER BY organization_id, month, status, currency
+    ON CONFLICT (organization_id, month, status, currency) DO UPDATE SET
+        quote_count = r.quote_count + EXCLUDED.quote_count,
+        total_amount = r.total_amount + EXCLUDED.total_amount,
+        total_profit_usd = r.total_profit_usd + EXCLUDED.total_profit_usd,
+        updated_at = now();
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION apply_customer_rollup_delta(p_delta org_customer_rollups[])
+RETURNS VOID AS $$
+    INSERT INTO org_customer_rollups AS r
+        (organization_id, region, company_type, status, customer_count, credit_limit_count, credit_limit_total)
+    SELECT organization_id, region, company_type, status,
+           SUM(customer_count), SUM(credit_limit_count), SUM(credit_limit_total)
+    FROM unnest(p_delta)
+    GROUP BY organization_id, region, company_type, status
+    HAVING SUM(customer_count) <> 0 OR SUM(credit_limit_count) <> 0 OR SUM(credit_limit_total) <> 0
+    ORDER BY organization_id, region, company_type, status
+    ON CONFLICT (organization_id, region, company_type, status) DO UPDATE SET
+        customer_count = r.customer_count + EXCLUDED.customer_count,
+        credit_limit_count = r.credit_limit_count + EXCLUDED.credit_limit_count,
+        credit_limit_total = r.credit_limit_total + EXCLUDED.credit_limit_total,
+        updated_at = now();
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION apply_campaign_rollup_delta(p_delta org_campaign_rollups[])
+RETURNS VOID AS $$
+    INSERT INTO org_campaign_rollups AS r
+        (organization_id, source, campaign_count, sent_count, open_count, unique_open_count,
+         click_count, unique_click_count, reply_count, bounce_count, unsubscribed_count,
+         interested_count, total_leads)
+    SELECT organization_id, source, SUM(campaign_count), SUM(sent_count), SUM(open_count),
+           SUM(unique_open_count), SUM(click_count), SUM(unique_click_count), SUM(reply_count),
+           SUM(bounce_count), SUM(unsubscribed_count), SUM(interested_count), SUM(total_leads)
+    FROM unnest(p_delta)
+    GROUP BY organization_id, source
+    HAVING SUM(campaign_count) <> 0 OR SUM(sent_count) <> 0 OR SUM(open_count) <> 0
+        OR SUM(unique_open_count) <> 0 OR SUM(click_count) <> 0 OR SUM(unique_click_count) <> 0
+        OR SUM(reply_count) <> 0 OR SUM(bounce_count) <> 0 OR SUM(unsubscribed_count) <> 0
+        OR SUM(interested_count) <> 0 OR SUM(total_leads) <> 0
+    ORDER BY organization_id, source
+    ON CONFLICT (organization_id, source) DO UPDATE SET
+        campaign_count = r.campaign_count + EXCLUDED.campaign_count,
+        sent_count = r.sent_count + EXCLUDED.sent_count,
+        open_count = r.open_count + EXCLUDED.open_count,
+        unique_open_count = r.unique_open_count + EXCLUDED.unique_open_count,
+        click_count = r.click_count + EXCLUDED.click_count,
+        unique_click_count = r.unique_click_count + EXCLUDED.unique_click_count,
+        reply_count = r.reply_count + EXCLUDED.reply_count,
+        bounce_count = r.bounce_count + EXCLUDED.bounce_count,
+        unsubscribed_count = r.unsubscribed_count + EXCLUDED.unsubscribed_count,
+        interested_count = r.interested_count + EXCLUDED.interested_count,
+        total_leads = r.total_leads + EXCLUDED.total_leads,
+        updated_at = now();
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- Called from the triggers only
+REVOKE EXECUTE ON FUNCTION apply_quote_rollup_delta(org_quote_rollups[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION apply_customer_rollup_delta(org_customer_rollups[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION apply_campaign_rollup_delta(org_campaign_rollups[]) FROM PUBLIC, anon, authenticated;
+
+-- ============================================================================
+-- 3. TRIGGERS
+-- ============================================================================
+-- Each function adds rows of new_rows (INSERT/UPDATE) and subtracts rows of
+-- old_rows (UPDATE/DELETE). Deltas are summed per bucket before the upsert,
+-- and buckets are upserted in key order so concurrent writers don't deadlock.
+-- The triggers and delta helpers run as their owner (SECURITY DEFINER):
+-- quotes, customers and campaign_data are also written through the Supabase
+-- client, whose roles have no policies on the rollup tables.
+
+CREATE OR REPLACE FUNCTION rollup_quotes_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta org_quote_rollups[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        delta := delta || ARRAY(
+            SELECT ROW(organization_id, date_trunc('month', created_at)::DATE,
+                       COALESCE(status, ''), COALESCE(currency, ''),
+                       1, COALESCE(total_amount, 0), COALESCE(total_profit_usd, 0), now())::org_quote_rollups
+            FROM new_rows
+            WHERE deleted_at IS NULL AND organization_id IS NOT NULL
+        );
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        delta := delta || ARRAY(
+            SELECT ROW(organization_id, date_trunc('month', created_at)::DATE,
+                       COALESCE(status, ''), COALESCE(currency, ''),
+                       -1, -COALESCE(total_amount, 0), -COALESCE(total_profit_usd, 0), now())::org_quote_rollups
+            FROM old_rows
+            WHERE deleted_at IS NULL AND organization_id IS NOT NULL
+        );
+    END IF;
+
+    PERFORM apply_quote_rollup_delta(delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION rollup_customers_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta org_customer_rollups[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        delta := delta || ARRAY(
+            SELECT ROW(organization_id, COALESCE(region, ''), COALESCE(company_type, ''), COALESCE(status, ''),
+                       1, CASE WHEN COALESCE(credit_limit, 0) <> 0 THEN 1 ELSE 0 END,
+                       COALESCE(credit_limit, 0), now())::org_customer_rollups
+            FROM new_rows
+            WHERE organization_id IS NOT NULL
+        );
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        delta := delta || ARRAY(
+            SELECT ROW(organization_id, COALESCE(region, ''), COALESCE(company_type, ''), COALESCE(status, ''),
+                       -1, CASE WHEN COALESCE(credit_limit, 0) <> 0 THEN -1 ELSE 0 END,
+                       -COALESCE(credit_limit, 0), now())::org_customer_rollups
+            FROM old_rows
+            WHERE organization_id IS NOT NULL
+        );
+    END IF;
+
+    PERFORM apply_customer_rollup_delta(delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION rollup_campaign_data_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta org_campaign_rollups[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        delta := delta || ARRAY(
+            SELECT ROW(organization_id, source, 1,
+                       kpi_metric(metrics, 'sent_count'), kpi_metric(metrics, 'open_count'),
+                       kpi_metric(metrics, 'unique_open_count'), kpi_metric(metrics, 'click_count'),
+                       kpi_metric(metrics, 'unique_click_count'), kpi_metric(metrics, 'reply_count'),
+                       kpi_metric(metrics, 'bounce_count'), kpi_metric(metrics, 'unsubscribed_count'),
+                       kpi_metric(metrics, 'interested_count'), kpi_metric(metrics, 'total_leads'),
+                       now())::org_campaign_rollups
+            FROM new_rows
+        );
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        delta := delta || ARRAY(
+            SELECT ROW(organization_id, source, -1,
+                       -kpi_metric(metrics, 'sent_count'), -kpi_metric(metrics, 'open_count'),
+                       -kpi_metric(metrics, 'unique_open_count'), -kpi_metric(metrics, 'click_count'),
+                       -kpi_metric(metrics, 'unique_click_count'), -kpi_metric(metrics, 'reply_count'),
+                       -kpi_metric(metrics, 'bounce_count'), -kpi_metric(metrics, 'unsubscribed_count'),
+                       -kpi_metric(metrics, 'interested_count'), -kpi_metric(metrics, 'total_leads'),
+                       now())::org_campaign_rollups
+            FROM old_rows
+        );
+    END IF;
+
+    PERFORM apply_campaign_rollup_delta(delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS quotes_rollup_insert ON quotes;
+DROP TRIGGER IF EXISTS quotes_rollup_update ON quotes;
+DROP TRIGGER IF EXISTS quotes_rollup_delete ON quotes;
+CREATE TRIGGER quotes_rollup_insert AFTER INSERT ON quotes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_quotes_changes();
+CREATE TRIGGER quotes_rollup_update AFTER UPDATE ON quotes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_quotes_changes();
+CREATE TRIGGER quotes_rollup_delete AFTER DELETE ON quotes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_quotes_changes();
+
+DROP TRIGGER IF EXISTS customers_rollup_insert ON customers;
+DROP TRIGGER IF EXISTS customers_rollup_update ON customers;
+DROP TRIGGER IF EXISTS customers_rollup_delete ON customers;
+CREATE TRIGGER customers_rollup_insert AFTER INSERT ON customers
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_customers_changes();
+CREATE TRIGGER customers_rollup_update AFTER UPDATE ON customers
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_customers_changes();
+CREATE TRIGGER customers_rollup_delete AFTER DELETE ON customers
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_customers_changes();
+
+DROP TRIGGER IF EXISTS campaign_data_rollup_insert ON campaign_data;
+DROP TRIGGER IF EXISTS campaign_data_rollup_update ON campaign_data;
+DROP TRIGGER IF EXISTS campaign_data_rollup_delete ON campaign_data;
+CREATE TRIGGER campaign_data_rollup_insert AFTER INSERT ON campaign_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_campaign_data_changes();
+CREATE TRIGGER campaign_data_rollup_update AFTER UPDATE ON campaign_data
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_campaign_data_changes();
+CREATE TRIGGER campaign_data_rollup_delete AFTER DELETE ON campaign_data
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_campaign_data_changes();
+
+-- ============================================================================
+-- 4. RECONCILIATION
+-- ============================================================================
+
+-- Recompute rollups from the source tables, for one organization or (NULL) all.
+-- Writes to the source tables wait until the rebuild commits, so no change is
+-- counted twice or lost.
+CREATE OR REPLACE FUNCTION rebuild_kpi_rollups(p_organization_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE org_quote_rollups, org_customer_rollups, org_campaign_rollups
+        IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM org_quote_rollups
+    WHERE p_organization_id IS NULL OR organization_id = p_organization_id;
+
+    INSERT INTO org_quote_rollups
+        (organization_id, month, status, currency, quote_count, total_amount, total_profit_usd)
+    SELECT organization_id, date_trunc('month', created_at)::DATE,
+           COALESCE(status, ''), COALESCE(currency, ''),
+           COUNT(*), COALESCE(SUM(total_amount), 0), COALESCE(SUM(total_profit_usd), 0)
+    FROM quotes
+    WHERE deleted_at IS NULL AND organization_id IS NOT NULL
+      AND (p_organization_id IS NULL OR organization_id = p_organization_id)
+    GROUP BY 1, 2, 3, 4;
+
+    DELETE FROM org_customer_rollups
+    WHERE p_organization_id IS NULL OR organization_id = p_organization_id;
+
+    INSERT INTO org_customer_rollups
+        (organization_id, region, company_type, status, customer_count, credit_limit_count, credit_limit_total)
+    SELECT organization_id, COALESCE(region, ''), COALESCE(company_type, ''), COALESCE(status, ''),
+           COUNT(*), COUNT(*) FILTER (WHERE COALESCE(credit_limit, 0) <> 0), COALESCE(SUM(credit_limit), 0)
+    FROM customers
+    WHERE organization_id IS NOT NULL
+      AND (p_organization_id IS NULL OR organization_id = p_organization_id)
+    GROUP BY 1, 2, 3, 4;
+
+    DELETE FROM org_campaign_rollups
+    WHERE p_organization_id IS NULL OR organization_id = p_organization_id;
+
+    INSERT INTO org_campaign_rollups
+        (organization_id, source, campaign_count, sent_count, open_count, unique_open_count,
+         click_count, unique_click_count, reply_count, bounce_count, unsubscribed_count,
+         interested_count, total_leads)
+    SELECT organization_id, source, COUNT(*),
+           SUM(kpi_metric(metrics, 'sent_count')), SUM(kpi_metric(metrics, 'open_count')),
+           SUM(kpi_metric(metrics, 'unique_open_count')), SUM(kpi_metric(metrics, 'click_count')),
+           SUM(kpi_metric(metrics, 'unique_click_count')), SUM(kpi_metric(metrics, 'reply_count')),
+           SUM(kpi_metric(metrics, 'bounce_count')), SUM(kpi_metric(metrics, 'unsubscribed_count')),
+           SUM(kpi_metric(metrics, 'interested_count')), SUM(kpi_metric(metrics, 'total_leads'))
+    FROM campaign_data
+    WHERE p_organization_id IS NULL OR organization_id = p_organization_id
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION rebuild_kpi_rollups IS 'Recompute KPI rollups from quotes, customers and campaign_data (NULL = all organizations)';
+
+-- Initial fill
+SELECT rebuild_kpi_rollups();
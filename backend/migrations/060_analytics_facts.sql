@@ -0,0 +1,447 @@
+-- Migration: 060_analytics_facts
+-- Description: Flattened, typed analytics fact tables (one row per quote, one per item)
+-- Created: 2026-10-18
+--
+-- The analytics query builders (analytics_security.py) used to read variable
+-- fields as qcv.variables->>'field' through a JOIN to
+-- quote_calculation_variables, re-parsing JSONB for every row with no usable
+-- index. analytics_quote_facts holds the quote columns, the whitelisted
+-- variables as typed columns and the quote summary, so reports scan one
+-- indexed table without joins. analytics_item_facts does the same per quote
+-- item with the main phase_results values.
+--
+-- Facts are refreshed by statement-level triggers whenever a quote, its
+-- variables, summary, items or calculation results change, so a saved
+-- calculation is visible to analytics in the same transaction. Deleting a
+-- quote or item removes its facts through the foreign keys.
+--
+-- routes/analytics.py detects the table and switches the builders to it;
+-- without this migration they keep using the JSONB joins.
+
+-- ============================================================================
+-- 1. FACT TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS analytics_quote_facts (
+    -- Same names as quotes columns, so builders keep the q. alias
+    id UUID PRIMARY KEY REFERENCES quotes(id) ON DELETE CASCADE,
+    organization_id UUID NOT NULL,
+    idn_quote TEXT,
+    status TEXT,
+    created_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ,
+    total_amount DECIMAL(15,2),
+    quote_date DATE,
+    customer_id UUID,
+
+    -- quote_calculation_variables.variables (whitelisted keys, typed)
+    offer_sale_type TEXT,
+    seller_company TEXT,
+    currency_of_quote TEXT,
+    markup NUMERIC,
+    discount NUMERIC,
+
+    -- quote_calculation_summaries
+    calc_n16_price_without_vat DECIMAL(15,2),
+    calc_p16_after_supplier_discount DECIMAL(15,2),
+    calc_r16_per_unit_quote_currency DECIMAL(15,2),
+    calc_s16_total_purchase_price DECIMAL(15,2),
+    calc_s13_sum_purchase_prices DECIMAL(15,2),
+    calc_t16_first_leg_logistics DECIMAL(15,2),
+    calc_u16_last_leg_logistics DECIMAL(15,2),
+    calc_v16_total_logistics DECIMAL(15,2),
+    calc_total_brokerage DECIMAL(15,2),
+    calc_total_logistics_and_brokerage DECIMAL(15,2),
+    calc_ax16_internal_price_unit DECIMAL(15,2),
+    calc_ay16_internal_price_total DECIMAL(15,2),
+    calc_y16_customs_duty DECIMAL(15,2),
+    calc_z16_excise_tax DECIMAL(15,2),
+    calc_az16_with_vat_restored DECIMAL(15,2),
+    calc_bh6_supplier_payment DECIMAL(15,2),
+    calc_bh4_before_forwarding DECIMAL(15,2),
+    calc_bh2_revenue_estimated DECIMAL(15,2),
+    calc_bh3_client_advance DECIMAL(15,2),
+    calc_bh7_supplier_financing_need DECIMAL(15,2),
+    calc_bj7_supplier_financing_cost DECIMAL(15,2),
+    calc_bh10_operational_financing DECIMAL(15,2),
+    calc_bj10_operational_cost DECIMAL(15,2),
+    calc_bj11_total_financing_cost DECIMAL(15,2),
+    calc_bl3_credit_sales_amount DECIMAL(15,2),
+    calc_bl4_credit_sales_with_interest DECIMAL(15,2),
+    calc_bl5_credit_sales_interest DECIMAL(15,2),
+    calc_ba16_financing_per_product DECIMAL(15,2),
+    calc_bb16_credit_interest_per_product DECIMAL(15,2),
+    calc_aa16_cogs_per_unit DECIMAL(15,2),
+    calc_ab16_cogs_total DECIMAL(15,2),
+    calc_af16_profit_margin DECIMAL(10,4),
+    calc_ag16_dm_fee DECIMAL(15,2),
+    calc_ah16_forex_risk_reserve DECIMAL(15,2),
+    calc_ai16_agent_fee DECIMAL(15,2),
+    calc_ad16_sale_price_unit DECIMAL(15,2),
+    calc_ae16_sale_price_total DECIMAL(15,2),
+    calc_aj16_final_price_unit DECIMAL(15,2),
+    calc_ak16_final_price_total DECIMAL(15,2),
+    calc_am16_price_with_vat DECIMAL(15,2),
+    calc_al16_total_with_vat DECIMAL(15,2),
+    calc_an16_sales_vat DECIMAL(15,2),
+    calc_ao16_deductible_vat DECIMAL(15,2),
+    calc_ap16_net_vat_payable DECIMAL(15,2),
+    calc_aq16_transit_commission DECIMAL(15,2),
+
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE analytics_quote_facts IS 'One row per quote: quote columns, typed calculation variables and summary totals (trigger-maintained)';
+
+CREATE INDEX IF NOT EXISTS idx_analytics_quote_facts_org_created
+    ON analytics_quote_facts(organization_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_analytics_quote_facts_org_status
+    ON analytics_quote_facts(organization_id, status);
+CREATE INDEX IF NOT EXISTS idx_analytics_quote_facts_org_quote_date
+    ON analytics_quote_facts(organization_id, quote_date);
+CREATE INDEX IF NOT EXISTS idx_analytics_quote_facts_org_seller
+    ON analytics_quote_facts(organization_id, seller_company);
+CREATE INDEX IF NOT EXISTS idx_analytics_quote_facts_org_sale_type
+    ON analytics_quote_facts(organization_id, offer_sale_type);
+
+CREATE TABLE IF NOT EXISTS analytics_item_facts (
+    id UUID PRIMARY KEY REFERENCES quote_items(id) ON DELETE CASCADE,
+    quote_id UUID NOT NULL,
+    organization_id UUID NOT NULL,
+    position INTEGER,
+    product_name TEXT,
+    product_code TEXT,
+    quantity INTEGER,
+    supplier_country TEXT,
+
+    -- quote_calculation_results.phase_results (see CALCULATION_FIELD_MAP)
+    customs_fee NUMERIC,
+    excise_tax_amount NUMERIC,
+    logistics_total NUMERIC,
+    cogs_per_product NUMERIC,
+    profit NUMERIC,
+    sales_price_total_no_vat NUMERIC,
+    sales_price_total_with_vat NUMERIC,
+    calculated_at TIMESTAMPTZ,
+
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE analytics_item_facts IS 'One row per quote item: product columns and typed calculation results (trigger-maintained)';
+
+CREATE INDEX IF NOT EXISTS idx_analytics_item_facts_org_quote
+    ON analytics_item_facts(organization_id, quote_id);
+
+-- Read through the SECURITY DEFINER analytics functions only
+ALTER TABLE analytics_quote_facts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE analytics_item_facts ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. REFRESH FUNCTIONS
+-- ============================================================================
+
+-- Numeric value of a JSONB key: JSON numbers and numeric strings ("15"),
+-- anything else is NULL
+CREATE OR REPLACE FUNCTION analytics_numeric(p_doc JSONB, p_key TEXT)
+RETURNS NUMERIC AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(p_doc -> p_key) = 'number'
+            THEN (p_doc ->> p_key)::NUMERIC
+        WHEN jsonb_typeof(p_doc -> p_key) = 'string' AND (p_doc ->> p_key) ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*$'
+            THEN trim(p_doc ->> p_key)::NUMERIC
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- The refresh functions and the trigger run as their owner (SECURITY
+-- DEFINER): the Supabase client roles that write quotes and items have no
+-- policies on the facts tables.
+
+-- Upsert facts of the given quotes (NULL = all quotes)
+CREATE OR REPLACE FUNCTION refresh_analytics_quote_facts(p_quote_ids UUID[])
+RETURNS VOID AS $$
+    INSERT INTO analytics_quote_facts (
+        id, organization_id, idn_quote, status, created_at, updated_at,
+        total_amount, quote_date, customer_id,
+        offer_sale_type, seller_company, currency_of_quote, markup, discount,
+        calc_n16_price_without_vat, calc_p16_after_supplier_discount, calc_r16_per_unit_quote_currency,
+        calc_s16_total_purchase_price, calc_s13_sum_purchase_prices, calc_t16_first_leg_logistics,
+        calc_u16_last_leg_logistics, calc_v16_total_logistics, calc_total_brokerage,
+        calc_total_logistics_and_brokerage, calc_ax16_internal_price_unit, calc_ay16_internal_price_total,
+        calc_y16_customs_duty, calc_z16_excise_tax, calc_az16_with_vat_restored,
+        calc_bh6_supplier_payment, calc_bh4_before_forwarding, calc_bh2_revenue_estimated,
+        calc_bh3_client_advance, calc_bh7_supplier_financing_need, calc_bj7_supplier_financing_cost,
+        calc_bh10_operational_financing, calc_bj10_operational_cost, calc_bj11_total_financing_cost,
+        calc_bl3_credit_sales_amount, calc_bl4_credit_sales_with_interest, calc_bl5_credit_sales_interest,
+        calc_ba16_financing_per_product, calc_bb16_credit_interest_per_product, calc_aa16_cogs_per_unit,
+        calc_ab16_cogs_total, calc_af16_profit_margin, calc_ag16_dm_fee,
+        calc_ah16_forex_risk_reserve, calc_ai16_agent_fee, calc_ad16_sale_price_unit,
+        calc_ae16_sale_price_total, calc_aj16_final_price_unit, calc_ak16_final_price_total,
+        calc_am16_price_with_vat, calc_al16_total_with_vat, calc_an16_sales_vat,
+        calc_ao16_deductible_vat, calc_ap16_net_vat_payable, calc_aq16_transit_commission
+    )
+    SELECT
+        q.id, q.organization_id, q.idn_quote, q.status, q.created_at, q.updated_at,
+        q.total_amount, q.quote_date, q.customer_id,
+        qcv.variables ->> 'offer_sale_type',
+        qcv.variables ->> 'seller_company',
+        qcv.variables ->> 'currency_of_quote',
+        analytics_numeric(qcv.variables, 'markup'),
+        analytics_numeric(qcv.variables, 'discount'),
+        qcs.calc_n16_price_without_vat,
+        qcs.calc_p16_after_supplier_discount,
+        qcs.calc_r16_per_unit_quote_currency,
+        qcs.calc_s16_total_purchase_price,
+        qcs.calc_s13_sum_purchase_prices,
+        qcs.calc_t16_first_leg_logistics,
+        qcs.calc_u16_last_leg_logistics,
+        qcs.calc_v16_total_logistics,
+        qcs.calc_total_brokerage,
+        qcs.calc_total_logistics_and_brokerage,
+        qcs.calc_ax16_internal_price_unit,
+        qcs.calc_ay16_internal_price_total,
+        qcs.calc_y16_customs_duty,
+        qcs.calc_z16_excise_tax,
+        qcs.calc_az16_with_vat_restored,
+        qcs.calc_bh6_supplier_payment,
+        qcs.calc_bh4_before_forwarding,
+        qcs.calc_bh2_revenue_estimated,
+        qcs.calc_bh3_client_advance,
+        qcs.calc_bh7_supplier_financing_need,
+        qcs.calc_bj7_supplier_financing_cost,
+        qcs.calc_bh10_operational_financing,
+        qcs.calc_bj10_operational_cost,
+        qcs.calc_bj11_total_financing_cost,
+        qcs.calc_bl3_credit_sales_amount,
+        qcs.calc_bl4_credit_sales_with_interest,
+        qcs.calc_bl5_credit_sales_interest,
+        qcs.calc_ba16_financing_per_product,
+        qcs.calc_bb16_credit_interest_per_product,
+        qcs.calc_aa16_cogs_per_unit,
+        qcs.calc_ab16_cogs_total,
+        qcs.calc_af16_profit_margin,
+        qcs.calc_ag16_dm_fee,
+        qcs.calc_ah16_forex_risk_reserve,
+        qcs.calc_ai16_agent_fee,
+        qcs.calc_ad16_sale_price_unit,
+        qcs.calc_ae16_sale_price_total,
+        qcs.calc_aj16_final_price_unit,
+        qcs.calc_ak16_final_price_total,
+        qcs.calc_am16_price_with_vat,
+        qcs.calc_al16_total_with_vat,
+        qcs.calc_an16_sales_vat,
+        qcs.calc_ao16_deductible_vat,
+        qcs.calc_ap16_net_vat_payable,
+        qcs.calc_aq16_transit_commission
+    FROM quotes q
+    LEFT JOIN quote_calculation_variables qcv ON qcv.quote_id = q.id
+    LEFT JOIN quote_calculation_summaries qcs ON qcs.quote_id = q.id
+    WHERE q.organization_id IS NOT NULL
+      AND (p_quote_ids IS NULL OR q.id = ANY(p_quote_ids))
+    ON CONFLICT (id) DO UPDATE SET
+        organization_id = EXCLUDED.organization_id,
+        idn_quote = EXCLUDED.idn_quote,
+        status = EXCLUDED.status,
+        created_at = EXCLUDED.created_at,
+        updated_at = EXCLUDED.updated_at,
+        total_amount = EXCLUDED.total_amount,
+        quote_date = EXCLUDED.quote_date,
+        customer_id = EXCLUDED.customer_id,
+        offer_sale_type = EXCLUDED.offer_sale_type,
+        seller_company = EXCLUDED.seller_company,
+        currency_of_quote = EXCLUDED.currency_of_quote,
+        markup = EXCLUDED.markup,
+        discount = EXCLUDED.discount,
+        calc_n16_price_without_vat = EXCLUDED.calc_n16_price_without_vat,
+        calc_p16_after_supplier_discount = EXCLUDED.calc_p16_after_supplier_discount,
+        calc_r16_per_unit_quote_currency = EXCLUDED.calc_r16_per_unit_quote_currency,
+        calc_s16_total_purchase_price = EXCLUDED.calc_s16_total_purchase_price,
+        calc_s13_sum_purchase_prices = EXCLUDED.calc_s13_sum_purchase_prices,
+        calc_t16_first_leg_logistics = EXCLUDED.calc_t16_first_leg_logistics,
+        calc_u16_last_leg_logistics = EXCLUDED.calc_u16_last_leg_logistics,
+        calc_v16_total_logistics = EXCLUDED.calc_v16_total_logistics,
+        calc_total_brokerage = EXCLUDED.calc_total_brokerage,
+        calc_total_logistics_and_brokerage = EXCLUDED.calc_total_logistics_and_brokerage,
+        calc_ax16_internal_price_unit = EXCLUDED.calc_ax16_internal_price_unit,
+        calc_ay16_internal_price_total = EXCLUDED.calc_ay16_internal_price_total,
+        calc_y16_customs_duty = EXCLUDED.calc_y16_customs_duty,
+        calc_z16_excise_tax = EXCLUDED.calc_z16_excise_tax,
+        calc_az16_with_vat_restored = EXCLUDED.calc_az16_with_vat_restored,
+        calc_bh6_supplier_payment = EXCLUDED.calc_bh6_supplier_payment,
+        calc_bh4_before_forwarding = EXCLUDED.calc_bh4_before_forwarding,
+        calc_bh2_revenue_estimated = EXCLUDED.calc_bh2_revenue_estimated,
+        calc_bh3_client_advance = EXCLUDED.calc_bh3_client_advance,
+        calc_bh7_supplier_financing_need = EXCLUDED.calc_bh7_supplier_financing_need,
+        calc_bj7_supplier_financing_cost = EXCLUDED.calc_bj7_supplier_financing_cost,
+        calc_bh10_operational_financing = EXCLUDED.calc_bh10_operational_financing,
+        calc_bj10_operational_cost = EXCLUDED.calc_bj10_operational_cost,
+        calc_bj11_total_financing_cost = EXCLUDED.calc_bj11_total_financing_cost,
+        calc_bl3_credit_sales_amount = EXCLUDED.calc_bl3_credit_sales_amount,
+        calc_bl4_credit_sales_with_interest = EXCLUDED.calc_bl4_credit_sales_with_interest,
+        calc_bl5_credit_sales_interest = EXCLUDED.calc_bl5_credit_sales_interest,
+        calc_ba16_financing_per_product = EXCLUDED.calc_ba16_financing_per_product,
+        calc_bb16_credit_interest_per_product = EXCLUDED.calc_bb16_credit_interest_per_product,
+        calc_aa16_cogs_per_unit = EXCLUDED.calc_aa16_cogs_per_unit,
+        calc_ab16_cogs_total = EXCLUDED.calc_ab16_cogs_total,
+        calc_af16_profit_margin = EXCLUDED.calc_af16_profit_margin,
+        calc_ag16_dm_fee = EXCLUDED.calc_ag16_dm_fee,
+        calc_ah16_forex_risk_reserve = EXCLUDED.calc_ah16_forex_risk_reserve,
+        calc_ai16_agent_fee = EXCLUDED.calc_ai16_agent_fee,
+        calc_ad16_sale_price_unit = EXCLUDED.calc_ad16_sale_price_unit,
+        calc_ae16_sale_price_total = EXCLUDED.calc_ae16_sale_price_total,
+        calc_aj16_final_price_unit = EXCLUDED.calc_aj16_final_price_unit,
+        calc_ak16_final_price_total = EXCLUDED.calc_ak16_final_price_total,
+        calc_am16_price_with_vat = EXCLUDED.calc_am16_price_with_vat,
+        calc_al16_total_with_vat = EXCLUDED.calc_al16_total_with_vat,
+        calc_an16_sales_vat = EXCLUDED.calc_an16_sales_vat,
+        calc_ao16_deductible_vat = EXCLUDED.calc_ao16_deductible_vat,
+        calc_ap16_net_vat_payable = EXCLUDED.calc_ap16_net_vat_payable,
+        calc_aq16_transit_commission = EXCLUDED.calc_aq16_transit_commission,
+        refreshed_at = now();
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- Upsert facts of the given quote items (NULL = all items)
+CREATE OR REPLACE FUNCTION refresh_analytics_item_facts(p_item_ids UUID[])
+RETURNS VOID AS $$
+    INSERT INTO analytics_item_facts (
+        id, quote_id, organization_id, position, product_name, product_code,
+        quantity, supplier_country,
+        customs_fee, excise_tax_amount, logistics_total, cogs_per_product, profit,
+        sales_price_total_no_vat, sales_price_total_with_vat, calculated_at
+    )
+    SELECT
+        qi.id, qi.quote_id, q.organization_id, qi.position, qi.product_name, qi.product_code,
+        qi.quantity, qi.supplier_country,
+        analytics_numeric(qcr.phase_results, 'customs_fee'),
+        analytics_numeric(qcr.phase_results, 'excise_tax_amount'),
+        analytics_numeric(qcr.phase_results, 'logistics_total'),
+        analytics_numeric(qcr.phase_results, 'cogs_per_product'),
+        analytics_numeric(qcr.phase_results, 'profit'),
+        analytics_numeric(qcr.phase_results, 'sales_price_total_no_vat'),
+        analytics_numeric(qcr.phase_results, 'sales_price_total_with_vat'),
+        qcr.calculated_at
+    FROM quote_items qi
+    JOIN quotes q ON q.id = qi.quote_id
+    LEFT JOIN quote_calculation_results qcr ON qcr.quote_item_id = qi.id
+    WHERE q.organization_id IS NOT NULL
+      AND (p_item_ids IS NULL OR qi.id = ANY(p_item_ids))
+    ON CONFLICT (id) DO UPDATE SET
+        quote_id = EXCLUDED.quote_id,
+        organization_id = EXCLUDED.organization_id,
+        position = EXCLUDED.position,
+        product_name = EXCLUDED.product_name,
+        product_code = EXCLUDED.product_code,
+        quantity = EXCLUDED.quantity,
+        supplier_country = EXCLUDED.supplier_country,
+        customs_fee = EXCLUDED.customs_fee,
+        excise_tax_amount = EXCLUDED.excise_tax_amount,
+        logistics_total = EXCLUDED.logistics_total,
+        cogs_per_product = EXCLUDED.cogs_per_product,
+        profit = EXCLUDED.profit,
+        sales_price_total_no_vat = EXCLUDED.sales_price_total_no_vat,
+        sales_price_total_with_vat = EXCLUDED.sales_price_total_with_vat,
+        calculated_at = EXCLUDED.calculated_at,
+        refreshed_at = now();
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- Called from the triggers and this migration only
+REVOKE EXECUTE ON FUNCTION refresh_analytics_quote_facts(UUID[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION refresh_analytics_item_facts(UUID[]) FROM PUBLIC, anon, authenticated;
+
+-- ============================================================================
+-- 3. TRIGGERS
+-- ============================================================================
+-- TG_ARGV[0]: 'quote' or 'item' facts; TG_ARGV[1]: column holding the key
+
+CREATE OR REPLACE FUNCTION refresh_analytics_facts_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    ids UUID[];
+    changed UUID[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format('SELECT array_agg(DISTINCT %I) FROM new_rows', TG_ARGV[1]) INTO ids;
+        changed := changed || COALESCE(ids, '{}');
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('SELECT array_agg(DISTINCT %I) FROM old_rows', TG_ARGV[1]) INTO ids;
+        changed := changed || COALESCE(ids, '{}');
+    END IF;
+
+    IF cardinality(changed) > 0 THEN
+        IF TG_ARGV[0] = 'quote' THEN
+            PERFORM refresh_analytics_quote_facts(changed);
+        ELSE
+            PERFORM refresh_analytics_item_facts(changed);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Quote facts: quotes, variables, summaries
+DROP TRIGGER IF EXISTS quotes_analytics_facts_insert ON quotes;
+DROP TRIGGER IF EXISTS quotes_analytics_facts_update ON quotes;
+CREATE TRIGGER quotes_analytics_facts_insert AFTER INSERT ON quotes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'id');
+CREATE TRIGGER quotes_analytics_facts_update AFTER UPDATE ON quotes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'id');
+
+DROP TRIGGER IF EXISTS qcv_analytics_facts_insert ON quote_calculation_variables;
+DROP TRIGGER IF EXISTS qcv_analytics_facts_update ON quote_calculation_variables;
+DROP TRIGGER IF EXISTS qcv_analytics_facts_delete ON quote_calculation_variables;
+CREATE TRIGGER qcv_analytics_facts_insert AFTER INSERT ON quote_calculation_variables
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'quote_id');
+CREATE TRIGGER qcv_analytics_facts_update AFTER UPDATE ON quote_calculation_variables
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'quote_id');
+CREATE TRIGGER qcv_analytics_facts_delete AFTER DELETE ON quote_calculation_variables
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'quote_id');
+
+DROP TRIGGER IF EXISTS qcs_analytics_facts_insert ON quote_calculation_summaries;
+DROP TRIGGER IF EXISTS qcs_analytics_facts_update ON quote_calculation_summaries;
+DROP TRIGGER IF EXISTS qcs_analytics_facts_delete ON quote_calculation_summaries;
+CREATE TRIGGER qcs_analytics_facts_insert AFTER INSERT ON quote_calculation_summaries
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'quote_id');
+CREATE TRIGGER qcs_analytics_facts_update AFTER UPDATE ON quote_calculation_summaries
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'quote_id');
+CREATE TRIGGER qcs_analytics_facts_delete AFTER DELETE ON quote_calculation_summaries
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('quote', 'quote_id');
+
+-- Item facts: items, calculation results
+DROP TRIGGER IF EXISTS quote_items_analytics_facts_insert ON quote_items;
+DROP TRIGGER IF EXISTS quote_items_analytics_facts_update ON quote_items;
+CREATE TRIGGER quote_items_analytics_facts_insert AFTER INSERT ON quote_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('item', 'id');
+CREATE TRIGGER quote_items_analytics_facts_update AFTER UPDATE ON quote_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('item', 'id');
+
+DROP TRIGGER IF EXISTS qcr_analytics_facts_insert ON quote_calculation_results;
+DROP TRIGGER IF EXISTS qcr_analytics_facts_update ON quote_calculation_results;
+DROP TRIGGER IF EXISTS qcr_analytics_facts_delete ON quote_calculation_results;
+CREATE TRIGGER qcr_analytics_facts_insert AFTER INSERT ON quote_calculation_results
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('item', 'quote_item_id');
+CREATE TRIGGER qcr_analytics_facts_update AFTER UPDATE ON quote_calculation_results
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('item', 'quote_item_id');
+CREATE TRIGGER qcr_analytics_facts_delete AFTER DELETE ON quote_calculation_results
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_analytics_facts_changes('item', 'quote_item_id');
+
+-- ============================================================================
+-- 4. INITIAL FILL
+-- ============================================================================
+
+SELECT refresh_analytics_quote_facts(NULL);
+SELECT refresh_analytics_item_facts(NULL);
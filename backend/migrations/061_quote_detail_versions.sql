@@ -0,0 +1,121 @@
+-- Migration: 061_quote_detail_versions
+-- Description: Per-quote version counter for the quote detail cache
+-- Created: 2026-10-18
+--
+-- GET /api/quotes/{id} caches the assembled quote (items, calculation
+-- results, variables) per quote. quote_detail_versions.version is bumped by
+-- statement-level triggers whenever the quote, its items, calculation
+-- results or variables change, from any writer (API, Supabase client,
+-- SQL). A cached entry is served only while its version matches, so item
+-- edits, recalculations and workflow transitions are visible on the next
+-- view in every worker.
+--
+-- A quote without a row here has version 0.
+
+-- ============================================================================
+-- 1. VERSION TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS quote_detail_versions (
+    quote_id UUID PRIMARY KEY REFERENCES quotes(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE quote_detail_versions IS 'Bumped on every change to a quote or its items/results/variables (trigger-maintained); key of the quote detail cache';
+
+ALTER TABLE quote_detail_versions ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. BUMP FUNCTION AND TRIGGERS
+-- ============================================================================
+
+-- Both functions run as their owner (SECURITY DEFINER): the Supabase client
+-- roles that write quotes and items have no policies on quote_detail_versions.
+-- Quotes deleted in the same statement (cascades) are skipped
+CREATE OR REPLACE FUNCTION bump_quote_detail_versions(p_quote_ids UUID[])
+RETURNS VOID AS $$
+    INSERT INTO quote_detail_versions (quote_id)
+    SELECT q.id
+    FROM quotes q
+    WHERE q.id = ANY(p_quote_ids)
+    ORDER BY q.id
+    ON CONFLICT (quote_id) DO UPDATE SET
+        version = quote_detail_versions.version + 1,
+        changed_at = now();
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION bump_quote_detail_versions(UUID[]) FROM PUBLIC, anon, authenticated;
+
+-- TG_ARGV[0]: column holding the quote id
+CREATE OR REPLACE FUNCTION bump_quote_detail_versions_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    ids UUID[];
+    changed UUID[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format('SELECT array_agg(DISTINCT %I) FROM new_rows', TG_ARGV[0]) INTO ids;
+        changed := changed || COALESCE(ids, '{}');
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('SELECT array_agg(DISTINCT %I) FROM old_rows', TG_ARGV[0]) INTO ids;
+        changed := changed || COALESCE(ids, '{}');
+    END IF;
+
+    IF cardinality(changed) > 0 THEN
+        PERFORM bump_quote_detail_versions(changed);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- quotes: status / workflow transitions and header edits
+DROP TRIGGER IF EXISTS quotes_detail_version_update ON quotes;
+CREATE TRIGGER quotes_detail_version_update AFTER UPDATE ON quotes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('id');
+
+-- quote_items: item edits
+DROP TRIGGER IF EXISTS quote_items_detail_version_insert ON quote_items;
+DROP TRIGGER IF EXISTS quote_items_detail_version_update ON quote_items;
+DROP TRIGGER IF EXISTS quote_items_detail_version_delete ON quote_items;
+CREATE TRIGGER quote_items_detail_version_insert AFTER INSERT ON quote_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+CREATE TRIGGER quote_items_detail_version_update AFTER UPDATE ON quote_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+CREATE TRIGGER quote_items_detail_version_delete AFTER DELETE ON quote_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+
+-- quote_calculation_results: recalculations
+DROP TRIGGER IF EXISTS qcr_detail_version_insert ON quote_calculation_results;
+DROP TRIGGER IF EXISTS qcr_detail_version_update ON quote_calculation_results;
+DROP TRIGGER IF EXISTS qcr_detail_version_delete ON quote_calculation_results;
+CREATE TRIGGER qcr_detail_version_insert AFTER INSERT ON quote_calculation_results
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+CREATE TRIGGER qcr_detail_version_update AFTER UPDATE ON quote_calculation_results
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+CREATE TRIGGER qcr_detail_version_delete AFTER DELETE ON quote_calculation_results
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+
+-- quote_calculation_variables: recalculations with new inputs
+DROP TRIGGER IF EXISTS qcv_detail_version_insert ON quote_calculation_variables;
+DROP TRIGGER IF EXISTS qcv_detail_version_update ON quote_calculation_variables;
+DROP TRIGGER IF EXISTS qcv_detail_version_delete ON quote_calculation_variables;
+CREATE TRIGGER qcv_detail_version_insert AFTER INSERT ON quote_calculation_variables
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+CREATE TRIGGER qcv_detail_version_update AFTER UPDATE ON quote_calculation_variables
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
+CREATE TRIGGER qcv_detail_version_delete AFTER DELETE ON quote_calculation_variables
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_quote_detail_versions_changes('quote_id');
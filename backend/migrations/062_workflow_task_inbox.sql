@@ -0,0 +1,146 @@
+-- Migration: 062_workflow_task_inbox
+-- Description: Task inbox projection for GET /api/quotes/my-tasks, with change notifications
+-- Created: 2026-10-18
+--
+-- workflow_task_inbox has one row per quote that is waiting on a role
+-- (current_assignee_role set, workflow_state not approved/rejected), with
+-- the columns the inbox shows. A trigger on quotes keeps it in step with
+-- every transition, whichever endpoint made it (routes/workflow.py,
+-- the approval endpoints in routes/quotes.py, routes/financial_approval.py),
+-- so reads are an index-only scan of
+-- (organization_id, assignee_role, assigned_at).
+--
+-- Every change is also sent with pg_notify on channel 'workflow_inbox'
+-- ({"organization_id", "assignee_roles", "quote_id"}); the API listens and
+-- pushes inbox updates to connected clients (GET /api/quotes/my-tasks/stream).
+
+-- ============================================================================
+-- 1. INBOX TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS workflow_task_inbox (
+    quote_id UUID PRIMARY KEY REFERENCES quotes(id) ON DELETE CASCADE,
+    organization_id UUID NOT NULL,
+    assignee_role TEXT NOT NULL,
+    workflow_state TEXT NOT NULL,
+    idn_quote TEXT,
+    customer_name TEXT,
+    total_amount DECIMAL(15,2),
+    assigned_at TIMESTAMPTZ NOT NULL
+);
+
+COMMENT ON TABLE workflow_task_inbox IS 'Quotes waiting on a workflow role (trigger-maintained from quotes)';
+
+-- Covers the whole inbox read: no heap access for visible pages
+CREATE INDEX IF NOT EXISTS idx_workflow_task_inbox_org_role
+    ON workflow_task_inbox(organization_id, assignee_role, assigned_at DESC)
+    INCLUDE (quote_id, workflow_state, idn_quote, customer_name, total_amount);
+
+ALTER TABLE workflow_task_inbox ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. MAINTENANCE
+-- ============================================================================
+-- The trigger functions run as their owner (SECURITY DEFINER): workflow
+-- transitions are also written through the Supabase client, whose roles
+-- have no policies on workflow_task_inbox.
+
+CREATE OR REPLACE FUNCTION sync_workflow_task_inbox()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_role TEXT;
+    new_role TEXT;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_role := CASE
+            WHEN OLD.workflow_state NOT IN ('approved', 'rejected') THEN OLD.current_assignee_role
+        END;
+    END IF;
+
+    IF TG_OP <> 'DELETE' THEN
+        new_role := CASE
+            WHEN NEW.workflow_state NOT IN ('approved', 'rejected') THEN NEW.current_assignee_role
+        END;
+    END IF;
+
+    IF new_role IS NULL THEN
+        DELETE FROM workflow_task_inbox WHERE quote_id = COALESCE(NEW.id, OLD.id);
+    ELSE
+        INSERT INTO workflow_task_inbox (
+            quote_id, organization_id, assignee_role, workflow_state,
+            idn_quote, customer_name, total_amount, assigned_at
+        )
+        SELECT NEW.id, NEW.organization_id, new_role, NEW.workflow_state,
+               NEW.idn_quote, c.name, NEW.total_amount, COALESCE(NEW.assigned_at, now())
+        FROM (SELECT 1) one
+        LEFT JOIN customers c ON c.id = NEW.customer_id
+        ON CONFLICT (quote_id) DO UPDATE SET
+            organization_id = EXCLUDED.organization_id,
+            assignee_role = EXCLUDED.assignee_role,
+            workflow_state = EXCLUDED.workflow_state,
+            idn_quote = EXCLUDED.idn_quote,
+            customer_name = EXCLUDED.customer_name,
+            total_amount = EXCLUDED.total_amount,
+            assigned_at = EXCLUDED.assigned_at;
+    END IF;
+
+    IF old_role IS DISTINCT FROM new_role
+       OR (new_role IS NOT NULL AND (
+            OLD.workflow_state IS DISTINCT FROM NEW.workflow_state
+            OR OLD.assigned_at IS DISTINCT FROM NEW.assigned_at)) THEN
+        PERFORM pg_notify('workflow_inbox', json_build_object(
+            'organization_id', COALESCE(NEW.organization_id, OLD.organization_id),
+            'assignee_roles', array_remove(ARRAY[old_role, new_role], NULL),
+            'quote_id', COALESCE(NEW.id, OLD.id)
+        )::text);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS quotes_task_inbox_insert ON quotes;
+DROP TRIGGER IF EXISTS quotes_task_inbox_update ON quotes;
+CREATE TRIGGER quotes_task_inbox_insert AFTER INSERT ON quotes
+    FOR EACH ROW EXECUTE FUNCTION sync_workflow_task_inbox();
+CREATE TRIGGER quotes_task_inbox_update
+    AFTER UPDATE OF workflow_state, current_assignee_role, assigned_at,
+                    idn_quote, customer_id, total_amount, organization_id
+    ON quotes
+    FOR EACH ROW EXECUTE FUNCTION sync_workflow_task_inbox();
+
+-- Customer renames
+CREATE OR REPLACE FUNCTION sync_workflow_task_inbox_customer()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE workflow_task_inbox t
+    SET customer_name = NEW.name
+    FROM quotes q
+    WHERE q.customer_id = NEW.id
+      AND t.quote_id = q.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS customers_task_inbox_update ON customers;
+CREATE TRIGGER customers_task_inbox_update
+    AFTER UPDATE OF name ON customers
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION sync_workflow_task_inbox_customer();
+
+-- ============================================================================
+-- 3. INITIAL FILL
+-- ============================================================================
+
+INSERT INTO workflow_task_inbox (
+    quote_id, organization_id, assignee_role, workflow_state,
+    idn_quote, customer_name, total_amount, assigned_at
+)
+SELECT q.id, q.organization_id, q.current_assignee_role, q.workflow_state,
+       q.idn_quote, c.name, q.total_amount, COALESCE(q.assigned_at, q.updated_at, now())
+FROM quotes q
+LEFT JOIN customers c ON c.id = q.customer_id
+WHERE q.current_assignee_role IS NOT NULL
+  AND q.workflow_state NOT IN ('approved', 'rejected')
+ON CONFLICT (quote_id) DO NOTHING;
@@ -0,0 +1,47 @@
+-- Migration: 063_scheduled_report_notify
+-- Description: Change notifications for scheduled_reports, for the in-memory report scheduler
+-- Created: 2026-10-18
+--
+-- The report scheduler (services/report_scheduler_service.py) keeps the next
+-- run of every active schedule in memory and sleeps until the earliest one.
+-- Only the replica holding the scheduler's advisory lock dispatches, so a
+-- schedule created, edited or deleted through another replica reaches it via
+-- pg_notify on channel 'scheduled_reports':
+-- {"op", "id", "organization_id", "is_active", "next_run_at"}.
+
+CREATE OR REPLACE FUNCTION notify_scheduled_report_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('scheduled_reports', json_build_object(
+            'op', TG_OP,
+            'id', OLD.id,
+            'organization_id', OLD.organization_id
+        )::text);
+    ELSE
+        PERFORM pg_notify('scheduled_reports', json_build_object(
+            'op', TG_OP,
+            'id', NEW.id,
+            'organization_id', NEW.organization_id,
+            'is_active', NEW.is_active,
+            'next_run_at', NEW.next_run_at
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS scheduled_reports_notify_insert ON scheduled_reports;
+DROP TRIGGER IF EXISTS scheduled_reports_notify_update ON scheduled_reports;
+DROP TRIGGER IF EXISTS scheduled_reports_notify_delete ON scheduled_reports;
+CREATE TRIGGER scheduled_reports_notify_insert AFTER INSERT ON scheduled_reports
+    FOR EACH ROW EXECUTE FUNCTION notify_scheduled_report_change();
+CREATE TRIGGER scheduled_reports_notify_update
+    AFTER UPDATE OF is_active, next_run_at, organization_id ON scheduled_reports
+    FOR EACH ROW
+    WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active
+          OR OLD.next_run_at IS DISTINCT FROM NEW.next_run_at
+          OR OLD.organization_id IS DISTINCT FROM NEW.organization_id)
+    EXECUTE FUNCTION notify_scheduled_report_change();
+CREATE TRIGGER scheduled_reports_notify_delete AFTER DELETE ON scheduled_reports
+    FOR EACH ROW EXECUTE FUNCTION notify_scheduled_report_change();
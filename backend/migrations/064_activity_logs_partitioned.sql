@@ -0,0 +1,208 @@
+-- Migration: 064_activity_logs_partitioned
+-- Description: Monthly partitions for activity_logs, retention by partition drop, indexes for the log filters
+-- Created: 2026-10-18
+--
+-- activity_logs becomes a table partitioned by month of created_at
+-- (activity_logs_YYYY_MM, plus activity_logs_default for rows outside every
+-- month partition). cleanup_old_activity_logs() now drops whole months
+-- instead of DELETEing rows: a month is dropped once all of it is older than
+-- six months, so logs are kept six to seven months.
+--
+-- Every read in routes/activity_logs.py filters by organization and orders
+-- by (created_at, id) descending, optionally narrowed by user, entity type
+-- or action. Each of those has an index ending in (created_at DESC, id DESC)
+-- so the list endpoint's keyset pages (services/activity_log_query_service.py)
+-- are a single index range scan per partition.
+--
+-- The existing rows are copied into the new table inside this transaction;
+-- writes to activity_logs wait for it.
+
+BEGIN;
+
+-- ============================================================================
+-- 1. PARTITIONED TABLE
+-- ============================================================================
+
+ALTER TABLE activity_logs RENAME TO activity_logs_legacy;
+ALTER INDEX activity_logs_pkey RENAME TO activity_logs_legacy_pkey;
+DROP INDEX IF EXISTS idx_activity_logs_org_time;
+DROP INDEX IF EXISTS idx_activity_logs_entity;
+DROP INDEX IF EXISTS idx_activity_logs_user;
+DROP INDEX IF EXISTS idx_activity_logs_action;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE activity_logs (
+  id UUID NOT NULL DEFAULT gen_random_uuid(),
+  organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  action VARCHAR(50) NOT NULL,
+  entity_type VARCHAR(50) NOT NULL,
+  entity_id UUID,
+  metadata JSONB,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT;
+
+-- ============================================================================
+-- 2. PARTITION MAINTENANCE
+-- ============================================================================
+
+-- Create the partition for the month containing p_month (no-op if it exists).
+-- Rows of that month already in activity_logs_default move into it.
+CREATE OR REPLACE FUNCTION create_activity_log_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+  v_start DATE := date_trunc('month', p_month)::date;
+  v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+  v_name TEXT := 'activity_logs_' || to_char(v_start, 'YYYY_MM');
+BEGIN
+  IF to_regclass(v_name) IS NOT NULL THEN
+    RETURN v_name;
+  END IF;
+
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE activity_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name
+  );
+  EXECUTE format(
+    'WITH moved AS (
+       DELETE FROM activity_logs_default WHERE created_at >= %L AND created_at < %L RETURNING *
+     )
+     INSERT INTO %I SELECT * FROM moved',
+    v_start, v_end, v_name
+  );
+  EXECUTE format(
+    'ALTER TABLE activity_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+    v_name, v_start, v_end
+  );
+  RETURN v_name;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Partitions for this month and the next p_months_ahead
+CREATE OR REPLACE FUNCTION ensure_activity_log_partitions(p_months_ahead INT DEFAULT 3)
+RETURNS void AS $$
+DECLARE
+  v_month DATE;
+BEGIN
+  FOR v_month IN
+    SELECT generate_series(
+      date_trunc('month', NOW()),
+      date_trunc('month', NOW()) + make_interval(months => p_months_ahead),
+      INTERVAL '1 month'
+    )::date
+  LOOP
+    PERFORM create_activity_log_partition(v_month);
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Drop month partitions that end before NOW() - p_retention; returns how many
+CREATE OR REPLACE FUNCTION drop_expired_activity_log_partitions(p_retention INTERVAL DEFAULT INTERVAL '6 months')
+RETURNS INT AS $$
+DECLARE
+  v_partition RECORD;
+  v_dropped INT := 0;
+BEGIN
+  FOR v_partition IN
+    SELECT c.relname,
+           substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::timestamp AS upper_bound
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'activity_logs'::regclass
+      AND c.relname <> 'activity_logs_default'
+  LOOP
+    IF v_partition.upper_bound <= NOW() - p_retention THEN
+      EXECUTE format('DROP TABLE %I', v_partition.relname);
+      v_dropped := v_dropped + 1;
+    END IF;
+  END LOOP;
+  RETURN v_dropped;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Weekly cron job (services/activity_log_service.cleanup_old_logs)
+CREATE OR REPLACE FUNCTION cleanup_old_activity_logs()
+RETURNS void AS $$
+BEGIN
+  PERFORM ensure_activity_log_partitions(3);
+  PERFORM drop_expired_activity_log_partitions(INTERVAL '6 months');
+  DELETE FROM activity_logs_default
+  WHERE created_at < NOW() - INTERVAL '6 months';
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- ============================================================================
+-- 3. COPY EXISTING LOGS
+-- ============================================================================
+
+SELECT create_activity_log_partition(m::date)
+FROM generate_series(
+  date_trunc('month', COALESCE((SELECT MIN(created_at) FROM activity_logs_legacy), NOW())),
+  date_trunc('month', NOW()) + INTERVAL '3 months',
+  INTERVAL '1 month'
+) AS m;
+
+-- created_at was nullable before; such rows are dated to the migration
+INSERT INTO activity_logs (id, organization_id, user_id, action, entity_type, entity_id, metadata, created_at)
+SELECT id, organization_id, user_id, action, entity_type, entity_id, metadata, COALESCE(created_at, NOW())
+FROM activity_logs_legacy;
+
+DROP TABLE activity_logs_legacy;
+
+-- ============================================================================
+-- 4. INDEXES
+-- ============================================================================
+
+-- List / recent / stats: organization, newest first (keyset on created_at, id)
+CREATE INDEX idx_activity_logs_org_time
+  ON activity_logs(organization_id, created_at DESC, id DESC);
+
+-- Filter by user (also serves the distinct-user lookup for the filter dropdown)
+CREATE INDEX idx_activity_logs_org_user_time
+  ON activity_logs(organization_id, user_id, created_at DESC, id DESC);
+
+CREATE INDEX idx_activity_logs_org_entity_time
+  ON activity_logs(organization_id, entity_type, created_at DESC, id DESC);
+
+CREATE INDEX idx_activity_logs_org_action_time
+  ON activity_logs(organization_id, action, created_at DESC, id DESC);
+
+-- History of one entity
+CREATE INDEX idx_activity_logs_entity
+  ON activity_logs(entity_type, entity_id);
+
+-- ============================================================================
+-- 5. RLS POLICIES
+-- ============================================================================
+
+ALTER TABLE activity_logs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can read org activity logs"
+  ON activity_logs FOR SELECT
+  USING (
+    organization_id IN (
+      SELECT organization_id
+      FROM organization_members
+      WHERE user_id = auth.uid() AND status = 'active'
+    )
+  );
+
+CREATE POLICY "Service role can insert activity logs"
+  ON activity_logs FOR INSERT
+  WITH CHECK (true);
+
+CREATE POLICY "No manual updates"
+  ON activity_logs FOR UPDATE
+  USING (false);
+
+CREATE POLICY "No manual deletes"
+  ON activity_logs FOR DELETE
+  USING (false);
+
+COMMENT ON TABLE activity_logs IS 'Audit trail for all user actions. Logs are immutable; monthly partitions are dropped after 6 months.';
+
+COMMIT;
+
+ANALYZE activity_logs;
@@ -0,0 +1,73 @@
+-- Migration: 065_quote_idn_counters
+-- Description: Per-(organization, year) quote number counters that are taken without locking the organization row
+-- Created: 2026-10-18
+--
+-- Quote numbers used to come from organizations.idn_counters (JSONB),
+-- read with SELECT ... FOR UPDATE and rewritten whole on every quote, so
+-- all quote creation in an organization queued on its organizations row.
+-- quotes_calc numbered its КП25-0001 quotes from MAX(idn_quote) and
+-- retried on duplicates.
+--
+-- quote_idn_counters has one row per organization, year and series:
+--   'idn' - SUPPLIER-INN-YEAR-SEQ (services/idn_service.py)
+--   'kp'  - КП{YY}-{NNNN} (routes/quotes_calc.py)
+-- services/idn_service.py reserves numbers with a single autocommitted
+-- INSERT ... ON CONFLICT DO UPDATE ... RETURNING, which locks only that
+-- counter row and only for the statement. It may reserve several numbers
+-- per round trip (IDN_BLOCK_SIZE); numbers a process reserved but did not
+-- use are skipped, so sequences may have gaps but never repeat.
+
+-- ============================================================================
+-- 1. COUNTER TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS quote_idn_counters (
+    organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    year INT NOT NULL,
+    series TEXT NOT NULL,
+    last_value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (organization_id, year, series)
+);
+
+COMMENT ON TABLE quote_idn_counters IS 'Last reserved quote number per organization, year and series (idn: SUPPLIER-INN-YEAR-SEQ, kp: КП{YY}-{NNNN})';
+
+-- Written by the backend only
+ALTER TABLE quote_idn_counters ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. INITIAL VALUES
+-- ============================================================================
+
+-- Continue after the highest of the JSONB counters and the numbers already
+-- on quotes, for each series
+INSERT INTO quote_idn_counters (organization_id, year, series, last_value)
+SELECT organization_id, year, series, MAX(last_value)
+FROM (
+    SELECT o.id AS organization_id, c.key::int AS year, 'idn' AS series, c.value::bigint AS last_value
+    FROM organizations o, jsonb_each_text(COALESCE(o.idn_counters, '{}'::jsonb)) c
+    WHERE c.key ~ '^\d{4}$' AND c.value ~ '^\d+$'
+
+    UNION ALL
+
+    SELECT q.organization_id,
+           (regexp_match(q.idn_quote, '^[A-Z]{3}-\d{10,12}-(\d{4})-(\d+)$'))[1]::int,
+           'idn',
+           (regexp_match(q.idn_quote, '^[A-Z]{3}-\d{10,12}-(\d{4})-(\d+)$'))[2]::bigint
+    FROM quotes q
+    WHERE q.idn_quote ~ '^[A-Z]{3}-\d{10,12}-\d{4}-\d+$'
+
+    UNION ALL
+
+    SELECT q.organization_id,
+           2000 + (regexp_match(q.idn_quote, '^КП(\d{2})-(\d+)$'))[1]::int,
+           'kp',
+           (regexp_match(q.idn_quote, '^КП(\d{2})-(\d+)$'))[2]::bigint
+    FROM quotes q
+    WHERE q.idn_quote ~ '^КП\d{2}-\d+$'
+) existing
+WHERE organization_id IS NOT NULL
+GROUP BY organization_id, year, series
+ON CONFLICT (organization_id, year, series) DO UPDATE
+SET last_value = GREATEST(quote_idn_counters.last_value, EXCLUDED.last_value);
+
+COMMENT ON COLUMN organizations.idn_counters IS 'Superseded by quote_idn_counters (migration 065); no longer updated';
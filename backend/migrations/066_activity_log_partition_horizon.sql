@@ -0,0 +1,39 @@
+-- Migration: 066_activity_log_partition_horizon
+-- Description: Create activity_logs month partitions a year ahead
+-- Created: 2026-10-19
+--
+-- 064 created partitions only up to three months ahead, so rows would fall
+-- into activity_logs_default if partition maintenance ever stopped running.
+-- Partition maintenance now runs weekly from scheduler.py
+-- (services/activity_log_service.cleanup_old_logs). It keeps twelve months
+-- of partitions ahead, which leaves plenty of slack if the job is down.
+
+CREATE OR REPLACE FUNCTION ensure_activity_log_partitions(p_months_ahead INT DEFAULT 12)
+RETURNS void AS $$
+DECLARE
+  v_month DATE;
+BEGIN
+  FOR v_month IN
+    SELECT generate_series(
+      date_trunc('month', NOW()),
+      date_trunc('month', NOW()) + make_interval(months => p_months_ahead),
+      INTERVAL '1 month'
+    )::date
+  LOOP
+    PERFORM create_activity_log_partition(v_month);
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Weekly job in scheduler.py (services/activity_log_service.cleanup_old_logs)
+CREATE OR REPLACE FUNCTION cleanup_old_activity_logs()
+RETURNS void AS $$
+BEGIN
+  PERFORM ensure_activity_log_partitions(12);
+  PERFORM drop_expired_activity_log_partitions(INTERVAL '6 months');
+  DELETE FROM activity_logs_default
+  WHERE created_at < NOW() - INTERVAL '6 months';
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+SELECT ensure_activity_log_partitions(12);
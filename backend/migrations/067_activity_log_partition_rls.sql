@@ -0,0 +1,64 @@
+-- Migration: 067_activity_log_partition_rls
+-- Description: Row level security on activity_logs partitions
+-- Created: 2026-10-19
+--
+-- 064 enabled RLS on the partitioned parent only. The month partitions and
+-- activity_logs_default are ordinary tables in public, which Supabase grants
+-- to anon and authenticated, so /rest/v1/activity_logs_2026_10 returned
+-- every organization's logs. Every partition now has RLS enabled without
+-- policies, and anon/authenticated lose their privileges on it. Reads through
+-- activity_logs are unaffected: they are checked against the parent's
+-- policies.
+
+BEGIN;
+
+-- Same as 064, plus locking the new partition down
+CREATE OR REPLACE FUNCTION create_activity_log_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+  v_start DATE := date_trunc('month', p_month)::date;
+  v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+  v_name TEXT := 'activity_logs_' || to_char(v_start, 'YYYY_MM');
+BEGIN
+  IF to_regclass(v_name) IS NOT NULL THEN
+    RETURN v_name;
+  END IF;
+
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE activity_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name
+  );
+  EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', v_name);
+  EXECUTE format('REVOKE ALL ON %I FROM anon, authenticated', v_name);
+  EXECUTE format(
+    'WITH moved AS (
+       DELETE FROM activity_logs_default WHERE created_at >= %L AND created_at < %L RETURNING *
+     )
+     INSERT INTO %I SELECT * FROM moved',
+    v_start, v_end, v_name
+  );
+  EXECUTE format(
+    'ALTER TABLE activity_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+    v_name, v_start, v_end
+  );
+  RETURN v_name;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Partitions created by 064 and 066, and the default partition
+DO $$
+DECLARE
+  v_partition RECORD;
+BEGIN
+  FOR v_partition IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'activity_logs'::regclass
+  LOOP
+    EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', v_partition.relname);
+    EXECUTE format('REVOKE ALL ON %I FROM anon, authenticated', v_partition.relname);
+  END LOOP;
+END;
+$$;
+
+COMMIT;
@@ -13,120 +13,35 @@ import jinja2
 from weasyprint import HTML, CSS
 
 from models import Quote, QuoteItem, Customer, QuoteWithItems
-
-
-# ============================================================================
-# RUSSIAN NUMBER TO WORDS
-# ============================================================================
-
-def number_to_words_ru(number: float, currency: str = 'RUB') -> str:
-    """
-    Convert a number to Russian words with currency.
-
-    Args:
-        number: The amount to convert
-        currency: Currency code (RUB, EUR, USD, etc.)
-
-    Returns:
-        String like "двадцать восемь тысяч пятьсот семьдесят шесть евро 06 центов"
-    """
-    # Define word forms
-    ones = ['', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
-    ones_fem = ['', 'одна', 'две', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
-    teens = ['десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать',
-             'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать']
-    tens = ['', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят',
-            'шестьдесят', 'семьдесят', 'восемьдесят', 'девяносто']
-    hundreds = ['', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот',
-                'шестьсот', 'семьсот', 'восемьсот', 'девятьсот']
-
-    # Currency forms [1, 2-4, 5+] and gender (True = feminine)
-    currency_forms = {
-        'RUB': (['рубль', 'рубля', 'рублей'], ['копейка', 'копейки', 'копеек'], False, True),
-        'EUR': (['евро', 'евро', 'евро'], ['цент', 'цента', 'центов'], False, False),
-        'USD': (['доллар', 'доллара', 'долларов'], ['цент', 'цента', 'центов'], False, False),
-        'TRY': (['лира', 'лиры', 'лир'], ['куруш', 'куруша', 'курушей'], True, False),
-        'CNY': (['юань', 'юаня', 'юаней'], ['фэнь', 'фэня', 'фэней'], False, False),
-    }
-
-    def get_form(n: int, forms: list) -> str:
-        """Get correct word form based on number"""
-        if 11 <= n % 100 <= 19:
-            return forms[2]
-        elif n % 10 == 1:
-            return forms[0]
-        elif 2 <= n % 10 <= 4:
-            return forms[1]
-        else:
-            return forms[2]
-
-    def convert_group(n: int, feminine: bool = False) -> str:
-        """Convert a 3-digit group to words"""
-        if n == 0:
-            return ''
-
-        result = []
-
-        # Hundreds
-        if n >= 100:
-            result.append(hundreds[n // 100])
-            n %= 100
-
-        # Tens and ones
-        if 10 <= n <= 19:
-            result.append(teens[n - 10])
-        else:
-            if n >= 10:
-                result.append(tens[n // 10])
-                n %= 10
-            if n > 0:
-                if feminine:
-                    result.append(ones_fem[n])
-                else:
-                    result.append(ones[n])
-
-        return ' '.join(filter(None, result))
-
-    # Get currency info
-    main_forms, cent_forms, main_fem, cent_fem = currency_forms.get(
-        currency, (['единица', 'единицы', 'единиц'], ['сотая', 'сотых', 'сотых'], True, True)
-    )
-
-    # Split into integer and decimal parts
-    integer_part = int(abs(number))
-    decimal_part = int(round((abs(number) - integer_part) * 100))
-
-    if integer_part == 0:
-        words = ['ноль']
-    else:
-        words = []
-
-        # Millions
-        if integer_part >= 1000000:
-            millions = integer_part // 1000000
-            words.append(convert_group(millions, False))
-            words.append(get_form(millions, ['миллион', 'миллиона', 'миллионов']))
-            integer_part %= 1000000
-
-        # Thousands (feminine in Russian)
-        if integer_part >= 1000:
-            thousands = integer_part // 1000
-            words.append(convert_group(thousands, True))
-            words.append(get_form(thousands, ['тысяча', 'тысячи', 'тысяч']))
-            integer_part %= 1000
-
-        # Remainder (use main currency gender)
-        if integer_part > 0:
-            words.append(convert_group(integer_part, main_fem))
-
-    # Add main currency
-    words.append(get_form(int(abs(number)), main_forms))
-
-    # Add cents
-    words.append(f'{decimal_part:02d}')
-    words.append(get_form(decimal_part, cent_forms))
-
-    return ' '.join(filter(None, words))
+from services.russian_formatting import (
+    number_to_words_ru,
+    format_ru_number,
+    format_ru_currency,
+    format_ru_currency_code,
+    format_ru_number_column,
+    format_ru_currency_column,
+    format_columns,
+)
+
+
+# Sales price columns shared by supply and openbook formats: (context key, calculation field)
+SALES_PRICE_COLUMNS = (
+    ('selling_price_per_unit', 'sales_price_per_unit_no_vat'),
+    ('selling_price_total', 'sales_price_total_no_vat'),
+    ('vat_from_sales', 'vat_from_sales'),
+    ('selling_price_with_vat_per_unit', 'sales_price_per_unit_with_vat'),
+    ('selling_price_with_vat_total', 'sales_price_total_with_vat'),
+)
+
+# Cost columns of openbook formats: (context key, calculation field)
+COST_COLUMNS = (
+    ('purchase_price_quote_currency', 'purchase_price_total_quote_currency'),
+    ('logistics', 'logistics_total'),
+    ('customs_fee', 'customs_fee'),
+    ('excise_tax', 'excise_tax'),
+    ('util_fee', 'util_fee'),
+    ('transit_commission', 'transit_commission'),
+)
 
 
 def parse_iso_date(value) -> str:
@@ -175,26 +90,6 @@ class QuotePDFService:
     def _register_filters(self):
         """Register custom Jinja2 filters for Russian formatting"""
 
-        def ru_currency(value: Decimal, currency: str = 'RUB') -> str:
-            """Format currency in Russian style"""
-            if value is None:
-                return '0,00 ₽'
-
-            # Format number with Russian decimal separator
-            formatted = f"{float(value):,.2f}".replace(',', ' ').replace('.', ',')
-
-            # Add currency symbol
-            if currency == 'RUB':
-                return f"{formatted} ₽"
-            elif currency == 'USD':
-                return f"${formatted}"
-            elif currency == 'EUR':
-                return f"{formatted} €"
-            elif currency == 'CNY':
-                return f"{formatted} ¥"
-            else:
-                return f"{formatted} {currency}"
-
         def ru_date(value) -> str:
             """Format date in Russian style (DD.MM.YYYY)"""
             if isinstance(value, str):
@@ -212,21 +107,14 @@ class QuotePDFService:
 
             return str(value) if value else ''
 
-        def ru_number(value: Decimal) -> str:
-            """Format number with Russian decimal separator"""
-            if value is None:
-                return '0,00'
-
-            return f"{float(value):,.2f}".replace(',', ' ').replace('.', ',')
-
         def vat_label(vat_included: bool) -> str:
             """Return VAT label based on inclusion"""
             return "в т.ч. НДС" if vat_included else "НДС"
 
         # Register filters
-        self.jinja_env.filters['ru_currency'] = ru_currency
+        self.jinja_env.filters['ru_currency'] = format_ru_currency_code
         self.jinja_env.filters['ru_date'] = ru_date
-        self.jinja_env.filters['ru_number'] = ru_number
+        self.jinja_env.filters['ru_number'] = format_ru_number
         self.jinja_env.filters['vat_label'] = vat_label
 
     def _create_templates(self):
@@ -820,34 +708,12 @@ body {
     @staticmethod
     def format_russian_currency(value, currency_symbol: str = '₽') -> str:
         """Format Decimal/float as Russian currency: 1 234,56 ₽"""
-        if value is None:
-            return f"0,00 {currency_symbol}"
-
-        # Convert to float if Decimal
-        if isinstance(value, Decimal):
-            value = float(value)
-
-        # Format with thousand separator and 2 decimals
-        str_val = f"{value:,.2f}"
-        # Replace comma with space (thousands) and period with comma (decimals)
-        str_val = str_val.replace(',', ' ').replace('.', ',')
-        return f"{str_val} {currency_symbol}"
+        return format_ru_currency(value, currency_symbol)
 
     @staticmethod
     def format_russian_number(value) -> str:
         """Format Decimal/float as Russian number without currency: 1 234,56"""
-        if value is None:
-            return "0,00"
-
-        # Convert to float if Decimal
-        if isinstance(value, Decimal):
-            value = float(value)
-
-        # Format with thousand separator and 2 decimals
-        str_val = f"{value:,.2f}"
-        # Replace comma with space (thousands) and period with comma (decimals)
-        str_val = str_val.replace(',', ' ').replace('.', ',')
-        return str_val
+        return format_ru_number(value)
 
     def render_template(self, template_name: str, context: dict) -> str:
         """Render Jinja2 template with context"""
@@ -910,19 +776,16 @@ body {
         # Build items list with 9 columns
         totals = {'quantity': 0, 'total_vat': Decimal('0')}
 
-        for item in export_data.items:
-            calc = item.get('calculation_results', {})
+        calcs = [item.get('calculation_results', {}) for item in export_data.items]
+        price_columns = format_columns(calcs, SALES_PRICE_COLUMNS, currency_symbol)
 
+        for item, calc, prices in zip(export_data.items, calcs, price_columns):
             item_data = {
                 'brand': item.get('brand', ''),
                 'sku': item.get('product_code', ''),
                 'product_name': item.get('product_name', ''),
                 'quantity': item.get('quantity', 0),
-                'selling_price_per_unit': self.format_russian_currency(calc.get('sales_price_per_unit_no_vat', 0), currency_symbol),
-                'selling_price_total': self.format_russian_currency(calc.get('sales_price_total_no_vat', 0), currency_symbol),
-                'vat_from_sales': self.format_russian_currency(calc.get('vat_from_sales', 0), currency_symbol),
-                'selling_price_with_vat_per_unit': self.format_russian_currency(calc.get('sales_price_per_unit_with_vat', 0), currency_symbol),
-                'selling_price_with_vat_total': self.format_russian_currency(calc.get('sales_price_total_with_vat', 0), currency_symbol)
+                **prices
             }
 
             context['items'].append(item_data)
@@ -993,13 +856,25 @@ body {
         # Build items list with 21 columns
         totals = {'quantity': 0, 'total_vat': Decimal('0')}
 
-        for item in export_data.items:
-            calc = item.get('calculation_results', {})
+        calcs = [item.get('calculation_results', {}) for item in export_data.items]
 
-            # Calculate invoice amount (purchase price × quantity)
-            purchase_price_no_vat = Decimal(str(calc.get('purchase_price_no_vat', 0)))
+        # Calculate invoice amount (purchase price × quantity)
+        purchase_prices = [Decimal(str(calc.get('purchase_price_no_vat', 0))) for calc in calcs]
+        invoice_amounts = [
+            price * Decimal(str(item.get('quantity', 0)))
+            for price, item in zip(purchase_prices, export_data.items)
+        ]
+
+        # Format amount columns (plain numbers)
+        purchase_price_column = format_ru_number_column(purchase_prices)
+        invoice_amount_column = format_ru_number_column(invoice_amounts)
+        cost_columns = format_columns(calcs, COST_COLUMNS)
+        price_columns = format_columns(calcs, SALES_PRICE_COLUMNS)
+
+        for item, calc, purchase_price_no_vat, invoice_amount, costs, prices in zip(
+            export_data.items, calcs, purchase_price_column, invoice_amount_column, cost_columns, price_columns
+        ):
             quantity = item.get('quantity', 0)
-            invoice_amount = purchase_price_no_vat * Decimal(str(quantity))
 
             item_data = {
                 # Columns 1-4: Basic info
@@ -1010,23 +885,14 @@ body {
 
                 # Columns 5-15: Purchase & cost details
                 'currency': export_data.variables.get('currency_of_base_price', 'USD'),
-                'purchase_price_no_vat': self.format_russian_number(purchase_price_no_vat),
-                'invoice_amount': self.format_russian_number(invoice_amount),
-                'purchase_price_quote_currency': self.format_russian_number(calc.get('purchase_price_total_quote_currency', 0)),
-                'logistics': self.format_russian_number(calc.get('logistics_total', 0)),
+                'purchase_price_no_vat': purchase_price_no_vat,
+                'invoice_amount': invoice_amount,
+                **costs,
                 'customs_code': item.get('customs_code', ''),
                 'import_tariff': f"{export_data.variables.get('import_tariff', 0)}%",
-                'customs_fee': self.format_russian_number(calc.get('customs_fee', 0)),
-                'excise_tax': self.format_russian_number(calc.get('excise_tax', 0)),
-                'util_fee': self.format_russian_number(calc.get('util_fee', 0)),
-                'transit_commission': self.format_russian_number(calc.get('transit_commission', 0)),
 
                 # Columns 16-21: Selling prices
-                'selling_price_per_unit': self.format_russian_number(calc.get('sales_price_per_unit_no_vat', 0)),
-                'selling_price_total': self.format_russian_number(calc.get('sales_price_total_no_vat', 0)),
-                'vat_from_sales': self.format_russian_number(calc.get('vat_from_sales', 0)),
-                'selling_price_with_vat_per_unit': self.format_russian_number(calc.get('sales_price_per_unit_with_vat', 0)),
-                'selling_price_with_vat_total': self.format_russian_number(calc.get('sales_price_total_with_vat', 0))
+                **prices
             }
 
             context['items'].append(item_data)
@@ -1102,19 +968,16 @@ body {
         # Build items list (same as supply_pdf)
         totals = {'quantity': 0, 'total_vat': Decimal('0')}
 
-        for item in export_data.items:
-            calc = item.get('calculation_results', {})
+        calcs = [item.get('calculation_results', {}) for item in export_data.items]
+        price_columns = format_columns(calcs, SALES_PRICE_COLUMNS, currency_symbol)
 
+        for item, calc, prices in zip(export_data.items, calcs, price_columns):
             item_data = {
                 'brand': item.get('brand', ''),
                 'sku': item.get('product_code', ''),
                 'product_name': item.get('product_name', ''),
                 'quantity': item.get('quantity', 0),
-                'selling_price_per_unit': self.format_russian_currency(calc.get('sales_price_per_unit_no_vat', 0), currency_symbol),
-                'selling_price_total': self.format_russian_currency(calc.get('sales_price_total_no_vat', 0), currency_symbol),
-                'vat_from_sales': self.format_russian_currency(calc.get('vat_from_sales', 0), currency_symbol),
-                'selling_price_with_vat_per_unit': self.format_russian_currency(calc.get('sales_price_per_unit_with_vat', 0), currency_symbol),
-                'selling_price_with_vat_total': self.format_russian_currency(calc.get('sales_price_total_with_vat', 0), currency_symbol)
+                **prices
             }
 
             context['items'].append(item_data)
@@ -1189,13 +1052,25 @@ body {
         # Build items list (same as openbook_pdf)
         totals = {'quantity': 0, 'total_vat': Decimal('0')}
 
-        for item in export_data.items:
-            calc = item.get('calculation_results', {})
+        calcs = [item.get('calculation_results', {}) for item in export_data.items]
+
+        # Calculate invoice amount (purchase price × quantity)
+        purchase_prices = [Decimal(str(calc.get('purchase_price_no_vat', 0))) for calc in calcs]
+        invoice_amounts = [
+            price * Decimal(str(item.get('quantity', 0)))
+            for price, item in zip(purchase_prices, export_data.items)
+        ]
+
+        # Format amount columns (with currency symbol)
+        purchase_price_column = format_ru_currency_column(purchase_prices, currency_symbol)
+        invoice_amount_column = format_ru_currency_column(invoice_amounts, currency_symbol)
+        cost_columns = format_columns(calcs, COST_COLUMNS, currency_symbol)
+        price_columns = format_columns(calcs, SALES_PRICE_COLUMNS, currency_symbol)
 
-            # Calculate invoice amount
-            purchase_price_no_vat = Decimal(str(calc.get('purchase_price_no_vat', 0)))
+        for item, calc, purchase_price_no_vat, invoice_amount, costs, prices in zip(
+            export_data.items, calcs, purchase_price_column, invoice_amount_column, cost_columns, price_columns
+        ):
             quantity = item.get('quantity', 0)
-            invoice_amount = purchase_price_no_vat * Decimal(str(quantity))
 
             item_data = {
                 # Columns 1-4: Basic info
@@ -1206,23 +1081,14 @@ body {
 
                 # Columns 5-15: Purchase & cost details
                 'currency': export_data.variables.get('currency_of_base_price', 'USD'),
-                'purchase_price_no_vat': self.format_russian_currency(purchase_price_no_vat, currency_symbol),
-                'invoice_amount': self.format_russian_currency(invoice_amount, currency_symbol),
-                'purchase_price_quote_currency': self.format_russian_currency(calc.get('purchase_price_total_quote_currency', 0), currency_symbol),
-                'logistics': self.format_russian_currency(calc.get('logistics_total', 0), currency_symbol),
+                'purchase_price_no_vat': purchase_price_no_vat,
+                'invoice_amount': invoice_amount,
+                **costs,
                 'customs_code': item.get('customs_code', ''),
                 'import_tariff': f"{export_data.variables.get('import_tariff', 0)}%",
-                'customs_fee': self.format_russian_currency(calc.get('customs_fee', 0), currency_symbol),
-                'excise_tax': self.format_russian_currency(calc.get('excise_tax', 0), currency_symbol),
-                'util_fee': self.format_russian_currency(calc.get('util_fee', 0), currency_symbol),
-                'transit_commission': self.format_russian_currency(calc.get('transit_commission', 0), currency_symbol),
 
                 # Columns 16-21: Selling prices
-                'selling_price_per_unit': self.format_russian_currency(calc.get('sales_price_per_unit_no_vat', 0), currency_symbol),
-                'selling_price_total': self.format_russian_currency(calc.get('sales_price_total_no_vat', 0), currency_symbol),
-                'vat_from_sales': self.format_russian_currency(calc.get('vat_from_sales', 0), currency_symbol),
-                'selling_price_with_vat_per_unit': self.format_russian_currency(calc.get('sales_price_per_unit_with_vat', 0), currency_symbol),
-                'selling_price_with_vat_total': self.format_russian_currency(calc.get('sales_price_total_with_vat', 0), currency_symbol)
+                **prices
             }
 
             context['items'].append(item_data)
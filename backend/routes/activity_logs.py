@@ -11,6 +11,7 @@ from supabase import Client
 
 from auth import get_current_user, User
 from dependencies import get_supabase
+from services.activity_log_query_service import get_log_stats, get_log_user_ids, list_logs
 
 
 # ============================================================================
@@ -35,10 +36,10 @@ async def list_activity_logs(
     user_id: Optional[UUID] = Query(None, description="Filter by user"),
     entity_type: Optional[str] = Query(None, description="Filter by entity type"),
     action: Optional[str] = Query(None, description="Filter by action"),
-    page: int = Query(1, ge=1, description="Page number"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    page: int = Query(1, ge=1, description="Page number (ignored with cursor)"),
     per_page: int = Query(100, ge=1, le=100, description="Items per page"),
-    user: User = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    user: User = Depends(get_current_user)
 ):
     """
     List activity logs with filtering and pagination
@@ -49,49 +50,35 @@ async def list_activity_logs(
     - entity_type: Filter by entity type (quote, customer, contact)
     - action: Filter by action (created, updated, deleted, exported, etc.)
 
+    Pagination: pass the returned next_cursor to get the following page
+    (constant cost however deep). Numbered pages still work but count and
+    skip every earlier row.
+
     Returns:
     - items: List of log entries
-    - total: Total count matching filters
-    - page: Current page
+    - total: Total count matching filters (null with cursor)
+    - page: Current page (null with cursor)
     - per_page: Items per page
+    - next_cursor: Cursor of the next page (null on the last page)
     """
     try:
+        return await list_logs(
+            user.current_organization_id,
+            date_from=date_from,
+            date_to=date_to,
+            user_id=user_id,
+            entity_type=entity_type,
+            action=action,
+            cursor=cursor,
+            page=page,
+            per_page=per_page
+        )
 
-        # Build query with organization filter
-        query = supabase.table("activity_logs").select(
-            "id, user_id, action, entity_type, entity_id, metadata, created_at",
-            count="exact"
-        ).eq("organization_id", str(user.current_organization_id))
-
-        # Apply filters
-        if date_from:
-            query = query.gte("created_at", date_from.isoformat())
-        if date_to:
-            # Include the entire day by adding time
-            query = query.lte("created_at", f"{date_to.isoformat()}T23:59:59")
-        if user_id:
-            query = query.eq("user_id", str(user_id))
-        if entity_type:
-            query = query.eq("entity_type", entity_type)
-        if action:
-            query = query.eq("action", action)
-
-        # Apply pagination
-        offset = (page - 1) * per_page
-        query = query.order("created_at", desc=True).range(offset, offset + per_page - 1)
-
-        # Execute query
-        result = query.execute()
-
-        total = result.count if result.count is not None else 0
-
-        return {
-            "items": result.data,
-            "total": total,
-            "page": page,
-            "per_page": per_page
-        }
-
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -103,8 +90,7 @@ async def list_activity_logs(
 async def get_activity_stats(
     date_from: Optional[date] = Query(None, description="Stats from date"),
     date_to: Optional[date] = Query(None, description="Stats to date"),
-    user: User = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    user: User = Depends(get_current_user)
 ):
     """
     Get activity statistics summary
@@ -112,38 +98,7 @@ async def get_activity_stats(
     Returns counts by action type and entity type
     """
     try:
-
-        # Build base query
-        query = supabase.table("activity_logs").select(
-            "action, entity_type",
-            count="exact"
-        ).eq("organization_id", str(user.current_organization_id))
-
-        # Apply date filters
-        if date_from:
-            query = query.gte("created_at", date_from.isoformat())
-        if date_to:
-            query = query.lte("created_at", f"{date_to.isoformat()}T23:59:59")
-
-        # Execute query
-        result = query.execute()
-
-        # Count by action
-        action_counts = {}
-        entity_counts = {}
-
-        for log in result.data:
-            action = log['action']
-            entity = log['entity_type']
-
-            action_counts[action] = action_counts.get(action, 0) + 1
-            entity_counts[entity] = entity_counts.get(entity, 0) + 1
-
-        return {
-            "total_logs": len(result.data),
-            "by_action": action_counts,
-            "by_entity": entity_counts
-        }
+        return await get_log_stats(user.current_organization_id, date_from=date_from, date_to=date_to)
 
     except Exception as e:
         raise HTTPException(
@@ -165,14 +120,8 @@ async def list_users(
     """
     try:
 
-        # Get all users who have activity logs in this organization
-        result = supabase.table("activity_logs").select(
-            "user_id"
-        ).eq("organization_id", str(user.current_organization_id))\
-         .execute()
-
-        # Get unique user IDs
-        unique_user_ids = list(set(log['user_id'] for log in result.data if log.get('user_id')))
+        # Users who have activity logs in this organization
+        unique_user_ids = await get_log_user_ids(user.current_organization_id)
 
         if not unique_user_ids:
             return {"users": []}
@@ -5,6 +5,7 @@ Admin-only analytics endpoints with query builder, aggregations, and exports.
 Uses Redis caching (10-min TTL) and parameterized SQL for security.
 """
 
+import asyncio
 import os
 import io
 import time
@@ -34,6 +35,7 @@ from models import (
     AnalyticsAggregateResponse,
 )
 from analytics_security import (
+    ANALYTICS_FACTS_TABLE,
     build_analytics_query,
     build_aggregation_query,
     QuerySecurityValidator,
@@ -45,12 +47,53 @@ from analytics_cache import (
     invalidate_report_cache,
 )
 from async_supabase import async_supabase_call
+from services.report_scheduler_service import notify_schedule_changed, notify_schedule_removed
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 limiter = Limiter(key_func=get_remote_address)
 
+# Read analytics_quote_facts (migration 060) when it exists; "false" forces
+# the JSONB joins on quotes
+ANALYTICS_USE_FACTS = os.getenv("ANALYTICS_USE_FACTS", "true").lower() == "true"
+
+# Seconds before a missing facts table is looked up again
+ANALYTICS_FACTS_RECHECK_SECONDS = 300
+
+# (available, monotonic time of the lookup)
+_facts_available: Optional[tuple] = None
+
+
+async def analytics_facts_available(supabase: Client) -> bool:
+    """
+    Whether the query builders can read analytics_quote_facts.
+
+    A found table is remembered for the life of the process; a missing one
+    is looked up again after ANALYTICS_FACTS_RECHECK_SECONDS, so applying
+    the migration takes effect without a restart.
+    """
+    global _facts_available
+    if not ANALYTICS_USE_FACTS:
+        return False
+
+    if _facts_available is not None:
+        available, checked_at = _facts_available
+        if available or time.monotonic() - checked_at < ANALYTICS_FACTS_RECHECK_SECONDS:
+            return available
+
+    try:
+        await async_supabase_call(
+            supabase.table(ANALYTICS_FACTS_TABLE).select("id").limit(1)
+        )
+        available = True
+    except Exception as e:
+        logger.info(f"{ANALYTICS_FACTS_TABLE} not available, using source tables: {e}")
+        available = False
+
+    _facts_available = (available, time.monotonic())
+    return available
+
 
 # ============================================================================
 # TASK 5: SAVED REPORTS CRUD ENDPOINTS
@@ -361,12 +404,14 @@ async def execute_analytics_query(
 
         # Build SQL query using existing query builder
         # Note: We still need the SQL builder for complex queries with JOINs and filters
+        use_facts = await analytics_facts_available(supabase)
         sql, params = build_analytics_query(
             user.current_organization_id,
             query_request.filters,
             query_request.selected_fields,
             limit=query_request.limit,
-            offset=query_request.offset
+            offset=query_request.offset,
+            use_facts=use_facts
         )
 
         # DEBUG: Print generated SQL
@@ -392,7 +437,8 @@ async def execute_analytics_query(
             query_request.filters,
             ["id"],
             limit=1000000,
-            offset=0
+            offset=0,
+            use_facts=use_facts
         )
 
         # Replace SELECT with COUNT
@@ -526,7 +572,8 @@ async def execute_analytics_aggregation(
         sql, params = build_aggregation_query(
             user.current_organization_id,
             query_request.filters,
-            query_request.aggregations or {}
+            query_request.aggregations or {},
+            use_facts=await analytics_facts_available(supabase)
         )
 
         # DEBUG: Print aggregation SQL
@@ -610,7 +657,8 @@ async def export_analytics_data(
             query_request.filters,
             query_request.selected_fields,
             limit=query_request.limit,
-            offset=query_request.offset
+            offset=query_request.offset,
+            use_facts=await analytics_facts_available(supabase)
         )
 
         # Execute via Supabase RPC
@@ -702,8 +750,20 @@ async def generate_excel_export(
     """
     Generate Excel file with Russian formatting.
 
+    The workbook (up to 100k rows) is built in a worker thread so exports
+    and scheduled reports don't stall the event loop.
+
     Returns: Path to temporary file
     """
+    return await asyncio.to_thread(_build_excel_export, rows, selected_fields, org_id)
+
+
+def _build_excel_export(
+    rows: List[Any],
+    selected_fields: List[str],
+    org_id: UUID
+) -> str:
+    """generate_excel_export body (blocking)"""
     import tempfile
 
     # Create workbook
@@ -813,6 +873,12 @@ async def upload_to_storage(file_path: str, org_id: str, supabase: Client = None
             os.getenv("SUPABASE_SERVICE_ROLE_KEY")
         )
 
+    # File read and storage client calls are blocking
+    return await asyncio.to_thread(_upload_file, file_path, org_id, supabase)
+
+
+def _upload_file(file_path: str, org_id: str, supabase: Client) -> str:
+    """upload_to_storage body (blocking)"""
     with open(file_path, 'rb') as f:
         file_data = f.read()
 
@@ -1248,6 +1314,7 @@ async def create_scheduled_report(
                 detail="Failed to create scheduled report"
             )
 
+        notify_schedule_changed(result.data[0])
         return result.data[0]
 
     except HTTPException:
@@ -1304,6 +1371,7 @@ async def update_scheduled_report(
                 detail="Scheduled report not found or you don't have permission to update it"
             )
 
+        notify_schedule_changed(result.data[0])
         return result.data[0]
 
     except HTTPException:
@@ -1345,6 +1413,7 @@ async def delete_scheduled_report(
                 detail="Scheduled report not found or you don't have permission to delete it"
             )
 
+        notify_schedule_removed(schedule_id)
         return None
 
     except HTTPException:
@@ -1405,7 +1474,8 @@ async def run_scheduled_report(
             schedule=schedule,
             saved_report=saved_report,
             user=user,
-            execution_type="manual"
+            execution_type="manual",
+            supabase=supabase
         )
 
         return execution
@@ -1535,7 +1605,8 @@ async def execute_scheduled_report_internal(
             saved_report.get("filters", {}),
             saved_report.get("selected_fields", []),
             limit=100000,  # High limit for exports
-            offset=0
+            offset=0,
+            use_facts=await analytics_facts_available(supabase)
         )
 
         # Execute via Supabase RPC
@@ -1561,7 +1632,8 @@ async def execute_scheduled_report_internal(
         # Upload to storage
         file_url = await upload_to_storage(
             file_path,
-            str(user.current_organization_id)
+            str(user.current_organization_id),
+            supabase
         )
 
         # Get file size
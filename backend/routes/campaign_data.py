@@ -26,6 +26,7 @@ from domain_models.dashboard import (
     SmartLeadSyncResult,
 )
 from services.smartlead_service import get_smartlead_service
+from services.stats_service import CAMPAIGN_METRICS, get_campaign_totals
 
 
 # ============================================================================
@@ -384,6 +385,30 @@ async def sync_single_campaign(
 # ============================================================================
 
 
+def sum_campaign_metrics(
+    supabase: Client,
+    organization_id: str,
+    campaign_ids: List[str],
+    source: Optional[str] = None,
+) -> dict:
+    """Sum CAMPAIGN_METRICS over the selected campaigns"""
+    query = supabase.table("campaign_data").select("metrics")
+    query = query.eq("organization_id", organization_id).in_("campaign_id", campaign_ids)
+    if source:
+        query = query.eq("source", source)
+
+    result = query.execute()
+
+    totals = {metric: 0 for metric in CAMPAIGN_METRICS}
+    totals["campaign_count"] = len(result.data)
+    for item in result.data:
+        metrics = item.get("metrics", {})
+        for metric in CAMPAIGN_METRICS:
+            totals[metric] += metrics.get(metric, 0) or 0
+
+    return totals
+
+
 @router.get("/aggregate")
 async def get_aggregated_metrics(
     campaign_ids: Optional[str] = Query(None, description="Comma-separated campaign IDs"),
@@ -402,46 +427,14 @@ async def get_aggregated_metrics(
             detail="User is not associated with any organization",
         )
 
-    # Build query
-    query = supabase.table("campaign_data").select("metrics")
-    query = query.eq("organization_id", str(user.current_organization_id))
-
-    if source:
-        query = query.eq("source", source)
+    organization_id = str(user.current_organization_id)
 
     if campaign_ids:
         ids = [id.strip() for id in campaign_ids.split(",")]
-        query = query.in_("campaign_id", ids)
-
-    result = query.execute()
-
-    # Aggregate metrics
-    totals = {
-        "sent_count": 0,
-        "open_count": 0,
-        "unique_open_count": 0,
-        "click_count": 0,
-        "unique_click_count": 0,
-        "reply_count": 0,
-        "bounce_count": 0,
-        "unsubscribed_count": 0,
-        "interested_count": 0,
-        "total_leads": 0,
-        "campaign_count": len(result.data),
-    }
-
-    for item in result.data:
-        metrics = item.get("metrics", {})
-        totals["sent_count"] += metrics.get("sent_count", 0) or 0
-        totals["open_count"] += metrics.get("open_count", 0) or 0
-        totals["unique_open_count"] += metrics.get("unique_open_count", 0) or 0
-        totals["click_count"] += metrics.get("click_count", 0) or 0
-        totals["unique_click_count"] += metrics.get("unique_click_count", 0) or 0
-        totals["reply_count"] += metrics.get("reply_count", 0) or 0
-        totals["bounce_count"] += metrics.get("bounce_count", 0) or 0
-        totals["unsubscribed_count"] += metrics.get("unsubscribed_count", 0) or 0
-        totals["interested_count"] += metrics.get("interested_count", 0) or 0
-        totals["total_leads"] += metrics.get("total_leads", 0) or 0
+        totals = sum_campaign_metrics(supabase, organization_id, ids, source)
+    else:
+        # Whole organization (or one source): read the KPI rollup
+        totals = dict(await get_campaign_totals(organization_id, source))
 
     # Calculate rates
     if totals["sent_count"] > 0:
@@ -16,6 +16,7 @@ from models import (
     PaginationParams, SuccessResponse, ErrorResponse
 )
 from services.activity_log_service import log_activity, log_activity_decorator
+from services.stats_service import get_customer_kpis
 
 
 # ============================================================================
@@ -857,8 +858,7 @@ async def delete_delivery_address(
 
 @router.get("/stats/overview")
 async def get_customer_stats(
-    user: User = Depends(require_permission("customers:read")),
-    supabase: Client = Depends(get_supabase)
+    user: User = Depends(require_permission("customers:read"))
 ):
     """
     Get customer statistics overview
@@ -873,51 +873,21 @@ async def get_customer_stats(
                 detail="User is not associated with any organization"
             )
 
-        # Get all customers for the organization
-        result = supabase.table("customers").select("*")\
-            .eq("organization_id", str(user.current_organization_id))\
-            .execute()
-
-        customers = result.data
-
-        # Calculate statistics in Python
-        total_customers = len(customers)
-        active_customers = sum(1 for c in customers if c.get('status') == 'active')
-        inactive_customers = sum(1 for c in customers if c.get('status') == 'inactive')
-        organizations = sum(1 for c in customers if c.get('company_type') == 'organization')
-        entrepreneurs = sum(1 for c in customers if c.get('company_type') == 'individual_entrepreneur')
-        moscow_customers = sum(1 for c in customers if c.get('region') == 'Москва')
-
-        # Calculate credit limit averages
-        credit_limits = [float(c.get('credit_limit', 0)) for c in customers if c.get('credit_limit')]
-        avg_credit_limit = sum(credit_limits) / len(credit_limits) if credit_limits else 0
-        total_credit_limit = sum(credit_limits)
-
-        # Calculate regional breakdown
-        region_counts = {}
-        for c in customers:
-            region = c.get('region')
-            if region:
-                region_counts[region] = region_counts.get(region, 0) + 1
-
-        # Sort by count descending and take top 10
-        top_regions = [
-            {"region": region, "count": count}
-            for region, count in sorted(region_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        ]
+        # Counts, credit limit totals and top 10 regions aggregated in Postgres
+        kpis = await get_customer_kpis(str(user.current_organization_id))
 
         return {
             "overview": {
-                "total_customers": total_customers,
-                "active_customers": active_customers,
-                "inactive_customers": inactive_customers,
-                "organizations": organizations,
-                "entrepreneurs": entrepreneurs,
-                "moscow_customers": moscow_customers,
-                "avg_credit_limit": round(avg_credit_limit, 2),
-                "total_credit_limit": round(total_credit_limit, 2)
+                "total_customers": kpis["total_customers"],
+                "active_customers": kpis["active_customers"],
+                "inactive_customers": kpis["inactive_customers"],
+                "organizations": kpis["organizations"],
+                "entrepreneurs": kpis["entrepreneurs"],
+                "moscow_customers": kpis["moscow_customers"],
+                "avg_credit_limit": round(float(kpis["avg_credit_limit"]), 2),
+                "total_credit_limit": round(float(kpis["total_credit_limit"]), 2)
             },
-            "top_regions": top_regions
+            "top_regions": kpis["top_regions"]
         }
 
     except HTTPException:
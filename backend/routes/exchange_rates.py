@@ -5,10 +5,10 @@ CBR rates are fetched once daily at 14:00 MSK (after CBR publishes ~11:30-13:30)
 Rates are cached in memory - lookups are instant, no DB queries.
 Admin users can manually trigger a refresh via POST /api/exchange-rates/refresh.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Dict
 
 from auth import get_current_user, User, check_admin_permissions
@@ -72,6 +72,7 @@ async def get_all_rates():
 async def get_exchange_rate(
     from_currency: str,
     to_currency: str,
+    on_date: Optional[date] = Query(None, description="Rates in effect on this date (recent history)"),
     user: User = Depends(get_current_user)
 ):
     """
@@ -85,6 +86,7 @@ async def get_exchange_rate(
     Args:
         from_currency: Source currency code (e.g., "USD")
         to_currency: Target currency code (e.g., "RUB")
+        on_date: Optional as-of date (e.g., ?on_date=2025-12-01)
 
     Returns:
         Exchange rate
@@ -95,7 +97,7 @@ async def get_exchange_rate(
     service = get_exchange_rate_service()
 
     try:
-        rate = await service.get_rate(from_currency, to_currency)
+        rate = await service.get_rate(from_currency, to_currency, on_date=on_date)
 
         if rate is None:
             raise HTTPException(
@@ -19,6 +19,7 @@ from supabase import Client
 
 from auth import get_current_user, User, check_admin_permissions
 from services.exchange_rate_service import get_exchange_rate_service
+from services.multi_currency_service import get_multi_currency_service
 from domain_models.monetary import SUPPORTED_CURRENCIES
 from dependencies import get_supabase
 
@@ -151,6 +152,8 @@ async def update_exchange_rate_settings(
         .eq("organization_id", org_id) \
         .execute()
 
+    get_multi_currency_service().invalidate_rate_policy(org_id)
+
     logger.info(
         f"User {user.id} {'enabled' if request.use_manual_exchange_rates else 'disabled'} "
         f"manual exchange rates for org {org_id}"
@@ -213,6 +216,8 @@ async def update_org_rate(
         }, on_conflict="organization_id,from_currency,to_currency") \
         .execute()
 
+    get_multi_currency_service().invalidate_rate_policy(org_id)
+
     logger.info(
         f"User {user.id} updated {currency}/USD rate to {request.rate} for org {org_id}"
     )
@@ -303,6 +308,8 @@ async def sync_rates_from_cbr(
             logger.error(f"Failed to sync {currency} rate: {e}")
             continue
 
+    get_multi_currency_service().invalidate_rate_policy(org_id)
+
     logger.info(
         f"User {user.id} synced {synced_count} rates from CBR for org {org_id}"
     )
@@ -29,6 +29,9 @@ from services.idn_service import get_idn_service, IDNValidationError, IDNGenerat
 from async_supabase import async_supabase_call
 from supabase import Client
 from dependencies import get_supabase
+from db_pool import get_db_connection as acquire_db_connection, release_db_connection
+from services.quote_detail_service import get_quote_detail, fetch_quote_approvals
+from services.render_cache_service import get_render_cache
 
 
 # ============================================================================
@@ -43,12 +46,14 @@ router = APIRouter(
 
 
 async def get_db_connection():
-    """Get database connection with proper error handling"""
-    import asyncpg
+    """
+    Get a pooled database connection with proper error handling.
+
+    Return it with release_db_connection() (not conn.close(), which would
+    discard the pooled connection).
+    """
     try:
-        # Use POSTGRES_DIRECT_URL for asyncpg (pooler URL has parsing issues)
-        db_url = os.getenv("POSTGRES_DIRECT_URL") or os.getenv("DATABASE_URL")
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -57,18 +62,19 @@ async def get_db_connection():
 
 
 async def set_rls_context(conn, user: User):
-    """Set Row Level Security context for database queries"""
-    import json
+    """
+    Set Row Level Security context for database queries
 
-    # Set organization ID for current_organization_id() function
-    await conn.execute(
-        "SELECT set_config('app.current_organization_id', $1, false)",
-        str(user.current_organization_id)
-    )
+    Session-level settings; the pool resets them (RESET ALL) when the
+    connection is released.
+    """
+    import json
 
-    # Set JWT claims for auth.uid()
+    # Organization ID for current_organization_id(), JWT claims for auth.uid()
     await conn.execute(
-        "SELECT set_config('request.jwt.claims', $1, false)",
+        "SELECT set_config('app.current_organization_id', $1, false), "
+        "set_config('request.jwt.claims', $2, false)",
+        str(user.current_organization_id),
         json.dumps({
             "sub": str(user.id),
             "organization_id": str(user.current_organization_id),
@@ -396,7 +402,7 @@ async def create_quote(
             detail=f"Failed to create quote: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.get("/{quote_id}", response_model=QuoteWithItems)
@@ -408,50 +414,30 @@ async def get_quote(
     conn = await get_db_connection()
     try:
         await set_rls_context(conn, user)
-        
-        # Validate access and get quote
-        quote_data = await validate_quote_access(conn, quote_id, user, "view")
-        quote = Quote(**quote_data)
 
-        # Get customer information if customer_id exists
+        # Quote, customer, items with calculation results and variables in
+        # one query, served from the per-quote cache while unchanged
+        detail = await get_quote_detail(conn, quote_id, user.current_organization_id)
+        if detail is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Quote {quote_id} not found or access denied"
+            )
+        quote = Quote(**detail["quote"])
+
         customer = None
-        if quote.customer_id:
-            customer_row = await conn.fetchrow("""
-                SELECT id, name, email, phone, address, city, region, country,
-                       inn, kpp, ogrn, company_type, industry, notes,
-                       created_at, updated_at
-                FROM customers
-                WHERE id = $1
-            """, quote.customer_id)
-            if customer_row:
-                customer_dict = dict(customer_row)
-                # Map 'name' to 'company_name' for frontend compatibility
-                customer_dict['company_name'] = customer_dict.get('name')
-                customer = customer_dict
-
-        # Get quote items with field mapping
-        items_rows = await conn.fetch("""
-            SELECT
-                id, quote_id, position,
-                product_name as description,
-                product_code,
-                brand,
-                quantity::numeric as quantity,
-                unit,
-                base_price_vat as unit_price,
-                weight_in_kg,
-                supplier_country as country_of_origin,
-                customs_code,
-                created_at, updated_at
-            FROM quote_items
-            WHERE quote_id = $1
-            ORDER BY position ASC, created_at ASC
-        """, quote_id)
+        if detail["customer"]:
+            customer = dict(detail["customer"])
+            # Map 'name' to 'company_name' for frontend compatibility
+            customer['company_name'] = customer.get('name')
 
         # Map database rows to QuoteItem model with defaults for missing fields
         items = []
-        for row in items_rows:
+        for row in detail["items"]:
             item_dict = dict(row)
+            phase_results = item_dict.pop('calculation_results')
+            calculated_at = item_dict.pop('calculated_at')
+
             # Add required fields with defaults if missing
             item_dict.setdefault('discount_type', 'percentage')
             item_dict.setdefault('discount_rate', 0)
@@ -463,66 +449,29 @@ async def get_quote(
             item_dict['name'] = item_dict.get('description')  # Frontend expects 'name'
             item_dict['final_price'] = item_dict.get('unit_price')  # Frontend expects 'final_price'
 
-            items.append(QuoteItem(**item_dict))
-
-        # Get calculation results for all items
-        calc_results_rows = await conn.fetch("""
-            SELECT qcr.quote_item_id, qcr.phase_results, qcr.calculated_at
-            FROM quote_calculation_results qcr
-            WHERE qcr.quote_id = $1
-        """, quote_id)
-
-        # Create a map of item_id -> calculation results
-        calc_results_map = {str(row['quote_item_id']): dict(row) for row in calc_results_rows}
-
-        # Attach calculation results to each item and extract final selling price
-        for item in items:
-            item_id_str = str(item.id)
-            if item_id_str in calc_results_map:
-                # Add calculation results as extra attributes
-                phase_results_raw = calc_results_map[item_id_str]['phase_results']
-
-                # Parse JSON string to dict if needed
-                import json
-                if isinstance(phase_results_raw, str):
-                    phase_results = json.loads(phase_results_raw)
-                else:
-                    phase_results = phase_results_raw
-
-                item.calculation_results = phase_results
-                item.calculated_at = calc_results_map[item_id_str]['calculated_at']
-
-                # Extract final selling price from calculation results
-                # Use quote currency price if available, otherwise fall back to USD
-                # sales_price_per_unit_with_vat_quote is the price converted to quote currency
-                # sales_price_per_unit_with_vat is the USD value (internal accounting)
-                if phase_results and isinstance(phase_results, dict):
-                    # Prefer quote currency price (EUR, RUB, etc.) over USD
-                    selling_price = phase_results.get('sales_price_per_unit_with_vat_quote')
-                    if selling_price is None:
-                        # Fall back to USD if quote currency price not available
-                        selling_price = phase_results.get('sales_price_per_unit_with_vat')
-                    if selling_price is not None:
-                        item.final_price = Decimal(str(selling_price))
-            else:
-                item.calculation_results = None
-                item.calculated_at = None
+            item = QuoteItem(**item_dict)
+            item.calculation_results = phase_results
+            item.calculated_at = calculated_at
+
+            # Extract final selling price from calculation results
+            # Use quote currency price if available, otherwise fall back to USD
+            # sales_price_per_unit_with_vat_quote is the price converted to quote currency
+            # sales_price_per_unit_with_vat is the USD value (internal accounting)
+            if phase_results and isinstance(phase_results, dict):
+                # Prefer quote currency price (EUR, RUB, etc.) over USD
+                selling_price = phase_results.get('sales_price_per_unit_with_vat_quote')
+                if selling_price is None:
+                    # Fall back to USD if quote currency price not available
+                    selling_price = phase_results.get('sales_price_per_unit_with_vat')
+                if selling_price is not None:
+                    item.final_price = Decimal(str(selling_price))
+
+            items.append(item)
 
         # Get approval information (if quote_approvals table exists)
         approvals = []
-        try:
-            approvals_rows = await conn.fetch("""
-                SELECT qa.*,
-                       u.email as approver_email,
-                       up.raw_user_meta_data->>'full_name' as approver_name
-                FROM quote_approvals qa
-                JOIN auth.users u ON qa.approver_id = u.id
-                LEFT JOIN auth.users up ON qa.approver_id = up.id
-                WHERE qa.quote_id = $1
-                ORDER BY qa.approval_order ASC, qa.assigned_at ASC
-            """, quote_id)
-
-            for row in approvals_rows:
+        if detail["has_approvals"]:
+            for row in await fetch_quote_approvals(conn, quote_id):
                 approval_dict = dict(row)
                 # Remove non-model fields
                 approval_dict.pop('approver_email', None)
@@ -532,33 +481,16 @@ async def get_quote(
                 approval.approver_email = row['approver_email']
                 approval.approver_name = row['approver_name']
                 approvals.append(approval)
-        except Exception:
-            # quote_approvals table doesn't exist yet (stub feature)
-            pass
-
-        # Get calculation variables (input variables used for calculation)
-        calculation_variables = None
-        try:
-            variables_row = await conn.fetchrow("""
-                SELECT variables
-                FROM quote_calculation_variables
-                WHERE quote_id = $1
-            """, quote_id)
-            if variables_row:
-                calculation_variables = variables_row['variables']
-        except Exception:
-            # quote_calculation_variables might not have data for old quotes
-            pass
 
         # Create response with items, customer, approvals, and variables
         quote_response = QuoteWithItems(**quote.dict())
         quote_response.items = items
         quote_response.customer = customer
         quote_response.approvals = approvals
-        quote_response.calculation_variables = calculation_variables
+        quote_response.calculation_variables = detail["calculation_variables"]
 
         return quote_response
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -571,7 +503,7 @@ async def get_quote(
             detail=f"Failed to retrieve quote: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.put("/{quote_id}", response_model=Quote)
@@ -645,6 +577,9 @@ async def update_quote(
             entity_id=quote.id
         )
 
+        # Rendered documents of the old content must not be served again
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return quote
         
     except HTTPException:
@@ -655,7 +590,7 @@ async def update_quote(
             detail=f"Failed to update quote: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.delete("/{quote_id}", response_model=SuccessResponse)
@@ -705,6 +640,8 @@ async def delete_quote(
             entity_id=quote_id
         )
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message=f"Quote {quote_data['idn_quote']} deleted successfully"
         )
@@ -717,7 +654,7 @@ async def delete_quote(
             detail=f"Failed to delete quote: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 # ============================================================================
@@ -767,6 +704,8 @@ async def soft_delete_quote(
             "deleted_at": datetime.utcnow().isoformat()
         }).eq("id", str(quote_id)).execute()
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message="Quote moved to bin"
         )
@@ -888,6 +827,8 @@ async def permanently_delete_quote(
         # Permanently delete quote (CASCADE will delete quote_items and quote_approvals)
         delete_result = supabase.table("quotes").delete().eq("id", str(quote_id)).execute()
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message="Quote permanently deleted"
         )
@@ -1050,6 +991,8 @@ async def add_quote_item(
             item_data.notes
         )
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return QuoteItem(**dict(row))
         
     except HTTPException:
@@ -1060,7 +1003,7 @@ async def add_quote_item(
             detail=f"Failed to add quote item: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.put("/{quote_id}/items/{item_id}", response_model=QuoteItem)
@@ -1119,6 +1062,8 @@ async def update_quote_item(
         """
         
         row = await conn.fetchrow(query, *params)
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return QuoteItem(**dict(row))
         
     except HTTPException:
@@ -1129,7 +1074,7 @@ async def update_quote_item(
             detail=f"Failed to update quote item: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.delete("/{quote_id}/items/{item_id}", response_model=SuccessResponse)
@@ -1158,6 +1103,8 @@ async def delete_quote_item(
                 detail=f"Quote item {item_id} not found in quote {quote_id}"
             )
         
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message=f"Quote item deleted successfully"
         )
@@ -1170,7 +1117,7 @@ async def delete_quote_item(
             detail=f"Failed to delete quote item: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 # ============================================================================
@@ -1304,6 +1251,8 @@ async def approve_quote_financially(
 
         supabase.table("quote_workflow_transitions").insert(transition_data).execute()
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             success=True,
             message=f"КП {quote['idn_quote']} финансово утверждено"
@@ -1381,6 +1330,8 @@ async def reject_quote_financially(
 
         supabase.table("quote_workflow_transitions").insert(transition_data).execute()
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             success=True,
             message=f"КП {quote['idn_quote']} отклонено финансовым менеджером"
@@ -1466,6 +1417,8 @@ async def send_quote_back_for_revision(
             print(f"ERROR: Failed to insert workflow transition: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to record workflow transition: {str(e)}")
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             success=True,
             message=f"КП {quote['idn_quote']} отправлено на доработку"
@@ -1557,7 +1510,7 @@ async def submit_quote_for_approval(
             detail=f"Failed to submit quote for approval: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.post("/{quote_id}/approve", response_model=SuccessResponse)
@@ -1609,6 +1562,8 @@ async def approve_quote(
         
         # TODO: Send notification emails based on new status
         
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message=f"Quote {updated_quote['idn_quote']} {approval_update.approval_status}. New status: {updated_quote['status']}"
         )
@@ -1621,7 +1576,7 @@ async def approve_quote(
             detail=f"Failed to approve quote: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.get("/pending-approval", response_model=QuoteListResponse)
@@ -1680,7 +1635,7 @@ async def get_quotes_pending_approval(
             detail=f"Failed to retrieve pending approvals: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 # ============================================================================
@@ -1719,6 +1674,8 @@ async def send_quote_to_customer(
         
         # TODO: Generate PDF and send email to customer
         
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message=f"Quote {quote_data['idn_quote']} sent to customer {quote_data['customer_name']}"
         )
@@ -1731,7 +1688,7 @@ async def send_quote_to_customer(
             detail=f"Failed to send quote to customer: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.post("/{quote_id}/mark-accepted", response_model=SuccessResponse)
@@ -1764,6 +1721,8 @@ async def mark_quote_accepted(
             WHERE id = $1
         """, quote_id)
         
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return SuccessResponse(
             message=f"Quote {quote_data['idn_quote']} marked as accepted by customer"
         )
@@ -1776,7 +1735,7 @@ async def mark_quote_accepted(
             detail=f"Failed to mark quote as accepted: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 # ============================================================================
@@ -1914,7 +1873,7 @@ async def generate_quote_pdf(
             detail=f"PDF generation failed: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 @router.get("/{quote_id}/export/pdf")
@@ -1933,61 +1892,14 @@ async def export_quote_pdf(
     - openbook-letter: КП open book письмо (formal letter + 21-column grid)
     - invoice: Счет (Russian standard commercial invoice)
     """
-    import tempfile
-    from fastapi.responses import FileResponse
-    from starlette.background import BackgroundTask
-    from services.export_data_mapper import fetch_export_data
+    from urllib.parse import quote as url_quote
+    from services.render_cache_service import get_or_render_document
 
     try:
-        # Fetch all export data
-        export_data = await fetch_export_data(str(quote_id), str(user.current_organization_id))
-
-        # Initialize PDF service
-        pdf_service = QuotePDFService()
-
-        # Generate PDF based on format
-        if format == "supply":
-            pdf_bytes = pdf_service.generate_supply_pdf(export_data)
-            format_name = "supply"
-        elif format == "openbook":
-            pdf_bytes = pdf_service.generate_openbook_pdf(export_data)
-            format_name = "openbook"
-        elif format == "supply-letter":
-            pdf_bytes = pdf_service.generate_supply_letter_pdf(export_data)
-            format_name = "supply_letter"
-        elif format == "invoice":
-            pdf_bytes = pdf_service.generate_invoice_pdf(export_data)
-            format_name = "invoice"
-        else:  # openbook-letter
-            pdf_bytes = pdf_service.generate_openbook_letter_pdf(export_data)
-            format_name = "openbook_letter"
-
-        # Generate filename
-        # Parse created_at (comes from Supabase as ISO string)
-        quote_date = ''
-        if export_data.quote.get('created_at'):
-            from datetime import datetime
-            created_at_str = export_data.quote['created_at']
-            if isinstance(created_at_str, str):
-                # Parse ISO format: "2025-10-21T19:44:04.236Z"
-                created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-                quote_date = created_at.strftime('%Y%m%d')
-            else:
-                # Already datetime object
-                quote_date = created_at_str.strftime('%Y%m%d')
-
-        customer_name = export_data.customer.get('name', 'customer')[:20] if export_data.customer else 'customer'
-        # Clean customer name for filename (transliterate Cyrillic)
-        customer_name_clean = ''.join(c if c.isalnum() or c in '-_' else '_' for c in customer_name)
-        idn_quote = export_data.quote.get('idn_quote', 'quote')
-        # Clean quote number (remove 'КП-' prefix if present)
-        idn_quote_clean = str(idn_quote).replace('КП-', '').replace('КП', '')
-        filename = f"kvota_{format_name}_{quote_date}_{idn_quote_clean}_{customer_name_clean}.pdf"
-
-        # Write to temp file and return
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            tmp.write(pdf_bytes)
-            tmp_path = tmp.name
+        # Render PDF (served from render cache for approved/sent quotes)
+        document = await get_or_render_document(
+            str(quote_id), str(user.current_organization_id), "pdf", format
+        )
 
         # Log export activity
         await log_activity(
@@ -1999,11 +1911,12 @@ async def export_quote_pdf(
             metadata={"format": f"pdf_{format}"}
         )
 
-        return FileResponse(
-            tmp_path,
-            media_type='application/pdf',
-            filename=filename,
-            background=BackgroundTask(os.unlink, tmp_path)
+        return Response(
+            content=document.content,
+            media_type=document.media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename*=UTF-8''{url_quote(document.filename, safe='')}"
+            }
         )
 
     except ValueError as e:
@@ -2146,6 +2059,8 @@ async def import_items_to_quote(
                 detail="Failed to add any items to quote"
             )
 
+        get_render_cache().invalidate_quote(str(quote_id))
+
         return {
             "success": True,
             "message": f"Successfully imported {len(added_items)} items to quote {quote_data['idn_quote']}",
@@ -2163,7 +2078,7 @@ async def import_items_to_quote(
             detail=f"Items import failed: {str(e)}"
         )
     finally:
-        await conn.close()
+        await release_db_connection(conn)
 
 
 # ============================================================================
@@ -2193,55 +2108,14 @@ async def export_quote_excel(
         404: Quote not found
         500: Export generation failed
     """
-    from fastapi.responses import FileResponse
-    from services.excel_service import QuoteExcelService
-    from services.export_data_mapper import fetch_export_data
-    import tempfile
+    from urllib.parse import quote as url_quote
+    from services.render_cache_service import get_or_render_document
 
     try:
-        # Fetch data
-        export_data = await fetch_export_data(quote_id, user.current_organization_id)
-
-        # Generate Excel based on format
-        if format == "validation":
-            excel_bytes = QuoteExcelService.generate_validation_export(export_data)
-            format_suffix = "validation"
-        elif format == "supply-grid":
-            excel_bytes = QuoteExcelService.generate_supply_grid_export(export_data)
-            format_suffix = "supply_grid"
-        elif format == "openbook-grid":
-            excel_bytes = QuoteExcelService.generate_openbook_grid_export(export_data)
-            format_suffix = "openbook_grid"
-        else:
-            raise ValueError(f"Unknown format: {format}")
-
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(excel_bytes)
-            tmp_path = tmp.name
-
-        # Generate filename
-        # Parse created_at for date
-        from datetime import datetime
-        quote_date = ''
-        if export_data.quote.get('created_at'):
-            created_at_str = export_data.quote['created_at']
-            if isinstance(created_at_str, str):
-                created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-                quote_date = created_at.strftime('%Y%m%d')
-            else:
-                quote_date = created_at_str.strftime('%Y%m%d')
-
-        idn_quote = export_data.quote.get('idn_quote', 'quote')
-        # Clean quote number (remove 'КП-' prefix if present)
-        idn_quote_clean = str(idn_quote).replace('КП-', '').replace('КП', '')
-
-        customer_name = export_data.customer.get('name', 'customer')[:20] if export_data.customer else 'customer'
-        # Clean customer name for filename (remove special characters)
-        import re
-        clean_customer = re.sub(r'[^\w\s-]', '', customer_name).strip().replace(' ', '_')
-
-        filename = f"kvota_{format_suffix}_{quote_date}_{idn_quote_clean}_{clean_customer}.xlsx"
+        # Render Excel (served from render cache for approved/sent quotes)
+        document = await get_or_render_document(
+            quote_id, str(user.current_organization_id), "excel", format
+        )
 
         # Log export activity
         await log_activity(
@@ -2253,12 +2127,12 @@ async def export_quote_excel(
             metadata={"format": f"excel_{format}"}
         )
 
-        from starlette.background import BackgroundTask
-        return FileResponse(
-            tmp_path,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            filename=filename,
-            background=BackgroundTask(os.unlink, tmp_path)
+        return Response(
+            content=document.content,
+            media_type=document.media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename*=UTF-8''{url_quote(document.filename, safe='')}"
+            }
         )
 
     except ValueError as e:
@@ -1,6 +1,7 @@
 """
 Quote Calculation Routes - Excel/CSV Upload and Calculation Engine Integration
-Uses Supabase client (NOT asyncpg) following customers.py pattern
+Uses Supabase client (NOT asyncpg) following customers.py pattern; calculated
+quotes are saved in one asyncpg transaction (services/quote_persistence_service.py)
 """
 from typing import List, Optional, Dict, Any
 from uuid import UUID
@@ -9,11 +10,13 @@ import os
 import io
 import asyncio
 import logging
-import re
+import uuid
 
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, status, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from supabase import Client
+import asyncpg
+import numpy as np
 import pandas as pd
 
 from auth import get_current_user, User
@@ -26,6 +29,10 @@ from calculation_engine import calculate_single_product_quote, calculate_multipr
 
 # Import activity logging
 from services.activity_log_service import log_activity_decorator
+from services.idn_service import get_idn_service
+from services.quote_persistence_service import QuoteBundle, persist_quote_bundle
+
+from file_service import read_csv_content
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -61,57 +68,6 @@ router = APIRouter(
 
 
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def generate_idn_quote(supabase_client: Client, organization_id: str) -> str:
-    """
-    Generate next sequential quote number for organization.
-    Format: КП{YY}-{NNNN} (e.g., КП25-0001)
-
-    Uses MAX(idn_quote) approach to avoid race conditions.
-    Filters by current year to reset numbering each year.
-
-    Args:
-        supabase_client: Supabase client instance
-        organization_id: Organization UUID
-
-    Returns:
-        str: Next quote number (e.g., "КП25-0001")
-    """
-    current_year = datetime.now().year
-    year_short = str(current_year)[-2:]  # Last 2 digits (2025 → 25)
-    year_prefix = f"КП{year_short}-"
-
-    # Query for maximum idn_quote starting with this year's prefix
-    quotes_response = supabase_client.table("quotes")\
-        .select("idn_quote")\
-        .eq("organization_id", str(organization_id))\
-        .like("idn_quote", f"{year_prefix}%")\
-        .order("idn_quote", desc=True)\
-        .limit(1)\
-        .execute()
-
-    if quotes_response.data and len(quotes_response.data) > 0:
-        # Extract numeric part from last quote number (e.g., "КП25-0042" → 42)
-        last_quote = quotes_response.data[0]["idn_quote"]
-        match = re.search(r'-(\d+)$', last_quote)
-        if match:
-            last_number = int(match.group(1))
-            next_number = last_number + 1
-        else:
-            # Fallback if regex fails
-            next_number = 1
-    else:
-        # No quotes for this year yet
-        next_number = 1
-
-    # Format: КП25-0001
-    idn_quote = f"{year_prefix}{str(next_number).zfill(4)}"
-    return idn_quote
-
-
 # ============================================================================
 # PYDANTIC MODELS
 # ============================================================================
@@ -248,11 +204,16 @@ def get_value(field_name: str, product: ProductFromFile, variables: Dict[str, An
     return default
 
 
-async def get_exchange_rate_async(from_currency: str, to_currency: str) -> Decimal:
+async def get_exchange_rate_async(
+    from_currency: str,
+    to_currency: str,
+    on_date: Optional[date] = None
+) -> Decimal:
     """Get exchange rate from in-memory CBR cache.
 
     Uses ExchangeRateService which caches CBR rates in memory (refreshed daily at 12:05 MSK).
-    No database queries - instant lookup.
+    No database queries - instant lookup. With on_date, uses the rates in effect
+    on that date (in-memory history index).
 
     Returns rate to multiply by (e.g., 1 USD = 100 RUB means rate is 100)
     """
@@ -264,7 +225,7 @@ async def get_exchange_rate_async(from_currency: str, to_currency: str) -> Decim
     service = get_exchange_rate_service()
 
     # get_rate handles cross-rates via RUB automatically
-    rate = await service.get_rate(from_currency, to_currency)
+    rate = await service.get_rate(from_currency, to_currency, on_date=on_date)
 
     if rate is None:
         logger.warning(f"No exchange rate found for {from_currency} -> {to_currency}, using 1.0")
@@ -297,6 +258,17 @@ def get_exchange_rate(from_currency: str, to_currency: str, supabase: Client) ->
         return asyncio.run(get_exchange_rate_async(from_currency, to_currency))
 
 
+def get_quote_rate_date(quote: Dict[str, Any]) -> Optional[date]:
+    """Date whose exchange rates apply to a saved quote (quote_date, else created_at)"""
+    value = quote.get("quote_date") or quote.get("created_at")
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
 def get_converted_monetary_value(
     supabase: Optional[Client],
     field_name: str,
@@ -714,6 +686,163 @@ def validate_calculation_input(
 # FILE UPLOAD & PARSING
 # ============================================================================
 
+# Row errors listed in one upload response
+UPLOAD_ERROR_LIMIT = 20
+
+
+def _text_column(df: pd.DataFrame, *columns: str) -> np.ndarray:
+    """First non-blank value across columns as str, None where all are blank"""
+    result = np.full(len(df), None, dtype=object)
+    for column in reversed(columns):
+        if column not in df.columns:
+            continue
+        values = df[column]
+        present = (values.notna() & (values != '')).to_numpy()
+        result = np.where(present, values.astype(str).to_numpy(dtype=object), result)
+    return result
+
+
+def _float_column(df: pd.DataFrame, column: str) -> tuple:
+    """
+    float() over a column
+
+    Returns:
+        Tuple: (floats with NaN for blank cells, error message or None per row)
+    """
+    errors = np.full(len(df), None, dtype=object)
+    if column not in df.columns:
+        return np.full(len(df), np.nan), errors
+
+    values = df[column]
+    try:
+        return values.astype(float).to_numpy(), errors
+    except (TypeError, ValueError):
+        pass
+
+    # Mixed column: convert cell by cell to find the invalid ones
+    floats = np.full(len(df), np.nan)
+    for pos, value in enumerate(values.tolist()):
+        if pd.isna(value):
+            continue
+        try:
+            floats[pos] = float(value)
+        except (TypeError, ValueError) as e:
+            errors[pos] = str(e)
+    return floats, errors
+
+
+def _int_column(values: pd.Series) -> tuple:
+    """
+    int() over a column (floats are truncated)
+
+    Returns:
+        Tuple: (int64 values, error message or None per row)
+    """
+    errors = np.full(len(values), None, dtype=object)
+    if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=np.int64), errors
+
+    if pd.api.types.is_float_dtype(values):
+        floats = values.to_numpy(dtype=float)
+        errors[np.isnan(floats)] = "cannot convert float NaN to integer"
+        errors[np.isinf(floats)] = "cannot convert float infinity to integer"
+        return np.where(np.isfinite(floats), np.trunc(floats), 0).astype(np.int64), errors
+
+    ints = np.zeros(len(values), dtype=np.int64)
+    for pos, value in enumerate(values.tolist()):
+        try:
+            ints[pos] = int(value)
+        except (TypeError, ValueError, OverflowError) as e:
+            errors[pos] = str(e)
+    return ints, errors
+
+
+def _optional(floats: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Floats where present, None elsewhere"""
+    return np.where(present, floats, None)
+
+
+def _products_from_dataframe(df: pd.DataFrame) -> tuple:
+    """
+    Build products from an uploaded price list column by column.
+
+    Column aliases are resolved as before: weight_in_kg/weight_per_unit,
+    import_tariff/duty_pct, customs_code/hs_code, sku/product_code.
+
+    Args:
+        df: Parsed file with required columns present
+
+    Returns:
+        Tuple: (list of ProductFromFile, list of "Error parsing row N: ..." messages)
+    """
+    def notna(column: str) -> np.ndarray:
+        if column not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        return df[column].notna().to_numpy()
+
+    # Weight can be in 'weight_in_kg' or 'weight_per_unit' columns
+    weight_kg, weight_kg_errors = _float_column(df, 'weight_in_kg')
+    weight_per_unit, weight_per_unit_errors = _float_column(df, 'weight_per_unit')
+    weight_kg = np.nan_to_num(weight_kg, nan=0.0)
+    use_per_unit = weight_kg == 0
+    weight = np.where(use_per_unit, np.nan_to_num(weight_per_unit, nan=0.0), weight_kg)
+
+    # Duty/tariff can be in 'import_tariff' or 'duty_pct' columns
+    tariff, tariff_errors = _float_column(df, 'import_tariff')
+    duty, duty_errors = _float_column(df, 'duty_pct')
+    has_tariff = notna('import_tariff')
+    use_duty = ~has_tariff & notna('duty_pct')
+    import_tariff = np.where(has_tariff, tariff, np.where(use_duty, duty, None))
+
+    base_price, base_price_errors = _float_column(df, 'base_price_vat')
+    quantity, quantity_errors = _int_column(df['quantity'])
+    discount, discount_errors = _float_column(df, 'supplier_discount')
+
+    # First failing conversion per row, in the order fields are read
+    row_errors = np.full(len(df), None, dtype=object)
+    for errors, applies in (
+        (weight_kg_errors, True),
+        (weight_per_unit_errors, use_per_unit),
+        (tariff_errors, True),
+        (duty_errors, use_duty),
+        (base_price_errors, True),
+        (quantity_errors, True),
+        (discount_errors, True),
+    ):
+        fill = pd.isna(row_errors) & ~pd.isna(errors) & applies
+        row_errors[fill] = errors[fill]
+
+    failed = ~pd.isna(row_errors)
+    messages = [
+        f"Error parsing row {index + 2}: {error}"
+        for index, error in zip(df.index[failed], row_errors[failed])
+    ]
+    if messages:
+        return [], messages
+
+    columns = {
+        'brand': _text_column(df, 'brand'),
+        'product_name': df['product_name'].astype(str).to_numpy(dtype=object),
+        'product_code': _text_column(df, 'sku', 'product_code'),
+        'base_price_vat': base_price,
+        'quantity': quantity,
+        'weight_in_kg': weight,
+        'customs_code': _text_column(df, 'customs_code', 'hs_code'),
+        'supplier_country': _text_column(df, 'supplier_country'),
+        'currency_of_base_price': _text_column(df, 'currency_of_base_price'),
+        'supplier_discount': _optional(discount, notna('supplier_discount')),
+        'import_tariff': import_tariff,
+    }
+
+    # Values are already converted to the model's types, skip per-row validation
+    fields = list(columns)
+    products = [
+        ProductFromFile.model_construct(**dict(zip(fields, values)))
+        for values in zip(*(column.tolist() for column in columns.values()))
+    ]
+    return products, []
+
+
 @router.post("/upload-products", response_model=FileUploadResponse)
 async def upload_products_file(
     file: UploadFile = File(...),
@@ -748,7 +877,7 @@ async def upload_products_file(
 
         # Parse based on file type
         if file_ext == '.csv':
-            df = pd.read_csv(io.BytesIO(contents))
+            df = read_csv_content(contents)
         else:  # Excel
             df = pd.read_excel(io.BytesIO(contents))
 
@@ -762,50 +891,17 @@ async def upload_products_file(
                 detail=f"Missing required columns: {', '.join(missing_columns)}"
             )
 
-        # Parse products
-        products = []
-        for index, row in df.iterrows():
-            try:
-                # Helper to safely get string value
-                def get_str(col: str) -> Optional[str]:
-                    val = row.get(col)
-                    return str(val) if pd.notna(val) and val != '' else None
-
-                # Helper to safely get float value
-                def get_float(col: str, default: float = 0) -> float:
-                    val = row.get(col)
-                    return float(val) if pd.notna(val) else default
-
-                # Weight can be in 'weight_in_kg' or 'weight_per_unit' columns
-                weight = get_float('weight_in_kg') or get_float('weight_per_unit')
-
-                # Duty/tariff can be in 'import_tariff' or 'duty_pct' columns
-                import_tariff = get_float('import_tariff') if pd.notna(row.get('import_tariff')) else None
-                if import_tariff is None and pd.notna(row.get('duty_pct')):
-                    import_tariff = get_float('duty_pct')
-
-                # HS code can be in 'customs_code' or 'hs_code' columns
-                customs_code = get_str('customs_code') or get_str('hs_code')
-
-                product = ProductFromFile(
-                    brand=get_str('brand'),
-                    product_name=str(row['product_name']),
-                    product_code=get_str('sku') or get_str('product_code'),
-                    base_price_vat=float(row['base_price_vat']),
-                    quantity=int(row['quantity']),
-                    weight_in_kg=weight,
-                    customs_code=customs_code,
-                    supplier_country=get_str('supplier_country'),
-                    currency_of_base_price=get_str('currency_of_base_price'),
-                    supplier_discount=get_float('supplier_discount') if pd.notna(row.get('supplier_discount')) else None,
-                    import_tariff=import_tariff,
-                )
-                products.append(product)
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Error parsing row {index + 2}: {str(e)}"
-                )
+        # Parse products column by column, reporting all invalid rows at once
+        products, row_errors = _products_from_dataframe(df)
+
+        if row_errors:
+            detail = "; ".join(row_errors[:UPLOAD_ERROR_LIMIT])
+            if len(row_errors) > UPLOAD_ERROR_LIMIT:
+                detail += f" (and {len(row_errors) - UPLOAD_ERROR_LIMIT} more rows)"
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=detail
+            )
 
         if not products:
             raise HTTPException(
@@ -1300,18 +1396,18 @@ def aggregate_product_results_to_summary(
 @log_activity_decorator(entity_type="quote", action="created")
 async def calculate_quote(
     request: QuoteCalculationRequest,
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase)
 ):
     """
     Calculate a quote using the 13-phase calculation engine
 
     This endpoint:
-    1. Creates a quote record
-    2. Creates quote_items records for each product
-    3. Saves calculation variables
-    4. Runs calculation engine for each product
-    5. Saves all 13 phases of results
-    6. Returns complete quote with calculations
+    1. Validates and maps all products
+    2. Runs calculation engine for all products
+    3. Saves quote, items, variables, all 13 phases of results and the
+       summary in one database transaction
+    4. Returns complete quote with calculations
     """
 
     if not user.current_organization_id:
@@ -1320,134 +1416,11 @@ async def calculate_quote(
             detail="User is not associated with any organization"
         )
 
-    # Retry logic for quote creation (handles race conditions with duplicate quote numbers)
-    max_retries = 3
-    last_error = None
-
-    for attempt in range(max_retries):
-        try:
-            # Generate quote number with current year (format: КП25-0001)
-            idn_quote = generate_idn_quote(supabase, str(user.current_organization_id))
-
-            # 1. Create quote record
-            quote_data = {
-                "organization_id": str(user.current_organization_id),
-                "customer_id": request.customer_id,
-                "contact_id": request.contact_id,  # Customer contact person
-                "idn_quote": idn_quote,
-                "title": request.title,
-                "description": request.description,
-                "status": "draft",
-                "created_by": str(user.id),
-                "manager_name": user.full_name,  # Manager info from user
-                "manager_email": user.email,
-                "quote_date": request.quote_date.isoformat(),  # Convert date to ISO string
-                "valid_until": request.valid_until.isoformat(),  # Convert date to ISO string
-                "currency": request.variables.get('currency_of_quote', 'USD'),
-                "subtotal": 0,  # Will be updated after calculations
-                "total_amount": 0  # Will be updated after calculations
-            }
-
-            quote_response = supabase.table("quotes").insert(quote_data).execute()
-
-            if not quote_response.data:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to create quote"
-                )
-
-            quote_id = quote_response.data[0]['id']
-
-            # Success! Break out of retry loop
-            break
-
-        except Exception as e:
-            # Check if it's a duplicate key error (code 23505)
-            error_str = str(e)
-            is_duplicate = '23505' in error_str or 'duplicate key value' in error_str or 'already exists' in error_str
-
-            if is_duplicate and attempt < max_retries - 1:
-                # Duplicate quote number - retry with new number
-                logger.warning(f"Duplicate quote number detected (attempt {attempt + 1}/{max_retries}). Retrying...")
-                last_error = e
-                continue  # Retry loop
-            elif is_duplicate:
-                # Exhausted retries
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Failed to generate unique quote number after {max_retries} attempts. Please try again."
-                )
-            else:
-                # Different error - re-raise immediately
-                raise
-
-    # 2. Create quote_items records
     try:
-        items_data = []
-        for idx, product in enumerate(request.products):
-            # Extract custom_fields (product-level variable overrides)
-            custom_fields = {}
-
-            # Fields that can be overridden per product
-            override_fields = [
-                'currency_of_base_price',
-                'exchange_rate_base_price_to_quote',
-                'supplier_discount',
-                'markup',
-                'customs_code',
-                'import_tariff',
-                'excise_tax',
-                'util_fee'
-            ]
-
-            # Check if product has overrides
-            for field in override_fields:
-                product_value = getattr(product, field, None)
-                if product_value is not None:
-                    # Store override in custom_fields
-                    # Convert Decimal to float for JSON serialization
-                    if isinstance(product_value, Decimal):
-                        custom_fields[field] = float(product_value)
-                    else:
-                        custom_fields[field] = product_value
-
-            item_data = {
-                "quote_id": quote_id,
-                "position": idx,
-                "product_name": product.product_name,
-                "product_code": product.product_code,
-                "base_price_vat": float(product.base_price_vat),
-                "quantity": product.quantity,
-                "weight_in_kg": float(product.weight_in_kg) if product.weight_in_kg else 0,
-                "customs_code": product.customs_code,
-                "supplier_country": product.supplier_country or request.variables.get('supplier_country', 'Турция'),
-                "custom_fields": custom_fields  # Add custom_fields to item data
-            }
-            items_data.append(item_data)
-
-        items_response = supabase.table("quote_items").insert(items_data).execute()
-
-        if not items_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create quote items"
-            )
-
-        # 3. Save calculation variables
-        variables_data = {
-            "quote_id": quote_id,
-            "template_id": request.template_id,
-            "variables": request.variables
-        }
-
-        variables_response = supabase.table("quote_calculation_variables")\
-            .insert(variables_data)\
-            .execute()
-
-        # 4. Fetch admin settings for organization
+        # 1. Fetch admin settings for organization
         admin_settings = await fetch_admin_settings(str(user.current_organization_id), supabase)
 
-        # 5. Validate all products and build calculation inputs
+        # 2. Validate all products and build calculation inputs
         calc_inputs = []
 
         # DEBUG: Log dm_fee values
@@ -1462,11 +1435,9 @@ async def calculate_quote(
             logger.info(f"🔍 DEBUG: Product 0 - currency_of_base_price = {p0.currency_of_base_price}")
 
         for idx, product in enumerate(request.products):
-            # Validate input before processing
+            # Validate input before processing (nothing is saved yet)
             validation_errors = validate_calculation_input(product, request.variables)
             if validation_errors:
-                # Roll back quote and return all errors
-                supabase.table("quotes").delete().eq("id", quote_id).execute()
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Validation failed for product '{product.product_name}': " + "; ".join(validation_errors)
@@ -1493,7 +1464,7 @@ async def calculate_quote(
 
             calc_inputs.append(calc_input)
 
-        # 6. Run calculation engine for ALL products together (with 60-second timeout)
+        # 3. Run calculation engine for ALL products together (with 60-second timeout)
         # This ensures proper distribution of quote-level costs (dm_fee, logistics, etc.)
         try:
             async with asyncio.timeout(60):
@@ -1505,15 +1476,57 @@ async def calculate_quote(
                     calc_inputs
                 )
         except asyncio.TimeoutError:
-            # Roll back quote and raise timeout error
-            supabase.table("quotes").delete().eq("id", quote_id).execute()
             raise HTTPException(
                 status_code=status.HTTP_408_REQUEST_TIMEOUT,
                 detail=f"Calculation timeout (max 60 seconds). Please simplify inputs."
             )
 
-        # 7. Process results and save to database
+        # 4. Build quote_items records (IDs generated here so results can reference them)
+        items_data = []
+        for idx, product in enumerate(request.products):
+            # Extract custom_fields (product-level variable overrides)
+            custom_fields = {}
+
+            # Fields that can be overridden per product
+            override_fields = [
+                'currency_of_base_price',
+                'exchange_rate_base_price_to_quote',
+                'supplier_discount',
+                'markup',
+                'customs_code',
+                'import_tariff',
+                'excise_tax',
+                'util_fee'
+            ]
+
+            # Check if product has overrides
+            for field in override_fields:
+                product_value = getattr(product, field, None)
+                if product_value is not None:
+                    # Store override in custom_fields
+                    # Convert Decimal to float for JSON serialization
+                    if isinstance(product_value, Decimal):
+                        custom_fields[field] = float(product_value)
+                    else:
+                        custom_fields[field] = product_value
+
+            item_data = {
+                "id": str(uuid.uuid4()),
+                "position": idx,
+                "product_name": product.product_name,
+                "product_code": product.product_code,
+                "base_price_vat": float(product.base_price_vat),
+                "quantity": product.quantity,
+                "weight_in_kg": float(product.weight_in_kg) if product.weight_in_kg else 0,
+                "customs_code": product.customs_code,
+                "supplier_country": product.supplier_country or request.variables.get('supplier_country', 'Турция'),
+                "custom_fields": custom_fields  # Add custom_fields to item data
+            }
+            items_data.append(item_data)
+
+        # 5. Process results
         calculation_results = []
+        results_data = []
         total_subtotal = Decimal("0")
         total_amount = Decimal("0")
         total_profit_usd = Decimal("0")
@@ -1526,7 +1539,7 @@ async def calculate_quote(
         usd_to_quote_rate = get_exchange_rate("USD", client_quote_currency, supabase)
         rates_snapshot = get_rates_snapshot_to_usd(request.quote_date, supabase)
 
-        for idx, (result, product, item_record) in enumerate(zip(results_list, request.products, items_response.data)):
+        for idx, (result, product, item_record) in enumerate(zip(results_list, request.products, items_data)):
             try:
                 # Convert result to dict and add quote currency fields
                 result_dict = convert_decimals_to_float(result.dict())
@@ -1557,17 +1570,11 @@ async def calculate_quote(
                     "dm_fee": float(result.dm_fee * usd_to_quote_rate),
                 }
 
-                # Save calculation results (USD in phase_results, quote currency in phase_results_quote_currency)
-                results_data = {
-                    "quote_id": quote_id,
-                    "quote_item_id": item_record['id'],
+                # Calculation results (USD in phase_results, quote currency in phase_results_quote_currency)
+                results_data.append({
                     "phase_results": result_dict,
                     "phase_results_quote_currency": phase_results_quote  # New in migration 037
-                }
-
-                results_response = supabase.table("quote_calculation_results")\
-                    .insert(results_data)\
-                    .execute()
+                })
 
                 # Accumulate totals
                 total_subtotal += result.purchase_price_total_quote_currency  # S16 - Purchase price
@@ -1616,20 +1623,43 @@ async def calculate_quote(
                 })
 
             except Exception as e:
-                # If processing fails for one product, roll back the quote
-                supabase.table("quotes").delete().eq("id", quote_id).execute()
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Failed to save results for product {product.product_name}: {str(e)}"
                 )
 
-        # 8. Update quote totals (USD + quote currency)
-        # Calculate totals
+        # 6. Quote totals (USD + quote currency)
         total_with_vat_usd = sum(r.sales_price_total_with_vat for r in results_list)  # AL16 sum in USD
         total_amount_quote = total_amount * usd_to_quote_rate
         total_with_vat_quote = total_with_vat_usd * usd_to_quote_rate
 
-        supabase.table("quotes").update({
+        # 7. Aggregate product results to quote-level summary (with dual currency)
+        quote_summary = aggregate_product_results_to_summary(
+            results_list,
+            request.variables,
+            quote_currency=client_quote_currency,
+            usd_to_quote_rate=usd_to_quote_rate,
+            exchange_rate_source="cbr",
+            exchange_rate_timestamp=datetime.now()
+        )
+
+        # 8. Quote number from the organization's yearly counter (format: КП25-0001)
+        idn_quote = await get_idn_service().generate_kp_number(user.current_organization_id)
+
+        quote_data = {
+            "organization_id": str(user.current_organization_id),
+            "customer_id": request.customer_id,
+            "contact_id": request.contact_id,  # Customer contact person
+            "idn_quote": idn_quote,
+            "title": request.title,
+            "description": request.description,
+            "status": "draft",
+            "created_by": str(user.id),
+            "manager_name": user.full_name,  # Manager info from user
+            "manager_email": user.email,
+            "quote_date": request.quote_date.isoformat(),  # Convert date to ISO string
+            "valid_until": request.valid_until.isoformat(),  # Convert date to ISO string
+            "currency": request.variables.get('currency_of_quote', 'USD'),
             "subtotal": float(total_subtotal),
             "total_amount": float(total_amount),
             "total_usd": float(total_amount),  # AK16 sum - without VAT in USD
@@ -1643,27 +1673,33 @@ async def calculate_quote(
             "exchange_rate_timestamp": datetime.now().isoformat(),
             "total_amount_quote": float(total_amount_quote),
             "total_with_vat_quote": float(total_with_vat_quote)
-        }).eq("id", quote_id).execute()
-
-        # 8b. Aggregate product results to quote-level summary (with dual currency)
-        quote_summary = aggregate_product_results_to_summary(
-            results_list,
-            request.variables,
-            quote_currency=client_quote_currency,
-            usd_to_quote_rate=usd_to_quote_rate,
-            exchange_rate_source="cbr",
-            exchange_rate_timestamp=datetime.now()
-        )
-        quote_summary["quote_id"] = quote_id
+        }
 
-        # Upsert (insert or update) quote calculation summary
-        supabase.table("quote_calculation_summaries")\
-            .upsert(quote_summary)\
-            .execute()
+        # Save quote, items, variables, results and summary in one transaction
+        try:
+            saved = await persist_quote_bundle(
+                QuoteBundle(
+                    quote=quote_data,
+                    items=items_data,
+                    variables={
+                        "template_id": request.template_id,
+                        "variables": request.variables
+                    },
+                    results=results_data,
+                    summary=quote_summary,
+                ),
+                user_id=str(user.id),
+                organization_id=str(user.current_organization_id),
+            )
+        except asyncpg.UniqueViolationError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Quote number {idn_quote} is already taken. Please try again."
+            )
 
         # 9. Return complete result
         return QuoteCalculationResult(
-            quote_id=quote_id,
+            quote_id=saved.quote_id,
             idn_quote=idn_quote,
             customer_id=request.customer_id,
             title=request.title,
@@ -1694,7 +1730,8 @@ async def calculate_quote(
 @router.get("/debug-export/{quote_id}")
 async def export_calculation_debug(
     quote_id: str,
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase)
 ):
     """
     Export intermediate calculation results with USD conversion.
@@ -1739,28 +1776,8 @@ async def export_calculation_debug(
         usd_rate = Decimal("1.0")
 
         if quote_currency != "USD":
-            # Try to get rate from exchange_rates table
-            rate_result = supabase.table("exchange_rates")\
-                .select("rate")\
-                .eq("from_currency", quote_currency)\
-                .eq("to_currency", "USD")\
-                .order("fetched_at", desc=True)\
-                .limit(1)\
-                .execute()
-
-            if rate_result.data:
-                usd_rate = Decimal(str(rate_result.data[0]["rate"]))
-            else:
-                # Fallback: try reverse rate
-                reverse_result = supabase.table("exchange_rates")\
-                    .select("rate")\
-                    .eq("from_currency", "USD")\
-                    .eq("to_currency", quote_currency)\
-                    .order("fetched_at", desc=True)\
-                    .limit(1)\
-                    .execute()
-                if reverse_result.data:
-                    usd_rate = Decimal("1") / Decimal(str(reverse_result.data[0]["rate"]))
+            # CBR rate in effect on the quote date (in-memory history index)
+            usd_rate = await get_exchange_rate_async(quote_currency, "USD", on_date=get_quote_rate_date(quote))
 
         # Build CSV rows with key milestones
         rows = []
@@ -1936,7 +1953,8 @@ async def export_calculation_debug(
 @router.get("/validation-export/{quote_id}")
 async def export_validation_data(
     quote_id: str,
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase)
 ):
     """
     Export ALL calculation results mapped to exact Excel cell references.
@@ -2011,16 +2029,8 @@ async def export_validation_data(
         usd_to_quote_rate = Decimal("1.0")
 
         if quote_currency != "USD":
-            rate_result = supabase.table("exchange_rates")\
-                .select("rate")\
-                .eq("from_currency", "USD")\
-                .eq("to_currency", quote_currency)\
-                .order("fetched_at", desc=True)\
-                .limit(1)\
-                .execute()
-
-            if rate_result.data:
-                usd_to_quote_rate = Decimal(str(rate_result.data[0]["rate"]))
+            # CBR rate in effect on the quote date (in-memory history index)
+            usd_to_quote_rate = await get_exchange_rate_async("USD", quote_currency, on_date=get_quote_rate_date(quote))
 
         # Build flat CSV rows - one row per product
         rows = []
@@ -5,6 +5,8 @@ Endpoint: POST /api/quotes/upload-excel
 Accepts simplified Excel template, parses it, and runs calculation engine.
 Optionally saves to database if customer_id is provided.
 
+Large files can be sent in resumable chunks via /api/quotes/uploads.
+
 Created: 2025-11-28
 Updated: 2025-12-01 - Added save-to-DB functionality
 """
@@ -13,12 +15,12 @@ import io
 import os
 import logging
 from datetime import date, datetime, timedelta, timezone
-from typing import Optional, List
+from typing import BinaryIO, Optional, List, Tuple
 from decimal import Decimal, ROUND_HALF_UP
 from uuid import UUID
 from urllib.parse import quote as url_quote
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Request, UploadFile, status
 from pydantic import BaseModel
 from supabase import Client
 
@@ -48,8 +50,18 @@ from calculation_models import (
     DMFeeType,
 )
 from calculation_engine import calculate_multiproduct_quote
-from services.exchange_rate_service import get_exchange_rate_service
+from services.exchange_rate_service import RateMatrix, get_exchange_rate_service
 from services.export_validation_service import generate_validation_export
+from services.parse_cache_service import content_digest, get_parse_cache, inputs_key, parsed_key
+from services.quote_persistence_service import QuoteBundle, persist_quote_bundle
+from services.upload_session_service import (
+    UPLOAD_CHUNK_BYTES,
+    UploadError,
+    UploadNotFoundError,
+    UploadOffsetError,
+    UploadTooLargeError,
+    get_upload_session_store,
+)
 from fastapi.responses import StreamingResponse
 
 # Import helper functions from quotes_calc
@@ -176,15 +188,29 @@ INCOTERMS_MAP = {
 # HELPER FUNCTIONS
 # ============================================================================
 
-async def get_exchange_rates(quote_currency: str, product_currencies: List[str]) -> dict:
+class ExchangeRates(dict):
+    """
+    {"X/RUB": rate} mapping that also carries the quote's cross-rate matrix.
+
+    calculate_exchange_rate() reads cross rates from .matrix instead of
+    dividing and quantizing for every product and cost line.
+    """
+
+    def __init__(self, rub_rates: dict, matrix: Optional[RateMatrix] = None):
+        super().__init__(rub_rates)
+        self.matrix = matrix
+
+
+async def get_exchange_rates(quote_currency: str, product_currencies: List[str]) -> ExchangeRates:
     """
     Get exchange rates from CBR for all currencies used in the quote.
 
+    All currencies are resolved with one rate-matrix call.
+
     Returns dict mapping currency pair to rate, e.g.:
     {"EUR/RUB": 95.5, "USD/RUB": 88.3, ...}
     """
     service = get_exchange_rate_service()
-    rates = {}
 
     # Get unique currencies needed
     # Always include USD for final totals conversion (even if no USD products)
@@ -192,19 +218,32 @@ async def get_exchange_rates(quote_currency: str, product_currencies: List[str])
     all_currencies.add(quote_currency)
     all_currencies.add("USD")  # Required for total_with_vat_usd calculation
 
+    # Same precision/rounding as calculate_exchange_rate
+    matrix = await service.get_rate_matrix(
+        all_currencies, precision=Decimal("0.0001"), rounding=ROUND_HALF_UP
+    )
+
     # Get rates to RUB (CBR base currency)
-    for currency in all_currencies:
+    rub_rates = {}
+    for currency in sorted(all_currencies):
         if currency == "RUB":
-            rates[f"{currency}/RUB"] = Decimal("1.0")
+            rub_rates[currency] = Decimal("1.0")
+            continue
+        rate = matrix.rub_rates.get(currency)
+        if rate:
+            rub_rates[currency] = rate
         else:
-            rate = await service.get_rate(currency, "RUB")
-            if rate:
-                rates[f"{currency}/RUB"] = rate
-            else:
-                logger.warning(f"Could not get rate for {currency}/RUB")
-                rates[f"{currency}/RUB"] = Decimal("1.0")  # Fallback
+            logger.warning(f"Could not get rate for {currency}/RUB")
+            rub_rates[currency] = Decimal("1.0")  # Fallback
 
-    return rates
+    if rub_rates != matrix.rub_rates:
+        # Fallback rates must show up in cross rates too
+        matrix = RateMatrix(rub_rates, rub_rates, precision=Decimal("0.0001"), rounding=ROUND_HALF_UP)
+
+    return ExchangeRates(
+        {f"{currency}/RUB": rate for currency, rate in rub_rates.items()},
+        matrix=matrix
+    )
 
 
 def calculate_exchange_rate(
@@ -231,6 +270,16 @@ def calculate_exchange_rate(
     if from_currency == to_currency:
         return Decimal("1.0")
 
+    # Precomputed cross rate (rates from get_exchange_rates)
+    matrix = getattr(rates, "matrix", None)
+    if matrix is not None:
+        if for_division:
+            rate = matrix.rate(to_currency, from_currency)
+        else:
+            rate = matrix.rate(from_currency, to_currency)
+        if rate is not None:
+            return rate
+
     from_rub = rates.get(f"{from_currency}/RUB", Decimal("1.0"))
     to_rub = rates.get(f"{to_currency}/RUB", Decimal("1.0"))
 
@@ -413,6 +462,43 @@ async def map_to_calculation_inputs(
     return inputs
 
 
+def parse_template_cached(stream: BinaryIO, digest: Optional[str] = None) -> Tuple[str, SimplifiedQuoteInput]:
+    """
+    Parse template, reusing the cached result for identical file content.
+
+    Args:
+        stream: Seekable workbook stream
+        digest: SHA-256 of the content if already known
+
+    Returns:
+        (content digest, parsed template)
+    """
+    digest = digest or content_digest(stream)
+    cache = get_parse_cache()
+
+    parsed = cache.get(parsed_key(digest))
+    if parsed is None:
+        parsed = SimplifiedExcelParser(stream).parse()
+        cache.put(parsed_key(digest), parsed)
+    return digest, parsed
+
+
+async def map_to_calculation_inputs_cached(
+    digest: str,
+    parsed: SimplifiedQuoteInput,
+    rates: dict
+) -> List[QuoteCalculationInput]:
+    """map_to_calculation_inputs with results cached per file content, rates and date"""
+    cache = get_parse_cache()
+    key = inputs_key(digest, rates)
+
+    calc_inputs = cache.get(key)
+    if calc_inputs is None:
+        calc_inputs = await map_to_calculation_inputs(parsed, rates)
+        cache.put(key, calc_inputs)
+    return calc_inputs
+
+
 def format_decimal(value: Decimal, precision: int = 2) -> str:
     """Format decimal for display"""
     return f"{value:.{precision}f}"
@@ -500,6 +586,45 @@ def build_calculation_summary(
 # ENDPOINTS
 # ============================================================================
 
+async def build_upload_response(
+    digest: str,
+    parsed_data: SimplifiedQuoteInput,
+    calculate: bool
+) -> UploadResponse:
+    """
+    Run calculation for a parsed template and build the upload response.
+
+    Shared by the single-request and chunked upload endpoints.
+    """
+    if not calculate:
+        return UploadResponse(
+            success=True,
+            message="File parsed successfully",
+            quote_input=parsed_data.dict(),
+            calculation_results=None,
+        )
+
+    # Get exchange rates
+    product_currencies = [p.currency.value for p in parsed_data.products]
+    rates = await get_exchange_rates(parsed_data.quote_currency.value, product_currencies)
+
+    # Map to calculation inputs
+    calc_inputs = await map_to_calculation_inputs_cached(digest, parsed_data, rates)
+
+    # Run calculation
+    calc_result = calculate_multiproduct_quote(calc_inputs)
+
+    # Build summary
+    summary = build_calculation_summary(parsed_data, calc_result, rates)
+
+    return UploadResponse(
+        success=True,
+        message="File parsed and calculated successfully",
+        quote_input=parsed_data.dict(),
+        calculation_results=summary,
+    )
+
+
 @router.post("/upload-excel", response_model=UploadResponse)
 async def upload_excel_quote(
     file: UploadFile = File(...),
@@ -525,41 +650,10 @@ async def upload_excel_quote(
         )
 
     try:
-        # Read file content
-        content = await file.read()
-        file_stream = io.BytesIO(content)
-
-        # Parse Excel
-        parser = SimplifiedExcelParser(file_stream)
-        parsed_data = parser.parse()
-
-        if not calculate:
-            return UploadResponse(
-                success=True,
-                message="File parsed successfully",
-                quote_input=parsed_data.dict(),
-                calculation_results=None,
-            )
-
-        # Get exchange rates
-        product_currencies = [p.currency.value for p in parsed_data.products]
-        rates = await get_exchange_rates(parsed_data.quote_currency.value, product_currencies)
-
-        # Map to calculation inputs
-        calc_inputs = await map_to_calculation_inputs(parsed_data, rates)
+        # Parse straight from the spooled upload (no in-memory copy)
+        digest, parsed_data = parse_template_cached(file.file)
 
-        # Run calculation
-        calc_result = calculate_multiproduct_quote(calc_inputs)
-
-        # Build summary
-        summary = build_calculation_summary(parsed_data, calc_result, rates)
-
-        return UploadResponse(
-            success=True,
-            message="File parsed and calculated successfully",
-            quote_input=parsed_data.dict(),
-            calculation_results=summary,
-        )
+        return await build_upload_response(digest, parsed_data, calculate)
 
     except ValueError as e:
         raise HTTPException(
@@ -597,11 +691,7 @@ async def parse_excel_only(
         )
 
     try:
-        content = await file.read()
-        file_stream = io.BytesIO(content)
-
-        parser = SimplifiedExcelParser(file_stream)
-        parsed_data = parser.parse()
+        _, parsed_data = parse_template_cached(file.file)
 
         return ParseOnlyResponse(
             success=True,
@@ -652,20 +742,15 @@ async def upload_excel_with_validation_export(
         )
 
     try:
-        # Read file content
-        content = await file.read()
-        file_stream = io.BytesIO(content)
-
-        # Parse Excel
-        parser = SimplifiedExcelParser(file_stream)
-        parsed_data = parser.parse()
+        # Parse straight from the spooled upload
+        digest, parsed_data = parse_template_cached(file.file)
 
         # Get exchange rates
         product_currencies = [p.currency.value for p in parsed_data.products]
         rates = await get_exchange_rates(parsed_data.quote_currency.value, product_currencies)
 
         # Map to calculation inputs
-        calc_inputs = await map_to_calculation_inputs(parsed_data, rates)
+        calc_inputs = await map_to_calculation_inputs_cached(digest, parsed_data, rates)
 
         # Run calculation
         calc_results = calculate_multiproduct_quote(calc_inputs)
@@ -884,7 +969,7 @@ async def upload_excel_with_validation_export(
                 total_revenue_no_vat_quote = total_revenue_no_vat * usd_to_quote_rate
                 total_revenue_with_vat_quote = total_revenue_with_vat * usd_to_quote_rate
 
-                # 1. Create quote record
+                # 1. Quote record
                 quote_data = {
                     "organization_id": str(user.current_organization_id),
                     "customer_id": customer_id,
@@ -911,12 +996,7 @@ async def upload_excel_with_validation_export(
                     "total_with_vat_quote": float(total_revenue_with_vat_quote),
                 }
 
-                quote_response = supabase.table("quotes").insert(quote_data).execute()
-                if not quote_response.data:
-                    raise Exception("Failed to create quote")
-                quote_id = quote_response.data[0]['id']
-
-                # 2. Create quote_items records with IDN-SKU
+                # 2. Build quote_items records with IDN-SKU
                 idn_service = get_idn_service()
                 items_data = []
                 for idx, p in enumerate(parsed_data.products):
@@ -938,7 +1018,6 @@ async def upload_excel_with_validation_export(
                         "import_tariff": float(p.import_tariff) if p.import_tariff else 0,
                     }
                     items_data.append({
-                        "quote_id": quote_id,
                         "idn_sku": item_idn_sku,
                         "position": idx,
                         "product_name": p.name,
@@ -951,23 +1030,18 @@ async def upload_excel_with_validation_export(
                         "custom_fields": custom_fields,
                     })
 
-                items_response = supabase.table("quote_items").insert(items_data).execute()
-                if not items_response.data:
-                    raise Exception("Failed to create quote items")
-
-                # 3. Save calculation variables
+                # 3. Calculation variables
                 variables_data = {
-                    "quote_id": quote_id,
                     "variables": {
                         **quote_inputs,
                         "exchange_rates": {k: float(v) for k, v in rates.items()},
                         "rates_snapshot": rates_snapshot,
                     }
                 }
-                supabase.table("quote_calculation_variables").insert(variables_data).execute()
 
-                # 4. Save calculation results for each product (USD in phase_results, quote currency in phase_results_quote_currency)
-                for idx, (r, item_record) in enumerate(zip(calc_results, items_response.data)):
+                # 4. Calculation results for each product (USD in phase_results, quote currency in phase_results_quote_currency)
+                results_data = []
+                for r in calc_results:
                     result_dict = convert_decimals_to_float(r.dict())
                     result_dict["rates_snapshot"] = rates_snapshot
                     result_dict["quote_currency"] = quote_currency
@@ -991,15 +1065,12 @@ async def upload_excel_with_validation_export(
                         "dm_fee": float(r.dm_fee * usd_to_quote_rate),
                     }
 
-                    results_data = {
-                        "quote_id": quote_id,
-                        "quote_item_id": item_record['id'],
+                    results_data.append({
                         "phase_results": result_dict,
                         "phase_results_quote_currency": phase_results_quote,
-                    }
-                    supabase.table("quote_calculation_results").insert(results_data).execute()
+                    })
 
-                # 5. Save quote calculation summary
+                # 5. Quote calculation summary
 
                 quote_summary = aggregate_product_results_to_summary(
                     calc_results,
@@ -1009,8 +1080,20 @@ async def upload_excel_with_validation_export(
                     exchange_rate_source="cbr",
                     exchange_rate_timestamp=datetime.now(timezone.utc)
                 )
-                quote_summary["quote_id"] = quote_id
-                supabase.table("quote_calculation_summaries").upsert(quote_summary).execute()
+
+                # Write everything in one transaction
+                saved = await persist_quote_bundle(
+                    QuoteBundle(
+                        quote=quote_data,
+                        items=items_data,
+                        variables=variables_data,
+                        results=results_data,
+                        summary=quote_summary,
+                    ),
+                    user_id=str(user.id),
+                    organization_id=str(user.current_organization_id),
+                )
+                quote_id = saved.quote_id
 
                 logger.info(f"Quote {idn_quote} (ID: {quote_id}) saved to database for customer {customer_id}")
 
@@ -1068,6 +1151,185 @@ async def upload_excel_with_validation_export(
         )
 
 
+# ============================================================================
+# CHUNKED (RESUMABLE) UPLOAD
+# ============================================================================
+#
+# For large workbooks on unreliable connections:
+#   POST   /uploads                    -> open session, get upload_id
+#   PUT    /uploads/{id}?offset=N      -> send next chunk (raw body)
+#   GET    /uploads/{id}               -> current offset (resume point)
+#   POST   /uploads/{id}/complete      -> verify, parse, calculate
+#   DELETE /uploads/{id}               -> abort
+
+class UploadSessionCreate(BaseModel):
+    """Request to open a chunked upload"""
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class UploadSessionResponse(BaseModel):
+    """State of a chunked upload"""
+    upload_id: str
+    filename: str
+    size: int
+    offset: int
+    complete: bool
+    chunk_size: int = UPLOAD_CHUNK_BYTES
+
+
+def _session_response(session) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session.upload_id,
+        filename=session.filename,
+        size=session.size,
+        offset=session.received,
+        complete=session.complete,
+    )
+
+
+def _upload_http_error(e: UploadError) -> HTTPException:
+    """Map upload session errors to HTTP errors"""
+    if isinstance(e, UploadNotFoundError):
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if isinstance(e, UploadOffsetError):
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "offset": e.expected_offset}
+        )
+    if isinstance(e, UploadTooLargeError):
+        return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    body: UploadSessionCreate,
+    user: User = Depends(get_current_user),
+):
+    """
+    Open a resumable upload for a large Excel template.
+
+    Args:
+        body: File name, total size in bytes and optional SHA-256 of the file
+
+    Returns:
+        UploadSessionResponse with upload_id and suggested chunk size
+    """
+    try:
+        session = get_upload_session_store().create(
+            user_id=str(user.id),
+            organization_id=str(user.current_organization_id) if user.current_organization_id else None,
+            filename=body.filename,
+            size=body.size,
+            sha256=body.sha256,
+        )
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+    return _session_response(session)
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: Optional[str] = Header(None),
+    user: User = Depends(get_current_user),
+):
+    """
+    Append a chunk (raw request body) at the given offset.
+
+    The body is streamed to disk as it arrives. A chunk that fails or is cut
+    off is discarded, so the client resends it from the returned offset.
+
+    Args:
+        offset: Byte offset of the chunk; must equal the current offset (409 otherwise)
+        x_chunk_sha256: Optional SHA-256 of the chunk, checked before it is accepted
+
+    Returns:
+        UploadSessionResponse with the new offset
+    """
+    try:
+        session = await get_upload_session_store().append(
+            upload_id, str(user.id), offset, request.stream(), chunk_sha256=x_chunk_sha256
+        )
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+    return _session_response(session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    upload_id: str,
+    user: User = Depends(get_current_user),
+):
+    """Get upload state; offset is where the client should resume"""
+    try:
+        session = get_upload_session_store().get(upload_id, str(user.id))
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+    return _session_response(session)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=UploadResponse)
+async def complete_upload_session(
+    upload_id: str,
+    calculate: bool = True,
+    user: User = Depends(get_current_user),
+):
+    """
+    Finish a chunked upload: verify checksum, parse and optionally calculate.
+
+    Same response as POST /upload-excel. The workbook is parsed in
+    read-only mode from the spooled file, then the session is removed.
+    """
+    store = get_upload_session_store()
+    try:
+        session = store.finalize(upload_id, str(user.id))
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+    try:
+        with store.open(session) as file_stream:
+            digest, parsed_data = parse_template_cached(file_stream, session.sha256)
+        store.discard(upload_id)
+
+        return await build_upload_response(digest, parsed_data, calculate)
+
+    except ValueError as e:
+        store.discard(upload_id)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.exception("Error processing chunked Excel upload")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing file: {str(e)}"
+        )
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upload_session(
+    upload_id: str,
+    user: User = Depends(get_current_user),
+):
+    """Abort a chunked upload and delete received data"""
+    store = get_upload_session_store()
+    try:
+        store.get(upload_id, str(user.id))
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+    store.discard(upload_id)
+
+
 # ============================================================================
 # TEMPLATE DOWNLOAD & EXPORT ENDPOINTS
 # ============================================================================
@@ -2,12 +2,12 @@
 Specification Export Routes - Russian B2B Quotation System
 Exports specification (Спецификация) documents as DOCX
 """
-import os
+from io import BytesIO
 from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from supabase import Client
 from dependencies import get_supabase
@@ -175,7 +175,7 @@ async def export_specification(
             )
 
         # 5. Generate specification DOCX
-        file_path = await generate_specification(
+        filename, docx_bytes = await generate_specification(
             quote_id=quote_id,
             contract_id=request.contract_id,
             org_id=user.current_organization_id,
@@ -190,12 +190,10 @@ async def export_specification(
         # 6. Return file as download
         # Use RFC 5987 encoding for UTF-8 filenames (Cyrillic support)
         from urllib.parse import quote
-        filename = os.path.basename(file_path)
         filename_encoded = quote(filename, safe='')
-        return FileResponse(
-            path=file_path,
+        return StreamingResponse(
+            BytesIO(docx_bytes),
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            filename=filename,
             headers={
                 "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
             }
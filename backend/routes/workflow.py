@@ -2,20 +2,27 @@
 Quote Workflow API Endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from uuid import UUID
 from decimal import Decimal
 import logging
 
+import asyncpg
+
 from auth import get_current_user, User, check_admin_permissions
 from workflow_models import (
     WorkflowStatus, WorkflowTransitionRequest, WorkflowTransitionResponse,
-    WorkflowSettings, WorkflowSettingsUpdate, MyTask, WorkflowTransition
+    WorkflowSettings, WorkflowSettingsUpdate, WorkflowTransition
 )
 from workflow_validator import WorkflowValidator
 from supabase import Client
 from dependencies import get_supabase
+from services.render_cache_service import get_render_cache, prewarm_quote_documents
+from services.task_inbox_service import (
+    assignee_roles_for, get_inbox, get_inbox_listener, inbox_event_stream, to_my_task
+)
 
 router = APIRouter(prefix="/api/quotes", tags=["workflow"])
 logger = logging.getLogger(__name__)
@@ -28,6 +35,7 @@ logger = logging.getLogger(__name__)
 async def transition_quote_workflow(
     quote_id: UUID,
     request: WorkflowTransitionRequest,
+    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
 ):
@@ -38,6 +46,9 @@ async def transition_quote_workflow(
     - User has required role for this transition
     - Current state allows this action
     - Required fields are filled
+
+    When the quote becomes approved, its export documents are rendered into
+    the render cache in the background so later downloads are cache reads.
     """
     # Get quote (avoid .single() which throws PGRST116 on 0 rows)
     quote_result = supabase.table("quotes")\
@@ -146,6 +157,7 @@ async def transition_quote_workflow(
         "current_assignee_role": next_assignee,
         "assigned_at": "now()"
     }).eq("id", str(quote_id)).execute()
+    get_render_cache().invalidate_quote(str(quote_id))
 
     # Log transition
     transition_data = {
@@ -164,6 +176,14 @@ async def transition_quote_workflow(
         .insert(transition_data)\
         .execute()
 
+    # Pre-warm render cache: approved quotes are downloaded repeatedly
+    if next_state == 'approved' and quote["workflow_state"] != 'approved':
+        background_tasks.add_task(
+            prewarm_quote_documents,
+            str(quote_id),
+            str(user.current_organization_id)
+        )
+
     return WorkflowTransitionResponse(
         quote_id=str(quote_id),
         old_state=quote["workflow_state"],
@@ -349,52 +369,77 @@ async def get_my_workflow_tasks(
     Returns quotes where:
     - current_assignee_role matches user's role
     - workflow_state is not terminal (approved/rejected/draft)
+
+    Reads the workflow_task_inbox projection (migration 062); live updates
+    are pushed by GET /my-tasks/stream.
     """
-    from datetime import datetime
+    assignee_roles = assignee_roles_for(user.role)
 
-    # Map user role to assignee roles they can handle
-    role_mapping = {
-        'sales_manager': ['sales_manager'],
-        'procurement_manager': ['procurement_manager'],
-        'logistics_manager': ['logistics_manager'],
-        'customs_manager': ['customs_manager'],
-        'financial_manager': ['financial_manager'],
-        'top_sales_manager': ['ceo', 'top_sales_manager'],  # Can handle senior approvals
-        'cfo': ['ceo', 'cfo', 'top_sales_manager'],
-        'ceo': ['ceo', 'cfo', 'top_sales_manager'],
-        'admin': ['ceo', 'financial_manager'],  # Admin can handle approvals
-        'owner': ['ceo', 'financial_manager']   # Owner can handle approvals
+    try:
+        rows = await get_inbox(str(user.current_organization_id), assignee_roles)
+    except asyncpg.UndefinedTableError:
+        logger.warning("workflow_task_inbox missing (migration 062); reading tasks from quotes")
+        rows = await fetch_tasks_from_quotes(supabase, str(user.current_organization_id), assignee_roles)
+
+    tasks = [to_my_task(row) for row in rows]
+
+    return {
+        "tasks": tasks,
+        "count": len(tasks)
     }
 
-    assignee_roles = role_mapping.get(user.role, [user.role])
 
-    # Get quotes assigned to user's role
+async def fetch_tasks_from_quotes(supabase: Client, organization_id: str, assignee_roles: List[str]) -> List[dict]:
+    """Inbox rows read from quotes directly (before migration 062)"""
+    from datetime import datetime
+
     quotes_result = supabase.table("quotes")\
         .select("id, idn_quote, customer_id, total_amount, workflow_state, assigned_at, customers(name)")\
-        .eq("organization_id", str(user.current_organization_id))\
+        .eq("organization_id", organization_id)\
         .in_("current_assignee_role", assignee_roles)\
         .neq("workflow_state", "approved")\
         .neq("workflow_state", "rejected")\
         .order("assigned_at", desc=True)\
         .execute()
 
-    tasks = []
+    rows = []
     for quote in quotes_result.data:
         # Calculate age in hours
         assigned_at = datetime.fromisoformat(quote["assigned_at"].replace('Z', '+00:00'))
         age_hours = int((datetime.now(assigned_at.tzinfo) - assigned_at).total_seconds() / 3600)
 
-        tasks.append(MyTask(
-            quote_id=quote["id"],
-            idn_quote=quote["idn_quote"],
-            customer_name=quote.get("customers", {}).get("name", "Unknown"),
-            total_amount=Decimal(str(quote["total_amount"])),
-            workflow_state=quote["workflow_state"],
-            assigned_at=assigned_at,
-            age_hours=age_hours
-        ))
+        rows.append({
+            "quote_id": quote["id"],
+            "idn_quote": quote["idn_quote"],
+            "customer_name": (quote.get("customers") or {}).get("name"),
+            "total_amount": quote["total_amount"],
+            "workflow_state": quote["workflow_state"],
+            "assigned_at": assigned_at,
+            "age_hours": age_hours,
+        })
+    return rows
+
+
+@router.get("/my-tasks/stream")
+async def stream_my_workflow_tasks(
+    request: Request,
+    user: User = Depends(get_current_user),
+):
+    """
+    Server-sent events with the user's task inbox.
 
-    return {
-        "tasks": tasks,
-        "count": len(tasks)
-    }
+    Sends a "tasks" event ({"tasks", "count"}, same rows as GET /my-tasks)
+    on connect and whenever a transition changes the inbox, instead of
+    the UI polling /my-tasks.
+    """
+    await get_inbox_listener().ensure_started()
+
+    return StreamingResponse(
+        inbox_event_stream(
+            str(user.current_organization_id),
+            assignee_roles_for(user.role),
+            request.is_disconnected
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,13 +1,18 @@
 """
 Analytics Report Scheduler
 
-Background job that runs every minute to check for due scheduled reports.
+Background jobs:
+- Scheduled reports: run by the report scheduler
+  (services/report_scheduler_service.py) when due; it competes for the
+  dispatch lock with the API replicas, so running this process as well is safe
+- Nightly: rebuild KPI rollup tables from source data (repairs any drift)
+- Weekly: activity_logs partition maintenance (create upcoming months,
+  drop the ones past retention)
 """
 
 import asyncio
 import os
 import sys
-from datetime import datetime
 from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
@@ -18,81 +23,19 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 load_dotenv()
 
-from supabase import create_client, Client
-from async_supabase import async_supabase_call
-from routes.analytics import execute_scheduled_report_internal
-from auth import User
+from services.report_scheduler_service import start_report_scheduler, stop_report_scheduler
+from services.stats_service import rebuild_kpi_rollups
+from services.activity_log_service import cleanup_old_logs
 
 logger = logging.getLogger(__name__)
 
 
-async def check_and_run_scheduled_reports():
-    """Check for due scheduled reports and execute them"""
-
-    supabase: Client = create_client(
-        os.getenv("SUPABASE_URL"),
-        os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    )
-
+async def reconcile_kpi_rollups():
+    """Rebuild dashboard/customer/campaign KPI rollups from scratch"""
     try:
-        # Find due reports
-        query = supabase.table("scheduled_reports") \
-            .select("*, saved_report:saved_reports(*)") \
-            .lte("next_run_at", datetime.now().isoformat()) \
-            .eq("is_active", True)
-
-        result = await async_supabase_call(query)
-
-        due_reports = result.data if result.data else []
-
-        logger.info(f"Found {len(due_reports)} scheduled reports due for execution")
-
-        for schedule in due_reports:
-            try:
-                saved_report = schedule.get("saved_report")
-
-                if not saved_report:
-                    logger.warning(f"Skipping schedule {schedule['id']}: No saved report found")
-                    continue
-
-                # Create system user context
-                user = User(
-                    id=schedule["created_by"],
-                    email="system@scheduler",
-                    full_name="System Scheduler",
-                    current_organization_id=schedule["organization_id"],
-                    current_role="admin",
-                    current_role_slug="admin",
-                    is_owner=False,
-                    role="admin",
-                    permissions=[],
-                    created_at=datetime.utcnow()
-                )
-
-                # Execute report
-                execution = await execute_scheduled_report_internal(
-                    schedule=schedule,
-                    saved_report=saved_report,
-                    user=user,
-                    execution_type="scheduled"
-                )
-
-                logger.info(
-                    f"✅ Executed scheduled report: {schedule['name']} "
-                    f"(execution_id: {execution['id']})"
-                )
-
-            except Exception as e:
-                logger.error(
-                    f"❌ Failed to execute scheduled report {schedule.get('name', schedule['id'])}: {e}",
-                    exc_info=True
-                )
-
-                # Failure status already updated in execute_scheduled_report_internal
-                # via exception handling
-
+        await rebuild_kpi_rollups()
     except Exception as e:
-        logger.error(f"Error in check_and_run_scheduled_reports: {e}", exc_info=True)
+        logger.error(f"Error in reconcile_kpi_rollups: {e}", exc_info=True)
 
 
 def start_scheduler():
@@ -100,17 +43,26 @@ def start_scheduler():
 
     scheduler = AsyncIOScheduler()
 
-    # Run every minute to check for due reports
+    # Nightly rollup reconciliation (low-traffic hour)
+    scheduler.add_job(
+        reconcile_kpi_rollups,
+        CronTrigger(hour=3, minute=30),
+        id='kpi_rollups_reconcile',
+        name='Rebuild KPI rollups',
+        replace_existing=True
+    )
+
+    # Weekly activity log partition maintenance (errors are logged inside)
     scheduler.add_job(
-        check_and_run_scheduled_reports,
-        CronTrigger(minute='*'),  # Every minute
-        id='scheduled_reports_check',
-        name='Check and run scheduled reports',
+        cleanup_old_logs,
+        CronTrigger(day_of_week='sun', hour=4, minute=0),
+        id='activity_log_partitions',
+        name='Maintain activity_logs partitions',
         replace_existing=True
     )
 
     scheduler.start()
-    logger.info("📅 Scheduler started - checking for due reports every minute")
+    logger.info("📅 Scheduler started - nightly KPI rollup reconciliation, weekly activity log maintenance")
 
     return scheduler
 
@@ -123,12 +75,15 @@ if __name__ == "__main__":
 
     logger.info("Starting Analytics Report Scheduler...")
 
+    loop = asyncio.get_event_loop()
     scheduler = start_scheduler()
+    loop.run_until_complete(start_report_scheduler())
 
     try:
         # Keep running
-        asyncio.get_event_loop().run_forever()
+        loop.run_forever()
     except (KeyboardInterrupt, SystemExit):
         logger.info("Shutting down scheduler...")
         scheduler.shutdown()
+        loop.run_until_complete(stop_report_scheduler())
         logger.info("Scheduler stopped")
@@ -0,0 +1,236 @@
+"""
+Activity Log Query Service
+
+Filtered reads of activity_logs for routes/activity_logs.py, run on the
+asyncpg pool. The table is partitioned by month and indexed on
+(organization_id, [user_id | entity_type | action], created_at DESC, id DESC)
+(migrations/064_activity_logs_partitioned.sql), so every query here
+filters by organization and orders by (created_at, id).
+
+Pages are keyset pages: a cursor carries the (created_at, id) of the last
+row shown and the next page starts strictly after it, which costs the same
+on page 1000 as on page 1. Numbered pages (OFFSET plus an exact count) are
+still served for clients that have not switched to cursors.
+"""
+import base64
+import binascii
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import asyncpg
+
+from db_pool import init_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+LOG_COLUMNS = "id, user_id, action, entity_type, entity_id, metadata, created_at"
+
+# Distinct users of an organization: one index probe per user on
+# idx_activity_logs_org_user_time instead of reading every log row
+LOG_USERS_SQL = """
+WITH RECURSIVE users AS (
+    (SELECT user_id FROM activity_logs WHERE organization_id = $1::uuid ORDER BY user_id LIMIT 1)
+    UNION ALL
+    SELECT (
+        SELECT l.user_id FROM activity_logs l
+        WHERE l.organization_id = $1::uuid AND l.user_id > u.user_id
+        ORDER BY l.user_id
+        LIMIT 1
+    )
+    FROM users u
+    WHERE u.user_id IS NOT NULL
+)
+SELECT user_id FROM users WHERE user_id IS NOT NULL
+"""
+
+
+def encode_cursor(created_at: datetime, log_id: Any) -> str:
+    """Opaque cursor for the row (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Raises:
+        ValueError: The cursor was not produced by encode_cursor
+    """
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(log_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def build_filters(
+    organization_id: Any,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    user_id: Optional[Any] = None,
+    entity_type: Optional[str] = None,
+    action: Optional[str] = None
+) -> Tuple[List[str], List[Any]]:
+    """
+    WHERE conditions and their parameters ($1, $2, ...) for the log filters.
+
+    date_to includes the whole day.
+    """
+    conditions = ["organization_id = $1::uuid"]
+    args: List[Any] = [str(organization_id)]
+
+    def add(condition: str, value: Any) -> None:
+        args.append(value)
+        conditions.append(condition.format(n=len(args)))
+
+    if date_from:
+        add("created_at >= ${n}::timestamp", datetime.combine(date_from, time.min))
+    if date_to:
+        add("created_at < ${n}::timestamp", datetime.combine(date_to + timedelta(days=1), time.min))
+    if user_id:
+        add("user_id = ${n}::uuid", str(user_id))
+    if entity_type:
+        add("entity_type = ${n}", entity_type)
+    if action:
+        add("action = ${n}", action)
+    return conditions, args
+
+
+def build_list_query(
+    conditions: List[str],
+    args: List[Any],
+    limit: int,
+    cursor: Optional[Tuple[datetime, UUID]] = None,
+    offset: int = 0
+) -> Tuple[str, List[Any]]:
+    """Page query, newest first; starts after cursor when given, else at offset"""
+    conditions = list(conditions)
+    args = list(args)
+    if cursor is not None:
+        args.extend(cursor)
+        conditions.append(f"(created_at, id) < (${len(args) - 1}::timestamp, ${len(args)}::uuid)")
+
+    sql = (
+        f"SELECT {LOG_COLUMNS} FROM activity_logs WHERE {' AND '.join(conditions)} "
+        f"ORDER BY created_at DESC, id DESC LIMIT {int(limit)}"
+    )
+    if offset:
+        sql += f" OFFSET {int(offset)}"
+    return sql, args
+
+
+def _to_item(row) -> Dict[str, Any]:
+    item = dict(row)
+    if isinstance(item.get("metadata"), str):
+        item["metadata"] = json.loads(item["metadata"])
+    return item
+
+
+# ============================================================================
+# READS
+# ============================================================================
+
+async def list_logs(
+    organization_id: Any,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    user_id: Optional[Any] = None,
+    entity_type: Optional[str] = None,
+    action: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    per_page: int = 100,
+    pool: Optional[asyncpg.Pool] = None
+) -> Dict[str, Any]:
+    """
+    One page of an organization's activity logs, newest first.
+
+    With a cursor the page follows the row it points at and total is None
+    (counting millions of rows is what keyset pages avoid). Without one,
+    page selects a numbered page and total is the exact match count.
+
+    Returns:
+        {"items", "total", "page", "per_page", "next_cursor"}; next_cursor is
+        None on the last page
+
+    Raises:
+        ValueError: Invalid cursor
+    """
+    after = decode_cursor(cursor) if cursor else None
+    conditions, args = build_filters(organization_id, date_from, date_to, user_id, entity_type, action)
+    # One extra row tells whether a next page exists
+    sql, sql_args = build_list_query(
+        conditions, args, per_page + 1,
+        cursor=after, offset=0 if after else (page - 1) * per_page
+    )
+
+    if pool is None:
+        pool = await init_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *sql_args)
+        total = None
+        if after is None:
+            total = await conn.fetchval(
+                f"SELECT count(*) FROM activity_logs WHERE {' AND '.join(conditions)}", *args
+            )
+
+    items = [_to_item(r) for r in rows[:per_page]]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    return {
+        "items": items,
+        "total": total,
+        "page": None if after else page,
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+    }
+
+
+async def get_log_stats(
+    organization_id: Any,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    pool: Optional[asyncpg.Pool] = None
+) -> Dict[str, Any]:
+    """Log counts by action and by entity type, grouped in SQL"""
+    conditions, args = build_filters(organization_id, date_from, date_to)
+    sql = (
+        f"SELECT action, entity_type, count(*) AS n FROM activity_logs "
+        f"WHERE {' AND '.join(conditions)} GROUP BY action, entity_type"
+    )
+
+    if pool is None:
+        pool = await init_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *args)
+
+    by_action: Dict[str, int] = {}
+    by_entity: Dict[str, int] = {}
+    for row in rows:
+        by_action[row["action"]] = by_action.get(row["action"], 0) + row["n"]
+        by_entity[row["entity_type"]] = by_entity.get(row["entity_type"], 0) + row["n"]
+
+    return {
+        "total_logs": sum(by_action.values()),
+        "by_action": by_action,
+        "by_entity": by_entity,
+    }
+
+
+async def get_log_user_ids(organization_id: Any, pool: Optional[asyncpg.Pool] = None) -> List[str]:
+    """Users with at least one activity log in the organization"""
+    if pool is None:
+        pool = await init_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(LOG_USERS_SQL, str(organization_id))
+    return [str(r["user_id"]) for r in rows]
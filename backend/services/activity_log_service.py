@@ -1,23 +1,84 @@
 """
 Activity Log Service - Audit Trail System
 Handles asynchronous logging with batching for performance
+
+Pipeline:
+- log_activity() puts entries on a bounded queue (ACTIVITY_LOG_QUEUE_SIZE).
+  When it is full, entries go to the spill file; once the spill file reaches
+  ACTIVITY_LOG_SPILL_MAX_BYTES they are dropped (counted in the metrics).
+- log_worker() flushes a batch when it reaches ACTIVITY_LOG_BATCH_SIZE
+  entries or its oldest entry is ACTIVITY_LOG_FLUSH_SECONDS old, with one
+  COPY through the asyncpg pool.
+- A batch that cannot be written because the database is unreachable is
+  appended to the spill file (JSON lines) and the database is retried with
+  backoff. Spilled entries are replayed once writes succeed again, also
+  after a restart (at-least-once: a crash mid-replay may repeat entries).
+  Each process spills to its own file (ACTIVITY_LOG_SPILL_PATH + "." + PID);
+  files left by processes that are no longer running are taken over and
+  replayed by a live worker.
+- Rows the database rejects (e.g. unknown user) are dropped one by one
+  instead of failing the whole batch.
+
+get_log_metrics() reports queue depth, lag and drop/spill counters
+(GET /api/health/detailed).
 """
 import asyncio
+import json
+import logging
 import os
-from typing import Optional, Dict, Any
+import tempfile
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from uuid import UUID
 from datetime import datetime
 from functools import wraps
-from supabase import create_client, Client
-import json
+
+import asyncpg
+
+from db_pool import init_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv("ACTIVITY_LOG_QUEUE_SIZE", "10000"))
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "500"))
+ACTIVITY_LOG_FLUSH_SECONDS = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", "2"))
+
+# Seconds a COPY may take before the batch is spilled
+ACTIVITY_LOG_WRITE_TIMEOUT = float(os.getenv("ACTIVITY_LOG_WRITE_TIMEOUT", "10"))
+
+# Backoff between database attempts while writes fail (doubles up to the max)
+ACTIVITY_LOG_RETRY_SECONDS = 1.0
+ACTIVITY_LOG_RETRY_MAX_SECONDS = 60.0
+
+# Base path of the per-process spill files
+ACTIVITY_LOG_SPILL_PATH = os.getenv(
+    "ACTIVITY_LOG_SPILL_PATH",
+    os.path.join(tempfile.gettempdir(), "kvota_activity_logs.jsonl")
+)
+ACTIVITY_LOG_SPILL_MAX_BYTES = int(os.getenv("ACTIVITY_LOG_SPILL_MAX_BYTES", str(100 * 1024 * 1024)))
+
+ACTIVITY_LOG_COLUMNS = (
+    "organization_id", "user_id", "action", "entity_type", "entity_id", "metadata", "created_at"
+)
+
+ACTIVITY_LOG_INSERT_SQL = """
+INSERT INTO activity_logs (organization_id, user_id, action, entity_type, entity_id, metadata, created_at)
+VALUES ($1, $2, $3, $4, $5, $6, $7)
+"""
 
 
 # ============================================================================
 # GLOBAL STATE
 # ============================================================================
 
-# Batch queue for log entries
-log_queue: asyncio.Queue = asyncio.Queue()
+# Batch queue for log entries: (monotonic enqueue time, entry)
+log_queue: asyncio.Queue = asyncio.Queue(maxsize=ACTIVITY_LOG_QUEUE_SIZE)
 
 # Background worker task
 worker_task: Optional[asyncio.Task] = None
@@ -25,6 +86,58 @@ worker_task: Optional[asyncio.Task] = None
 # Shutdown flag
 shutdown_flag = False
 
+# Wakes the worker on shutdown (a full queue has no room for a marker)
+_shutdown_event = asyncio.Event()
+
+# Spill file appends come from the event loop and worker threads
+_spill_lock = threading.Lock()
+
+
+class ActivityLogMetrics:
+    """Counters of the logging pipeline (per process)"""
+
+    def __init__(self):
+        self.enqueued = 0
+        self.written = 0
+        self.rejected = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.flush_failures = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_lag_seconds = 0.0
+        self.last_error: Optional[str] = None
+        # Monotonic enqueue time of the oldest entry not yet flushed
+        self.oldest_pending: Optional[float] = None
+
+
+metrics = ActivityLogMetrics()
+
+
+def get_log_metrics() -> Dict[str, Any]:
+    """Queue depth, lag and counters for health checks"""
+    lag = 0.0
+    if metrics.oldest_pending is not None:
+        lag = time.monotonic() - metrics.oldest_pending
+    return {
+        "queue_size": log_queue.qsize(),
+        "max_queue_size": log_queue.maxsize,
+        "lag_seconds": round(lag, 3),
+        "last_flush_lag_seconds": round(metrics.last_flush_lag_seconds, 3),
+        "enqueued": metrics.enqueued,
+        "written": metrics.written,
+        "rejected": metrics.rejected,
+        "spilled": metrics.spilled,
+        "replayed": metrics.replayed,
+        "dropped": metrics.dropped,
+        "flush_failures": metrics.flush_failures,
+        "spill_bytes": _spill_size(),
+        "last_flush_age_seconds": (
+            round(time.monotonic() - metrics.last_flush_at, 3) if metrics.last_flush_at else None
+        ),
+        "last_error": metrics.last_error,
+    }
+
 
 # ============================================================================
 # LOGGING FUNCTIONS
@@ -49,22 +162,27 @@ async def log_activity(
         entity_id: ID of affected entity (optional)
         metadata: Additional context (optional)
     """
-    log_entry = {
-        "user_id": str(user_id),
-        "organization_id": str(organization_id),
-        "action": action,
-        "entity_type": entity_type,
-        "entity_id": str(entity_id) if entity_id else None,
-        "metadata": metadata or {},
-        "created_at": datetime.utcnow().isoformat()
-    }
-
     try:
-        # Add to queue (non-blocking)
-        await log_queue.put(log_entry)
-    except Exception as e:
+        log_entry = {
+            "user_id": str(UUID(str(user_id))),
+            "organization_id": str(UUID(str(organization_id))),
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": str(entity_id) if entity_id else None,
+            "metadata": metadata or {},
+            "created_at": datetime.utcnow().isoformat()
+        }
+    except ValueError as e:
         # Logging should never crash the app
-        print(f"Warning: Failed to queue activity log: {e}")
+        logger.warning(f"Skipping activity log {entity_type}/{action}: {e}")
+        return
+
+    metrics.enqueued += 1
+    try:
+        log_queue.put_nowait((time.monotonic(), log_entry))
+    except asyncio.QueueFull:
+        # Backpressure: never block the request; keep the entry on disk
+        _spill_or_drop([log_entry])
 
 
 def log_activity_decorator(entity_type: str, action: str):
@@ -119,123 +237,357 @@ def log_activity_decorator(entity_type: str, action: str):
 
 
 # ============================================================================
-# BATCH WORKER
+# SPILL FILE
 # ============================================================================
 
-async def log_worker():
+def _spill_path(pid: Optional[int] = None) -> str:
+    """Spill file of a process (this one by default)"""
+    return f"{ACTIVITY_LOG_SPILL_PATH}.{pid or os.getpid()}"
+
+
+def _spill_size() -> int:
+    try:
+        return os.path.getsize(_spill_path())
+    except OSError:
+        return 0
+
+
+def _spill_or_drop(entries: List[Dict[str, Any]]) -> None:
+    """Append entries to the spill file; drop them if it is full or unwritable"""
+    lines = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in entries)
+    with _spill_lock:
+        try:
+            if _spill_size() + len(lines.encode("utf-8")) > ACTIVITY_LOG_SPILL_MAX_BYTES:
+                raise OSError(f"spill file full ({ACTIVITY_LOG_SPILL_MAX_BYTES} bytes)")
+            with open(_spill_path(), "a", encoding="utf-8") as f:
+                f.write(lines)
+            metrics.spilled += len(entries)
+        except OSError as e:
+            metrics.dropped += len(entries)
+            metrics.last_error = f"Dropped {len(entries)} activity logs: {e}"
+            logger.error(metrics.last_error)
+
+
+def _replay_path() -> str:
+    return _spill_path() + ".replay"
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _orphaned_spills() -> List[str]:
     """
-    Background worker for batch inserts
+    Spill and replay files of processes that are no longer running
 
-    Flushes queue every 5 seconds or 100 entries
+    Includes the unsuffixed files written before spills were per process.
+    """
+    directory, base = os.path.split(ACTIVITY_LOG_SPILL_PATH)
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return []
+
+    orphans = []
+    for name in sorted(names):
+        if name in (base, base + ".replay"):
+            orphans.append(os.path.join(directory, name))
+            continue
+        if not name.startswith(base + "."):
+            continue
+        pid = name[len(base) + 1:]
+        if pid.endswith(".replay"):
+            pid = pid[:-len(".replay")]
+        if pid.isdigit() and int(pid) != os.getpid() and not _process_running(int(pid)):
+            orphans.append(os.path.join(directory, name))
+    return orphans
+
+
+def _take_spill() -> Optional[str]:
+    """
+    Move a spill file aside for replay (new spills start a fresh file)
 
-    Safety limits:
-    - Max 86400 iterations (24 hours at 1 sec/iteration)
-    - Max 24 hours absolute runtime
-    - Auto-shutdown if memory exceeds 90%
+    This process's own spill comes first, then files of dead processes.
+    Files are claimed by renaming them to this process's replay path, so
+    of two workers racing for an orphan only one gets it.
     """
-    global shutdown_flag
+    with _spill_lock:
+        if os.path.exists(_replay_path()):
+            return _replay_path()
+        candidates = [_spill_path()] if _spill_size() else []
+        for path in candidates + _orphaned_spills():
+            try:
+                os.replace(path, _replay_path())
+            except FileNotFoundError:
+                continue  # taken by another worker
+            return _replay_path()
+        return None
+
+
+def _read_spill_chunk(path: str, offset: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Up to `limit` entries from byte offset; returns (entries, next offset)"""
+    entries = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while len(entries) < limit:
+            line = f.readline()
+            if not line:
+                break
+            offset += len(line)
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                metrics.dropped += 1  # torn line from a crash mid-write
+        return entries, offset
 
-    supabase: Client = create_client(
-        os.getenv("SUPABASE_URL"),
-        os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    )
 
-    batch = []
-    last_flush = datetime.utcnow()
+# ============================================================================
+# DATABASE WRITES
+# ============================================================================
+
+class _DatabaseUnavailable(Exception):
+    """A batch could not be written for a reason other than its rows"""
 
-    # Safety limits to prevent infinite loops
-    iteration_count = 0
-    MAX_ITERATIONS = 86400  # 24 hours at 1 sec/iteration
-    start_time = datetime.utcnow()
-    MAX_RUNTIME_HOURS = 24
 
-    while not shutdown_flag and iteration_count < MAX_ITERATIONS:
-        # Check absolute timeout (prevents running forever)
-        runtime_hours = (datetime.utcnow() - start_time).total_seconds() / 3600
-        if runtime_hours > MAX_RUNTIME_HOURS:
-            print(f"Activity log worker: Max runtime ({MAX_RUNTIME_HOURS}h) reached, shutting down")
-            break
+def _to_record(entry: Dict[str, Any]) -> tuple:
+    return (
+        UUID(entry["organization_id"]),
+        UUID(entry["user_id"]),
+        entry["action"],
+        entry["entity_type"],
+        UUID(entry["entity_id"]) if entry.get("entity_id") else None,
+        json.dumps(entry.get("metadata") or {}, ensure_ascii=False, default=str),
+        datetime.fromisoformat(entry["created_at"]),
+    )
 
-        iteration_count += 1
 
+async def _write_entries(entries: List[Dict[str, Any]]) -> None:
+    """
+    COPY entries into activity_logs.
+
+    If the batch is refused because of its data, rows are inserted one by
+    one and the refused ones dropped (metrics.rejected).
+
+    Raises:
+        _DatabaseUnavailable: Nothing was written; spill and retry later
+    """
+    records = []
+    for entry in entries:
         try:
-            # Wait for new log entry (with timeout)
+            records.append(_to_record(entry))
+        except (KeyError, TypeError, ValueError) as e:
+            metrics.rejected += 1
+            logger.warning(f"Rejected malformed activity log {entry!r}: {e}")
+
+    if not records:
+        return
+
+    try:
+        pool = await init_db_pool()
+        async with pool.acquire(timeout=ACTIVITY_LOG_WRITE_TIMEOUT) as conn:
             try:
-                log_entry = await asyncio.wait_for(log_queue.get(), timeout=1.0)
-                batch.append(log_entry)
-            except asyncio.TimeoutError:
-                # No new entries, check if we should flush
-                pass
-
-            # Flush conditions
-            time_since_flush = (datetime.utcnow() - last_flush).total_seconds()
-            should_flush = len(batch) >= 100 or time_since_flush >= 5.0
-
-            if should_flush and batch:
-                try:
-                    # Batch insert
-                    supabase.table("activity_logs").insert(batch).execute()
-                    print(f"Activity logs: Flushed {len(batch)} entries")
-                    batch = []
-                    last_flush = datetime.utcnow()
-                except Exception as e:
-                    print(f"Error flushing activity logs: {e}")
-                    # Don't clear batch on error - will retry next flush
+                await conn.copy_records_to_table(
+                    "activity_logs", records=records, columns=ACTIVITY_LOG_COLUMNS,
+                    timeout=ACTIVITY_LOG_WRITE_TIMEOUT
+                )
+            except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+                logger.warning(f"Activity log batch refused ({e}); inserting rows one by one")
+                for record in records:
+                    try:
+                        await conn.execute(ACTIVITY_LOG_INSERT_SQL, *record)
+                    except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as row_error:
+                        metrics.rejected += 1
+                        logger.warning(f"Rejected activity log {record!r}: {row_error}")
+    except Exception as e:
+        raise _DatabaseUnavailable(str(e)) from e
 
-        except Exception as e:
-            print(f"Error in activity log worker: {e}")
-            await asyncio.sleep(1)
 
-    # Final flush on shutdown
-    if batch:
+# ============================================================================
+# BATCH WORKER
+# ============================================================================
+
+class _Writer:
+    """Flushes batches; spills and backs off while the database is unavailable"""
+
+    def __init__(self):
+        self.retry_at = 0.0
+        self.backoff = ACTIVITY_LOG_RETRY_SECONDS
+        self.replay_offset = 0
+
+    @property
+    def database_ready(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def _failed(self, error: Exception) -> None:
+        metrics.flush_failures += 1
+        metrics.last_error = str(error)
+        self.retry_at = time.monotonic() + self.backoff
+        logger.error(f"Error flushing activity logs (retry in {self.backoff:.0f}s): {error}")
+        self.backoff = min(self.backoff * 2, ACTIVITY_LOG_RETRY_MAX_SECONDS)
+
+    async def flush(self, batch: List[Tuple[float, Dict[str, Any]]]) -> None:
+        entries = [entry for _, entry in batch]
+        metrics.last_flush_lag_seconds = time.monotonic() - batch[0][0]
+        if self.database_ready:
+            try:
+                await _write_entries(entries)
+                metrics.written += len(entries)
+                metrics.last_flush_at = time.monotonic()
+                self.backoff = ACTIVITY_LOG_RETRY_SECONDS
+                return
+            except _DatabaseUnavailable as e:
+                self._failed(e)
+        await asyncio.to_thread(_spill_or_drop, entries)
+
+    async def replay_spill(self) -> bool:
+        """Write one batch of spilled entries; False when there is nothing to replay"""
+        if not self.database_ready:
+            return False
+        path = await asyncio.to_thread(_take_spill)
+        if path is None:
+            return False
+
+        entries, next_offset = await asyncio.to_thread(
+            _read_spill_chunk, path, self.replay_offset, ACTIVITY_LOG_BATCH_SIZE
+        )
+        if entries:
+            try:
+                await _write_entries(entries)
+            except _DatabaseUnavailable as e:
+                self._failed(e)
+                return False
+            metrics.replayed += len(entries)
+            logger.info(f"Activity logs: Replayed {len(entries)} spilled entries")
+
+        if next_offset == self.replay_offset:
+            os.remove(path)
+            self.replay_offset = 0
+        else:
+            self.replay_offset = next_offset
+        return True
+
+
+async def log_worker():
+    """
+    Background worker for batch inserts
+
+    Flushes when a batch reaches ACTIVITY_LOG_BATCH_SIZE entries or its
+    oldest entry is ACTIVITY_LOG_FLUSH_SECONDS old; replays the spill file
+    while idle. Runs until shutdown_log_worker(), then flushes what is left.
+    """
+    writer = _Writer()
+    batch: List[Tuple[float, Dict[str, Any]]] = []
+
+    while True:
         try:
-            supabase.table("activity_logs").insert(batch).execute()
-            print(f"Activity logs: Final flush of {len(batch)} entries")
+            if batch:
+                timeout = max(batch[0][0] + ACTIVITY_LOG_FLUSH_SECONDS - time.monotonic(), 0)
+            elif await writer.replay_spill():
+                timeout = 0  # take new entries between replayed batches
+            else:
+                timeout = ACTIVITY_LOG_FLUSH_SECONDS
+
+            if log_queue.empty() and not shutdown_flag:
+                getter = asyncio.ensure_future(log_queue.get())
+                stopper = asyncio.ensure_future(_shutdown_event.wait())
+                done, _ = await asyncio.wait({getter, stopper}, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                stopper.cancel()
+                if getter in done:
+                    batch.append(getter.result())
+                else:
+                    getter.cancel()
+                    try:
+                        # The item may have arrived while cancelling
+                        batch.append(await getter)
+                    except asyncio.CancelledError:
+                        pass
+
+            while len(batch) < ACTIVITY_LOG_BATCH_SIZE and not log_queue.empty():
+                batch.append(log_queue.get_nowait())
+
+            metrics.oldest_pending = batch[0][0] if batch else None
+            due = batch and (
+                len(batch) >= ACTIVITY_LOG_BATCH_SIZE
+                or time.monotonic() - batch[0][0] >= ACTIVITY_LOG_FLUSH_SECONDS
+                or shutdown_flag
+            )
+            if due:
+                flushing, batch = batch, []
+                await writer.flush(flushing)
+                metrics.oldest_pending = None
+
+            if shutdown_flag and not batch and log_queue.empty():
+                break
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"Error during final flush: {e}")
+            logger.error(f"Error in activity log worker: {e}", exc_info=True)
+            await asyncio.sleep(1)
+
+    logger.info("Activity log worker drained")
 
 
 async def setup_log_worker():
     """Start the background log worker"""
-    global worker_task, shutdown_flag
+    global worker_task, shutdown_flag, log_queue, _shutdown_event
 
     if worker_task is None:
         shutdown_flag = False
+        # Queues and events belong to the event loop that first waits on them:
+        # start each worker with fresh ones, keeping entries queued so far
+        queued = []
+        while not log_queue.empty():
+            queued.append(log_queue.get_nowait())
+        log_queue = asyncio.Queue(maxsize=ACTIVITY_LOG_QUEUE_SIZE)
+        for item in queued:
+            log_queue.put_nowait(item)
+        _shutdown_event = asyncio.Event()
         worker_task = asyncio.create_task(log_worker())
-        print("Activity log worker started")
+        logger.info("Activity log worker started")
 
 
 async def shutdown_log_worker():
-    """Gracefully shutdown the log worker"""
+    """Gracefully shutdown the log worker (flushes or spills what is queued)"""
     global worker_task, shutdown_flag
 
     if worker_task:
         shutdown_flag = True
+        _shutdown_event.set()
         await worker_task
         worker_task = None
-        print("Activity log worker stopped")
+        logger.info("Activity log worker stopped")
 
 
 # ============================================================================
 # CLEANUP UTILITIES
 # ============================================================================
 
-async def cleanup_old_logs():
+async def cleanup_old_logs(pool: Optional[asyncpg.Pool] = None) -> bool:
     """
     Auto-purge logs older than 6 months
 
-    Should be called by a cron job weekly
-    """
-    supabase: Client = create_client(
-        os.getenv("SUPABASE_URL"),
-        os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    )
+    Drops expired monthly partitions and creates the next twelve months'
+    ones (migrations/064_activity_logs_partitioned.sql, 066). Run weekly by
+    scheduler.py.
 
+    Returns:
+        True if the maintenance ran, False if it failed
+    """
     try:
-        # Call the database function
-        result = await supabase.rpc("cleanup_old_activity_logs").execute()
-        print("Activity logs: Old logs cleaned up successfully")
+        if pool is None:
+            pool = await init_db_pool()
+        async with pool.acquire() as conn:
+            await conn.execute("SELECT cleanup_old_activity_logs()")
+        logger.info("Activity logs: Old logs cleaned up successfully")
         return True
     except Exception as e:
-        print(f"Error cleaning up old activity logs: {e}")
+        logger.error(f"Error cleaning up old activity logs: {e}")
         return False
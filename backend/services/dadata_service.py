@@ -11,9 +11,12 @@ from typing import Optional
 from pydantic import BaseModel
 import logging
 
+from http_pool import get_http_client
+
 logger = logging.getLogger(__name__)
 
 DADATA_API_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/findById/party"
+REQUEST_TIMEOUT = 10.0
 
 
 class CompanyInfo(BaseModel):
@@ -50,10 +53,16 @@ class CompanyInfo(BaseModel):
 class DaDataService:
     """Service for fetching company data from DaData API"""
 
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = os.getenv("DADATA_API_KEY")
         if not self.api_key:
             logger.warning("DADATA_API_KEY not configured")
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Injected client, else the shared pooled client"""
+        return self._http_client or get_http_client()
 
     async def find_by_inn(self, inn: str) -> Optional[CompanyInfo]:
         """
@@ -82,24 +91,24 @@ class DaDataService:
         payload = {"query": inn_clean}
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    DADATA_API_URL,
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                if not data.get("suggestions"):
-                    logger.info(f"No company found for INN: {inn_clean}")
-                    return None
-
-                # Get first suggestion
-                suggestion = data["suggestions"][0]
-                company_data = suggestion.get("data", {})
-
-                return self._parse_company_data(company_data)
+            response = await self.http_client.post(
+                DADATA_API_URL,
+                headers=headers,
+                json=payload,
+                timeout=REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            if not data.get("suggestions"):
+                logger.info(f"No company found for INN: {inn_clean}")
+                return None
+
+            # Get first suggestion
+            suggestion = data["suggestions"][0]
+            company_data = suggestion.get("data", {})
+
+            return self._parse_company_data(company_data)
 
         except httpx.HTTPStatusError as e:
             logger.error(f"DaData API error: {e.response.status_code} - {e.response.text}")
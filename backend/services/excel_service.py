@@ -6,17 +6,113 @@ Generates Excel exports in 2 formats:
 2. Grid Export - Professional 2-sheet export (КП поставка + КП open book)
 """
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import Cell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
 from io import BytesIO
+from copy import copy
 from decimal import Decimal
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.export_data_mapper import ExportData
+from services.russian_formatting import format_ru_number
+
+
+# ============================================================================
+# SHARED GRID STYLES
+# ============================================================================
+
+MONEY_FORMAT = '#,##0.00 ₽'
+PERCENT_FORMAT = '0.00%'
+
+_BRAND_BLUE = "FF2C5AA0"
+_HEADER_FILL = PatternFill(start_color=_BRAND_BLUE, end_color=_BRAND_BLUE, fill_type="solid")
+_CARD_FILL = PatternFill(start_color="FFE8E8E8", end_color="FFE8E8E8", fill_type="solid")
+_CARD_SIDE = Side(style='thin', color=_BRAND_BLUE)
+_CARD_BORDER = Border(left=_CARD_SIDE, right=_CARD_SIDE, top=_CARD_SIDE, bottom=_CARD_SIDE)
+_HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+# Style specs are built once at import; each workbook gets its own NamedStyle
+# instances (NamedStyle binds to a single workbook) but shares these objects.
+GRID_STYLE_SPECS: Dict[str, Dict[str, Any]] = {
+    'kvota_header': {'font': Font(bold=True, size=11, color="FFFFFFFF"), 'fill': _HEADER_FILL, 'alignment': _HEADER_ALIGNMENT},
+    'kvota_header_small': {'font': Font(bold=True, size=10, color="FFFFFFFF"), 'fill': _HEADER_FILL, 'alignment': _HEADER_ALIGNMENT},
+    'kvota_money': {'number_format': MONEY_FORMAT},
+    'kvota_money_bold': {'font': Font(bold=True), 'number_format': MONEY_FORMAT},
+    'kvota_percent': {'number_format': PERCENT_FORMAT},
+    'kvota_bold': {'font': Font(bold=True)},
+    'kvota_total_label': {'font': Font(bold=True, size=12)},
+    'kvota_card_title': {'font': Font(bold=True, size=11, color=_BRAND_BLUE)},
+    'kvota_card': {'fill': _CARD_FILL, 'border': _CARD_BORDER},
+    'kvota_card_label': {'font': Font(bold=True, size=10), 'fill': _CARD_FILL, 'border': _CARD_BORDER},
+    'kvota_card_value': {'font': Font(size=10), 'fill': _CARD_FILL, 'border': _CARD_BORDER},
+    'kvota_card_total': {'font': Font(bold=True, size=11, color=_BRAND_BLUE), 'fill': _CARD_FILL, 'border': _CARD_BORDER},
+    'kvota_card_note': {'font': Font(size=9, italic=True), 'fill': _CARD_FILL, 'border': _CARD_BORDER},
+    'kvota_card_note_wrap': {
+        'font': Font(size=9, italic=True), 'fill': _CARD_FILL, 'border': _CARD_BORDER,
+        'alignment': Alignment(wrap_text=True, vertical='top'),
+    },
+}
+
+
+def register_grid_styles(wb: Workbook) -> Dict[str, StyleArray]:
+    """
+    Register all shared grid styles on a workbook.
+
+    Args:
+        wb: Workbook to register styles on
+
+    Returns:
+        Style arrays by style name, ready to be attached to new cells
+    """
+    style_arrays = {}
+    for name, spec in GRID_STYLE_SPECS.items():
+        # Cells without an explicit font keep the workbook default (Calibri 11)
+        style = NamedStyle(name=name, **{'font': DEFAULT_FONT, **spec})
+        wb.add_named_style(style)
+        style_arrays[name] = copy(style.as_tuple())
+    return style_arrays
+
+
+class GridRowWriter:
+    """
+    Appends table rows whose columns share a fixed style template.
+
+    Each cell is created with a copy of a precomputed style array instead of
+    assigning Font/Fill/Border objects one attribute at a time, so a row costs
+    one style lookup per column regardless of the number of rows.
+    """
+
+    def __init__(self, ws: Worksheet, styles: Dict[str, StyleArray], template: Sequence[Optional[str]]):
+        """
+        Args:
+            ws: Worksheet to append rows to
+            styles: Style arrays returned by register_grid_styles()
+            template: Style name per column (None for unstyled columns)
+        """
+        self.ws = ws
+        self._arrays = [styles[name] if name else None for name in template]
+
+    def append(self, values: Sequence[Any]):
+        """Append one row of values directly below the last written row."""
+        ws = self.ws
+        ws.append([
+            Cell(ws, value=value, style_array=array) if array is not None else value
+            for value, array in zip(values, self._arrays)
+        ])
+
+
+def apply_style(ws: Worksheet, name: str, coordinates: Sequence[str]):
+    """Apply a registered named style to existing cells (including merged cells)."""
+    for coordinate in coordinates:
+        ws[coordinate].style = name
 
 
 class QuoteExcelService:
@@ -33,21 +129,7 @@ class QuoteExcelService:
         Returns:
             Formatted string with space as thousand separator and comma as decimal
         """
-        if value is None:
-            return "0,00"
-
-        # Convert to float
-        try:
-            num_value = float(value)
-        except (ValueError, TypeError):
-            return "0,00"
-
-        # Format with 2 decimals
-        str_val = f"{num_value:,.2f}"
-
-        # Replace comma (thousand separator) with space, dot (decimal) with comma
-        # Python's format uses comma for thousands and dot for decimal
-        return str_val.replace(',', ' ').replace('.', ',')
+        return format_ru_number(value)
 
     @staticmethod
     def generate_validation_export(export_data: ExportData) -> bytes:
@@ -422,6 +504,7 @@ class QuoteExcelService:
             Excel file as bytes
         """
         wb = Workbook()
+        styles = register_grid_styles(wb)
 
         # ========== Sheet 1: КП поставка (9 columns) ==========
         ws1 = wb.active
@@ -433,32 +516,15 @@ class QuoteExcelService:
             'Цена за ед. (₽)', 'Сумма (₽)', 'НДС (₽)',
             'Цена с НДС за ед. (₽)', 'Сумма с НДС (₽)'
         ]
+        GridRowWriter(ws1, styles, ['kvota_header'] * len(headers_supply)).append(headers_supply)
 
-        # Style headers
-        header_fill = PatternFill(start_color="FF2C5AA0", end_color="FF2C5AA0", fill_type="solid")
-        header_font = Font(bold=True, size=11, color="FFFFFFFF")
-        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-
-        for col_idx, header in enumerate(headers_supply, 1):
-            cell = ws1.cell(row=1, column=col_idx)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-
-        # Data rows
-        row_idx = 2
+        # Data rows: columns 1-4 unstyled, monetary columns 5-9
+        rows = GridRowWriter(ws1, styles, [None] * 4 + ['kvota_money'] * 5)
         totals = {'quantity': 0, 'col5': Decimal('0'), 'col6': Decimal('0'), 'col7': Decimal('0'), 'col8': Decimal('0'), 'col9': Decimal('0')}
 
         for item in export_data.items:
             calc_results = item.get('calculation_results', {})
 
-            # Basic info
-            ws1.cell(row=row_idx, column=1).value = item.get('brand', '')
-            ws1.cell(row=row_idx, column=2).value = item.get('product_code', '')
-            ws1.cell(row=row_idx, column=3).value = item.get('product_name', '')
-            ws1.cell(row=row_idx, column=4).value = item.get('quantity', 0)
-
             # Selling prices from calculations
             selling_price_per_unit = Decimal(str(calc_results.get('sales_price_per_unit', 0)))
             selling_price_total = Decimal(str(calc_results.get('sales_price_total_no_vat', 0)))
@@ -466,11 +532,17 @@ class QuoteExcelService:
             selling_price_with_vat_per_unit = Decimal(str(calc_results.get('sales_price_per_unit_with_vat', 0)))
             selling_price_with_vat_total = Decimal(str(calc_results.get('sales_price_total_with_vat', 0)))
 
-            ws1.cell(row=row_idx, column=5).value = float(selling_price_per_unit)
-            ws1.cell(row=row_idx, column=6).value = float(selling_price_total)
-            ws1.cell(row=row_idx, column=7).value = float(vat_from_sales)
-            ws1.cell(row=row_idx, column=8).value = float(selling_price_with_vat_per_unit)
-            ws1.cell(row=row_idx, column=9).value = float(selling_price_with_vat_total)
+            rows.append([
+                item.get('brand', ''),
+                item.get('product_code', ''),
+                item.get('product_name', ''),
+                item.get('quantity', 0),
+                float(selling_price_per_unit),
+                float(selling_price_total),
+                float(vat_from_sales),
+                float(selling_price_with_vat_per_unit),
+                float(selling_price_with_vat_total),
+            ])
 
             # Accumulate totals
             totals['quantity'] += item.get('quantity', 0)
@@ -480,23 +552,11 @@ class QuoteExcelService:
             totals['col8'] += selling_price_with_vat_per_unit
             totals['col9'] += selling_price_with_vat_total
 
-            # Apply currency format to monetary columns (5-9)
-            for col in range(5, 10):
-                ws1.cell(row=row_idx, column=col).number_format = '#,##0.00 ₽'
-
-            row_idx += 1
-
         # Totals row
-        ws1.cell(row=row_idx, column=1).value = 'ИТОГО'
-        ws1.cell(row=row_idx, column=1).font = Font(bold=True, size=12)
-        ws1.cell(row=row_idx, column=4).value = totals['quantity']
-        ws1.cell(row=row_idx, column=4).font = Font(bold=True)
-
-        for col_idx, col_key in enumerate(['col5', 'col6', 'col7', 'col8', 'col9'], 5):
-            cell = ws1.cell(row=row_idx, column=col_idx)
-            cell.value = float(totals[col_key])
-            cell.number_format = '#,##0.00 ₽'
-            cell.font = Font(bold=True)
+        GridRowWriter(ws1, styles, ['kvota_total_label', None, None, 'kvota_bold'] + ['kvota_money_bold'] * 5).append(
+            ['ИТОГО', None, None, totals['quantity']]
+            + [float(totals[col_key]) for col_key in ['col5', 'col6', 'col7', 'col8', 'col9']]
+        )
 
         # Set column widths
         ws1.column_dimensions['A'].width = 12  # Бренд
@@ -520,80 +580,60 @@ class QuoteExcelService:
             'Цена за ед. (₽)', 'Сумма (₽)', 'НДС (₽)',
             'Цена с НДС за ед. (₽)', 'Сумма с НДС (₽)'
         ]
-
-        for col_idx, header in enumerate(headers_openbook, 1):
-            cell = ws2.cell(row=1, column=col_idx)
-            cell.value = header
-            cell.font = Font(bold=True, size=10, color="FFFFFFFF")
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        GridRowWriter(ws2, styles, ['kvota_header_small'] * len(headers_openbook)).append(headers_openbook)
 
         # Data rows for Sheet 2
-        row_idx = 2
+        # Monetary columns: 6-9, 12-20; percentage column: 11
+        rows = GridRowWriter(
+            ws2, styles,
+            [None] * 5 + ['kvota_money'] * 4 + [None, 'kvota_percent'] + ['kvota_money'] * 9
+        )
+        currency_of_base_price = export_data.variables.get('currency_of_base_price', 'USD')
+
         for item in export_data.items:
             calc_results = item.get('calculation_results', {})
 
-            # Columns 1-4: Same as Sheet 1
-            ws2.cell(row=row_idx, column=1).value = item.get('brand', '')
-            ws2.cell(row=row_idx, column=2).value = item.get('product_code', '')
-            ws2.cell(row=row_idx, column=3).value = item.get('product_name', '')
-            ws2.cell(row=row_idx, column=4).value = item.get('quantity', 0)
-
-            # Column 5: Currency
-            ws2.cell(row=row_idx, column=5).value = export_data.variables.get('currency_of_base_price', 'USD')
-
-            # Column 6: Price without VAT
             purchase_price_no_vat = Decimal(str(calc_results.get('purchase_price_no_vat', 0)))
-            ws2.cell(row=row_idx, column=6).value = float(purchase_price_no_vat)
 
             # Column 7: Invoice amount (FORMULA: Price × Quantity)
             quantity = item.get('quantity', 0)
             invoice_amount = purchase_price_no_vat * Decimal(str(quantity))
-            ws2.cell(row=row_idx, column=7).value = float(invoice_amount)
-
-            # Column 8: Price in quote currency
-            ws2.cell(row=row_idx, column=8).value = float(Decimal(str(calc_results.get('purchase_price_total_quote_currency', 0))))
-
-            # Column 9: Logistics
-            ws2.cell(row=row_idx, column=9).value = float(Decimal(str(calc_results.get('logistics_total', 0))))
-
-            # Column 10: Customs code
-            ws2.cell(row=row_idx, column=10).value = item.get('customs_code', '')
-
-            # Column 11: Import tariff (%)
-            ws2.cell(row=row_idx, column=11).value = float(item.get('import_tariff', 0))
-
-            # Column 12: Customs fee
-            ws2.cell(row=row_idx, column=12).value = float(Decimal(str(calc_results.get('customs_fee', 0))))
-
-            # Column 13: Excise tax
-            ws2.cell(row=row_idx, column=13).value = float(item.get('excise_tax', 0))
-
-            # Column 14: Util fee
-            ws2.cell(row=row_idx, column=14).value = float(Decimal(str(calc_results.get('util_fee', 0))))
-
-            # Column 15: Transit commission
-            ws2.cell(row=row_idx, column=15).value = float(Decimal(str(calc_results.get('transit_commission', 0))))
-
-            # Columns 16-20: Same selling prices as Sheet 1
-            ws2.cell(row=row_idx, column=16).value = float(Decimal(str(calc_results.get('sales_price_per_unit', 0))))
-            ws2.cell(row=row_idx, column=17).value = float(Decimal(str(calc_results.get('sales_price_total_no_vat', 0))))
-            ws2.cell(row=row_idx, column=18).value = float(Decimal(str(calc_results.get('vat_amount', 0))))
-            ws2.cell(row=row_idx, column=19).value = float(Decimal(str(calc_results.get('sales_price_per_unit_with_vat', 0))))
-            ws2.cell(row=row_idx, column=20).value = float(Decimal(str(calc_results.get('sales_price_total_with_vat', 0))))
-
-            # Apply number formats
-            # Monetary columns: 6, 7, 8, 9, 12, 14, 15, 16, 17, 18, 19, 20
-            for col in [6, 7, 8, 9, 12, 14, 15, 16, 17, 18, 19, 20]:
-                ws2.cell(row=row_idx, column=col).number_format = '#,##0.00 ₽'
-
-            # Percentage columns: 11
-            ws2.cell(row=row_idx, column=11).number_format = '0.00%'
-
-            # Excise tax (column 13) - monetary
-            ws2.cell(row=row_idx, column=13).number_format = '#,##0.00 ₽'
 
-            row_idx += 1
+            rows.append([
+                # Columns 1-4: Same as Sheet 1
+                item.get('brand', ''),
+                item.get('product_code', ''),
+                item.get('product_name', ''),
+                quantity,
+                # Column 5: Currency
+                currency_of_base_price,
+                # Column 6: Price without VAT
+                float(purchase_price_no_vat),
+                # Column 7: Invoice amount
+                float(invoice_amount),
+                # Column 8: Price in quote currency
+                float(Decimal(str(calc_results.get('purchase_price_total_quote_currency', 0)))),
+                # Column 9: Logistics
+                float(Decimal(str(calc_results.get('logistics_total', 0)))),
+                # Column 10: Customs code
+                item.get('customs_code', ''),
+                # Column 11: Import tariff (%)
+                float(item.get('import_tariff', 0)),
+                # Column 12: Customs fee
+                float(Decimal(str(calc_results.get('customs_fee', 0)))),
+                # Column 13: Excise tax
+                float(item.get('excise_tax', 0)),
+                # Column 14: Util fee
+                float(Decimal(str(calc_results.get('util_fee', 0)))),
+                # Column 15: Transit commission
+                float(Decimal(str(calc_results.get('transit_commission', 0)))),
+                # Columns 16-20: Same selling prices as Sheet 1
+                float(Decimal(str(calc_results.get('sales_price_per_unit', 0)))),
+                float(Decimal(str(calc_results.get('sales_price_total_no_vat', 0)))),
+                float(Decimal(str(calc_results.get('vat_amount', 0)))),
+                float(Decimal(str(calc_results.get('sales_price_per_unit_with_vat', 0)))),
+                float(Decimal(str(calc_results.get('sales_price_total_with_vat', 0)))),
+            ])
 
         # Set column widths for Sheet 2
         ws2.column_dimensions['A'].width = 10  # Бренд
@@ -628,33 +668,17 @@ class QuoteExcelService:
         - Row 14+: Data
         """
         wb = Workbook()
+        styles = register_grid_styles(wb)
         ws = wb.active
         ws.title = "КП поставка"
-        
-        # Styling
-        header_fill = PatternFill(start_color="FF2C5AA0", end_color="FF2C5AA0", fill_type="solid")
-        header_font = Font(bold=True, size=11, color="FFFFFFFF")
-        info_font = Font(bold=True, size=11)
-        
+
         # ==== 3-COLUMN HEADER CARDS (Like PDF) ====
-        card_fill = PatternFill(start_color="FFE8E8E8", end_color="FFE8E8E8", fill_type="solid")
-        card_border = Border(
-            left=Side(style='thin', color='FF2C5AA0'),
-            right=Side(style='thin', color='FF2C5AA0'),
-            top=Side(style='thin', color='FF2C5AA0'),
-            bottom=Side(style='thin', color='FF2C5AA0')
-        )
-        label_font = Font(bold=True, size=10)
-        value_font = Font(size=10)
-        title_font = Font(bold=True, size=11, color="FF2C5AA0")
 
         # Card titles row
         ws['A1'] = "Продавец"
-        ws['A1'].font = title_font
         ws['D1'] = "Покупатель"
-        ws['D1'].font = title_font
         ws['G1'] = "Информация о поставке"
-        ws['G1'].font = title_font
+        apply_style(ws, 'kvota_card_title', ['A1', 'D1', 'G1'])
 
         # Card 1: Seller (A2:C8)
         seller_data = [
@@ -667,13 +691,11 @@ class QuoteExcelService:
         row = 2
         for label, value in seller_data:
             ws[f'A{row}'] = label
-            ws[f'A{row}'].font = label_font
             ws[f'B{row}'] = value
-            ws[f'B{row}'].font = value_font
             ws.merge_cells(f'B{row}:C{row}')
-            for col in ['A', 'B', 'C']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card_label', [f'A{row}'])
+            apply_style(ws, 'kvota_card_value', [f'B{row}'])
+            apply_style(ws, 'kvota_card', [f'C{row}'])
             row += 1
 
         # Card 2: Buyer (D2:F8)
@@ -687,13 +709,11 @@ class QuoteExcelService:
         row = 2
         for label, value in customer_data:
             ws[f'D{row}'] = label
-            ws[f'D{row}'].font = label_font
             ws[f'E{row}'] = value
-            ws[f'E{row}'].font = value_font
             ws.merge_cells(f'E{row}:F{row}')
-            for col in ['D', 'E', 'F']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card_label', [f'D{row}'])
+            apply_style(ws, 'kvota_card_value', [f'E{row}'])
+            apply_style(ws, 'kvota_card', [f'F{row}'])
             row += 1
 
         # Card 3: Quote Info (G2:I11)
@@ -719,13 +739,11 @@ class QuoteExcelService:
         row = 2
         for label, value in quote_data:
             ws[f'G{row}'] = label
-            ws[f'G{row}'].font = label_font if label else Font(size=9, italic=True)
             ws[f'H{row}'] = value
-            ws[f'H{row}'].font = Font(bold=True, size=11, color="FF2C5AA0") if "Сумма" in label else value_font
             ws.merge_cells(f'H{row}:I{row}')
-            for col in ['G', 'H', 'I']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card_label' if label else 'kvota_card_note', [f'G{row}'])
+            apply_style(ws, 'kvota_card_total' if "Сумма" in label else 'kvota_card_value', [f'H{row}'])
+            apply_style(ws, 'kvota_card', [f'I{row}'])
             row += 1
 
         # Blank row before table
@@ -742,45 +760,32 @@ class QuoteExcelService:
         ]
         
         for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col_idx)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        row += 1
-        
-        # Data rows
+            ws.cell(row=row, column=col_idx, value=header).style = 'kvota_header'
+
+        # Data rows (appended directly below the header row)
+        rows = GridRowWriter(ws, styles, [None] * 4 + ['kvota_money'] * 5)
         totals = {'quantity': 0, 'col5': Decimal('0'), 'col6': Decimal('0'), 'col7': Decimal('0'), 'col8': Decimal('0'), 'col9': Decimal('0')}
         
         for item in export_data.items:
             calc_results = item.get('calculation_results', {})
-            
-            ws.cell(row=row, column=1).value = item.get('brand', '')
-            ws.cell(row=row, column=2).value = item.get('product_code', '')
-            ws.cell(row=row, column=3).value = item.get('product_name', '')
-            ws.cell(row=row, column=4).value = item.get('quantity', 0)
 
             selling_price_per_unit = Decimal(str(calc_results.get('sales_price_per_unit_no_vat', 0)))
             selling_price_total = Decimal(str(calc_results.get('sales_price_total_no_vat', 0)))
             vat_amount = Decimal(str(calc_results.get('vat_net_payable', 0)))
             selling_price_with_vat_per_unit = Decimal(str(calc_results.get('sales_price_per_unit_with_vat', 0)))
             selling_price_total_with_vat = Decimal(str(calc_results.get('sales_price_total_with_vat', 0)))
-            
-            ws.cell(row=row, column=5).value = float(selling_price_per_unit)
-            ws.cell(row=row, column=5).number_format = '#,##0.00 ₽'
-            
-            ws.cell(row=row, column=6).value = float(selling_price_total)
-            ws.cell(row=row, column=6).number_format = '#,##0.00 ₽'
-            
-            ws.cell(row=row, column=7).value = float(vat_amount)
-            ws.cell(row=row, column=7).number_format = '#,##0.00 ₽'
-            
-            ws.cell(row=row, column=8).value = float(selling_price_with_vat_per_unit)
-            ws.cell(row=row, column=8).number_format = '#,##0.00 ₽'
-            
-            ws.cell(row=row, column=9).value = float(selling_price_total_with_vat)
-            ws.cell(row=row, column=9).number_format = '#,##0.00 ₽'
+
+            rows.append([
+                item.get('brand', ''),
+                item.get('product_code', ''),
+                item.get('product_name', ''),
+                item.get('quantity', 0),
+                float(selling_price_per_unit),
+                float(selling_price_total),
+                float(vat_amount),
+                float(selling_price_with_vat_per_unit),
+                float(selling_price_total_with_vat),
+            ])
             
             totals['quantity'] += item.get('quantity', 0)
             totals['col5'] += selling_price_per_unit
@@ -788,20 +793,12 @@ class QuoteExcelService:
             totals['col7'] += vat_amount
             totals['col8'] += selling_price_with_vat_per_unit
             totals['col9'] += selling_price_total_with_vat
-            
-            row += 1
         
         # Totals row
-        ws.cell(row=row, column=3).value = "ИТОГО:"
-        ws.cell(row=row, column=3).font = Font(bold=True)
-        ws.cell(row=row, column=4).value = totals['quantity']
-        ws.cell(row=row, column=4).font = Font(bold=True)
-        
-        for col_idx, col_key in enumerate(['col5', 'col6', 'col7', 'col8', 'col9'], 5):
-            cell = ws.cell(row=row, column=col_idx)
-            cell.value = float(totals[col_key])
-            cell.number_format = '#,##0.00 ₽'
-            cell.font = Font(bold=True)
+        GridRowWriter(ws, styles, [None, None, 'kvota_bold', 'kvota_bold'] + ['kvota_money_bold'] * 5).append(
+            [None, None, "ИТОГО:", totals['quantity']]
+            + [float(totals[col_key]) for col_key in ['col5', 'col6', 'col7', 'col8', 'col9']]
+        )
         
         # Column widths
         ws.column_dimensions['A'].width = 12
@@ -832,33 +829,17 @@ class QuoteExcelService:
         - Row 14+: Data
         """
         wb = Workbook()
+        styles = register_grid_styles(wb)
         ws = wb.active
         ws.title = "КП open book"
-        
-        # Styling
-        header_fill = PatternFill(start_color="FF2C5AA0", end_color="FF2C5AA0", fill_type="solid")
-        header_font = Font(bold=True, size=10, color="FFFFFFFF")
-        info_font = Font(bold=True, size=11)
-        
+
         # ==== 3-COLUMN HEADER CARDS (Like PDF) ====
-        card_fill = PatternFill(start_color="FFE8E8E8", end_color="FFE8E8E8", fill_type="solid")
-        card_border = Border(
-            left=Side(style='thin', color='FF2C5AA0'),
-            right=Side(style='thin', color='FF2C5AA0'),
-            top=Side(style='thin', color='FF2C5AA0'),
-            bottom=Side(style='thin', color='FF2C5AA0')
-        )
-        label_font = Font(bold=True, size=10)
-        value_font = Font(size=10)
-        title_font = Font(bold=True, size=11, color="FF2C5AA0")
 
         # Card titles row
         ws['A1'] = "Продавец"
-        ws['A1'].font = title_font
         ws['H1'] = "Покупатель"
-        ws['H1'].font = title_font
         ws['O1'] = "Информация о поставке"
-        ws['O1'].font = title_font
+        apply_style(ws, 'kvota_card_title', ['A1', 'H1', 'O1'])
 
         # Card 1: Seller (A2:G8) - spans 7 columns for wider card
         seller_data = [
@@ -871,20 +852,16 @@ class QuoteExcelService:
         row = 2
         for label, value in seller_data:
             ws[f'A{row}'] = label
-            ws[f'A{row}'].font = label_font
             ws[f'B{row}'] = value
-            ws[f'B{row}'].font = value_font
             ws.merge_cells(f'B{row}:G{row}')
-            for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card_label', [f'A{row}'])
+            apply_style(ws, 'kvota_card_value', [f'B{row}'])
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'CDEFG'])
             row += 1
 
         # Empty rows to match card height
         for _ in range(2):
-            for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'ABCDEFG'])
             row += 1
 
         # Card 2: Buyer (H2:N8) - spans 7 columns
@@ -898,20 +875,16 @@ class QuoteExcelService:
         row = 2
         for label, value in customer_data:
             ws[f'H{row}'] = label
-            ws[f'H{row}'].font = label_font
             ws[f'I{row}'] = value
-            ws[f'I{row}'].font = value_font
             ws.merge_cells(f'I{row}:N{row}')
-            for col in ['H', 'I', 'J', 'K', 'L', 'M', 'N']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card_label', [f'H{row}'])
+            apply_style(ws, 'kvota_card_value', [f'I{row}'])
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'JKLMN'])
             row += 1
 
         # Empty rows to match card height
         for _ in range(2):
-            for col in ['H', 'I', 'J', 'K', 'L', 'M', 'N']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'HIJKLMN'])
             row += 1
 
         # Card 3: Quote Info (O2:U11) - spans 7 columns, taller card
@@ -932,32 +905,25 @@ class QuoteExcelService:
         row = 2
         for label, value in quote_data:
             ws[f'O{row}'] = label
-            ws[f'O{row}'].font = label_font
             ws[f'P{row}'] = value
-            ws[f'P{row}'].font = value_font
             ws.merge_cells(f'P{row}:U{row}')
-            for col in ['O', 'P', 'Q', 'R', 'S', 'T', 'U']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card_label', [f'O{row}'])
+            apply_style(ws, 'kvota_card_value', [f'P{row}'])
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'QRSTU'])
             row += 1
 
         # Delivery description (if present) - spans 2 rows
         delivery_desc = export_data.quote.get('delivery_terms', '')
         if delivery_desc:
             ws[f'O{row}'] = delivery_desc
-            ws[f'O{row}'].font = Font(size=9, italic=True)
-            ws[f'O{row}'].alignment = Alignment(wrap_text=True, vertical='top')
             ws.merge_cells(f'O{row}:U{row+1}')
-            for r in [row, row+1]:
-                for col in ['O', 'P', 'Q', 'R', 'S', 'T', 'U']:
-                    ws[f'{col}{r}'].fill = card_fill
-                    ws[f'{col}{r}'].border = card_border
+            apply_style(ws, 'kvota_card_note_wrap', [f'O{row}'])
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'PQRSTU'])
+            apply_style(ws, 'kvota_card', [f'{col}{row+1}' for col in 'OPQRSTU'])
             row += 2
         else:
             # Empty row to match card height
-            for col in ['O', 'P', 'Q', 'R', 'S', 'T', 'U']:
-                ws[f'{col}{row}'].fill = card_fill
-                ws[f'{col}{row}'].border = card_border
+            apply_style(ws, 'kvota_card', [f'{col}{row}' for col in 'OPQRSTU'])
             row += 1
 
         # Blank row before table
@@ -977,69 +943,53 @@ class QuoteExcelService:
         ]
         
         for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col_idx)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        row += 1
-        
-        # Data rows
+            ws.cell(row=row, column=col_idx, value=header).style = 'kvota_header_small'
+
+        # Data rows (appended directly below the header row)
+        # Only the selling-price columns 16-20 carry a currency format
+        rows = GridRowWriter(ws, styles, [None] * 15 + ['kvota_money'] * 5)
+        currency_of_base_price = export_data.variables.get('currency_of_base_price', 'USD')
+        # Import tariff comes from variables, not calc_results
+        import_tariff = float(Decimal(str(export_data.variables.get('import_tariff', 0))))
+
         for item in export_data.items:
             calc_results = item.get('calculation_results', {})
-            
-            # Columns 1-4: Basic info
-            ws.cell(row=row, column=1).value = item.get('brand', '')
-            ws.cell(row=row, column=2).value = item.get('product_code', '')
-            ws.cell(row=row, column=3).value = item.get('product_name', '')
-            ws.cell(row=row, column=4).value = item.get('quantity', 0)
-
-            # Column 5: Currency
-            ws.cell(row=row, column=5).value = export_data.variables.get('currency_of_base_price', 'USD')
-            
+
             # Column 6-7: Purchase prices
             purchase_price_no_vat = Decimal(str(calc_results.get('purchase_price_no_vat', 0)))
             purchase_price_total = Decimal(str(calc_results.get('purchase_price_total_quote_currency', 0)))
 
-            ws.cell(row=row, column=6).value = float(purchase_price_no_vat)
-            ws.cell(row=row, column=7).value = float(purchase_price_total)
-
             # Column 8-9: Converted price and logistics (per unit values)
             quantity = item.get('quantity', 1)
             purchase_price_per_unit = purchase_price_total / quantity if quantity > 0 else Decimal('0')
             logistics_per_unit = Decimal(str(calc_results.get('logistics_total', 0))) / quantity if quantity > 0 else Decimal('0')
 
-            ws.cell(row=row, column=8).value = float(purchase_price_per_unit)
-            ws.cell(row=row, column=9).value = float(logistics_per_unit)
-            
-            # Column 10-15: Customs and fees
-            ws.cell(row=row, column=10).value = item.get('customs_code', '')
-            # Import tariff comes from variables, not calc_results
-            import_tariff = export_data.variables.get('import_tariff', 0)
-            ws.cell(row=row, column=11).value = float(Decimal(str(import_tariff)))
-            ws.cell(row=row, column=12).value = float(Decimal(str(calc_results.get('customs_fee', 0))))
-            ws.cell(row=row, column=13).value = float(Decimal(str(calc_results.get('excise_tax_amount', 0))))
-            ws.cell(row=row, column=14).value = float(Decimal(str(calc_results.get('recycling_fee', 0))))
-            ws.cell(row=row, column=15).value = float(Decimal(str(calc_results.get('transit_commission', 0))))
-
-            # Column 16-20: Selling prices
-            ws.cell(row=row, column=16).value = float(Decimal(str(calc_results.get('sales_price_per_unit_no_vat', 0))))
-            ws.cell(row=row, column=16).number_format = '#,##0.00 ₽'
-
-            ws.cell(row=row, column=17).value = float(Decimal(str(calc_results.get('sales_price_total_no_vat', 0))))
-            ws.cell(row=row, column=17).number_format = '#,##0.00 ₽'
-
-            ws.cell(row=row, column=18).value = float(Decimal(str(calc_results.get('vat_net_payable', 0))))
-            ws.cell(row=row, column=18).number_format = '#,##0.00 ₽'
-
-            ws.cell(row=row, column=19).value = float(Decimal(str(calc_results.get('sales_price_per_unit_with_vat', 0))))
-            ws.cell(row=row, column=19).number_format = '#,##0.00 ₽'
-
-            ws.cell(row=row, column=20).value = float(Decimal(str(calc_results.get('sales_price_total_with_vat', 0))))
-            ws.cell(row=row, column=20).number_format = '#,##0.00 ₽'
-            
-            row += 1
+            rows.append([
+                # Columns 1-4: Basic info
+                item.get('brand', ''),
+                item.get('product_code', ''),
+                item.get('product_name', ''),
+                item.get('quantity', 0),
+                # Column 5: Currency
+                currency_of_base_price,
+                float(purchase_price_no_vat),
+                float(purchase_price_total),
+                float(purchase_price_per_unit),
+                float(logistics_per_unit),
+                # Column 10-15: Customs and fees
+                item.get('customs_code', ''),
+                import_tariff,
+                float(Decimal(str(calc_results.get('customs_fee', 0)))),
+                float(Decimal(str(calc_results.get('excise_tax_amount', 0)))),
+                float(Decimal(str(calc_results.get('recycling_fee', 0)))),
+                float(Decimal(str(calc_results.get('transit_commission', 0)))),
+                # Column 16-20: Selling prices
+                float(Decimal(str(calc_results.get('sales_price_per_unit_no_vat', 0)))),
+                float(Decimal(str(calc_results.get('sales_price_total_no_vat', 0)))),
+                float(Decimal(str(calc_results.get('vat_net_payable', 0)))),
+                float(Decimal(str(calc_results.get('sales_price_per_unit_with_vat', 0)))),
+                float(Decimal(str(calc_results.get('sales_price_total_with_vat', 0)))),
+            ])
         
         # Column widths
         ws.column_dimensions['A'].width = 10
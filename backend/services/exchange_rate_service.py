@@ -4,20 +4,26 @@ Exchange Rate Service - Central Bank of Russia (CBR) API Integration
 CBR publishes rates once daily around 11:30-13:30 Moscow time (varies).
 This service fetches rates once per day at 14:00 MSK and caches them in memory.
 No database queries needed for rate lookups - pure in-memory cache.
+
+On every refresh the full cross-rate matrix is precomputed, and the last
+HISTORY_DAYS days of rates are kept in a date index (loaded once from
+exchange_rates), so get_rate(from, to, on_date) is a table lookup.
 """
 import os
 import httpx
 import logging
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal, ROUND_HALF_EVEN, ROUND_HALF_UP
 
 # Industry standard: 4 decimal places for exchange rates
 RATE_PRECISION = Decimal("0.0001")
-from datetime import datetime, timedelta, timezone
-from typing import Dict, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from supabase import create_client, Client
 
+from http_pool import get_http_client, get_retry_budget
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,6 +38,167 @@ REQUEST_TIMEOUT = 10.0
 MAX_RETRIES = 3
 RETRY_BACKOFF_BASE = 2  # exponential backoff: 2^0, 2^1, 2^2 seconds
 
+# Rate matrices kept per service (distinct currency sets / precisions)
+MAX_CACHED_MATRICES = 64
+
+# Days of rate history kept in memory for as-of-date lookups
+# (cleanup_old_rates keeps 30 days in the database)
+HISTORY_DAYS = int(os.getenv("EXCHANGE_RATE_HISTORY_DAYS", "30"))
+HISTORY_PAGE_SIZE = 1000
+
+
+class RateMatrix:
+    """
+    N×N cross-rate table for a fixed set of currencies.
+
+    Built once from X/RUB rates; every cell is already divided and
+    quantized, so lookups are plain dict reads.
+
+    rate(A, B) = (A/RUB) / (B/RUB), i.e. how many B per 1 A.
+    Pairs with a missing or zero leg are absent (rate() returns None).
+    """
+
+    def __init__(
+        self,
+        rub_rates: Dict[str, Decimal],
+        currencies: Iterable[str],
+        precision: Decimal = RATE_PRECISION,
+        rounding: str = ROUND_HALF_EVEN
+    ):
+        self.currencies: Tuple[str, ...] = tuple(dict.fromkeys(currencies))
+        self.precision = precision
+        # Raw X/RUB legs the matrix was built from (unquantized)
+        self.rub_rates: Dict[str, Decimal] = {
+            currency: rub_rates[currency]
+            for currency in self.currencies
+            if rub_rates.get(currency)
+        }
+
+        self._table: Dict[Tuple[str, str], Decimal] = {}
+        for from_currency in self.currencies:
+            self._table[(from_currency, from_currency)] = Decimal("1.0")
+            from_rub = self.rub_rates.get(from_currency)
+            if from_rub is None:
+                continue
+            for to_currency, to_rub in self.rub_rates.items():
+                if to_currency != from_currency:
+                    self._table[(from_currency, to_currency)] = (from_rub / to_rub).quantize(
+                        precision, rounding=rounding
+                    )
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[Decimal]:
+        """Cross rate from_currency -> to_currency, or None if unavailable"""
+        return self._table.get((from_currency, to_currency))
+
+    def to_dict(self) -> Dict[str, Dict[str, Decimal]]:
+        """Nested {from: {to: rate}} view (available pairs only)"""
+        table: Dict[str, Dict[str, Decimal]] = {}
+        for (from_currency, to_currency), rate in self._table.items():
+            table.setdefault(from_currency, {})[to_currency] = rate
+        return table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+class RateHistory:
+    """
+    Date-indexed X/RUB snapshots for as-of-date lookups.
+
+    Every calendar day from the first snapshot on maps to the latest
+    snapshot published on or before it (CBR skips weekends and holidays),
+    so a lookup is one list index. Cross-rate matrices are built per
+    snapshot on first use.
+    """
+
+    def __init__(self, snapshots: Optional[Dict[date, Dict[str, Decimal]]] = None):
+        self.first_date: Optional[date] = None
+        # Day offset from first_date -> snapshot index
+        self._days: List[int] = []
+        self._snapshots: List[Dict[str, Decimal]] = []
+        self._matrices: List[Optional[RateMatrix]] = []
+        for snapshot_date in sorted(snapshots or {}):
+            self.add(snapshot_date, snapshots[snapshot_date])
+
+    @property
+    def last_date(self) -> Optional[date]:
+        if self.first_date is None:
+            return None
+        return self.first_date + timedelta(days=len(self._days) - 1)
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def add(self, snapshot_date: date, rates: Dict[str, Decimal]) -> None:
+        """
+        Add the snapshot for a date (same date replaces it).
+
+        Raises:
+            ValueError: If snapshot_date is before the last snapshot
+        """
+        rates = {**rates, "RUB": Decimal("1.0")}
+        if self.first_date is None:
+            self.first_date = snapshot_date
+
+        offset = (snapshot_date - self.first_date).days
+        last = len(self._days) - 1
+        if offset < last:
+            raise ValueError(f"Snapshot for {snapshot_date} is older than {self.last_date}")
+
+        if offset == last:
+            index = self._days[last]
+            self._snapshots[index] = rates
+            self._matrices[index] = None
+            return
+
+        # Days without a publication reuse the previous snapshot
+        if self._days:
+            self._days.extend([self._days[last]] * (offset - last - 1))
+        self._snapshots.append(rates)
+        self._matrices.append(None)
+        self._days.append(len(self._snapshots) - 1)
+
+    def _index(self, on_date: date) -> Optional[int]:
+        if self.first_date is None or on_date < self.first_date:
+            return None
+        offset = (on_date - self.first_date).days
+        return self._days[min(offset, len(self._days) - 1)]
+
+    def rates_on(self, on_date: date) -> Optional[Dict[str, Decimal]]:
+        """X/RUB rates in effect on a date, or None if before the history"""
+        index = self._index(on_date)
+        return None if index is None else self._snapshots[index]
+
+    def matrix_on(self, on_date: date) -> Optional[RateMatrix]:
+        """Full cross-rate matrix in effect on a date"""
+        index = self._index(on_date)
+        if index is None:
+            return None
+        matrix = self._matrices[index]
+        if matrix is None:
+            rates = self._snapshots[index]
+            matrix = self._matrices[index] = RateMatrix(rates, rates)
+        return matrix
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> "RateHistory":
+        """
+        Build from exchange_rates rows (from_currency, rate, fetched_at).
+
+        Rows are grouped by fetch date; the latest fetch of a day wins.
+        """
+        snapshots: Dict[date, Dict[str, Tuple[str, Decimal]]] = {}
+        for row in rows:
+            fetched_at = row["fetched_at"]
+            day = datetime.fromisoformat(fetched_at.replace("Z", "+00:00")).date()
+            current = snapshots.setdefault(day, {}).get(row["from_currency"])
+            if current is None or fetched_at >= current[0]:
+                snapshots[day][row["from_currency"]] = (fetched_at, Decimal(str(row["rate"])))
+        return cls({
+            day: {currency: rate for currency, (_, rate) in rates.items()}
+            for day, rates in snapshots.items()
+        })
+
 
 class ExchangeRateService:
     """
@@ -41,12 +208,37 @@ class ExchangeRateService:
     (after CBR publishes new rates around 11:30-13:30).
     """
 
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.scheduler: Optional[AsyncIOScheduler] = None
+        self._http_client = http_client
+        self._supabase: Optional[Client] = None
         # In-memory cache: rates and timestamp
         self._cached_rates: Dict[str, Decimal] = {}
         self._cache_timestamp: Optional[datetime] = None
         self._cbr_date: Optional[str] = None  # Date from CBR response
+        # Rate matrices built from the current _cached_rates dict
+        self._matrices: Dict[tuple, RateMatrix] = {}
+        self._matrices_source: Optional[Dict[str, Decimal]] = None
+        # Full cross-rate matrix of _cached_rates (rebuilt on refresh)
+        self._rate_matrix: Optional[RateMatrix] = None
+        self._rate_matrix_source: Optional[Dict[str, Decimal]] = None
+        # Past snapshots for as-of-date lookups (loaded on first use)
+        self._history: Optional[RateHistory] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Injected client, else the shared pooled client"""
+        return self._http_client or get_http_client()
+
+    @property
+    def supabase(self) -> Client:
+        """Lazy-load Supabase client (reused across refreshes)"""
+        if self._supabase is None:
+            self._supabase = create_client(
+                os.getenv("SUPABASE_URL"),
+                os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+            )
+        return self._supabase
 
     async def fetch_cbr_rates(self) -> Dict[str, Decimal]:
         """
@@ -60,12 +252,14 @@ class ExchangeRateService:
         """
         logger.info("Fetching exchange rates from CBR API...")
 
+        budget = get_retry_budget("cbr")
+        budget.record_request()
+
         for attempt in range(MAX_RETRIES):
             try:
-                async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-                    response = await client.get(CBR_API_URL)
-                    response.raise_for_status()
-                    data = response.json()
+                response = await self.http_client.get(CBR_API_URL, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                data = response.json()
 
                 # Validate API response structure
                 if not isinstance(data, dict):
@@ -118,6 +312,9 @@ class ExchangeRateService:
                 self._cached_rates = rates
                 self._cache_timestamp = datetime.now(timezone.utc)
                 self._cbr_date = data.get("Date", "")  # e.g. "2025-12-03T11:30:00+03:00"
+                self._on_rates_refreshed()
+                if self._history is not None:
+                    self._history.add(self._cache_timestamp.date(), rates)
 
                 # Store in database (for persistence across restarts)
                 await self._store_rates(rates)
@@ -131,17 +328,17 @@ class ExchangeRateService:
                     f"Retrying in {wait_time}s..."
                 )
 
-                if attempt < MAX_RETRIES - 1:
+                if attempt < MAX_RETRIES - 1 and budget.try_retry():
                     import asyncio
                     await asyncio.sleep(wait_time)
                 else:
-                    logger.error(f"CBR API request failed after all retries: {e}")
+                    logger.error(f"CBR API request failed after {attempt + 1} attempt(s): {e}")
                     # Return empty dict instead of raising to prevent service disruption
                     return {}
 
             except ValueError as e:
                 logger.error(f"Invalid CBR API response format: {e}")
-                if attempt < MAX_RETRIES - 1:
+                if attempt < MAX_RETRIES - 1 and budget.try_retry():
                     import asyncio
                     wait_time = RETRY_BACKOFF_BASE ** attempt
                     await asyncio.sleep(wait_time)
@@ -159,12 +356,8 @@ class ExchangeRateService:
         Args:
             rates: Dict of currency codes to RUB rates
         """
-        supabase: Client = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        )
-
         try:
+            supabase = self.supabase
             fetched_at = datetime.now(timezone.utc)
 
             # Prepare batch of records
@@ -191,40 +384,38 @@ class ExchangeRateService:
             # Don't raise - we want the service to continue even if storage fails
             # Rates can still be fetched from API on demand
 
-    def _calculate_rate(
-        self,
-        from_currency: str,
-        to_currency: str,
-        rates: Dict[str, Decimal]
-    ) -> Optional[Decimal]:
-        """Calculate rate from cached rates (all rates are X to RUB)"""
-        if to_currency == "RUB":
-            return rates.get(from_currency)
-        elif from_currency == "RUB":
-            to_rate = rates.get(to_currency)
-            return (Decimal("1.0") / to_rate).quantize(RATE_PRECISION) if to_rate else None
-        else:
-            # Cross-rate (e.g., USD to EUR via RUB)
-            from_rate = rates.get(from_currency)
-            to_rate = rates.get(to_currency)
-            if from_rate and to_rate:
-                return (from_rate / to_rate).quantize(RATE_PRECISION)
-            return None
+    def _on_rates_refreshed(self) -> None:
+        """Precompute the full cross-rate matrix for the new rates"""
+        self._rate_matrix = RateMatrix(self._cached_rates, self._cached_rates)
+        self._rate_matrix_source = self._cached_rates
+        logger.info(f"Precomputed {len(self._rate_matrix)} cross rates")
+
+    def _current_matrix(self) -> RateMatrix:
+        """Full cross-rate matrix of the cached rates (all X to RUB)"""
+        # Refreshes replace the cached dict, never mutate it
+        if self._rate_matrix is None or self._rate_matrix_source is not self._cached_rates:
+            self._on_rates_refreshed()
+        return self._rate_matrix
 
     async def get_rate(
         self,
         from_currency: str,
-        to_currency: str
+        to_currency: str,
+        on_date: Optional[date] = None
     ) -> Optional[Decimal]:
         """
         Get exchange rate from in-memory cache.
 
         Cache is populated once daily at 12:05 MSK. On first request
-        after server start, loads from DB or fetches from CBR.
+        after server start, loads from DB or fetches from CBR. Rates come
+        from a cross-rate matrix precomputed on refresh.
 
         Args:
             from_currency: Source currency code (e.g., "USD")
             to_currency: Target currency code (e.g., "RUB")
+            on_date: Use the rates in effect on this date (history of the
+                last HISTORY_DAYS days). Dates outside the history use
+                the current rates.
 
         Returns:
             Exchange rate as Decimal, or None if not available
@@ -233,33 +424,86 @@ class ExchangeRateService:
         if from_currency == to_currency:
             return Decimal("1.0")
 
+        if on_date is not None:
+            history = await self._ensure_history()
+            if history.last_date is not None and on_date < history.last_date:
+                matrix = history.matrix_on(on_date)
+                rate = matrix.rate(from_currency, to_currency) if matrix else None
+                if rate is not None:
+                    return rate
+
+        rates = await self._ensure_rates()
+        if rates:
+            return self._current_matrix().rate(from_currency, to_currency)
+
+        logger.error(f"No rate available for {from_currency}/{to_currency}")
+        return None
+
+    async def _ensure_rates(self) -> Dict[str, Decimal]:
+        """
+        Return the in-memory X/RUB rates, populating the cache if needed.
+
+        On first request after server start, loads from DB or fetches
+        from CBR. Returns an empty dict if neither source has rates.
+        """
         # If cache is populated, use it (instant, no DB query)
         if self._cached_rates:
-            return self._calculate_rate(from_currency, to_currency, self._cached_rates)
+            return self._cached_rates
 
         # Cache empty - try to load from DB first (server just started)
         await self._load_from_db()
 
         if self._cached_rates:
-            return self._calculate_rate(from_currency, to_currency, self._cached_rates)
+            return self._cached_rates
 
         # DB empty too - fetch from CBR
         logger.info("No cached rates found, fetching from CBR...")
         await self.fetch_cbr_rates()
 
-        if self._cached_rates:
-            return self._calculate_rate(from_currency, to_currency, self._cached_rates)
+        return self._cached_rates
 
-        logger.error(f"No rate available for {from_currency}/{to_currency}")
-        return None
+    async def get_rate_matrix(
+        self,
+        currencies: Iterable[str],
+        precision: Decimal = RATE_PRECISION,
+        rounding: str = ROUND_HALF_EVEN
+    ) -> RateMatrix:
+        """
+        Get an N×N cross-rate matrix for a set of currencies in one call.
+
+        Matrices are built from the in-memory cache and reused until the
+        daily refresh replaces it, so repeated calls for the same set
+        cost one dict lookup.
+
+        Args:
+            currencies: Currency codes (e.g., ["USD", "EUR", "RUB"])
+            precision: Quantization applied to every cross rate
+            rounding: Decimal rounding mode for quantization
+
+        Returns:
+            RateMatrix (pairs without rates are absent; empty if no rates)
+        """
+        currencies = sorted(set(currencies))
+        rates = await self._ensure_rates()
+
+        # fetch_cbr_rates/_load_from_db replace the dict, never mutate it
+        if self._matrices_source is not rates:
+            self._matrices = {}
+            self._matrices_source = rates
+
+        key = (tuple(currencies), precision, rounding)
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            if len(self._matrices) >= MAX_CACHED_MATRICES:
+                self._matrices.clear()
+            matrix = RateMatrix(rates, currencies, precision=precision, rounding=rounding)
+            self._matrices[key] = matrix
+        return matrix
 
     async def _load_from_db(self) -> None:
         """Load latest rates from database into memory cache"""
         try:
-            supabase: Client = create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-            )
+            supabase = self.supabase
 
             # Get the most recent rates (one per currency)
             result = supabase.table("exchange_rates") \
@@ -286,11 +530,51 @@ class ExchangeRateService:
                     self._cache_timestamp = datetime.fromisoformat(
                         latest_timestamp.replace("Z", "+00:00")
                     ) if latest_timestamp else datetime.now(timezone.utc)
+                    self._on_rates_refreshed()
                     logger.info(f"Loaded {len(rates)} rates from DB into memory cache")
 
         except Exception as e:
             logger.error(f"Failed to load rates from DB: {e}")
 
+    async def _ensure_history(self) -> RateHistory:
+        """Load the rate history from the database once"""
+        if self._history is None:
+            self._history = await self._load_history()
+        return self._history
+
+    async def _load_history(self, days: int = HISTORY_DAYS) -> RateHistory:
+        """
+        Load the last `days` days of X/RUB rates into a RateHistory.
+
+        Returns an empty history if the database is unavailable; daily
+        refreshes still append to it.
+        """
+        rows = []
+        try:
+            supabase = self.supabase
+            cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+            start = 0
+            while True:
+                result = supabase.table("exchange_rates") \
+                    .select("from_currency, rate, fetched_at") \
+                    .eq("to_currency", "RUB") \
+                    .gte("fetched_at", cutoff.isoformat()) \
+                    .order("fetched_at") \
+                    .range(start, start + HISTORY_PAGE_SIZE - 1) \
+                    .execute()
+                rows.extend(result.data or [])
+                if len(result.data or []) < HISTORY_PAGE_SIZE:
+                    break
+                start += HISTORY_PAGE_SIZE
+
+        except Exception as e:
+            logger.error(f"Failed to load rate history from DB: {e}")
+
+        history = RateHistory.from_rows(rows)
+        logger.info(f"Loaded {len(history)} daily rate snapshots into history index")
+        return history
+
     async def cleanup_old_rates(self, days_to_keep: int = 30) -> int:
         """
         Remove exchange rates older than specified days
@@ -301,12 +585,8 @@ class ExchangeRateService:
         Returns:
             Number of rows deleted
         """
-        supabase: Client = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        )
-
         try:
+            supabase = self.supabase
             cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
 
             # First count how many will be deleted
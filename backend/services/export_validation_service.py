@@ -8,18 +8,24 @@ Creates an Excel file with:
 4. Conditional formatting highlighting differences > 0.01%
 """
 
+import copyreg
 import io
 import logging
 import os
+import pickle
+import threading
 from copy import copy
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from zipfile import ZipFile, ZIP_DEFLATED
 
 import openpyxl
 from openpyxl.formatting.rule import FormulaRule
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.protection import SheetProtection
+from openpyxl.worksheet.table import TableList
 
 logger = logging.getLogger(__name__)
 
@@ -256,11 +262,168 @@ FINANCING_CELLS = {
 }
 
 
+# =============================================================================
+# TEMPLATE SNAPSHOT - Parsed once, cloned per export
+# =============================================================================
+#
+# Parsing the 1.7 MB .xlsm template with openpyxl takes several seconds, and a
+# parsed workbook cannot be saved twice (embedded images are read from streams
+# that are closed by the first save). Instead we keep a pickled snapshot of the
+# parsed workbook plus the raw VBA archive entries, and unpickle a fresh clone
+# for every export. After each export one spare clone is prepared in the
+# background so the next request does not wait for unpickling either.
+
+INPUTS_SHEET = "API_Inputs"
+RASCHET_PRODUCT_START_ROW = 16
+
+
+def _reduce_table_list(tables: TableList):
+    # TableList.items() returns (name, ref) pairs, which breaks the default
+    # dict pickling; rebuild from the real {name: Table} mapping instead
+    return TableList, (dict(tables),)
+
+
+class ValidationTemplateSnapshot:
+    """In-memory snapshot of the validation template workbook."""
+
+    def __init__(self, template_path: str):
+        self.template_path = template_path
+        self.mtime = os.path.getmtime(template_path)
+
+        wb = openpyxl.load_workbook(template_path, keep_vba=True)
+        vba_archive, wb.vba_archive = wb.vba_archive, None
+        self._vba_entries: List[Tuple[str, bytes]] = (
+            [(name, vba_archive.read(name)) for name in vba_archive.namelist()]
+            if vba_archive else []
+        )
+        if vba_archive:
+            vba_archive.close()
+
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.dispatch_table = {**copyreg.dispatch_table, TableList: _reduce_table_list}
+        pickler.dump(wb)
+        self._payload = buffer.getvalue()
+
+        self._lock = threading.Lock()
+        self._spare: Optional[openpyxl.Workbook] = None
+        self._refilling = False
+
+    def clone(self) -> openpyxl.Workbook:
+        """Return an independent copy of the template workbook."""
+        wb = pickle.loads(self._payload)
+        if self._vba_entries:
+            wb.vba_archive = ZipFile(io.BytesIO(), "a", ZIP_DEFLATED)
+            for name, data in self._vba_entries:
+                wb.vba_archive.writestr(name, data)
+        return wb
+
+    def acquire(self) -> openpyxl.Workbook:
+        """Take the prepared spare clone, or clone now if none is ready."""
+        with self._lock:
+            wb, self._spare = self._spare, None
+        return wb if wb is not None else self.clone()
+
+    def prepare_spare(self) -> None:
+        """Clone the template in a background thread unless a spare is ready."""
+        with self._lock:
+            if self._spare is not None or self._refilling:
+                return
+            self._refilling = True
+        threading.Thread(target=self._fill_spare, daemon=True).start()
+
+    def _fill_spare(self) -> None:
+        try:
+            wb = self.clone()
+            with self._lock:
+                self._spare = wb
+        except Exception as e:
+            logger.warning(f"Failed to prepare validation template clone: {e}")
+        finally:
+            with self._lock:
+                self._refilling = False
+
+
+_snapshots: Dict[str, ValidationTemplateSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_template_snapshot(template_path: str = TEMPLATE_PATH) -> ValidationTemplateSnapshot:
+    """Return the snapshot for a template, rebuilding it if the file changed on disk."""
+    with _snapshots_lock:
+        snapshot = _snapshots.get(template_path)
+        if snapshot is None or snapshot.mtime != os.path.getmtime(template_path):
+            snapshot = ValidationTemplateSnapshot(template_path)
+            _snapshots[template_path] = snapshot
+        return snapshot
+
+
+def prewarm_template_snapshot(template_path: str = TEMPLATE_PATH) -> None:
+    """Build the template snapshot and a spare clone in the background (called on startup)."""
+    def _build():
+        try:
+            get_template_snapshot(template_path).prepare_spare()
+            logger.info("Validation export template snapshot ready")
+        except Exception as e:
+            logger.warning(f"Validation export template prewarm failed: {e}")
+
+    threading.Thread(target=_build, daemon=True).start()
+
+
+# =============================================================================
+# PRECOMPUTED расчет REFERENCE REWRITES
+# =============================================================================
+
+# Quote-level inputs always live in API_Inputs column D from row 6 onwards
+QUOTE_REFERENCE_FORMULAS: Tuple[Tuple[str, str], ...] = tuple(
+    (cell_addr, f"='{INPUTS_SHEET}'!D{row}")
+    for row, cell_addr in enumerate(QUOTE_INPUT_MAPPING, start=6)
+)
+
+
+def _product_count_bucket(num_products: int) -> int:
+    """Round product count up to a power of two (min 16) so few reference tables are built."""
+    return max(16, 1 << max(num_products - 1, 0).bit_length())
+
+
+@lru_cache(maxsize=16)
+def _product_reference_formulas(inputs_product_start: int, bucket: int) -> Tuple[Tuple[Tuple[str, str], ...], ...]:
+    """
+    Reference formulas for product rows of расчет, one tuple of (cell, formula) per product.
+
+    Built once per (start row, product-count bucket) and sliced for smaller quotes.
+    """
+    input_columns = [
+        (col_letter, get_column_letter(input_col))
+        for input_col, col_letter in enumerate(PRODUCT_INPUT_COLUMNS, start=2)
+    ]
+    return tuple(
+        tuple(
+            (f"{col_letter}{RASCHET_PRODUCT_START_ROW + prod_idx}",
+             f"='{INPUTS_SHEET}'!{inputs_col}{inputs_product_start + prod_idx}")
+            for col_letter, inputs_col in input_columns
+        )
+        for prod_idx in range(bucket)
+    )
+
+
 class ExportValidationService:
     """Service to generate validation Excel with API vs Excel comparison."""
 
-    def __init__(self, template_path: str = TEMPLATE_PATH):
+    def __init__(self, template_path: str = TEMPLATE_PATH, use_snapshot: bool = True):
         self.template_path = template_path
+        self.use_snapshot = use_snapshot
+        self._snapshot: Optional[ValidationTemplateSnapshot] = None
+
+    def _load_template(self) -> openpyxl.Workbook:
+        """Get a fresh template workbook, cloned from the in-memory snapshot when possible."""
+        if self.use_snapshot:
+            try:
+                self._snapshot = get_template_snapshot(self.template_path)
+                return self._snapshot.acquire()
+            except Exception as e:
+                logger.warning(f"Template snapshot unavailable, loading from disk: {e}")
+        return openpyxl.load_workbook(self.template_path, keep_vba=True)
 
     def generate_validation_export(
         self,
@@ -281,8 +444,8 @@ class ExportValidationService:
         Returns:
             Excel file as bytes
         """
-        # Load template
-        wb = openpyxl.load_workbook(self.template_path, keep_vba=True)
+        # Load template (cloned from the in-memory snapshot)
+        wb = self._load_template()
 
         # 1. Create API_Inputs sheet
         self._create_inputs_sheet(wb, quote_inputs, product_inputs)
@@ -309,6 +472,15 @@ class ExportValidationService:
         wb.save(output)
         output.seek(0)
 
+        # Close the in-memory VBA archive explicitly; left to the garbage
+        # collector it may be finalized after its buffer and raise on close
+        if wb.vba_archive:
+            wb.vba_archive.close()
+
+        # Prepare the next clone now that this export no longer competes for CPU
+        if self._snapshot is not None:
+            self._snapshot.prepare_spare()
+
         return output.getvalue()
 
     def _create_inputs_sheet(
@@ -503,15 +675,12 @@ class ExportValidationService:
         """
 
         ws = wb["расчет"]
-        inputs_sheet = "API_Inputs"
-
-        # Quote-level inputs - create reference formulas
-        # NOTE: Row numbers adjusted for new header layout (row 4 = header, row 5 = column names, row 6+ = data)
-        row = 6  # Start row in API_Inputs for quote values (after header rows)
-        for cell_addr, (field, _) in QUOTE_INPUT_MAPPING.items():
-            # Create formula referencing API_Inputs column D (converted values)
-            ws[cell_addr] = f"='{inputs_sheet}'!D{row}"
-            row += 1
+        inputs_sheet = INPUTS_SHEET
+
+        # Quote-level inputs - reference formulas are precomputed
+        # NOTE: Row numbers match the header layout (row 4 = header, row 5 = column names, row 6+ = data)
+        for cell_addr, formula in QUOTE_REFERENCE_FORMULAS:
+            ws[cell_addr] = formula
 
         # D10 - Payment type based on advance_from_client
         # Keep as value, not formula reference (per user request)
@@ -527,20 +696,12 @@ class ExportValidationService:
         # Product-level inputs
         # Use the stored row from _create_inputs_sheet (row after headers)
         # Products start at row 16 in расчет
-        inputs_product_start = self._product_start_row  # Set by _create_inputs_sheet
-        raschet_product_start = 16
-
-        for prod_idx in range(num_products):
-            inputs_row = inputs_product_start + prod_idx
-            raschet_row = raschet_product_start + prod_idx
-
-            # Map each product input column
-            input_col = 2  # Start at column B in API_Inputs
-            for col_letter, (field, _) in PRODUCT_INPUT_COLUMNS.items():
-                raschet_cell = f"{col_letter}{raschet_row}"
-                inputs_cell = f"'{inputs_sheet}'!{get_column_letter(input_col)}{inputs_row}"
-                ws[raschet_cell] = f"={inputs_cell}"
-                input_col += 1
+        product_formulas = _product_reference_formulas(
+            self._product_start_row, _product_count_bucket(num_products)
+        )
+        for row_formulas in product_formulas[:num_products]:
+            for raschet_cell, formula in row_formulas:
+                ws[raschet_cell] = formula
 
     def _create_results_sheet(
         self,
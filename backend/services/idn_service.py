@@ -9,9 +9,16 @@ IDN Format:
 - Product IDN-SKU: QUOTE_IDN-POSITION
   Example: CMT-1234567890-2025004525-1
 
+- Quote number (quotes_calc): КП{YY}-{NNNN}
+  Example: КП25-0001
+
 Counter Storage:
-- Organizations table: idn_counters JSONB {"2025": 4525, "2024": 3200}
-- Atomic increment using SELECT FOR UPDATE
+- quote_idn_counters table: one row per (organization, year, series)
+  (migrations/065_quote_idn_counters.sql)
+- Numbers are reserved with one autocommitted UPSERT ... RETURNING that
+  locks only the counter row for the statement, never the organization
+- With IDN_BLOCK_SIZE > 1 each process reserves blocks of numbers and
+  hands them out from memory; unused numbers become gaps, never duplicates
 
 Rate of Change:
 - Counter increments on each quote creation
@@ -19,16 +26,20 @@ Rate of Change:
 """
 import os
 import re
-import json
+import asyncio
 import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional, List, Dict, Any
+from typing import AsyncIterator, Optional, List, Dict, Any, Tuple
 from uuid import UUID
 
 import asyncpg
 from fastapi import HTTPException, status
 
+from db_pool import init_db_pool
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -116,19 +127,76 @@ def generate_idn_sku(quote_idn: str, position: int) -> str:
     return f"{quote_idn}-{position}"
 
 
-async def get_db_connection() -> asyncpg.Connection:
-    """Get database connection for IDN operations"""
-    db_url = os.getenv("POSTGRES_DIRECT_URL") or os.getenv("DATABASE_URL")
-    if not db_url:
-        raise IDNGenerationError("Database URL not configured")
-    return await asyncpg.connect(db_url)
+# ============================================================================
+# COUNTERS
+# ============================================================================
+
+IDN_SERIES = "idn"  # SUPPLIER-INN-YEAR-SEQ
+KP_SERIES = "kp"    # КП{YY}-{NNNN}
+
+# Numbers reserved per counter round trip. 1 keeps sequences dense and in
+# creation order; larger blocks trade gaps (unused numbers when a process
+# exits) and cross-process ordering for fewer counter writes.
+IDN_BLOCK_SIZE = int(os.getenv("IDN_BLOCK_SIZE", "1"))
+
+# $1 organization, $2 year, $3 series, $4 block size; returns the last number of the block
+RESERVE_IDN_BLOCK_SQL = """
+INSERT INTO quote_idn_counters (organization_id, year, series, last_value)
+VALUES ($1::uuid, $2::int, $3::text, $4::bigint)
+ON CONFLICT (organization_id, year, series)
+DO UPDATE SET last_value = quote_idn_counters.last_value + EXCLUDED.last_value
+RETURNING last_value
+"""
+
+
+class IDNBlockAllocator:
+    """
+    Hands out counter values, reserving block_size of them per database
+    round trip (per process, per organization/year/series).
+    """
+
+    def __init__(self, block_size: int = IDN_BLOCK_SIZE):
+        self.block_size = max(1, block_size)
+        # (organization, year, series) -> (next value, last reserved value)
+        self._blocks: Dict[Tuple[str, int, str], Tuple[int, int]] = {}
+        self._locks: Dict[Tuple[str, int, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def _reserve(self, conn: asyncpg.Connection, key: Tuple[str, int, str]) -> int:
+        """Reserve a block; returns its last value"""
+        return await conn.fetchval(RESERVE_IDN_BLOCK_SQL, *key, self.block_size)
+
+    async def next_value(
+        self,
+        conn: asyncpg.Connection,
+        organization_id: UUID,
+        year: int,
+        series: str
+    ) -> int:
+        """
+        Next number of the organization's counter for year and series.
+
+        conn should not be inside a longer transaction: the counter row
+        stays locked until that transaction ends.
+        """
+        key = (str(organization_id), year, series)
+        if self.block_size == 1:
+            return await self._reserve(conn, key)
+
+        async with self._locks[key]:
+            next_value, last = self._blocks.get(key, (1, 0))
+            if next_value > last:
+                last = await self._reserve(conn, key)
+                next_value = last - self.block_size + 1
+            self._blocks[key] = (next_value + 1, last)
+            return next_value
 
 
 class IDNService:
     """
     Service for generating and managing IDN (Identification Numbers).
 
-    Thread-safe: Uses PostgreSQL row locking for concurrent access.
+    Concurrency-safe: counter values come from quote_idn_counters, whose
+    row-level UPSERT never hands out the same number twice.
 
     Usage:
         service = IDNService()
@@ -145,26 +213,33 @@ class IDNService:
         # Returns: "CMT-1234567890-2025004525-1"
     """
 
-    def __init__(self, conn: Optional[asyncpg.Connection] = None):
+    def __init__(
+        self,
+        conn: Optional[asyncpg.Connection] = None,
+        allocator: Optional[IDNBlockAllocator] = None
+    ):
         """
         Initialize IDN service.
 
         Args:
-            conn: Optional database connection. If not provided,
-                  will create new connection for each operation.
+            conn: Optional database connection. If not provided, each
+                  operation borrows one from the pool.
+            allocator: Counter allocator (default: IDN_BLOCK_SIZE blocks)
         """
         self._conn = conn
-
-    async def _get_connection(self) -> asyncpg.Connection:
-        """Get database connection (reuse or create new)"""
-        if self._conn:
-            return self._conn
-        return await get_db_connection()
-
-    async def _close_connection(self, conn: asyncpg.Connection):
-        """Close connection if it was created by this method"""
-        if conn != self._conn:
-            await conn.close()
+        self.allocator = allocator or IDNBlockAllocator()
+
+    @asynccontextmanager
+    async def _connection(self, conn: Optional[asyncpg.Connection] = None) -> AsyncIterator[asyncpg.Connection]:
+        """The given connection, the service's own, or a pooled one"""
+        if conn is not None:
+            yield conn
+        elif self._conn is not None:
+            yield self._conn
+        else:
+            pool = await init_db_pool()
+            async with pool.acquire() as pooled:
+                yield pooled
 
     async def generate_quote_idn(
         self,
@@ -175,13 +250,15 @@ class IDNService:
         """
         Generate unique IDN for a quote with atomic counter increment.
 
-        Uses SELECT FOR UPDATE to lock the organization row and prevent
-        race conditions when multiple quotes are created simultaneously.
+        The sequence number comes from quote_idn_counters (series 'idn');
+        the organization row is only read, so concurrent quotes do not
+        wait on each other.
 
         Args:
             organization_id: The organization creating the quote
             customer_inn: Client's tax identification number (INN)
-            conn: Optional existing database connection
+            conn: Optional existing database connection (outside a
+                  transaction, see IDNBlockAllocator.next_value)
 
         Returns:
             IDN string (e.g., CMT-1234567890-2025004525)
@@ -207,65 +284,40 @@ class IDNService:
             )
 
         current_year = datetime.now().year
-        own_conn = conn is None
-
-        if own_conn:
-            conn = await self._get_connection()
 
         try:
-            # Start transaction if not already in one
-            # Lock organization row to prevent race conditions
-            org_row = await conn.fetchrow("""
-                SELECT supplier_code, idn_counters
-                FROM organizations
-                WHERE id = $1
-                FOR UPDATE
-            """, organization_id)
-
-            if not org_row:
-                raise IDNGenerationError(
-                    f"Organization {organization_id} not found"
-                )
-
-            supplier_code = org_row['supplier_code']
-            if not supplier_code:
-                raise IDNGenerationError(
-                    "Organization does not have a supplier_code configured. "
-                    "Please contact admin to set up the supplier code in organization settings."
-                )
-
-            if not validate_supplier_code(supplier_code):
-                raise IDNGenerationError(
-                    f"Invalid supplier_code format: '{supplier_code}'. "
-                    f"Must be exactly 3 uppercase letters."
-                )
-
-            # Get current counter for this year
-            counters = org_row['idn_counters'] or {}
-            if isinstance(counters, str):
-                counters = json.loads(counters)
-
-            year_key = str(current_year)
-            current_count = counters.get(year_key, 0)
-            new_count = current_count + 1
-
-            # Update counter
-            counters[year_key] = new_count
-
-            await conn.execute("""
-                UPDATE organizations
-                SET idn_counters = $1
-                WHERE id = $2
-            """, json.dumps(counters), organization_id)
+            async with self._connection(conn) as conn:
+                org_row = await conn.fetchrow("""
+                    SELECT supplier_code
+                    FROM organizations
+                    WHERE id = $1
+                """, organization_id)
+
+                if not org_row:
+                    raise IDNGenerationError(
+                        f"Organization {organization_id} not found"
+                    )
+
+                supplier_code = org_row['supplier_code']
+                if not supplier_code:
+                    raise IDNGenerationError(
+                        "Organization does not have a supplier_code configured. "
+                        "Please contact admin to set up the supplier code in organization settings."
+                    )
+
+                if not validate_supplier_code(supplier_code):
+                    raise IDNGenerationError(
+                        f"Invalid supplier_code format: '{supplier_code}'. "
+                        f"Must be exactly 3 uppercase letters."
+                    )
+
+                sequence = await self.allocator.next_value(conn, organization_id, current_year, IDN_SERIES)
 
             # Generate IDN: SUPPLIER-INN-YEAR-SEQ
             # Format: YYYY-N where N is sequence number (no padding)
-            idn = f"{supplier_code}-{customer_inn}-{current_year}-{new_count}"  # e.g., CMT-1234567890-2025-1
+            idn = f"{supplier_code}-{customer_inn}-{current_year}-{sequence}"  # e.g., CMT-1234567890-2025-1
 
-            logger.info(
-                f"Generated IDN {idn} for org {organization_id}, "
-                f"counter updated: {current_count} -> {new_count}"
-            )
+            logger.info(f"Generated IDN {idn} for org {organization_id}")
 
             return idn
 
@@ -276,9 +328,37 @@ class IDNService:
         except Exception as e:
             logger.error(f"Failed to generate IDN: {e}")
             raise IDNGenerationError(f"Failed to generate IDN: {str(e)}")
-        finally:
-            if own_conn:
-                await conn.close()
+
+    async def generate_kp_number(
+        self,
+        organization_id: UUID,
+        conn: Optional[asyncpg.Connection] = None
+    ) -> str:
+        """
+        Generate the next quote number in КП{YY}-{NNNN} format.
+
+        Numbering is per organization and restarts each year (series 'kp').
+
+        Args:
+            organization_id: The organization creating the quote
+            conn: Optional existing database connection
+
+        Returns:
+            Quote number (e.g., "КП25-0001")
+
+        Raises:
+            IDNGenerationError: On database error
+        """
+        current_year = datetime.now().year
+
+        try:
+            async with self._connection(conn) as conn:
+                sequence = await self.allocator.next_value(conn, organization_id, current_year, KP_SERIES)
+        except Exception as e:
+            logger.error(f"Failed to generate quote number: {e}")
+            raise IDNGenerationError(f"Failed to generate quote number: {str(e)}")
+
+        return f"КП{current_year % 100:02d}-{sequence:04d}"
 
     def generate_item_idn_sku(self, quote_idn: str, position: int) -> str:
         """
@@ -335,12 +415,7 @@ class IDNService:
         Raises:
             IDNValidationError: If customer not found or has no INN
         """
-        own_conn = conn is None
-
-        if own_conn:
-            conn = await self._get_connection()
-
-        try:
+        async with self._connection(conn) as conn:
             row = await conn.fetchrow("""
                 SELECT inn
                 FROM customers
@@ -361,10 +436,6 @@ class IDNService:
 
             return inn
 
-        finally:
-            if own_conn:
-                await conn.close()
-
     async def get_organization_supplier_code(
         self,
         organization_id: UUID,
@@ -380,12 +451,7 @@ class IDNService:
         Returns:
             Supplier code string or None if not set
         """
-        own_conn = conn is None
-
-        if own_conn:
-            conn = await self._get_connection()
-
-        try:
+        async with self._connection(conn) as conn:
             row = await conn.fetchrow("""
                 SELECT supplier_code
                 FROM organizations
@@ -397,10 +463,6 @@ class IDNService:
 
             return row['supplier_code']
 
-        finally:
-            if own_conn:
-                await conn.close()
-
     async def set_organization_supplier_code(
         self,
         organization_id: UUID,
@@ -427,12 +489,7 @@ class IDNService:
                 f"Must be exactly 3 uppercase letters (A-Z)."
             )
 
-        own_conn = conn is None
-
-        if own_conn:
-            conn = await self._get_connection()
-
-        try:
+        async with self._connection(conn) as conn:
             await conn.execute("""
                 UPDATE organizations
                 SET supplier_code = $1
@@ -445,10 +502,6 @@ class IDNService:
 
             return True
 
-        finally:
-            if own_conn:
-                await conn.close()
-
 
 # Singleton instance for reuse
 _idn_service: Optional[IDNService] = None
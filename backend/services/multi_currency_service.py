@@ -10,12 +10,19 @@ Rate Priority:
 1. Check org setting: use_manual_exchange_rates
 2. If manual enabled: query organization_exchange_rates table
 3. If no manual rate: fallback to CBR rates
+
+The org's setting and manual rate table are cached per organization
+(OrgRatePolicy, ORG_RATE_POLICY_TTL_SECONDS); routes/org_exchange_rates.py
+invalidates the entry when an admin changes them. The cache is per worker
+process, so other workers pick up a change when their entry expires.
 """
 import os
 import logging
+import time
+from dataclasses import dataclass, field
 from decimal import Decimal
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
 from supabase import create_client, Client
@@ -26,6 +33,28 @@ from services.exchange_rate_service import get_exchange_rate_service
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Currencies snapshotted on quote versions (get_all_rates_for_org)
+SNAPSHOT_CURRENCIES = ("USD", "EUR", "RUB", "TRY", "CNY")
+
+# CBR-derived X/USD rates are kept to 6 decimals
+CBR_USD_RATE_PRECISION = Decimal("0.000001")
+
+# How long an org's rate policy is reused before it is re-read
+ORG_RATE_POLICY_TTL_SECONDS = int(os.getenv("ORG_RATE_POLICY_TTL_SECONDS", "300"))
+
+# How long the CBR-only fallback is reused after the settings could not be read
+ORG_RATE_POLICY_ERROR_TTL_SECONDS = 5
+
+
+@dataclass
+class OrgRatePolicy:
+    """Organization rate settings: manual flag and manual rate table"""
+    use_manual: bool = False
+    manual_rates: Dict[Tuple[str, str], Decimal] = field(default_factory=dict)
+
+    def manual_rate(self, from_currency: str, to_currency: str) -> Optional[Decimal]:
+        return self.manual_rates.get((from_currency, to_currency))
+
 
 class MultiCurrencyService:
     """
@@ -34,9 +63,27 @@ class MultiCurrencyService:
 
     Key Methods:
         convert_to_usd(): Convert a value from any currency to USD
+        convert_many_to_usd(): Convert a batch, one rate lookup per currency
         get_all_rates_for_org(): Get all currency rates for quote version snapshots
+        invalidate_rate_policy(): Drop cached org settings after a change
     """
 
+    def __init__(self, policy_ttl_seconds: int = ORG_RATE_POLICY_TTL_SECONDS):
+        self._supabase: Optional[Client] = None
+        self.policy_ttl_seconds = policy_ttl_seconds
+        # org_id -> (expires_at monotonic, policy)
+        self._policies: Dict[str, Tuple[float, OrgRatePolicy]] = {}
+
+    @property
+    def supabase(self) -> Client:
+        """Lazy-load Supabase client"""
+        if self._supabase is None:
+            self._supabase = create_client(
+                os.getenv("SUPABASE_URL"),
+                os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+            )
+        return self._supabase
+
     async def convert_to_usd(
         self,
         value: Decimal,
@@ -89,35 +136,7 @@ class MultiCurrencyService:
                 rate_timestamp=now
             )
 
-        # Check if org uses manual rates
-        use_manual = await self._get_org_uses_manual_rates(org_id)
-
-        rate: Optional[Decimal] = None
-        source: str = "cbr"
-
-        if use_manual:
-            # Try manual rate first
-            rate = await self._get_manual_rate(org_id, from_currency, "USD")
-            if rate is not None:
-                source = "manual"
-                logger.debug(
-                    f"Using manual rate for {from_currency}/USD: {rate}"
-                )
-
-        # Fallback to CBR if no manual rate
-        if rate is None:
-            rate = await self._get_cbr_rate_to_usd(from_currency)
-            source = "cbr"
-            if rate is not None:
-                logger.debug(
-                    f"Using CBR rate for {from_currency}/USD: {rate}"
-                )
-
-        if rate is None:
-            raise ValueError(
-                f"No exchange rate available for {from_currency}/USD. "
-                f"Please configure a manual rate or wait for CBR rates to update."
-            )
+        rate, source = await self._resolve_rate_to_usd(from_currency, org_id)
 
         # Calculate USD value with proper rounding
         value_usd = (value * rate).quantize(Decimal("0.01"))
@@ -131,35 +150,175 @@ class MultiCurrencyService:
             rate_timestamp=now
         )
 
-    async def _get_org_uses_manual_rates(self, org_id: UUID) -> bool:
+    async def convert_many_to_usd(
+        self,
+        values: Sequence[Tuple[Decimal, Currency]],
+        org_id: UUID
+    ) -> List[MonetaryValue]:
         """
-        Check if organization uses manual exchange rates.
+        Convert a batch of values to USD.
+
+        Same result as convert_to_usd for each value, but the org policy and
+        each currency's rate are resolved once for the whole batch.
 
         Args:
-            org_id: Organization UUID
+            values: (value, currency) pairs
+            org_id: Organization ID for rate settings lookup
 
         Returns:
-            True if org has use_manual_exchange_rates=True, False otherwise
+            MonetaryValue per input, in input order
+
+        Raises:
+            ValueError: If no exchange rate is available for a currency
         """
-        try:
-            supabase: Client = create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        now = datetime.now(timezone.utc)
+        resolved: Dict[str, Tuple[Decimal, str]] = {}
+        results: List[MonetaryValue] = []
+
+        for value, currency in values:
+            if currency == "USD" or value == Decimal("0"):
+                results.append(MonetaryValue(
+                    value=value,
+                    currency=currency,
+                    value_usd=value,
+                    rate_used=Decimal("1.0"),
+                    rate_source="identity",
+                    rate_timestamp=now
+                ))
+                continue
+
+            if currency not in resolved:
+                resolved[currency] = await self._resolve_rate_to_usd(currency, org_id)
+            rate, source = resolved[currency]
+
+            results.append(MonetaryValue(
+                value=value,
+                currency=currency,
+                value_usd=(value * rate).quantize(Decimal("0.01")),
+                rate_used=rate,
+                rate_source=source,
+                rate_timestamp=now
+            ))
+
+        return results
+
+    async def _resolve_rate_to_usd(
+        self,
+        from_currency: str,
+        org_id: UUID
+    ) -> Tuple[Decimal, str]:
+        """
+        Pick the X/USD rate per org settings: manual if enabled and set, else CBR.
+
+        Returns:
+            (rate, source) where source is "manual" or "cbr"
+
+        Raises:
+            ValueError: If no exchange rate is available for the currency
+        """
+        if await self._get_org_uses_manual_rates(org_id):
+            rate = await self._get_manual_rate(org_id, from_currency, "USD")
+            if rate is not None:
+                logger.debug(f"Using manual rate for {from_currency}/USD: {rate}")
+                return rate, "manual"
+
+        rate = await self._get_cbr_rate_to_usd(from_currency)
+        if rate is None:
+            raise ValueError(
+                f"No exchange rate available for {from_currency}/USD. "
+                f"Please configure a manual rate or wait for CBR rates to update."
             )
+        logger.debug(f"Using CBR rate for {from_currency}/USD: {rate}")
+        return rate, "cbr"
+
+    # ========================================================================
+    # ORG RATE POLICY CACHE
+    # ========================================================================
+
+    async def get_rate_policy(self, org_id: UUID) -> OrgRatePolicy:
+        """
+        Get the organization's rate settings, cached for policy_ttl_seconds.
+
+        Args:
+            org_id: Organization UUID
+
+        Returns:
+            OrgRatePolicy (CBR-only policy if settings can't be read; that
+            fallback is kept for ORG_RATE_POLICY_ERROR_TTL_SECONDS only)
+        """
+        key = str(org_id)
+        cached = self._policies.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        policy = await self._load_rate_policy(key)
+        ttl = self.policy_ttl_seconds
+        if policy is None:
+            policy = OrgRatePolicy()
+            ttl = min(ttl, ORG_RATE_POLICY_ERROR_TTL_SECONDS)
+        self._policies[key] = (time.monotonic() + ttl, policy)
+        return policy
+
+    def invalidate_rate_policy(self, org_id: Optional[UUID] = None) -> None:
+        """
+        Drop the cached policy of one organization (or all, if org_id is None).
 
-            result = supabase.table("calculation_settings") \
+        Call after changing calculation_settings.use_manual_exchange_rates or
+        organization_exchange_rates. The cache is per process: other workers
+        keep the old policy until their entry expires (policy_ttl_seconds).
+        """
+        if org_id is None:
+            self._policies.clear()
+        else:
+            self._policies.pop(str(org_id), None)
+
+    async def _load_rate_policy(self, org_id: str) -> Optional[OrgRatePolicy]:
+        """
+        Read the manual flag and, if enabled, the whole manual rate table
+
+        Returns:
+            OrgRatePolicy, or None if the settings could not be read
+        """
+        try:
+            result = self.supabase.table("calculation_settings") \
                 .select("use_manual_exchange_rates") \
-                .eq("organization_id", str(org_id)) \
+                .eq("organization_id", org_id) \
                 .limit(1) \
                 .execute()
 
-            if result.data and len(result.data) > 0:
-                return result.data[0].get("use_manual_exchange_rates", False)
-            return False
+            use_manual = bool(result.data and result.data[0].get("use_manual_exchange_rates"))
+            if not use_manual:
+                return OrgRatePolicy()
+
+            rates_result = self.supabase.table("organization_exchange_rates") \
+                .select("from_currency, to_currency, rate") \
+                .eq("organization_id", org_id) \
+                .execute()
+
+            return OrgRatePolicy(
+                use_manual=True,
+                manual_rates={
+                    (row["from_currency"], row["to_currency"]): Decimal(str(row["rate"]))
+                    for row in rates_result.data or []
+                }
+            )
 
         except Exception as e:
-            logger.warning(f"Failed to check org manual rates setting: {e}")
-            return False
+            logger.warning(f"Failed to load exchange rate settings for org {org_id}: {e}")
+            return None
+
+    async def _get_org_uses_manual_rates(self, org_id: UUID) -> bool:
+        """
+        Check if organization uses manual exchange rates.
+
+        Args:
+            org_id: Organization UUID
+
+        Returns:
+            True if org has use_manual_exchange_rates=True, False otherwise
+        """
+        policy = await self.get_rate_policy(org_id)
+        return policy.use_manual
 
     async def _get_manual_rate(
         self,
@@ -178,29 +337,8 @@ class MultiCurrencyService:
         Returns:
             Exchange rate as Decimal, or None if not configured
         """
-        try:
-            supabase: Client = create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-            )
-
-            result = supabase.table("organization_exchange_rates") \
-                .select("rate") \
-                .eq("organization_id", str(org_id)) \
-                .eq("from_currency", from_currency) \
-                .eq("to_currency", to_currency) \
-                .limit(1) \
-                .execute()
-
-            if result.data and len(result.data) > 0:
-                return Decimal(str(result.data[0]["rate"]))
-            return None
-
-        except Exception as e:
-            logger.warning(
-                f"Failed to get manual rate for {from_currency}/{to_currency}: {e}"
-            )
-            return None
+        policy = await self.get_rate_policy(org_id)
+        return policy.manual_rate(from_currency, to_currency)
 
     async def _get_cbr_rate_to_usd(self, from_currency: str) -> Optional[Decimal]:
         """
@@ -219,24 +357,13 @@ class MultiCurrencyService:
         try:
             service = get_exchange_rate_service()
 
-            # Special case: RUB to USD
-            if from_currency == "RUB":
-                # Get USD/RUB rate
-                usd_rub = await service.get_rate("USD", "RUB")
-                if usd_rub is not None and usd_rub > 0:
-                    # RUB/USD = 1 / (USD/RUB)
-                    return (Decimal("1") / usd_rub).quantize(Decimal("0.000001"))
-                return None
-
-            # For other currencies: get currency/RUB and USD/RUB
-            currency_rub = await service.get_rate(from_currency, "RUB")
-            usd_rub = await service.get_rate("USD", "RUB")
-
-            if currency_rub is not None and usd_rub is not None and usd_rub > 0:
-                # currency/USD = (currency/RUB) / (USD/RUB)
-                return (currency_rub / usd_rub).quantize(Decimal("0.000001"))
-
-            return None
+            # One shared matrix for the snapshot currencies, so every
+            # conversion (and get_all_rates_for_org) is a table lookup
+            matrix = await service.get_rate_matrix(
+                {*SNAPSHOT_CURRENCIES, from_currency},
+                precision=CBR_USD_RATE_PRECISION
+            )
+            return matrix.rate(from_currency, "USD")
 
         except Exception as e:
             logger.warning(
@@ -257,7 +384,7 @@ class MultiCurrencyService:
             Dict mapping currency codes to USD rates
             Example: {"USD": 1.0, "EUR": 1.08, "RUB": 0.0105, "TRY": 0.0303, "CNY": 0.1381}
         """
-        currencies = ["EUR", "RUB", "TRY", "CNY"]
+        currencies = [c for c in SNAPSHOT_CURRENCIES if c != "USD"]
         rates: dict[str, Decimal] = {"USD": Decimal("1.0")}
 
         for currency in currencies:
@@ -0,0 +1,328 @@
+"""
+Parse Result Cache Service
+
+Users often send the same workbook several times in a row (/parse-excel,
+then /upload-excel, then /upload-excel-validation). This cache keeps the
+parsed SimplifiedQuoteInput and the mapped QuoteCalculationInput list keyed
+by the SHA-256 of the file bytes, so follow-up calls skip openpyxl parsing
+and input mapping.
+
+Two tiers:
+- Memory: LRU of pickled entries, capped by total bytes
+- Disk: entries evicted from memory spill to PARSE_CACHE_DIR, also LRU and
+  capped by total bytes
+
+Every entry expires PARSE_CACHE_TTL_SECONDS after it was stored. Entries are
+kept pickled in both tiers, so callers always get their own copy and may
+modify it freely.
+
+Spilled files are unpickled, so the disk tier only reads what this process
+wrote: PARSE_CACHE_DIR must be a 0700 directory owned by the server user
+(otherwise the disk tier is disabled), every file carries an HMAC under a
+key generated per process, and files left by earlier processes are never
+adopted (expired ones are deleted at startup).
+"""
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Bump when parser or input mapping changes output for the same workbook
+PARSE_CACHE_VERSION = "1"
+
+PARSE_CACHE_DIR = os.getenv(
+    "PARSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "kvota_parse_cache")
+)
+PARSE_CACHE_MEMORY_BYTES = int(os.getenv("PARSE_CACHE_MEMORY_MB", "64")) * 1024 * 1024
+PARSE_CACHE_DISK_BYTES = int(os.getenv("PARSE_CACHE_DISK_MB", "512")) * 1024 * 1024
+PARSE_CACHE_TTL_SECONDS = int(os.getenv("PARSE_CACHE_TTL_SECONDS", "3600"))
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+# Disk entry header: expiry timestamp (float64), then HMAC-SHA256 of key, expiry and data
+_EXPIRY = struct.Struct(">d")
+_MAC_SIZE = hashlib.sha256().digest_size
+_HEADER_SIZE = _EXPIRY.size + _MAC_SIZE
+
+
+# ============================================================================
+# KEYS
+# ============================================================================
+
+def content_digest(stream: BinaryIO) -> str:
+    """
+    SHA-256 of a file-like object, read in blocks.
+
+    The stream is rewound to the start afterwards, ready for parsing.
+    """
+    stream.seek(0)
+    hasher = hashlib.sha256()
+    for block in iter(lambda: stream.read(HASH_BLOCK_BYTES), b""):
+        hasher.update(block)
+    stream.seek(0)
+    return hasher.hexdigest()
+
+
+def parsed_key(digest: str) -> str:
+    """Cache key of the parsed template"""
+    return f"parsed:{PARSE_CACHE_VERSION}:{digest}"
+
+
+def inputs_key(digest: str, rates: Dict[str, Any], as_of: Optional[date] = None) -> str:
+    """
+    Cache key of the mapped calculation inputs.
+
+    Mapping depends on exchange rates and on today's date (delivery date
+    for VAT), so both are part of the key.
+    """
+    as_of = as_of or date.today()
+    rates_part = ";".join(f"{pair}={rate}" for pair, rate in sorted(rates.items()))
+    fingerprint = hashlib.sha256(f"{as_of.isoformat()}|{rates_part}".encode("utf-8")).hexdigest()[:16]
+    return f"inputs:{PARSE_CACHE_VERSION}:{digest}:{fingerprint}"
+
+
+# ============================================================================
+# TWO-TIER CACHE
+# ============================================================================
+
+class ParseResultCache:
+    """Memory LRU with disk spill and TTL for parsed workbooks"""
+
+    def __init__(
+        self,
+        cache_dir: str = PARSE_CACHE_DIR,
+        memory_bytes: int = PARSE_CACHE_MEMORY_BYTES,
+        disk_bytes: int = PARSE_CACHE_DISK_BYTES,
+        ttl_seconds: int = PARSE_CACHE_TTL_SECONDS
+    ):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, pickled value)
+        self._memory: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._memory_total = 0
+        # file name -> size
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_total = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        # Signs spilled entries; a new key per process, so no file written
+        # before this process started is ever unpickled
+        self._mac_key = os.urandom(32)
+
+        if not _private_directory(cache_dir):
+            self.disk_bytes = 0
+            return
+
+        # Other workers' entries are left alone until they expire
+        cutoff = time.time() - ttl_seconds
+        for entry in os.scandir(cache_dir):
+            if entry.is_file(follow_symlinks=False) and entry.name.endswith(".pkl") \
+                    and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                _remove_file(entry.path)
+
+    @property
+    def memory_total(self) -> int:
+        return self._memory_total
+
+    @property
+    def disk_total(self) -> int:
+        return self._disk_total
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh copy of the cached value, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] <= now:
+                self._forget_memory(key)
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                entry = self._load_spilled(key, now)
+                if entry is not None:
+                    self._store_memory(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        try:
+            return pickle.loads(entry[1])
+        except Exception as e:
+            logger.warning(f"Dropping unreadable parse cache entry {key}: {e}")
+            self.invalidate(key)
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value; least recently used entries spill to disk"""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            self._remove_spilled(_file_name(key))
+            self._store_memory(key, (time.time() + self.ttl_seconds, data))
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._forget_memory(key)
+            self._remove_spilled(_file_name(key))
+
+    # ------------------------------------------------------------------
+    # Memory tier (call with lock held)
+    # ------------------------------------------------------------------
+
+    def _store_memory(self, key: str, entry: Tuple[float, bytes]) -> None:
+        self._forget_memory(key)
+        self._memory[key] = entry
+        self._memory_total += len(entry[1])
+
+        while self._memory_total > self.memory_bytes and self._memory:
+            old_key, old_entry = self._memory.popitem(last=False)
+            self._memory_total -= len(old_entry[1])
+            self._spill(old_key, old_entry)
+
+    def _forget_memory(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_total -= len(entry[1])
+
+    # ------------------------------------------------------------------
+    # Disk tier (call with lock held)
+    # ------------------------------------------------------------------
+
+    def _spill(self, key: str, entry: Tuple[float, bytes]) -> None:
+        expires_at, data = entry
+        size = _HEADER_SIZE + len(data)
+        if expires_at <= time.time() or size > self.disk_bytes:
+            return
+
+        name = _file_name(key)
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_EXPIRY.pack(expires_at))
+                f.write(self._mac(key, expires_at, data))
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to spill parse cache entry {key}: {e}")
+            _remove_file(tmp_path)
+            return
+
+        self._remove_spilled(name, delete_file=False)
+        self._disk[name] = size
+        self._disk_total += size
+        self._evict_disk()
+
+    def _load_spilled(self, key: str, now: float) -> Optional[Tuple[float, bytes]]:
+        """Take an entry out of the disk tier (it moves back to memory)"""
+        name = _file_name(key)
+        if name not in self._disk:
+            return None
+
+        try:
+            with open(os.path.join(self.cache_dir, name), "rb") as f:
+                raw = f.read()
+        except OSError:
+            raw = b""
+        self._remove_spilled(name)
+
+        if len(raw) < _HEADER_SIZE:
+            return None
+        expires_at = _EXPIRY.unpack_from(raw)[0]
+        data = raw[_HEADER_SIZE:]
+        if not hmac.compare_digest(raw[_EXPIRY.size:_HEADER_SIZE], self._mac(key, expires_at, data)):
+            logger.warning(f"Ignoring parse cache file {name} with an invalid signature")
+            return None
+        if expires_at <= now:
+            return None
+        return expires_at, data
+
+    def _mac(self, key: str, expires_at: float, data: bytes) -> bytes:
+        mac = hmac.new(self._mac_key, key.encode("utf-8"), hashlib.sha256)
+        mac.update(_EXPIRY.pack(expires_at))
+        mac.update(data)
+        return mac.digest()
+
+    def _remove_spilled(self, name: str, delete_file: bool = True) -> None:
+        size = self._disk.pop(name, None)
+        if size is not None:
+            self._disk_total -= size
+            if delete_file:
+                _remove_file(os.path.join(self.cache_dir, name))
+
+    def _evict_disk(self) -> None:
+        while self._disk_total > self.disk_bytes and self._disk:
+            name, size = self._disk.popitem(last=False)
+            self._disk_total -= size
+            _remove_file(os.path.join(self.cache_dir, name))
+
+
+def _private_directory(path: str) -> bool:
+    """
+    Create path as a 0700 directory, or check that an existing one is a
+    real directory owned by this user and closed to others
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError as e:
+        logger.error(f"Parse cache disk tier disabled: {path}: {e}")
+        return False
+
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        logger.error(
+            f"Parse cache disk tier disabled: {path} must be a directory owned by uid "
+            f"{os.getuid()} with mode 0700 (owner {info.st_uid}, mode {oct(stat.S_IMODE(info.st_mode))})"
+        )
+        return False
+    return True
+
+
+def _file_name(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:40] + ".pkl"
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_parse_cache: Optional[ParseResultCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseResultCache:
+    """Get process-wide parse result cache"""
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseResultCache()
+        return _parse_cache
@@ -0,0 +1,312 @@
+"""
+Quote Detail Service
+
+Loads everything GET /api/quotes/{id} shows (quote, customer, items with
+calculation results, calculation variables) in one query with JSON
+aggregation, and keeps the result per quote in QuoteDetailCache.
+
+Entries are keyed by quote_detail_versions.version
+(migrations/061_quote_detail_versions.sql), which triggers bump on every
+change to the quote, its items, calculation results or variables. A cached
+quote is served after one primary-key lookup confirms its version;
+customer details may lag by at most QUOTE_DETAIL_CACHE_TTL_SECONDS.
+
+Approvals are not cached: they are read on every view while the
+quote_approvals table exists. Until migration 061 is applied, quotes are
+loaded the same way but never cached.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+QUOTE_DETAIL_CACHE_TTL_SECONDS = int(os.getenv("QUOTE_DETAIL_CACHE_TTL_SECONDS", "300"))
+
+# Quotes kept before least recently viewed are dropped
+QUOTE_DETAIL_CACHE_MAX_ENTRIES = int(os.getenv("QUOTE_DETAIL_CACHE_MAX_ENTRIES", "500"))
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+QUOTE_COLUMNS = (
+    "id", "organization_id", "customer_id", "created_by",
+    "idn_quote", "title", "description", "status",
+    "workflow_state",
+    "submission_comment", "last_sendback_reason",
+    "last_financial_comment", "last_approval_comment",
+    "quote_date", "valid_until",
+    "currency",
+    "subtotal", "tax_rate", "tax_amount", "total_amount",
+    "total_profit_usd", "total_vat_on_import_usd", "total_vat_payable_usd",
+    "notes", "terms_conditions",
+    "created_at", "updated_at", "deleted_at",
+)
+
+# $1 quote, $2 organization. JSON columns are decoded by decode_detail_row.
+_QUOTE_DETAIL_TEMPLATE = """
+SELECT
+    {quote_columns},
+    {detail_version} AS detail_version,
+    (
+        SELECT row_to_json(c)
+        FROM (
+            SELECT id, name, email, phone, address, city, region, country,
+                   inn, kpp, ogrn, company_type, industry, notes,
+                   created_at, updated_at
+            FROM customers
+            WHERE id = q.customer_id
+        ) c
+    ) AS customer,
+    (
+        SELECT COALESCE(json_agg(i ORDER BY i.position, i.created_at), '[]')
+        FROM (
+            SELECT
+                qi.id, qi.quote_id, qi.position,
+                qi.product_name AS description,
+                qi.product_code,
+                qi.brand,
+                qi.quantity::numeric AS quantity,
+                qi.unit,
+                qi.base_price_vat AS unit_price,
+                qi.weight_in_kg,
+                qi.supplier_country AS country_of_origin,
+                qi.customs_code,
+                qi.created_at, qi.updated_at,
+                qcr.phase_results AS calculation_results,
+                qcr.calculated_at
+            FROM quote_items qi
+            LEFT JOIN LATERAL (
+                SELECT phase_results, calculated_at
+                FROM quote_calculation_results
+                WHERE quote_item_id = qi.id AND quote_id = qi.quote_id
+                ORDER BY calculated_at DESC
+                LIMIT 1
+            ) qcr ON true
+            WHERE qi.quote_id = q.id
+        ) i
+    ) AS items,
+    (
+        SELECT variables FROM quote_calculation_variables WHERE quote_id = q.id LIMIT 1
+    ) AS calculation_variables,
+    to_regclass('public.quote_approvals') IS NOT NULL AS has_approvals
+FROM quotes q
+WHERE q.id = $1 AND q.organization_id = $2::uuid
+"""
+
+_QUOTE_COLUMNS_SQL = ", ".join(f"q.{c}" for c in QUOTE_COLUMNS)
+
+QUOTE_DETAIL_SQL = _QUOTE_DETAIL_TEMPLATE.format(
+    quote_columns=_QUOTE_COLUMNS_SQL,
+    detail_version="COALESCE((SELECT version FROM quote_detail_versions WHERE quote_id = q.id), 0)",
+)
+
+# Without quote_detail_versions: same data, no version (not cached)
+QUOTE_DETAIL_UNVERSIONED_SQL = _QUOTE_DETAIL_TEMPLATE.format(
+    quote_columns=_QUOTE_COLUMNS_SQL,
+    detail_version="NULL::bigint",
+)
+
+# $1 quote, $2 organization
+QUOTE_DETAIL_VERSION_SQL = """
+SELECT COALESCE((SELECT version FROM quote_detail_versions WHERE quote_id = q.id), 0) AS detail_version
+FROM quotes q
+WHERE q.id = $1 AND q.organization_id = $2::uuid
+"""
+
+QUOTE_APPROVALS_SQL = """
+SELECT qa.*,
+       u.email as approver_email,
+       up.raw_user_meta_data->>'full_name' as approver_name
+FROM quote_approvals qa
+JOIN auth.users u ON qa.approver_id = u.id
+LEFT JOIN auth.users up ON qa.approver_id = up.id
+WHERE qa.quote_id = $1
+ORDER BY qa.approval_order ASC, qa.assigned_at ASC
+"""
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class QuoteDetailCache:
+    """Per-quote LRU of loaded quote details, tagged with their detail version"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = QUOTE_DETAIL_CACHE_TTL_SECONDS,
+        max_entries: int = QUOTE_DETAIL_CACHE_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # quote_id -> (expires_at monotonic, version, organization_id, detail)
+        self._entries: "OrderedDict[str, Tuple[float, int, str, Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, quote_id: Any, organization_id: Any) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(version, detail) of a live entry of this organization, without counting a hit"""
+        entry = self._entries.get(str(quote_id))
+        if entry is None or entry[2] != str(organization_id):
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[str(quote_id)]
+            return None
+        return entry[1], entry[3]
+
+    def set(self, quote_id: Any, organization_id: Any, version: int, detail: Dict[str, Any]) -> None:
+        key = str(quote_id)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, version, str(organization_id), detail)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def touch(self, quote_id: Any) -> None:
+        self._entries.move_to_end(str(quote_id))
+
+    def invalidate(self, quote_id: Optional[Any] = None) -> None:
+        """Drop one quote (or everything, if None)"""
+        if quote_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(quote_id), None)
+
+
+_quote_detail_cache: Optional[QuoteDetailCache] = None
+
+# False once quote_detail_versions was found missing (migration 061 not applied)
+_versions_available = True
+
+
+def get_quote_detail_cache() -> QuoteDetailCache:
+    """Get or create the global quote detail cache"""
+    global _quote_detail_cache
+    if _quote_detail_cache is None:
+        _quote_detail_cache = QuoteDetailCache()
+    return _quote_detail_cache
+
+
+# ============================================================================
+# LOADER
+# ============================================================================
+
+def _decode_json(value: Any) -> Any:
+    """asyncpg returns json columns as text; keep numbers exact as Decimal"""
+    if isinstance(value, str):
+        return json.loads(value, parse_float=Decimal)
+    return value
+
+
+def decode_detail_row(row: Any) -> Dict[str, Any]:
+    """
+    Split a QUOTE_DETAIL_SQL row into its parts.
+
+    Returns:
+        Dict with "quote" (QUOTE_COLUMNS), "customer" (dict or None),
+        "items" (list of dicts; calculation_results is a dict or None),
+        "calculation_variables", "detail_version" and "has_approvals"
+    """
+    data = dict(row)
+    items = _decode_json(data["items"]) or []
+    for item in items:
+        item["calculation_results"] = _decode_json(item.get("calculation_results"))
+
+    return {
+        "quote": {c: data[c] for c in QUOTE_COLUMNS},
+        "customer": _decode_json(data["customer"]),
+        "items": items,
+        "calculation_variables": _decode_json(data["calculation_variables"]),
+        "detail_version": data["detail_version"],
+        "has_approvals": data["has_approvals"],
+    }
+
+
+async def load_quote_detail(
+    conn: asyncpg.Connection,
+    quote_id: UUID,
+    organization_id: Any
+) -> Optional[Dict[str, Any]]:
+    """
+    Load a quote with customer, items, results and variables in one query.
+
+    Returns:
+        decode_detail_row() dict, or None if the quote does not exist in
+        this organization. detail_version is None without migration 061.
+    """
+    global _versions_available
+    row = None
+    if _versions_available:
+        try:
+            row = await conn.fetchrow(QUOTE_DETAIL_SQL, quote_id, str(organization_id))
+        except asyncpg.UndefinedTableError:
+            logger.warning("quote_detail_versions missing (migration 061); quote details are not cached")
+            _versions_available = False
+    if not _versions_available:
+        row = await conn.fetchrow(QUOTE_DETAIL_UNVERSIONED_SQL, quote_id, str(organization_id))
+    if row is None:
+        return None
+    return decode_detail_row(row)
+
+
+async def get_quote_detail(
+    conn: asyncpg.Connection,
+    quote_id: UUID,
+    organization_id: Any,
+    cache: Optional[QuoteDetailCache] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    load_quote_detail through the quote detail cache.
+
+    A cached quote costs one version lookup; a stale or missing one is
+    reloaded (the reload returns its own version, so no extra lookup).
+
+    Returns:
+        Detail dict shared with the cache (treat as read-only), or None if
+        the quote does not exist in this organization
+    """
+    if cache is None:
+        cache = get_quote_detail_cache()
+
+    cached = cache.peek(quote_id, organization_id)
+    if cached is not None:
+        version = await conn.fetchval(QUOTE_DETAIL_VERSION_SQL, quote_id, str(organization_id))
+        if version is None:
+            cache.invalidate(quote_id)
+            return None
+        if version == cached[0]:
+            cache.hits += 1
+            cache.touch(quote_id)
+            return cached[1]
+
+    cache.misses += 1
+    detail = await load_quote_detail(conn, quote_id, organization_id)
+    if detail is None:
+        cache.invalidate(quote_id)
+        return None
+
+    if detail["detail_version"] is not None:
+        cache.set(quote_id, organization_id, detail["detail_version"], detail)
+    return detail
+
+
+async def fetch_quote_approvals(conn: asyncpg.Connection, quote_id: UUID) -> List[asyncpg.Record]:
+    """Approval rows with approver email / name (read on every view)"""
+    return await conn.fetch(QUOTE_APPROVALS_SQL, quote_id)
@@ -0,0 +1,226 @@
+"""
+Quote Persistence Service
+
+Writes a calculated quote (quote row, items, calculation variables,
+per-item calculation results and quote summary) in one asyncpg
+transaction. Used by /api/quotes-calc/calculate and by the Excel upload
+with save-to-DB.
+
+Each table is written with a single multi-row statement:
+
+    INSERT INTO quote_items (...)
+    SELECT ... FROM jsonb_populate_recordset(NULL::quote_items, $1::jsonb)
+
+so the cost is a fixed number of round trips regardless of line count.
+Rows are passed as one JSON document and typed by the table's own row
+type. Only the listed columns are inserted, so column defaults still
+apply. IDs are generated client-side, so results can reference items
+without reading anything back.
+
+If any statement fails the whole quote is rolled back; there is no
+partially saved quote to clean up.
+"""
+import json
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+import asyncpg
+
+from db_pool import init_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+IDENTIFIER_PATTERN = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+# ============================================================================
+# DATA STRUCTURES
+# ============================================================================
+
+@dataclass
+class QuoteBundle:
+    """
+    Rows of one calculated quote.
+
+    quote_id / quote_item_id links are filled in by the service. Rows
+    may carry their own "id"; missing ids are generated.
+
+    Attributes:
+        quote: quotes row
+        items: quote_items rows, in position order
+        variables: quote_calculation_variables row
+        results: quote_calculation_results rows, one per item (same order)
+        summary: quote_calculation_summaries row
+    """
+    quote: Dict[str, Any]
+    items: List[Dict[str, Any]]
+    variables: Dict[str, Any]
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    summary: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class SavedQuote:
+    """Result of persisting a QuoteBundle"""
+    quote_id: str
+    item_ids: List[str]
+    elapsed_ms: float
+
+    @property
+    def ms_per_100_lines(self) -> float:
+        """Insert time normalised to 100 quote lines"""
+        return self.elapsed_ms * 100 / max(len(self.item_ids), 1)
+
+
+# ============================================================================
+# SQL HELPERS
+# ============================================================================
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_json(value: Any) -> str:
+    """JSON for jsonb parameters (Decimal, date and UUID aware)"""
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+def _columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """Union of row keys, in first-seen order"""
+    columns: Dict[str, None] = {}
+    for row in rows:
+        for column in row:
+            if not IDENTIFIER_PATTERN.match(column):
+                raise ValueError(f"Invalid column name: {column!r}")
+            columns[column] = None
+    return list(columns)
+
+
+def build_insert_sql(table: str, columns: List[str], many: bool = True) -> str:
+    """
+    INSERT ... SELECT from a JSON document typed by the table's row type.
+
+    Args:
+        table: Target table
+        columns: Columns to insert (others keep their defaults)
+        many: Parameter is a JSON array of rows (else a single object)
+    """
+    if not IDENTIFIER_PATTERN.match(table):
+        raise ValueError(f"Invalid table name: {table!r}")
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    source = "jsonb_populate_recordset" if many else "jsonb_populate_record"
+    return (
+        f"INSERT INTO {table} ({column_list}) "
+        f"SELECT {column_list} FROM {source}(NULL::{table}, $1::jsonb)"
+    )
+
+
+async def insert_rows(conn: asyncpg.Connection, table: str, rows: List[Dict[str, Any]]) -> None:
+    """Insert rows into table with one statement"""
+    if not rows:
+        return
+    await conn.execute(build_insert_sql(table, _columns(rows)), to_json(rows))
+
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+async def save_quote_bundle(
+    conn: asyncpg.Connection,
+    bundle: QuoteBundle,
+    user_id: str,
+    organization_id: str
+) -> SavedQuote:
+    """
+    Persist a quote and all calculation rows in one transaction.
+
+    Args:
+        conn: asyncpg connection (not inside a transaction)
+        bundle: Rows to write
+        user_id: Acting user (RLS context)
+        organization_id: Organization of the quote (RLS context)
+
+    Returns:
+        SavedQuote with the quote ID, item IDs (bundle order) and timing
+
+    Raises:
+        ValueError: If results don't match items
+        asyncpg.UniqueViolationError: On duplicate idn_quote (nothing is saved)
+    """
+    if bundle.results and len(bundle.results) != len(bundle.items):
+        raise ValueError(f"Expected {len(bundle.items)} calculation results, got {len(bundle.results)}")
+
+    quote = dict(bundle.quote)
+    quote_id = str(quote.setdefault("id", str(uuid.uuid4())))
+
+    items = []
+    for item in bundle.items:
+        item = {**item, "quote_id": quote_id}
+        item.setdefault("id", str(uuid.uuid4()))
+        items.append(item)
+    item_ids = [str(item["id"]) for item in items]
+
+    results = [
+        {**result, "quote_id": quote_id, "quote_item_id": item_id}
+        for result, item_id in zip(bundle.results, item_ids)
+    ]
+
+    start = time.perf_counter()
+    async with conn.transaction():
+        # Set RLS context for multi-tenant security (transaction-local)
+        await conn.execute(
+            "SELECT set_config('app.current_organization_id', $1, true), "
+            "set_config('request.jwt.claims', $2, true)",
+            str(organization_id),
+            json.dumps({"sub": str(user_id), "organization_id": str(organization_id), "role": "authenticated"})
+        )
+        await conn.execute(build_insert_sql("quotes", _columns([quote]), many=False), to_json(quote))
+        await insert_rows(conn, "quote_items", items)
+        variables = {**bundle.variables, "quote_id": quote_id}
+        await conn.execute(
+            build_insert_sql("quote_calculation_variables", _columns([variables]), many=False),
+            to_json(variables)
+        )
+        await insert_rows(conn, "quote_calculation_results", results)
+        if bundle.summary is not None:
+            summary = {**bundle.summary, "quote_id": quote_id}
+            await conn.execute(
+                build_insert_sql("quote_calculation_summaries", _columns([summary]), many=False),
+                to_json(summary)
+            )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    saved = SavedQuote(quote_id=quote_id, item_ids=item_ids, elapsed_ms=elapsed_ms)
+    logger.info(
+        f"Persisted quote {quote_id}: {len(items)} lines in {elapsed_ms:.1f}ms "
+        f"({saved.ms_per_100_lines:.1f}ms per 100 lines)"
+    )
+    return saved
+
+
+async def persist_quote_bundle(
+    bundle: QuoteBundle,
+    user_id: str,
+    organization_id: str,
+    pool: Optional[asyncpg.Pool] = None
+) -> SavedQuote:
+    """save_quote_bundle on a connection from the shared pool"""
+    if pool is None:
+        pool = await init_db_pool()
+    async with pool.acquire() as conn:
+        return await save_quote_bundle(conn, bundle, user_id, organization_id)
@@ -228,16 +228,8 @@ class QuoteVersionService:
 
     async def _determine_rates_source(self, org_id: UUID) -> str:
         """Determine if org uses manual or CBR rates"""
-        result = self.supabase.table("calculation_settings") \
-            .select("use_manual_exchange_rates") \
-            .eq("organization_id", str(org_id)) \
-            .limit(1) \
-            .execute()
-
-        if result.data and len(result.data) > 0:
-            if result.data[0].get("use_manual_exchange_rates"):
-                return "manual"
-        return "cbr"
+        policy = await get_multi_currency_service().get_rate_policy(org_id)
+        return "manual" if policy.use_manual else "cbr"
 
     async def _save_version(
         self,
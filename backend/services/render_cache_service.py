@@ -0,0 +1,498 @@
+"""
+Document Render Cache Service
+
+Caches generated quote documents (PDF/XLSX) on local disk so repeat downloads
+of a quote that no longer changes are served without re-running the export
+pipeline.
+
+Cache key: quote ID + quote version token + document format + template version.
+- Quote version token combines current_version_id and updated_at, and is only
+  issued for quotes in a frozen state (approved / sent to customer / ...).
+  Editable quotes are always rendered fresh, since item edits don't bump
+  quotes.updated_at.
+- Template version changes whenever a file under templates/ changes or
+  RENDERER_VERSION is bumped, so stale layouts are never served.
+
+Entries are evicted least-recently-used once the total size exceeds the cap.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from async_supabase import async_supabase_call
+from services.export_data_mapper import ExportData, fetch_export_data, get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Bump when rendering code changes in a way that alters output for the same data
+RENDERER_VERSION = "1"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+TEMPLATES_DIR = os.path.join(BACKEND_DIR, "templates")
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(BACKEND_DIR, "render_cache"))
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Quote states after which document content no longer changes
+FROZEN_WORKFLOW_STATES = frozenset({"approved"})
+FROZEN_STATUSES = frozenset({"approved", "ready_to_send", "sent", "viewed", "accepted"})
+
+PDF_MEDIA_TYPE = "application/pdf"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# format -> (filename suffix, QuotePDFService method)
+PDF_FORMATS: Dict[str, Tuple[str, str]] = {
+    "supply": ("supply", "generate_supply_pdf"),
+    "openbook": ("openbook", "generate_openbook_pdf"),
+    "supply-letter": ("supply_letter", "generate_supply_letter_pdf"),
+    "openbook-letter": ("openbook_letter", "generate_openbook_letter_pdf"),
+    "invoice": ("invoice", "generate_invoice_pdf"),
+}
+
+# format -> (filename suffix, QuoteExcelService method)
+EXCEL_FORMATS: Dict[str, Tuple[str, str]] = {
+    "validation": ("validation", "generate_validation_export"),
+    "supply-grid": ("supply_grid", "generate_supply_grid_export"),
+    "openbook-grid": ("openbook_grid", "generate_openbook_grid_export"),
+}
+
+# Documents rendered in the background when a quote becomes approved
+PREWARM_DOCUMENTS: Tuple[Tuple[str, str], ...] = (
+    ("pdf", "supply"),
+    ("pdf", "openbook"),
+    ("excel", "supply-grid"),
+    ("excel", "openbook-grid"),
+)
+
+
+# ============================================================================
+# DATA STRUCTURES
+# ============================================================================
+
+class RenderCacheKey(NamedTuple):
+    """Identity of one rendered document"""
+    quote_id: str
+    quote_version: str
+    doc_format: str
+    template_version: str
+
+    @property
+    def entry_name(self) -> str:
+        """File name of the cache entry; prefixed with quote ID for per-quote invalidation"""
+        digest = hashlib.sha256(
+            "|".join((self.quote_version, self.doc_format, self.template_version)).encode("utf-8")
+        ).hexdigest()[:32]
+        return f"{self.quote_id}_{digest}.bin"
+
+
+class RenderedDocument(NamedTuple):
+    """Rendered document ready to be sent to the client"""
+    filename: str
+    content: bytes
+    media_type: str
+
+
+# ============================================================================
+# VERSION HELPERS
+# ============================================================================
+
+def get_template_version(templates_dir: str = TEMPLATES_DIR) -> str:
+    """
+    Fingerprint of all template files plus RENDERER_VERSION
+
+    Uses file name, size and mtime, so any template edit produces a new version.
+    """
+    fingerprint = hashlib.sha256(RENDERER_VERSION.encode("utf-8"))
+    for root, dirs, files in os.walk(templates_dir):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            fingerprint.update(f"{os.path.relpath(os.path.join(root, name), templates_dir)}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return fingerprint.hexdigest()[:16]
+
+
+def get_quote_version_token(quote: Dict[str, Any]) -> Optional[str]:
+    """
+    Version token for a quote row, or None if the quote can still change
+
+    Args:
+        quote: Row with workflow_state, status, current_version_id and updated_at
+
+    Returns:
+        Token string for frozen quotes, None for editable ones
+    """
+    if quote.get("workflow_state") not in FROZEN_WORKFLOW_STATES and quote.get("status") not in FROZEN_STATUSES:
+        return None
+    if not quote.get("updated_at"):
+        return None
+    return f"{quote.get('current_version_id') or '-'}:{quote['updated_at']}"
+
+
+# ============================================================================
+# DISK LRU CACHE
+# ============================================================================
+
+class RenderCache:
+    """
+    Size-capped LRU cache of rendered documents stored on local disk
+
+    Entry file layout: filename length (4 bytes) + UTF-8 filename + media type
+    length (4 bytes) + media type + document bytes. Recency survives restarts
+    through file mtimes, which are refreshed on every hit.
+    """
+
+    def __init__(self, cache_dir: str = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        existing = []
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: RenderCacheKey) -> Optional[RenderedDocument]:
+        """Return cached document or None"""
+        name = key.entry_name
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._forget(name)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return _decode_entry(data)
+
+    def put(self, key: RenderCacheKey, document: RenderedDocument) -> None:
+        """Store document, evicting least recently used entries over the size cap"""
+        data = _encode_entry(document)
+        if len(data) > self.max_bytes:
+            return
+
+        name = key.entry_name
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def invalidate_quote(self, quote_id: str) -> int:
+        """
+        Drop all cached documents of a quote; returns number of entries removed
+
+        Scans the directory rather than this process's index, so entries
+        written by other workers sharing cache_dir are removed too.
+        """
+        prefix = f"{quote_id}_"
+        with self._lock:
+            names = {name for name in self._entries if name.startswith(prefix)}
+            names.update(
+                entry.name for entry in os.scandir(self.cache_dir)
+                if entry.name.startswith(prefix) and entry.name.endswith(".bin")
+            )
+            for name in names:
+                self._forget(name)
+                _remove_file(os.path.join(self.cache_dir, name))
+        return len(names)
+
+    def _forget(self, name: str) -> None:
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            _remove_file(os.path.join(self.cache_dir, name))
+
+
+def _encode_entry(document: RenderedDocument) -> bytes:
+    filename = document.filename.encode("utf-8")
+    media_type = document.media_type.encode("utf-8")
+    return b"".join((
+        len(filename).to_bytes(4, "big"), filename,
+        len(media_type).to_bytes(4, "big"), media_type,
+        document.content,
+    ))
+
+
+def _decode_entry(data: bytes) -> RenderedDocument:
+    filename_end = 4 + int.from_bytes(data[:4], "big")
+    media_start = filename_end + 4
+    media_end = media_start + int.from_bytes(data[filename_end:media_start], "big")
+    return RenderedDocument(
+        filename=data[4:filename_end].decode("utf-8"),
+        content=data[media_end:],
+        media_type=data[media_start:media_end].decode("utf-8"),
+    )
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_render_cache: Optional[RenderCache] = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Get process-wide render cache instance"""
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+        return _render_cache
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+def _quote_date(export_data: ExportData) -> str:
+    """Quote creation date as YYYYMMDD for filenames"""
+    created_at = export_data.quote.get('created_at')
+    if not created_at:
+        return ''
+    if isinstance(created_at, str):
+        # Parse ISO format: "2025-10-21T19:44:04.236Z"
+        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+    return created_at.strftime('%Y%m%d')
+
+
+def _idn_quote_clean(export_data: ExportData) -> str:
+    idn_quote = export_data.quote.get('idn_quote', 'quote')
+    # Clean quote number (remove 'КП-' prefix if present)
+    return str(idn_quote).replace('КП-', '').replace('КП', '')
+
+
+def _customer_name(export_data: ExportData) -> str:
+    return export_data.customer.get('name', 'customer')[:20] if export_data.customer else 'customer'
+
+
+def render_pdf_document(export_data: ExportData, format: str) -> RenderedDocument:
+    """
+    Render quote PDF in one of PDF_FORMATS
+
+    Raises:
+        ValueError: If format is unknown
+    """
+    from pdf_service import QuotePDFService
+
+    if format not in PDF_FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    format_name, method = PDF_FORMATS[format]
+
+    pdf_bytes = getattr(QuotePDFService(), method)(export_data)
+
+    # Clean customer name for filename (keep letters/digits, Cyrillic included)
+    customer_name_clean = ''.join(c if c.isalnum() or c in '-_' else '_' for c in _customer_name(export_data))
+    filename = f"kvota_{format_name}_{_quote_date(export_data)}_{_idn_quote_clean(export_data)}_{customer_name_clean}.pdf"
+
+    return RenderedDocument(filename, pdf_bytes, PDF_MEDIA_TYPE)
+
+
+def render_excel_document(export_data: ExportData, format: str) -> RenderedDocument:
+    """
+    Render quote Excel export in one of EXCEL_FORMATS
+
+    Raises:
+        ValueError: If format is unknown
+    """
+    from services.excel_service import QuoteExcelService
+
+    if format not in EXCEL_FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    format_suffix, method = EXCEL_FORMATS[format]
+
+    excel_bytes = getattr(QuoteExcelService, method)(export_data)
+
+    # Clean customer name for filename (remove special characters)
+    clean_customer = re.sub(r'[^\w\s-]', '', _customer_name(export_data)).strip().replace(' ', '_')
+    filename = f"kvota_{format_suffix}_{_quote_date(export_data)}_{_idn_quote_clean(export_data)}_{clean_customer}.xlsx"
+
+    return RenderedDocument(filename, excel_bytes, XLSX_MEDIA_TYPE)
+
+
+RENDERERS = {
+    "pdf": render_pdf_document,
+    "excel": render_excel_document,
+}
+
+
+async def _fetch_quote_version(quote_id: str, organization_id: str) -> Optional[str]:
+    """Look up the version token of a quote with a single narrow query"""
+    supabase = get_supabase_client()
+    result = await async_supabase_call(
+        supabase.table("quotes")
+        .select("id, workflow_state, status, current_version_id, updated_at")
+        .eq("id", quote_id)
+        .eq("organization_id", organization_id)
+    )
+    if not result.data:
+        return None
+    return get_quote_version_token(result.data[0])
+
+
+async def _cache_keys(quote_id: str, organization_id: str, doc_formats: Iterable[str]) -> Dict[str, RenderCacheKey]:
+    """Build cache keys for a quote; empty when the quote is not cacheable"""
+    try:
+        quote_version = await _fetch_quote_version(quote_id, organization_id)
+        if not quote_version:
+            return {}
+        # Walks the template directory, so keep it off the event loop too
+        template_version = await asyncio.to_thread(get_template_version)
+        return {
+            doc_format: RenderCacheKey(quote_id, quote_version, doc_format, template_version)
+            for doc_format in doc_formats
+        }
+    except Exception as e:
+        # Cache lookup must never break exports
+        logger.warning(f"Render cache lookup failed for quote {quote_id}: {e}")
+        return {}
+
+
+def _store(cache: RenderCache, key: Optional[RenderCacheKey], document: RenderedDocument) -> None:
+    if key is None:
+        return
+    try:
+        cache.put(key, document)
+    except OSError as e:
+        logger.warning(f"Failed to store render cache entry for quote {key.quote_id}: {e}")
+
+
+async def get_or_render_document(
+    quote_id: str,
+    organization_id: str,
+    kind: str,
+    format: str,
+    cache: Optional[RenderCache] = None,
+) -> RenderedDocument:
+    """
+    Return a rendered quote document, serving frozen quotes from the cache
+
+    Args:
+        quote_id: Quote UUID
+        organization_id: Organization UUID (for RLS validation)
+        kind: 'pdf' or 'excel'
+        format: Format name within the kind (see PDF_FORMATS / EXCEL_FORMATS)
+        cache: Cache instance (defaults to process-wide cache)
+
+    Raises:
+        ValueError: If quote not found or format unknown
+    """
+    quote_id = str(quote_id)
+    organization_id = str(organization_id)
+    if cache is None:
+        cache = get_render_cache()
+    doc_format = f"{kind}_{format}"
+
+    key = (await _cache_keys(quote_id, organization_id, [doc_format])).get(doc_format)
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    export_data = await fetch_export_data(quote_id, organization_id)
+    # Render off the event loop: PDF/Excel generation is CPU-bound
+    document = await asyncio.to_thread(RENDERERS[kind], export_data, format)
+    _store(cache, key, document)
+
+    return document
+
+
+async def prewarm_quote_documents(
+    quote_id: str,
+    organization_id: str,
+    documents: Iterable[Tuple[str, str]] = PREWARM_DOCUMENTS,
+    cache: Optional[RenderCache] = None,
+) -> int:
+    """
+    Render documents of a newly approved quote into the cache
+
+    Intended to run as a background task after a workflow transition.
+    Export data is fetched once for all missing documents. Failures are
+    logged and skipped so one broken format doesn't block the others.
+
+    Returns:
+        Number of documents rendered into the cache
+    """
+    quote_id = str(quote_id)
+    organization_id = str(organization_id)
+    if cache is None:
+        cache = get_render_cache()
+    documents = list(documents)
+
+    keys = await _cache_keys(quote_id, organization_id, [f"{kind}_{format}" for kind, format in documents])
+    if not keys:
+        return 0
+
+    missing = [(kind, format) for kind, format in documents if cache.get(keys[f"{kind}_{format}"]) is None]
+    if not missing:
+        return 0
+
+    try:
+        export_data = await fetch_export_data(quote_id, organization_id)
+    except Exception as e:
+        logger.warning(f"Render cache pre-warm failed for quote {quote_id}: {e}")
+        return 0
+
+    rendered = 0
+    for kind, format in missing:
+        try:
+            # Render off the event loop: PDF/Excel generation is CPU-bound
+            document = await asyncio.to_thread(RENDERERS[kind], export_data, format)
+            _store(cache, keys[f"{kind}_{format}"], document)
+            rendered += 1
+        except Exception as e:
+            logger.warning(f"Render cache pre-warm failed for quote {quote_id} ({kind}_{format}): {e}")
+    return rendered
@@ -0,0 +1,471 @@
+"""
+Scheduled Report Scheduler
+
+Runs scheduled_reports when they are due without polling the table.
+
+- ScheduleQueue: min-heap of next_run_at per active schedule, loaded once
+  when the scheduler starts dispatching and updated on every change.
+- Changes arrive from routes/analytics.py (create/update/delete, same
+  process) and from pg_notify('scheduled_reports', ...) sent by a trigger
+  (migrations/063_scheduled_report_notify.sql), so edits made through any
+  replica are seen.
+- Due reports go to a pool of REPORT_SCHEDULER_WORKERS workers; at most
+  REPORT_SCHEDULER_PER_ORG_LIMIT reports of one organization run at once,
+  the rest wait their turn.
+- Only the process holding the session advisory lock
+  REPORT_SCHEDULER_LOCK_ID dispatches. Every API replica (and the
+  standalone scheduler.py) may run a ReportScheduler; the others retry the
+  lock every REPORT_SCHEDULER_LEADER_RETRY_SECONDS and take over when the
+  leader's connection drops.
+
+A failed run leaves next_run_at unchanged in the database and is retried
+after REPORT_SCHEDULER_RETRY_SECONDS.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+from supabase import Client, create_client
+
+from async_supabase import async_supabase_call
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SCHEDULER_CHANNEL = "scheduled_reports"
+
+# pg_try_advisory_lock key held by the dispatching process
+REPORT_SCHEDULER_LOCK_ID = 7_347_016
+
+REPORT_SCHEDULER_WORKERS = int(os.getenv("REPORT_SCHEDULER_WORKERS", "4"))
+REPORT_SCHEDULER_PER_ORG_LIMIT = int(os.getenv("REPORT_SCHEDULER_PER_ORG_LIMIT", "1"))
+
+# Delay before a failed report is tried again
+REPORT_SCHEDULER_RETRY_SECONDS = float(os.getenv("REPORT_SCHEDULER_RETRY_SECONDS", "60"))
+
+# Seconds between attempts to take the lock (or reconnect)
+REPORT_SCHEDULER_LEADER_RETRY_SECONDS = float(os.getenv("REPORT_SCHEDULER_LEADER_RETRY_SECONDS", "30"))
+
+# Longest sleep of the dispatcher, so a wall clock adjustment is noticed
+REPORT_SCHEDULER_MAX_SLEEP_SECONDS = 60.0
+
+ACTIVE_SCHEDULES_SQL = """
+SELECT id, organization_id, next_run_at
+FROM scheduled_reports
+WHERE is_active = true AND next_run_at IS NOT NULL
+"""
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    """next_run_at from a row or notification (datetime or ISO string)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+# ============================================================================
+# SCHEDULE QUEUE
+# ============================================================================
+
+class ScheduleQueue:
+    """
+    Next run of every active schedule, earliest first.
+
+    A changed schedule is pushed again; outdated heap entries are dropped
+    when they reach the top.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str]] = []
+        # schedule_id -> (next_run_at, organization_id)
+        self._entries: Dict[str, Tuple[datetime, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def upsert(self, schedule_id: Any, organization_id: Any, next_run_at: Optional[datetime]) -> None:
+        """Set a schedule's next run (None removes it)"""
+        key = str(schedule_id)
+        if next_run_at is None:
+            self._entries.pop(key, None)
+            return
+        entry = (next_run_at, str(organization_id))
+        if self._entries.get(key) != entry:
+            self._entries[key] = entry
+            heapq.heappush(self._heap, (next_run_at, key))
+
+    def remove(self, schedule_id: Any) -> None:
+        self._entries.pop(str(schedule_id), None)
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._entries.clear()
+
+    def _drop_outdated(self) -> None:
+        while self._heap:
+            run_at, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == run_at:
+                return
+            heapq.heappop(self._heap)
+
+    def next_run_at(self) -> Optional[datetime]:
+        self._drop_outdated()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[Tuple[str, str]]:
+        """Remove and return (schedule_id, organization_id) of schedules due at now"""
+        due = []
+        while True:
+            self._drop_outdated()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, key = heapq.heappop(self._heap)
+            due.append((key, self._entries.pop(key)[1]))
+
+
+# ============================================================================
+# REPORT EXECUTION
+# ============================================================================
+
+async def run_due_report(schedule_id: str, supabase: Client) -> Optional[datetime]:
+    """
+    Run one schedule if it is still active and due.
+
+    Returns:
+        The schedule's next run, or None if it is gone, inactive or has no
+        saved report
+
+    Raises:
+        Whatever the report execution raised (its failure is already
+        recorded on the schedule)
+    """
+    # Imported here: routes.analytics imports this module
+    from auth import User
+    from routes.analytics import calculate_next_run, execute_scheduled_report_internal
+
+    result = await async_supabase_call(
+        supabase.table("scheduled_reports")
+        .select("*, saved_report:saved_reports(*)")
+        .eq("id", schedule_id)
+        .eq("is_active", True)
+    )
+    if not result.data:
+        return None
+
+    schedule = result.data[0]
+    next_run_at = _parse_time(schedule.get("next_run_at"))
+    if next_run_at is None or next_run_at > datetime.now(timezone.utc):
+        # Edited or run manually since it was queued
+        return next_run_at
+
+    saved_report = schedule.get("saved_report")
+    if not saved_report:
+        logger.warning(f"Skipping schedule {schedule_id}: No saved report found")
+        return None
+
+    # System user context
+    user = User(
+        id=schedule["created_by"],
+        email="system@scheduler",
+        full_name="System Scheduler",
+        current_organization_id=schedule["organization_id"],
+        current_role="admin",
+        current_role_slug="admin",
+        is_owner=False,
+        role="admin",
+        permissions=[],
+        created_at=datetime.utcnow()
+    )
+
+    execution = await execute_scheduled_report_internal(
+        schedule=schedule,
+        saved_report=saved_report,
+        user=user,
+        execution_type="scheduled",
+        supabase=supabase
+    )
+    logger.info(
+        f"✅ Executed scheduled report: {schedule['name']} "
+        f"(execution_id: {execution['id']})"
+    )
+    return calculate_next_run(schedule["schedule_cron"], schedule.get("timezone", "Europe/Moscow"))
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+class ReportScheduler:
+    """Dispatches due scheduled reports while holding the scheduler lock"""
+
+    def __init__(
+        self,
+        run_report: Optional[Callable[[str], Awaitable[Optional[datetime]]]] = None,
+        workers: int = REPORT_SCHEDULER_WORKERS,
+        per_org_limit: int = REPORT_SCHEDULER_PER_ORG_LIMIT,
+        retry_seconds: float = REPORT_SCHEDULER_RETRY_SECONDS,
+        dsn: Optional[str] = None,
+        supabase: Optional[Client] = None
+    ):
+        """
+        Args:
+            run_report: Runs one schedule and returns its next run
+                (default: run_due_report with one shared Supabase client)
+            dsn: Direct Postgres connection for the lock and LISTEN (not the
+                transaction pooler: session locks must stay on one backend)
+        """
+        self.run_report = run_report or self._run_due_report
+        self.workers = max(1, workers)
+        self.per_org_limit = max(1, per_org_limit)
+        self.retry_seconds = retry_seconds
+        self.dsn = dsn or os.getenv("POSTGRES_DIRECT_URL")
+        self.queue = ScheduleQueue()
+        self.is_leader = False
+        self.runs = 0
+        self.failures = 0
+
+        self._supabase = supabase
+        self._wake = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._ready: "asyncio.Queue[Tuple[str, str]]" = asyncio.Queue()
+        self._running: Counter = Counter()
+        self._waiting: Dict[str, Deque[str]] = defaultdict(deque)
+        self._in_flight: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_due_report(self, schedule_id: str) -> Optional[datetime]:
+        if self._supabase is None:
+            self._supabase = create_client(
+                os.getenv("SUPABASE_URL", ""),
+                os.getenv("SUPABASE_SERVICE_ROLE_KEY", ""),
+            )
+        return await run_due_report(schedule_id, self._supabase)
+
+    # ------------------------------------------------------------------
+    # Schedule changes
+    # ------------------------------------------------------------------
+
+    def load(self, rows: List[Any]) -> None:
+        """Replace the queue with ACTIVE_SCHEDULES_SQL rows"""
+        self.queue.clear()
+        for row in rows:
+            self.queue.upsert(row["id"], row["organization_id"], _parse_time(row["next_run_at"]))
+        self._wake.set()
+
+    def schedule_changed(self, schedule: Dict[str, Any]) -> None:
+        """A schedule row was created or updated"""
+        next_run_at = _parse_time(schedule.get("next_run_at")) if schedule.get("is_active", True) else None
+        self.queue.upsert(schedule["id"], schedule["organization_id"], next_run_at)
+        self._wake.set()
+
+    def schedule_removed(self, schedule_id: Any) -> None:
+        self.queue.remove(schedule_id)
+        self._wake.set()
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        try:
+            change = json.loads(payload)
+            if change["op"] == "DELETE":
+                self.schedule_removed(change["id"])
+            else:
+                self.schedule_changed(change)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring malformed {channel} notification {payload!r}: {e}")
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def _submit(self, schedule_id: str, organization_id: str) -> None:
+        """Hand a due schedule to the workers, or queue it behind its organization's runs"""
+        if schedule_id in self._in_flight:
+            return
+        self._in_flight.add(schedule_id)
+        if self._running[organization_id] < self.per_org_limit:
+            self._running[organization_id] += 1
+            self._ready.put_nowait((schedule_id, organization_id))
+        else:
+            self._waiting[organization_id].append(schedule_id)
+
+    def _release(self, organization_id: str) -> None:
+        """A run of this organization finished: start its next waiting schedule"""
+        waiting = self._waiting.get(organization_id)
+        if waiting:
+            self._ready.put_nowait((waiting.popleft(), organization_id))
+            if not waiting:
+                del self._waiting[organization_id]
+        else:
+            self._running[organization_id] -= 1
+            if self._running[organization_id] <= 0:
+                del self._running[organization_id]
+
+    async def _dispatch(self, until: asyncio.Event) -> None:
+        # Stopped via `until` rather than cancelled: wait_for may swallow a
+        # cancellation that arrives together with a wake-up
+        while not until.is_set():
+            self._wake.clear()
+            now = datetime.now(timezone.utc)
+            for schedule_id, organization_id in self.queue.pop_due(now):
+                self._submit(schedule_id, organization_id)
+
+            timeout = REPORT_SCHEDULER_MAX_SLEEP_SECONDS
+            next_run_at = self.queue.next_run_at()
+            if next_run_at is not None:
+                timeout = min(max((next_run_at - now).total_seconds(), 0), timeout)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            schedule_id, organization_id = await self._ready.get()
+            try:
+                next_run_at = await self.run_report(schedule_id)
+                self.runs += 1
+            except Exception as e:
+                logger.error(f"❌ Failed to execute scheduled report {schedule_id}: {e}", exc_info=True)
+                self.failures += 1
+                next_run_at = datetime.now(timezone.utc) + timedelta(seconds=self.retry_seconds)
+
+            self._in_flight.discard(schedule_id)
+            self.queue.upsert(schedule_id, organization_id, next_run_at)
+            self._release(organization_id)
+            self._wake.set()
+
+    async def _lead(self, until: asyncio.Event) -> None:
+        """Dispatch from the loaded queue until `until` is set (cancels running reports)"""
+        dispatcher = asyncio.create_task(self._dispatch(until))
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await until.wait()
+        finally:
+            until.set()
+            self._wake.set()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(dispatcher, *workers, return_exceptions=True)
+            self._ready = asyncio.Queue()
+            self._running.clear()
+            self._waiting.clear()
+            self._in_flight.clear()
+
+    # ------------------------------------------------------------------
+    # Leadership
+    # ------------------------------------------------------------------
+
+    async def _try_lead(self) -> bool:
+        """Take the lock and dispatch until the connection drops or stop(); False if not taken"""
+        conn = await asyncpg.connect(self.dsn)
+        try:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", REPORT_SCHEDULER_LOCK_ID):
+                return False
+
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda c: lost.set())
+            await conn.add_listener(SCHEDULER_CHANNEL, self._on_notify)
+            self.load(await conn.fetch(ACTIVE_SCHEDULES_SQL))
+            self.is_leader = True
+            logger.info(f"📅 Report scheduler dispatching ({len(self.queue)} active schedules)")
+
+            stop_or_lost = asyncio.Event()
+            watchers = [
+                asyncio.create_task(self._set_when(lost, stop_or_lost)),
+                asyncio.create_task(self._set_when(self._stopped, stop_or_lost)),
+            ]
+            try:
+                await self._lead(stop_or_lost)
+            finally:
+                for watcher in watchers:
+                    watcher.cancel()
+            if lost.is_set():
+                logger.warning("Report scheduler lost its database connection; releasing leadership")
+            return True
+        finally:
+            self.is_leader = False
+            self.queue.clear()
+            if not conn.is_closed():
+                await conn.close()
+
+    @staticmethod
+    async def _set_when(source: asyncio.Event, target: asyncio.Event) -> None:
+        await source.wait()
+        target.set()
+
+    async def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                await self._try_lead()
+            except Exception as e:
+                logger.warning(f"Report scheduler could not reach the database: {e}")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), REPORT_SCHEDULER_LEADER_RETRY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start competing for the scheduler lock (call from a running event loop)"""
+        if self._task is None or self._task.done():
+            self._stopped.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+_report_scheduler: Optional[ReportScheduler] = None
+
+
+def get_report_scheduler() -> Optional[ReportScheduler]:
+    """The process's report scheduler, if one was started"""
+    return _report_scheduler
+
+
+async def start_report_scheduler(supabase: Optional[Client] = None) -> Optional[ReportScheduler]:
+    """
+    Start this process's report scheduler.
+
+    Returns:
+        The scheduler, or None without POSTGRES_DIRECT_URL (the lock needs
+        a direct connection)
+    """
+    global _report_scheduler
+    if _report_scheduler is None:
+        if not os.getenv("POSTGRES_DIRECT_URL"):
+            logger.warning("POSTGRES_DIRECT_URL not set; scheduled reports will not run in this process")
+            return None
+        _report_scheduler = ReportScheduler(supabase=supabase)
+    _report_scheduler.start()
+    return _report_scheduler
+
+
+async def stop_report_scheduler() -> None:
+    """Stop dispatching on shutdown (another replica takes over the lock)"""
+    if _report_scheduler is not None:
+        await _report_scheduler.stop()
+
+
+def notify_schedule_changed(schedule: Dict[str, Any]) -> None:
+    """Update this process's queue after a schedule was created or updated"""
+    if _report_scheduler is not None and _report_scheduler.is_leader:
+        _report_scheduler.schedule_changed(schedule)
+
+
+def notify_schedule_removed(schedule_id: Any) -> None:
+    """Update this process's queue after a schedule was deleted"""
+    if _report_scheduler is not None and _report_scheduler.is_leader:
+        _report_scheduler.schedule_removed(schedule_id)
@@ -0,0 +1,357 @@
+"""
+Russian Formatting - amounts in words (прописью) and number formatting
+
+Single implementation shared by PDF exports (pdf_service), specification
+DOCX export and Excel exports.
+
+Number-to-words works off precomputed tables:
+- words for every 3-digit group 0..999 in masculine and feminine gender
+- plural form index (1 / 2-4 / 5+) for every n % 100
+so converting an amount is a handful of table lookups per group. Whole-number
+conversions are additionally memoized, since totals repeat across exports.
+
+Number formatting ("1 234,56") has scalar and column variants; the column
+variants are used by table-rendering paths to format all amounts of a column
+in one call.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# ============================================================================
+# MORPHOLOGY TABLES
+# ============================================================================
+
+_ONES = ('', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять')
+_ONES_FEMININE = ('', 'одна', 'две', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять')
+_TEENS = ('десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать',
+          'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать')
+_TENS = ('', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят',
+         'шестьдесят', 'семьдесят', 'восемьдесят', 'девяносто')
+_HUNDREDS = ('', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот',
+             'шестьсот', 'семьсот', 'восемьсот', 'девятьсот')
+
+# Scale words (1000^k) with forms [1, 2-4, 5+] and gender (True = feminine)
+_SCALES: Tuple[Tuple[Tuple[str, str, str], bool], ...] = (
+    (('тысяча', 'тысячи', 'тысяч'), True),
+    (('миллион', 'миллиона', 'миллионов'), False),
+    (('миллиард', 'миллиарда', 'миллиардов'), False),
+    (('триллион', 'триллиона', 'триллионов'), False),
+)
+
+
+def _build_group_words(ones: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Words for every 3-digit group 0..999 ('' for 0)"""
+    groups = []
+    for n in range(1000):
+        words = [_HUNDREDS[n // 100]]
+        rest = n % 100
+        if 10 <= rest <= 19:
+            words.append(_TEENS[rest - 10])
+        else:
+            words.append(_TENS[rest // 10])
+            words.append(ones[rest % 10])
+        groups.append(' '.join(filter(None, words)))
+    return tuple(groups)
+
+
+def _plural_index(n: int) -> int:
+    if 11 <= n % 100 <= 19:
+        return 2
+    if n % 10 == 1:
+        return 0
+    if 2 <= n % 10 <= 4:
+        return 1
+    return 2
+
+
+# GROUP_WORDS[feminine][n] -> words for 0 <= n < 1000
+GROUP_WORDS: Tuple[Tuple[str, ...], Tuple[str, ...]] = (
+    _build_group_words(_ONES),
+    _build_group_words(_ONES_FEMININE),
+)
+
+# PLURAL_INDEX[n % 100] -> 0 (1, 21, ...), 1 (2-4, 22-24, ...), 2 (0, 5-20, ...)
+PLURAL_INDEX: Tuple[int, ...] = tuple(_plural_index(n) for n in range(100))
+
+
+class CurrencyForms(NamedTuple):
+    """Russian morphology of a currency"""
+    main: Tuple[str, str, str]            # forms [1, 2-4, 5+] of the main unit
+    cents: Tuple[str, str, str]           # forms [1, 2-4, 5+] of the fractional unit
+    main_feminine: bool
+    cents_feminine: bool
+    names: Dict[str, str]                 # full name by grammatical case
+
+
+CURRENCY_FORMS: Dict[str, CurrencyForms] = {
+    'RUB': CurrencyForms(
+        ('рубль', 'рубля', 'рублей'), ('копейка', 'копейки', 'копеек'), False, True,
+        {'nominative': 'рубль', 'genitive': 'рублей', 'prepositional': 'рублях'},
+    ),
+    'EUR': CurrencyForms(
+        ('евро', 'евро', 'евро'), ('цент', 'цента', 'центов'), False, False,
+        {'nominative': 'евро', 'genitive': 'евро', 'prepositional': 'евро'},
+    ),
+    'USD': CurrencyForms(
+        ('доллар', 'доллара', 'долларов'), ('цент', 'цента', 'центов'), False, False,
+        {'nominative': 'доллар США', 'genitive': 'долларов США', 'prepositional': 'долларах США'},
+    ),
+    'TRY': CurrencyForms(
+        ('лира', 'лиры', 'лир'), ('куруш', 'куруша', 'курушей'), True, False,
+        {'nominative': 'турецкая лира', 'genitive': 'турецких лир', 'prepositional': 'турецких лирах'},
+    ),
+    'CNY': CurrencyForms(
+        ('юань', 'юаня', 'юаней'), ('фэнь', 'фэня', 'фэней'), False, False,
+        {'nominative': 'юань', 'genitive': 'юаней', 'prepositional': 'юанях'},
+    ),
+}
+
+# Fallback for unknown currency codes ("двадцать одна единица 05 сотых")
+DEFAULT_CURRENCY_FORMS = CurrencyForms(
+    ('единица', 'единицы', 'единиц'), ('сотая', 'сотых', 'сотых'), True, True, {},
+)
+
+# Specifications name unknown currencies by code and count their cents as
+# "цент" ("Пять XYZ двадцать один цент")
+DEFAULT_SPECIFICATION_CENTS = ('цент', 'цента', 'центов')
+
+CURRENCY_SYMBOLS: Dict[str, str] = {
+    'RUB': '₽',
+    'USD': '$',
+    'EUR': '€',
+    'CNY': '¥',
+}
+
+
+# ============================================================================
+# NUMBER TO WORDS
+# ============================================================================
+
+def plural_form(n: int, forms: Tuple[str, str, str]) -> str:
+    """Pick the form agreeing with n: forms are [1, 2-4, 5+] (рубль/рубля/рублей)"""
+    return forms[PLURAL_INDEX[n % 100]]
+
+
+@lru_cache(maxsize=4096)
+def integer_to_words(n: int, feminine: bool = False) -> str:
+    """
+    Convert integer to Russian words
+
+    Args:
+        n: Integer with absolute value below 10^15
+        feminine: Gender of the counted noun (affects 1 and 2 in the last group)
+
+    Returns:
+        Words like "двадцать одна тысяча пятьсот" ("ноль" for 0, "минус ..." for negatives)
+
+    Raises:
+        ValueError: If n is too large
+    """
+    if n == 0:
+        return 'ноль'
+    if n < 0:
+        return f"минус {integer_to_words(-n, feminine)}"
+    if n >= 1000 ** (len(_SCALES) + 1):
+        raise ValueError(f"Number out of range for Russian words: {n}")
+
+    words = []
+    for power in range(len(_SCALES), 0, -1):
+        group = (n // 1000 ** power) % 1000
+        if group:
+            forms, scale_feminine = _SCALES[power - 1]
+            words.append(GROUP_WORDS[scale_feminine][group])
+            words.append(plural_form(group, forms))
+
+    words.append(GROUP_WORDS[feminine][n % 1000])
+    return ' '.join(filter(None, words))
+
+
+def get_currency_forms(currency: str) -> CurrencyForms:
+    return CURRENCY_FORMS.get(currency, DEFAULT_CURRENCY_FORMS)
+
+
+def currency_name_russian(currency: str, case: str = "nominative") -> str:
+    """
+    Get Russian currency name in specified grammatical case
+
+    Args:
+        currency: Currency code (USD, EUR, RUB, TRY, CNY)
+        case: Grammatical case (nominative, genitive, prepositional)
+
+    Returns:
+        Russian currency name in specified case (currency code if unknown)
+    """
+    forms = CURRENCY_FORMS.get(currency)
+    if forms is None:
+        return currency
+    return forms.names.get(case, forms.names["nominative"])
+
+
+def cents_word(cents: int, currency: str) -> str:
+    """Fractional unit word agreeing with cents (цент/цента/центов, копейка/...)"""
+    return plural_form(cents, get_currency_forms(currency).cents)
+
+
+def number_to_words_ru(number: float, currency: str = 'RUB') -> str:
+    """
+    Convert an amount to Russian words with currency, cents as digits (invoices)
+
+    Args:
+        number: The amount to convert
+        currency: Currency code (RUB, EUR, USD, etc.)
+
+    Returns:
+        String like "двадцать восемь тысяч пятьсот семьдесят шесть евро 06 центов"
+    """
+    forms = get_currency_forms(currency)
+
+    integer_part = int(abs(number))
+    decimal_part = int(round((abs(number) - integer_part) * 100))
+
+    return ' '.join((
+        integer_to_words(integer_part, forms.main_feminine),
+        plural_form(integer_part, forms.main),
+        f'{decimal_part:02d}',
+        plural_form(decimal_part, forms.cents),
+    ))
+
+
+def number_to_russian_words(amount: Decimal, currency: str) -> str:
+    """
+    Convert an amount to Russian words (прописью), currency in genitive (specifications)
+
+    Args:
+        amount: Decimal amount
+        currency: Currency code (USD, EUR, RUB, TRY, CNY)
+
+    Returns:
+        Russian words representation
+        - For whole numbers: "Сто семь тысяч долларов США"
+        - For decimals: "Одна тысяча пятьсот долларов США пятьдесят центов"
+    """
+    integer_part = int(amount)
+    fractional_part = int(round((amount - integer_part) * 100))
+
+    words = integer_to_words(integer_part).capitalize()
+    currency_name = currency_name_russian(currency, "genitive")
+
+    # Add cents only if fractional part is non-zero
+    if fractional_part == 0:
+        return f"{words} {currency_name}"
+
+    forms = CURRENCY_FORMS.get(currency)
+    if forms is None:
+        cents_forms, cents_feminine = DEFAULT_SPECIFICATION_CENTS, False
+    else:
+        cents_forms, cents_feminine = forms.cents, forms.cents_feminine
+    cents_words = integer_to_words(fractional_part, cents_feminine)
+    return f"{words} {currency_name} {cents_words} {plural_form(fractional_part, cents_forms)}"
+
+
+# ============================================================================
+# NUMBER FORMATTING
+# ============================================================================
+
+ZERO_RU = "0,00"
+
+
+def format_ru_number(value: Any) -> str:
+    """
+    Format number with Russian style: 1 234,56
+
+    None and non-numeric values are formatted as "0,00".
+    """
+    if value is None:
+        return ZERO_RU
+    try:
+        # Python's "," grouping uses comma for thousands and dot for decimals
+        return f"{float(value):,.2f}".replace(',', ' ').replace('.', ',')
+    except (ValueError, TypeError):
+        return ZERO_RU
+
+
+def format_ru_currency(value: Any, currency_symbol: str = '₽') -> str:
+    """Format amount as Russian currency with trailing symbol: 1 234,56 ₽"""
+    return f"{format_ru_number(value)} {currency_symbol}"
+
+
+def format_ru_currency_code(value: Any, currency: str = 'RUB') -> str:
+    """
+    Format amount with symbol placed per currency: "1 234,56 ₽", "$1 234,56"
+
+    None is always formatted as "0,00 ₽".
+    """
+    if value is None:
+        return f"{ZERO_RU} ₽"
+
+    formatted = format_ru_number(value)
+    if currency == 'USD':
+        return f"${formatted}"
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    return f"{formatted} {symbol or currency}"
+
+
+def format_ru_number_column(values: Iterable[Any]) -> List[str]:
+    """
+    Format a column of amounts with Russian style
+
+    Equivalent to [format_ru_number(v) for v in values]; repeated values
+    (zeros, identical unit prices) are formatted once.
+    """
+    formatted: Dict[Any, str] = {}
+    result = []
+    append = result.append
+    for value in values:
+        try:
+            text = formatted.get(value)
+        except TypeError:
+            # Unhashable value - format without memo
+            append(format_ru_number(value))
+            continue
+        if text is None:
+            if value is None:
+                text = ZERO_RU
+            else:
+                try:
+                    text = f"{float(value):,.2f}".replace(',', ' ').replace('.', ',')
+                except (ValueError, TypeError):
+                    text = ZERO_RU
+            formatted[value] = text
+        append(text)
+    return result
+
+
+def format_ru_currency_column(values: Iterable[Any], currency_symbol: str = '₽') -> List[str]:
+    """Format a column of amounts as Russian currency with trailing symbol"""
+    suffix = f" {currency_symbol}"
+    return [text + suffix for text in format_ru_number_column(values)]
+
+
+def format_columns(
+    rows: List[Dict[str, Any]],
+    columns: Iterable[Tuple[str, str]],
+    currency_symbol: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """
+    Format several amount columns of a table at once
+
+    Args:
+        rows: Source rows (e.g. calculation_results of each item)
+        columns: (output key, source key) pairs; missing source values count as 0
+        currency_symbol: Append symbol (currency format) if given, else plain numbers
+
+    Returns:
+        One dict per row with formatted values under output keys
+    """
+    formatted_rows: List[Dict[str, str]] = [{} for _ in rows]
+    for output_key, source_key in columns:
+        values = [row.get(source_key, 0) for row in rows]
+        if currency_symbol is None:
+            column = format_ru_number_column(values)
+        else:
+            column = format_ru_currency_column(values, currency_symbol)
+        for formatted_row, text in zip(formatted_rows, column):
+            formatted_row[output_key] = text
+    return formatted_rows
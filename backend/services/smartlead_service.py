@@ -4,17 +4,28 @@ SmartLead API Service - Email Campaign Analytics Integration
 This service fetches campaign metrics from SmartLead API and caches them
 in the database. Data is refreshed on-demand via sync button or scheduled job.
 
+Syncs fetch the campaign list once, skip campaigns that cannot have
+changed since their last sync, fetch the rest with a pool of
+SMARTLEAD_SYNC_CONCURRENCY workers under a shared token bucket
+(SMARTLEAD_RATE_PER_SECOND) and store them with one upsert.
+
 API Documentation: https://api.smartlead.ai/api-docs
 """
+import asyncio
+import json
 import os
 import httpx
 import logging
 from decimal import Decimal
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple, Union
 from uuid import UUID
 
+import asyncpg
 from supabase import create_client, Client
+
+from db_pool import init_db_pool
+from http_pool import RateLimiter, get_http_client, get_rate_limiter, get_retry_budget
 from domain_models.dashboard import (
     CampaignMetrics,
     CampaignData,
@@ -36,6 +47,71 @@ RETRY_BACKOFF_BASE = 2
 # Cache TTL in seconds (5 minutes)
 CACHE_TTL_SECONDS = 300
 
+# SmartLead allows 10 requests per 2 seconds per API key
+SMARTLEAD_RATE_PER_SECOND = float(os.getenv("SMARTLEAD_RATE_PER_SECOND", "5"))
+SMARTLEAD_RATE_BURST = float(os.getenv("SMARTLEAD_RATE_BURST", "10"))
+
+# Campaigns fetched at once during a sync
+SMARTLEAD_SYNC_CONCURRENCY = int(os.getenv("SMARTLEAD_SYNC_CONCURRENCY", "8"))
+
+# Campaign statuses whose metrics keep changing without an edit to the campaign
+ACTIVE_CAMPAIGN_STATUSES = {"ACTIVE"}
+
+# Paused, stopped and completed campaigns still receive replies; refetch them this often
+SMARTLEAD_INACTIVE_SYNC_TTL_SECONDS = int(os.getenv("SMARTLEAD_INACTIVE_SYNC_TTL_SECONDS", str(24 * 3600)))
+
+# $1 organization
+CAMPAIGN_SYNC_STATE_SQL = """
+SELECT campaign_id, synced_at
+FROM campaign_data
+WHERE organization_id = $1::uuid AND source = 'smartlead' AND campaign_id IS NOT NULL
+"""
+
+# $1 organization, $2 JSON array of {campaign_id, campaign_name, metrics}.
+# The conflict target is the partial unique index idx_campaign_data_unique_smartlead.
+CAMPAIGN_DATA_UPSERT_SQL = """
+INSERT INTO campaign_data (
+    organization_id, source, campaign_id, campaign_name, metrics, synced_at, updated_at
+)
+SELECT $1::uuid, 'smartlead', r.campaign_id, r.campaign_name, r.metrics, now(), now()
+FROM jsonb_to_recordset($2::jsonb) AS r(campaign_id text, campaign_name text, metrics jsonb)
+ON CONFLICT (organization_id, campaign_id) WHERE source = 'smartlead' AND campaign_id IS NOT NULL
+DO UPDATE SET
+    campaign_name = EXCLUDED.campaign_name,
+    metrics = EXCLUDED.metrics,
+    synced_at = EXCLUDED.synced_at,
+    updated_at = EXCLUDED.updated_at
+RETURNING id, organization_id, source, campaign_id, campaign_name, metrics,
+          period_start, period_end, synced_at, created_at, updated_at
+"""
+
+
+def campaign_needs_sync(
+    campaign: SmartLeadCampaign,
+    synced_at: Optional[datetime],
+    now: datetime,
+    ttl_seconds: float = CACHE_TTL_SECONDS,
+    inactive_ttl_seconds: float = SMARTLEAD_INACTIVE_SYNC_TTL_SECONDS
+) -> bool:
+    """
+    Whether a campaign may have changed since it was last synced.
+
+    Campaigns synced within ttl_seconds are skipped. Active campaigns change
+    continuously (sends, opens, replies). Paused, stopped or completed ones
+    are refetched when edited after the last sync, and otherwise every
+    inactive_ttl_seconds, since leads keep replying to finished campaigns.
+    """
+    if synced_at is None:
+        return True
+    age = (now - synced_at).total_seconds()
+    if age < ttl_seconds:
+        return False
+    if (campaign.status or "").upper() in ACTIVE_CAMPAIGN_STATUSES:
+        return True
+    if age >= inactive_ttl_seconds:
+        return True
+    return campaign.updated_at is None or campaign.updated_at > synced_at
+
 
 class SmartLeadService:
     """
@@ -48,27 +124,59 @@ class SmartLeadService:
     - Database caching with sync-on-demand pattern
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        pool: Optional[asyncpg.Pool] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency: int = SMARTLEAD_SYNC_CONCURRENCY,
+    ):
         """
         Initialize SmartLead service.
 
         Args:
             api_key: SmartLead API key. If not provided, reads from environment.
+            http_client: Outbound HTTP client. Defaults to the shared pooled client.
+            pool: Database pool for sync state and upserts. Defaults to db_pool.
+            rate_limiter: Request rate limiter. Defaults to the shared "smartlead" bucket.
+            concurrency: Campaigns fetched at once during a sync
         """
         self.api_key = api_key or os.getenv("SMARTLEAD_API_KEY")
         if not self.api_key:
             logger.warning("SmartLead API key not configured")
 
-        # In-memory cache for rate limiting
-        self._last_request_time: Optional[datetime] = None
-        self._min_request_interval = 0.5  # seconds between requests
+        self._http_client = http_client
+        self._pool = pool
+        self._rate_limiter = rate_limiter
+        self.concurrency = max(1, concurrency)
+        self._supabase: Optional[Client] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Injected client, else the shared pooled client"""
+        return self._http_client or get_http_client()
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """Injected limiter, else the bucket shared by all SmartLead callers"""
+        if self._rate_limiter is None:
+            return get_rate_limiter("smartlead", SMARTLEAD_RATE_PER_SECOND, SMARTLEAD_RATE_BURST)
+        return self._rate_limiter
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            return await init_db_pool()
+        return self._pool
 
     def _get_supabase_client(self) -> Client:
-        """Get Supabase client for database operations."""
-        return create_client(
-            os.getenv("SUPABASE_URL", ""),
-            os.getenv("SUPABASE_SERVICE_ROLE_KEY", ""),
-        )
+        """Get Supabase client for database operations (created once)."""
+        if self._supabase is None:
+            self._supabase = create_client(
+                os.getenv("SUPABASE_URL", ""),
+                os.getenv("SUPABASE_SERVICE_ROLE_KEY", ""),
+            )
+        return self._supabase
 
     async def _make_request(
         self, endpoint: str, params: Optional[Dict[str, Any]] = None
@@ -94,22 +202,27 @@ class SmartLeadService:
         request_params = params or {}
         request_params["api_key"] = self.api_key
 
+        budget = get_retry_budget("smartlead")
+        budget.record_request()
+
+        limiter = self.rate_limiter
+
         for attempt in range(MAX_RETRIES):
             try:
-                async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-                    response = await client.get(url, params=request_params)
+                await limiter.acquire()
+                response = await self.http_client.get(
+                    url, params=request_params, timeout=REQUEST_TIMEOUT
+                )
 
-                    # Check for rate limiting
-                    if response.status_code == 429:
-                        wait_time = int(response.headers.get("Retry-After", "60"))
-                        logger.warning(f"Rate limited, waiting {wait_time}s")
-                        import asyncio
+                # Rate limited: hold back every SmartLead request, not just this one
+                if response.status_code == 429:
+                    wait_time = float(response.headers.get("Retry-After", "60"))
+                    logger.warning(f"Rate limited, pausing SmartLead requests for {wait_time}s")
+                    limiter.pause(wait_time)
+                    continue
 
-                        await asyncio.sleep(wait_time)
-                        continue
-
-                    response.raise_for_status()
-                    return response.json()
+                response.raise_for_status()
+                return response.json()
 
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 401:
@@ -124,9 +237,7 @@ class SmartLeadService:
                         f"SmartLead API error (attempt {attempt + 1}/{MAX_RETRIES}): {e}. "
                         f"Retrying in {wait_time}s..."
                     )
-                    if attempt < MAX_RETRIES - 1:
-                        import asyncio
-
+                    if attempt < MAX_RETRIES - 1 and budget.try_retry():
                         await asyncio.sleep(wait_time)
                     else:
                         raise
@@ -137,9 +248,7 @@ class SmartLeadService:
                     f"SmartLead API connection error (attempt {attempt + 1}/{MAX_RETRIES}): {e}. "
                     f"Retrying in {wait_time}s..."
                 )
-                if attempt < MAX_RETRIES - 1:
-                    import asyncio
-
+                if attempt < MAX_RETRIES - 1 and budget.try_retry():
                     await asyncio.sleep(wait_time)
                 else:
                     raise
@@ -167,6 +276,7 @@ class SmartLeadService:
                         name=item.get("name", "Unknown Campaign"),
                         status=item.get("status"),
                         created_at=item.get("created_at"),
+                        updated_at=item.get("updated_at"),
                     )
                 )
 
@@ -385,85 +495,135 @@ class SmartLeadService:
 
         return metrics
 
-    async def sync_campaign(
-        self, campaign_id: str, organization_id: UUID
-    ) -> Optional[CampaignData]:
+    async def fetch_campaign_metrics(self, campaign_id: str) -> CampaignMetrics:
         """
-        Sync a single campaign from SmartLead to database.
+        Fetch analytics, lead statistics and leads of a campaign concurrently.
 
         Args:
             campaign_id: SmartLead campaign ID
-            organization_id: Organization to associate data with
 
         Returns:
-            CampaignData if successful, None if failed
+            CampaignMetrics with rates calculated
         """
-        try:
-            # Fetch campaign details
-            campaigns = await self.get_campaigns()
-            campaign = next((c for c in campaigns if c.id == campaign_id), None)
-
-            if not campaign:
-                logger.warning(f"Campaign {campaign_id} not found in SmartLead")
-                return None
+        analytics, lead_stats, leads_result = await asyncio.gather(
+            self.get_campaign_analytics(campaign_id),
+            self.get_campaign_lead_statistics(campaign_id),
+            self.get_campaign_leads(campaign_id),
+        )
+        category_counts = self._count_lead_categories(
+            leads_result["leads"],
+            leads_result["total_leads"]
+        )
+        return self._parse_metrics(analytics, lead_stats, category_counts)
 
-            # Fetch analytics and lead stats
-            analytics = await self.get_campaign_analytics(campaign_id)
-            lead_stats = await self.get_campaign_lead_statistics(campaign_id)
+    async def _fetch_all_metrics(
+        self, campaigns: Sequence[SmartLeadCampaign]
+    ) -> Dict[str, Union[CampaignMetrics, Exception]]:
+        """
+        Fetch metrics of many campaigns with a pool of self.concurrency workers.
 
-            # Fetch leads to count CRM categories
-            leads_result = await self.get_campaign_leads(campaign_id)
-            category_counts = self._count_lead_categories(
-                leads_result["leads"],
-                leads_result["total_leads"]
-            )
+        Returns:
+            Campaign ID -> metrics, or the exception its fetch raised
+        """
+        queue: "asyncio.Queue[SmartLeadCampaign]" = asyncio.Queue()
+        for campaign in campaigns:
+            queue.put_nowait(campaign)
+        results: Dict[str, Union[CampaignMetrics, Exception]] = {}
+
+        async def worker():
+            while not queue.empty():
+                campaign = queue.get_nowait()
+                try:
+                    results[campaign.id] = await self.fetch_campaign_metrics(campaign.id)
+                except Exception as e:
+                    logger.error(f"Error fetching campaign {campaign.id}: {e}")
+                    results[campaign.id] = e
 
-            # Parse into metrics (include category counts)
-            metrics = self._parse_metrics(analytics, lead_stats, category_counts)
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(campaigns)))))
+        return results
 
-            # Store in database (upsert based on campaign_id)
-            supabase = self._get_supabase_client()
+    async def load_sync_state(self, organization_id: UUID) -> Dict[str, datetime]:
+        """Last synced_at of each SmartLead campaign stored for the organization"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(CAMPAIGN_SYNC_STATE_SQL, str(organization_id))
+        return {r["campaign_id"]: r["synced_at"] for r in rows}
 
-            now = datetime.now(timezone.utc).isoformat()
+    async def store_campaign_data(
+        self,
+        organization_id: UUID,
+        entries: Sequence[Tuple[SmartLeadCampaign, CampaignMetrics]],
+    ) -> List[CampaignData]:
+        """
+        Upsert campaign metrics into campaign_data in one statement.
 
-            # Check if campaign data exists
-            existing = (
-                supabase.table("campaign_data")
-                .select("id")
-                .eq("organization_id", str(organization_id))
-                .eq("campaign_id", campaign_id)
-                .eq("source", "smartlead")
-                .execute()
-            )
+        Args:
+            organization_id: Organization to associate data with
+            entries: (campaign, metrics) pairs
 
-            campaign_data_dict = {
-                "organization_id": str(organization_id),
-                "source": "smartlead",
-                "campaign_id": campaign_id,
+        Returns:
+            Stored CampaignData rows
+        """
+        # One row per campaign: ON CONFLICT cannot touch a row twice
+        rows = {
+            campaign.id: {
+                "campaign_id": campaign.id,
                 "campaign_name": campaign.name,
                 "metrics": metrics.model_dump(mode="json"),  # Serialize Decimals to JSON-compatible format
-                "synced_at": now,
-                "updated_at": now,
             }
+            for campaign, metrics in entries
+        }
+        if not rows:
+            return []
 
-            if existing.data:
-                # Update existing record
-                result = (
-                    supabase.table("campaign_data")
-                    .update(campaign_data_dict)
-                    .eq("id", existing.data[0]["id"])
-                    .execute()
-                )
-            else:
-                # Insert new record
-                campaign_data_dict["created_at"] = now
-                result = (
-                    supabase.table("campaign_data").insert(campaign_data_dict).execute()
-                )
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            stored = await conn.fetch(
+                CAMPAIGN_DATA_UPSERT_SQL,
+                str(organization_id),
+                json.dumps(list(rows.values()), ensure_ascii=False),
+            )
+
+        result = []
+        for record in stored:
+            data = dict(record)
+            if isinstance(data["metrics"], str):
+                data["metrics"] = json.loads(data["metrics"])
+            result.append(CampaignData(**data))
+        return result
 
-            if result.data:
+    async def sync_campaign(
+        self,
+        campaign_id: str,
+        organization_id: UUID,
+        campaign: Optional[SmartLeadCampaign] = None,
+    ) -> Optional[CampaignData]:
+        """
+        Sync a single campaign from SmartLead to database.
+
+        Args:
+            campaign_id: SmartLead campaign ID
+            organization_id: Organization to associate data with
+            campaign: Campaign from an already fetched list (skips get_campaigns)
+
+        Returns:
+            CampaignData if successful, None if failed
+        """
+        try:
+            if campaign is None:
+                campaigns = await self.get_campaigns()
+                campaign = next((c for c in campaigns if c.id == campaign_id), None)
+
+            if not campaign:
+                logger.warning(f"Campaign {campaign_id} not found in SmartLead")
+                return None
+
+            metrics = await self.fetch_campaign_metrics(campaign_id)
+            stored = await self.store_campaign_data(organization_id, [(campaign, metrics)])
+
+            if stored:
                 logger.info(f"Successfully synced campaign {campaign_id}")
-                return CampaignData(**result.data[0])
+                return stored[0]
             return None
 
         except Exception as e:
@@ -479,6 +639,10 @@ class SmartLeadService:
         """
         Sync multiple campaigns from SmartLead to database.
 
+        The campaign list is fetched once per run. Unless force_refresh is
+        set, campaigns that cannot have changed since their last sync
+        (campaign_needs_sync) are skipped.
+
         Args:
             organization_id: Organization to associate data with
             campaign_ids: Specific campaigns to sync (None = all)
@@ -489,7 +653,6 @@ class SmartLeadService:
         """
         synced_campaigns: List[CampaignData] = []
         errors: List[str] = []
-        synced_count = 0
         failed_count = 0
 
         try:
@@ -501,53 +664,38 @@ class SmartLeadService:
             else:
                 campaigns_to_sync = all_campaigns
 
+            if not force_refresh and campaigns_to_sync:
+                synced_at = await self.load_sync_state(organization_id)
+                now = datetime.now(timezone.utc)
+                changed = [c for c in campaigns_to_sync if campaign_needs_sync(c, synced_at.get(c.id), now)]
+                logger.debug(f"Skipping {len(campaigns_to_sync) - len(changed)} unchanged campaigns")
+                campaigns_to_sync = changed
+
             logger.info(f"Syncing {len(campaigns_to_sync)} campaigns for org {organization_id}")
 
+            results = await self._fetch_all_metrics(campaigns_to_sync)
+            fetched = []
             for campaign in campaigns_to_sync:
-                try:
-                    # Check cache TTL if not forcing refresh
-                    if not force_refresh:
-                        supabase = self._get_supabase_client()
-                        existing = (
-                            supabase.table("campaign_data")
-                            .select("synced_at")
-                            .eq("organization_id", str(organization_id))
-                            .eq("campaign_id", campaign.id)
-                            .eq("source", "smartlead")
-                            .execute()
-                        )
-
-                        if existing.data:
-                            synced_at = datetime.fromisoformat(
-                                existing.data[0]["synced_at"].replace("Z", "+00:00")
-                            )
-                            age = (datetime.now(timezone.utc) - synced_at).total_seconds()
-                            if age < CACHE_TTL_SECONDS:
-                                logger.debug(
-                                    f"Skipping campaign {campaign.id} - cache still valid"
-                                )
-                                continue
-
-                    # Sync campaign
-                    result = await self.sync_campaign(campaign.id, organization_id)
-                    if result:
-                        synced_campaigns.append(result)
-                        synced_count += 1
-                    else:
-                        failed_count += 1
-                        errors.append(f"Failed to sync campaign: {campaign.name}")
-
-                except Exception as e:
+                result = results[campaign.id]
+                if isinstance(result, Exception):
                     failed_count += 1
-                    errors.append(f"Error syncing {campaign.name}: {str(e)}")
-                    logger.error(f"Error syncing campaign {campaign.id}: {e}")
+                    errors.append(f"Error syncing {campaign.name}: {str(result)}")
+                else:
+                    fetched.append((campaign, result))
+
+            try:
+                synced_campaigns = await self.store_campaign_data(organization_id, fetched)
+            except Exception as e:
+                logger.error(f"Failed to store synced campaigns: {e}")
+                failed_count += len(fetched)
+                errors.append(f"Failed to store campaigns: {str(e)}")
 
         except Exception as e:
             logger.error(f"Failed to sync campaigns: {e}")
             errors.append(f"Failed to fetch campaigns list: {str(e)}")
 
         return SmartLeadSyncResult(
-            synced_count=synced_count,
+            synced_count=len(synced_campaigns),
             failed_count=failed_count,
             campaigns=synced_campaigns,
             errors=errors,
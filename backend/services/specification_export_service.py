@@ -2,18 +2,25 @@
 Specification Export Service - Russian B2B Quotation System
 Generates DOCX specification documents (Спецификация) from quotes
 """
+import copy
 import os
+import re
+import threading
 from decimal import Decimal
 from datetime import date, datetime
-from typing import Dict, List, Optional, Any
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional, Any, Tuple
 from uuid import UUID
 
 from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from num2words import num2words
 
 from services.export_data_mapper import format_payment_terms
+from services.russian_formatting import number_to_russian_words
 
 
 # ============================================================================
@@ -132,132 +139,6 @@ def _format_seller_company_director_name(seller_company: Dict[str, Any]) -> str:
     return ""
 
 
-# ============================================================================
-# CURRENCY HELPERS
-# ============================================================================
-
-def currency_name_russian(currency: str, case: str = "nominative") -> str:
-    """
-    Get Russian currency name in specified grammatical case
-
-    Args:
-        currency: Currency code (USD, EUR, RUB, TRY, CNY)
-        case: Grammatical case (nominative, genitive, prepositional)
-
-    Returns:
-        Russian currency name in specified case
-    """
-    currency_names = {
-        "USD": {
-            "nominative": "доллар США",
-            "genitive": "долларов США",
-            "prepositional": "долларах США"
-        },
-        "EUR": {
-            "nominative": "евро",
-            "genitive": "евро",
-            "prepositional": "евро"
-        },
-        "RUB": {
-            "nominative": "рубль",
-            "genitive": "рублей",
-            "prepositional": "рублях"
-        },
-        "TRY": {
-            "nominative": "турецкая лира",
-            "genitive": "турецких лир",
-            "prepositional": "турецких лирах"
-        },
-        "CNY": {
-            "nominative": "юань",
-            "genitive": "юаней",
-            "prepositional": "юанях"
-        }
-    }
-
-    if currency not in currency_names:
-        return currency
-
-    return currency_names[currency].get(case, currency_names[currency]["nominative"])
-
-
-def number_to_russian_words(amount: Decimal, currency: str) -> str:
-    """
-    Convert number to Russian words (прописью)
-
-    Args:
-        amount: Decimal amount
-        currency: Currency code (USD, EUR, RUB, TRY, CNY)
-
-    Returns:
-        Russian words representation
-        - For whole numbers: "Сто семь тысяч долларов США"
-        - For decimals: "Сто семь тысяч долларов США 33 цента"
-
-    Example:
-        >>> number_to_russian_words(Decimal("1500.50"), "USD")
-        "Одна тысяча пятьсот долларов США 50 центов"
-        >>> number_to_russian_words(Decimal("107000.00"), "USD")
-        "Сто семь тысяч долларов США"
-    """
-    # Split into integer and fractional parts
-    integer_part = int(amount)
-    fractional_part = int(round((amount - integer_part) * 100))
-
-    # Convert integer part to Russian words
-    # num2words for Russian uses genitive case for currency
-    if integer_part == 0:
-        words = "Ноль"
-    else:
-        words = num2words(integer_part, lang='ru').capitalize()
-
-    # Get currency name in genitive case
-    currency_name = currency_name_russian(currency, "genitive")
-
-    # Build result - add cents only if fractional part is non-zero
-    if fractional_part == 0:
-        result = f"{words} {currency_name}"
-    else:
-        # Get cents word in proper grammatical form
-        cents_word = _get_cents_word(fractional_part, currency)
-        cents_num_words = num2words(fractional_part, lang='ru')
-        result = f"{words} {currency_name} {cents_num_words} {cents_word}"
-
-    return result
-
-
-def _get_cents_word(cents: int, currency: str) -> str:
-    """
-    Get the appropriate word for cents/kopecks based on number and currency
-
-    Russian grammar rules for numbers:
-    - 1: цент (singular)
-    - 2-4: цента (genitive singular)
-    - 5-20: центов (genitive plural)
-    - 21: цент, 22-24: цента, 25-30: центов, etc.
-    """
-    cents_names = {
-        "USD": ("цент", "цента", "центов"),
-        "EUR": ("цент", "цента", "центов"),
-        "RUB": ("копейка", "копейки", "копеек"),
-        "TRY": ("куруш", "куруша", "курушей"),
-        "CNY": ("фынь", "фыня", "фыней"),
-    }
-
-    words = cents_names.get(currency, ("цент", "цента", "центов"))
-
-    # Russian grammar rules for number agreement
-    if 11 <= cents <= 19:
-        return words[2]  # plural genitive (центов)
-    last_digit = cents % 10
-    if last_digit == 1:
-        return words[0]  # singular (цент)
-    elif 2 <= last_digit <= 4:
-        return words[1]  # genitive singular (цента)
-    else:
-        return words[2]  # plural genitive (центов)
-
-
 # ============================================================================
 # DATA GATHERING
 # ============================================================================
@@ -584,6 +465,112 @@ async def gather_specification_data(
 # DOCX GENERATION
 # ============================================================================
 
+PLACEHOLDER_PATTERN = re.compile(r"\[([A-Za-z0-9_]+)\]")
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "templates",
+    "specification_template.docx"
+)
+
+
+class PlaceholderSlot(NamedTuple):
+    """
+    Location of template text containing [key] placeholders
+
+    ordinal is the position of the run (or paragraph, when a placeholder is
+    split across runs) in document order, so it resolves the same element in
+    any clone of the template.
+    """
+    ordinal: int
+    text: str
+    keys: Tuple[str, ...]
+
+
+class PlaceholderIndex(NamedTuple):
+    """Placeholder slots of a document, split by substitution target"""
+    runs: Tuple[PlaceholderSlot, ...]
+    paragraphs: Tuple[PlaceholderSlot, ...]
+
+
+def build_placeholder_index(doc: Document) -> PlaceholderIndex:
+    """
+    Scan document body once and record every run holding a placeholder
+
+    Placeholders that fit inside a single run are substituted on that run,
+    which keeps its formatting. Paragraphs where a placeholder is split
+    across runs are recorded whole and rewritten like before.
+
+    Args:
+        doc: python-docx Document object
+
+    Returns:
+        PlaceholderIndex with run-level and paragraph-level slots
+    """
+    body = doc.element.body
+    run_ordinals = {r: i for i, r in enumerate(body.iter(qn("w:r")))}
+
+    run_slots: List[PlaceholderSlot] = []
+    paragraph_slots: List[PlaceholderSlot] = []
+
+    for p_ordinal, p in enumerate(body.iter(qn("w:p"))):
+        paragraph = Paragraph(p, None)
+        paragraph_text = paragraph.text
+        paragraph_keys = PLACEHOLDER_PATTERN.findall(paragraph_text)
+        if not paragraph_keys:
+            continue
+
+        slots = []
+        for r in p.iter(qn("w:r")):
+            run_text = Run(r, None).text
+            run_keys = PLACEHOLDER_PATTERN.findall(run_text)
+            if run_keys:
+                slots.append(PlaceholderSlot(run_ordinals[r], run_text, tuple(run_keys)))
+
+        if sum(len(slot.keys) for slot in slots) == len(paragraph_keys):
+            run_slots.extend(slots)
+        else:
+            paragraph_slots.append(PlaceholderSlot(p_ordinal, paragraph_text, tuple(paragraph_keys)))
+
+    return PlaceholderIndex(tuple(run_slots), tuple(paragraph_slots))
+
+
+def _substitute(slot: PlaceholderSlot, variables: Dict[str, Any]) -> str:
+    """Replace slot placeholders that have a value, leave unknown ones intact"""
+    text = slot.text
+    for key in slot.keys:
+        if key in variables:
+            text = text.replace(f"[{key}]", str(variables[key]))
+    return text
+
+
+def apply_placeholder_index(doc: Document, index: PlaceholderIndex, variables: Dict[str, Any]) -> Document:
+    """
+    Substitute variables at the locations recorded in a placeholder index
+
+    Args:
+        doc: Document with the same structure the index was built from
+        index: PlaceholderIndex from build_placeholder_index
+        variables: Dictionary of variable name -> value mappings
+
+    Returns:
+        Modified Document object
+    """
+    body = doc.element.body
+
+    if index.runs:
+        runs = list(body.iter(qn("w:r")))
+        for slot in index.runs:
+            Run(runs[slot.ordinal], None).text = _substitute(slot, variables)
+
+    if index.paragraphs:
+        paragraphs = list(body.iter(qn("w:p")))
+        for slot in index.paragraphs:
+            Paragraph(paragraphs[slot.ordinal], None).text = _substitute(slot, variables)
+
+    return doc
+
+
 def replace_variables_in_docx(doc: Document, variables: Dict[str, Any]) -> Document:
     """
     Replace template variables in DOCX document
@@ -597,25 +584,61 @@ def replace_variables_in_docx(doc: Document, variables: Dict[str, Any]) -> Docum
     Returns:
         Modified Document object
     """
-    # Replace in paragraphs
-    for paragraph in doc.paragraphs:
-        for key, value in variables.items():
-            placeholder = f"[{key}]"
-            if placeholder in paragraph.text:
-                # Replace placeholder with value
-                paragraph.text = paragraph.text.replace(placeholder, str(value))
-
-    # Replace in tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    for key, value in variables.items():
-                        placeholder = f"[{key}]"
-                        if placeholder in paragraph.text:
-                            paragraph.text = paragraph.text.replace(placeholder, str(value))
+    return apply_placeholder_index(doc, build_placeholder_index(doc), variables)
 
-    return doc
+
+class SpecificationTemplate:
+    """
+    Specification template parsed once and kept in memory
+
+    Every export works on a deep copy of the parsed document and reuses the
+    placeholder index built at load time.
+    """
+
+    def __init__(self, template_path: str):
+        self.template_path = template_path
+        self.mtime = os.path.getmtime(template_path)
+        self._document = Document(template_path)
+        self.placeholder_index = build_placeholder_index(self._document)
+
+    def clone(self) -> Document:
+        """Return an independent copy of the parsed template"""
+        return copy.deepcopy(self._document)
+
+    def render(self, variables: Dict[str, Any], products: List[Dict[str, Any]]) -> bytes:
+        """
+        Fill a clone of the template and return the DOCX bytes
+
+        Args:
+            variables: Dictionary of variable name -> value mappings
+            products: List of product dictionaries with sales prices
+
+        Returns:
+            DOCX file contents
+        """
+        doc = apply_placeholder_index(self.clone(), self.placeholder_index, variables)
+        doc = fill_products_table(doc, products)
+
+        output = BytesIO()
+        doc.save(output)
+        return output.getvalue()
+
+
+_templates: Dict[str, SpecificationTemplate] = {}
+_templates_lock = threading.Lock()
+
+
+def get_specification_template(template_path: str = TEMPLATE_PATH) -> SpecificationTemplate:
+    """Return cached parsed template, reloading it when the file changes on disk"""
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template file not found: {template_path}")
+
+    with _templates_lock:
+        template = _templates.get(template_path)
+        if template is None or template.mtime != os.path.getmtime(template_path):
+            template = SpecificationTemplate(template_path)
+            _templates[template_path] = template
+        return template
 
 
 def remove_column(table, col_index: int):
@@ -726,17 +749,17 @@ async def generate_specification(
     warehouse_index: Optional[int] = None,
     delivery_address_id: Optional[UUID] = None,
     signatory_contact_id: Optional[UUID] = None
-) -> str:
+) -> Tuple[str, bytes]:
     """
-    Generate specification DOCX document
+    Generate specification DOCX document in memory
 
     Steps:
     1. Gather all data
-    2. Load template DOCX
+    2. Clone cached template DOCX
     3. Replace variables
     4. Fill products table
-    5. Save to temporary file
-    6. Return file path
+    5. Save to bytes
+    6. Return filename and contents
 
     Args:
         quote_id: Quote UUID
@@ -750,7 +773,7 @@ async def generate_specification(
         signatory_contact_id: New - UUID of signatory contact from customer_contacts table
 
     Returns:
-        Path to generated DOCX file
+        Tuple of (filename, DOCX bytes)
 
     Raises:
         ValueError: If data is invalid or missing
@@ -772,42 +795,20 @@ async def generate_specification(
     if additional_conditions:
         data["additional_conditions"] = additional_conditions
 
-    # 2. Load template
-    template_path = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)),
-        "templates",
-        "specification_template.docx"
-    )
-
-    if not os.path.exists(template_path):
-        raise FileNotFoundError(f"Template file not found: {template_path}")
-
-    doc = Document(template_path)
+    # 2. Get cached template (parsed once, cloned per export)
+    template = get_specification_template()
 
     # 3. Prepare variables for replacement (exclude products list)
     variables = {k: v for k, v in data.items() if k != "products"}
 
-    # 4. Replace variables
-    doc = replace_variables_in_docx(doc, variables)
-
-    # 5. Fill products table
-    doc = fill_products_table(doc, data["products"])
-
-    # 6. Save to temporary file
-    output_dir = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)),
-        "temp_exports"
-    )
-    os.makedirs(output_dir, exist_ok=True)
+    # 4-6. Replace variables, fill products table and save to bytes
+    docx_bytes = template.render(variables, data["products"])
 
     # Filename format: spec-{quote_idn}-{spec_number}.docx
     # Example: spec-КП25-0018-1.docx (first specification for quote КП25-0018)
     quote_idn = data.get("quote_number") or f"quote-{str(quote_id)[:8]}"
     spec_number = data["specification_number"]
     output_filename = f"spec-{quote_idn}-{spec_number}.docx"
-    output_path = os.path.join(output_dir, output_filename)
-
-    doc.save(output_path)
 
     # 7. Create audit record in specification_exports table
     # Convert Decimal values to strings for JSON serialization
@@ -840,4 +841,4 @@ async def generate_specification(
         .eq("id", str(contract_id))\
         .execute()
 
-    return output_path
+    return output_filename, docx_bytes
@@ -0,0 +1,313 @@
+"""
+Aggregate Statistics Service
+
+Dashboard, customer and campaign KPIs read from per-organization rollup
+tables (migrations/059_kpi_rollups.sql). Triggers keep the rollups current
+as quotes, customers and campaign_data change, so each read touches a
+handful of rows however large the tenant is. rebuild_kpi_rollups() (run
+nightly by scheduler.py) recomputes them from the source tables.
+
+Results are kept per organization in StatsCache for
+STATS_CACHE_TTL_SECONDS; counts may lag writes by at most that long.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import asyncpg
+
+from db_pool import init_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+STATS_CACHE_TTL_SECONDS = int(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))
+
+# Entries (organization x stats kind) kept before least recently used are dropped
+STATS_CACHE_MAX_ENTRIES = 200
+
+RECENT_QUOTES_LIMIT = 5
+TOP_REGIONS_LIMIT = 10
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+# $1 organization, $2 this month start, $3 last month start
+DASHBOARD_KPI_SQL = """
+SELECT
+    COALESCE(SUM(quote_count), 0)::bigint AS total_quotes,
+    COALESCE(SUM(quote_count) FILTER (WHERE status = 'draft'), 0)::bigint AS draft_quotes,
+    COALESCE(SUM(quote_count) FILTER (WHERE status = 'sent'), 0)::bigint AS sent_quotes,
+    COALESCE(SUM(quote_count) FILTER (WHERE status = 'accepted'), 0)::bigint AS accepted_quotes,
+    COALESCE(SUM(total_amount) FILTER (
+        WHERE status = 'accepted' AND month >= $2::date
+    ), 0) AS revenue_this_month,
+    COALESCE(SUM(total_amount) FILTER (
+        WHERE status = 'accepted' AND month = $3::date
+    ), 0) AS revenue_last_month
+FROM org_quote_rollups
+WHERE organization_id = $1::uuid
+"""
+
+RECENT_QUOTES_SQL = """
+SELECT q.id, q.idn_quote, q.total_amount, q.status, q.created_at, c.name AS customer_name
+FROM quotes q
+LEFT JOIN customers c ON c.id = q.customer_id
+WHERE q.organization_id = $1::uuid AND q.deleted_at IS NULL
+ORDER BY q.created_at DESC
+LIMIT $2
+"""
+
+# A credit limit of 0 means "not set" and is left out of the average
+CUSTOMER_KPI_SQL = """
+SELECT
+    COALESCE(SUM(customer_count), 0)::bigint AS total_customers,
+    COALESCE(SUM(customer_count) FILTER (WHERE status = 'active'), 0)::bigint AS active_customers,
+    COALESCE(SUM(customer_count) FILTER (WHERE status = 'inactive'), 0)::bigint AS inactive_customers,
+    COALESCE(SUM(customer_count) FILTER (WHERE company_type = 'organization'), 0)::bigint AS organizations,
+    COALESCE(SUM(customer_count) FILTER (WHERE company_type = 'individual_entrepreneur'), 0)::bigint AS entrepreneurs,
+    COALESCE(SUM(customer_count) FILTER (WHERE region = 'Москва'), 0)::bigint AS moscow_customers,
+    COALESCE(SUM(credit_limit_total) / NULLIF(SUM(credit_limit_count), 0), 0) AS avg_credit_limit,
+    COALESCE(SUM(credit_limit_total), 0) AS total_credit_limit,
+    (
+        SELECT COALESCE(json_agg(json_build_object('region', region, 'count', n) ORDER BY n DESC, region), '[]')
+        FROM (
+            SELECT region, SUM(customer_count)::bigint AS n
+            FROM org_customer_rollups
+            WHERE organization_id = $1::uuid AND region <> ''
+            GROUP BY region
+            HAVING SUM(customer_count) > 0
+            ORDER BY n DESC, region
+            LIMIT $2
+        ) r
+    ) AS top_regions
+FROM org_customer_rollups
+WHERE organization_id = $1::uuid
+"""
+
+# Metric sums of campaign_data.metrics; $2 source or NULL for all sources
+CAMPAIGN_METRICS = (
+    "sent_count", "open_count", "unique_open_count", "click_count", "unique_click_count",
+    "reply_count", "bounce_count", "unsubscribed_count", "interested_count", "total_leads",
+)
+
+CAMPAIGN_TOTALS_SQL = """
+SELECT
+    {sums},
+    COALESCE(SUM(campaign_count), 0)::bigint AS campaign_count
+FROM org_campaign_rollups
+WHERE organization_id = $1::uuid AND ($2::text IS NULL OR source = $2::text)
+""".format(sums=",\n    ".join(f"COALESCE(SUM({m}), 0)::bigint AS {m}" for m in CAMPAIGN_METRICS))
+
+REBUILD_ROLLUPS_SQL = "SELECT rebuild_kpi_rollups($1::uuid)"
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class StatsCache:
+    """Per-organization LRU of computed stats with a fixed TTL"""
+
+    def __init__(self, ttl_seconds: float = STATS_CACHE_TTL_SECONDS, max_entries: int = STATS_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (kind, organization_id) -> (expires_at monotonic, value)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, kind: str, organization_id: str) -> Optional[Any]:
+        key = (kind, str(organization_id))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, kind: str, organization_id: str, value: Any) -> None:
+        key = (kind, str(organization_id))
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, organization_id: Optional[Hashable] = None) -> None:
+        """Drop all stats of one organization (or everything, if None)"""
+        if organization_id is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[1] == str(organization_id)]:
+            del self._entries[key]
+
+
+_stats_cache: Optional[StatsCache] = None
+
+
+def get_stats_cache() -> StatsCache:
+    """Get or create the global stats cache"""
+    global _stats_cache
+    if _stats_cache is None:
+        _stats_cache = StatsCache()
+    return _stats_cache
+
+
+# ============================================================================
+# AGGREGATE QUERIES
+# ============================================================================
+
+def month_bounds(today: date) -> Tuple[date, date]:
+    """(this month start, last month start) for today"""
+    this_month_start = date(today.year, today.month, 1)
+    if today.month == 1:
+        last_month_start = date(today.year - 1, 12, 1)
+    else:
+        last_month_start = date(today.year, today.month - 1, 1)
+    return this_month_start, last_month_start
+
+
+async def fetch_dashboard_kpis(conn: asyncpg.Connection, organization_id: str, today: date) -> Dict[str, Any]:
+    """
+    Quote counts by status, accepted revenue for this and last month, and
+    the most recent quotes.
+
+    Returns:
+        Dict with the DASHBOARD_KPI_SQL columns plus "recent_quotes"
+        (list of dicts with customer_name)
+    """
+    row = await conn.fetchrow(DASHBOARD_KPI_SQL, organization_id, *month_bounds(today))
+    recent = await conn.fetch(RECENT_QUOTES_SQL, organization_id, RECENT_QUOTES_LIMIT)
+
+    kpis = dict(row)
+    kpis["recent_quotes"] = [dict(r) for r in recent]
+    return kpis
+
+
+async def fetch_customer_kpis(conn: asyncpg.Connection, organization_id: str) -> Dict[str, Any]:
+    """
+    Customer counts by status, type and region, and credit limit totals.
+
+    Returns:
+        Dict with the CUSTOMER_KPI_SQL columns; "top_regions" is a list of
+        {"region", "count"} (most customers first)
+    """
+    row = await conn.fetchrow(CUSTOMER_KPI_SQL, organization_id, TOP_REGIONS_LIMIT)
+
+    kpis = dict(row)
+    if isinstance(kpis["top_regions"], str):
+        kpis["top_regions"] = json.loads(kpis["top_regions"])
+    return kpis
+
+
+async def fetch_campaign_totals(
+    conn: asyncpg.Connection,
+    organization_id: str,
+    source: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Campaign metric sums (CAMPAIGN_METRICS) and campaign_count.
+
+    Args:
+        source: "smartlead" / "manual", or None for all sources
+    """
+    row = await conn.fetchrow(CAMPAIGN_TOTALS_SQL, organization_id, source)
+    return dict(row)
+
+
+async def get_dashboard_kpis(
+    organization_id: str,
+    pool: Optional[asyncpg.Pool] = None,
+    today: Optional[date] = None
+) -> Dict[str, Any]:
+    """fetch_dashboard_kpis through the stats cache, on a pooled connection"""
+    cache = get_stats_cache()
+    kpis = cache.get("dashboard", organization_id)
+    if kpis is None:
+        if pool is None:
+            pool = await init_db_pool()
+        async with pool.acquire() as conn:
+            kpis = await fetch_dashboard_kpis(conn, organization_id, today or date.today())
+        cache.set("dashboard", organization_id, kpis)
+    return kpis
+
+
+async def get_customer_kpis(
+    organization_id: str,
+    pool: Optional[asyncpg.Pool] = None
+) -> Dict[str, Any]:
+    """fetch_customer_kpis through the stats cache, on a pooled connection"""
+    cache = get_stats_cache()
+    kpis = cache.get("customers", organization_id)
+    if kpis is None:
+        if pool is None:
+            pool = await init_db_pool()
+        async with pool.acquire() as conn:
+            kpis = await fetch_customer_kpis(conn, organization_id)
+        cache.set("customers", organization_id, kpis)
+    return kpis
+
+
+async def get_campaign_totals(
+    organization_id: str,
+    source: Optional[str] = None,
+    pool: Optional[asyncpg.Pool] = None
+) -> Dict[str, int]:
+    """fetch_campaign_totals through the stats cache, on a pooled connection"""
+    cache = get_stats_cache()
+    kind = f"campaigns:{source or ''}"
+    totals = cache.get(kind, organization_id)
+    if totals is None:
+        if pool is None:
+            pool = await init_db_pool()
+        async with pool.acquire() as conn:
+            totals = await fetch_campaign_totals(conn, organization_id, source)
+        cache.set(kind, organization_id, totals)
+    return totals
+
+
+# ============================================================================
+# RECONCILIATION
+# ============================================================================
+
+async def rebuild_kpi_rollups(
+    organization_id: Optional[str] = None,
+    pool: Optional[asyncpg.Pool] = None
+) -> float:
+    """
+    Recompute the rollup tables from quotes, customers and campaign_data.
+
+    Args:
+        organization_id: Only this organization (default: all)
+        pool: asyncpg pool (default: shared pool)
+
+    Returns:
+        Elapsed milliseconds
+    """
+    if pool is None:
+        pool = await init_db_pool()
+
+    start = time.perf_counter()
+    async with pool.acquire() as conn:
+        await conn.execute(REBUILD_ROLLUPS_SQL, organization_id)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    get_stats_cache().invalidate(organization_id)
+    logger.info(
+        f"Rebuilt KPI rollups for {'org ' + organization_id if organization_id else 'all organizations'} "
+        f"in {elapsed_ms:.0f}ms"
+    )
+    return elapsed_ms
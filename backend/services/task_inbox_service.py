@@ -0,0 +1,350 @@
+"""
+Workflow Task Inbox Service
+
+"My tasks" reads from workflow_task_inbox
+(migrations/062_workflow_task_inbox.sql), a projection of quotes waiting on
+a role that a trigger on quotes keeps current through every transition.
+The inbox query is an index-only scan and computes age_hours in SQL.
+
+The same trigger sends pg_notify('workflow_inbox', ...) on every change.
+InboxListener holds one LISTEN connection per process and hands
+notifications to InboxBroker, which wakes the server-sent-event streams
+(GET /api/quotes/my-tasks/stream) of the affected organization and roles.
+A woken stream re-reads its inbox and pushes it; bursts of transitions
+collapse into one push. If the LISTEN connection drops, the listener
+reconnects with backoff and then wakes every stream, since notifications
+sent while it was down are lost.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+import asyncpg
+
+from db_pool import init_db_pool
+from workflow_models import MyTask
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+INBOX_CHANNEL = "workflow_inbox"
+
+# Seconds between keep-alive comments on idle streams (proxies drop silent ones)
+INBOX_KEEPALIVE_SECONDS = float(os.getenv("INBOX_KEEPALIVE_SECONDS", "15"))
+
+# Backoff between reconnect attempts of a dropped LISTEN connection (doubles up to the max)
+INBOX_RECONNECT_SECONDS = 1.0
+INBOX_RECONNECT_MAX_SECONDS = 30.0
+
+# User role -> assignee roles whose tasks they handle
+ROLE_ASSIGNEE_MAPPING: Dict[str, List[str]] = {
+    'sales_manager': ['sales_manager'],
+    'procurement_manager': ['procurement_manager'],
+    'logistics_manager': ['logistics_manager'],
+    'customs_manager': ['customs_manager'],
+    'financial_manager': ['financial_manager'],
+    'top_sales_manager': ['ceo', 'top_sales_manager'],  # Can handle senior approvals
+    'cfo': ['ceo', 'cfo', 'top_sales_manager'],
+    'ceo': ['ceo', 'cfo', 'top_sales_manager'],
+    'admin': ['ceo', 'financial_manager'],  # Admin can handle approvals
+    'owner': ['ceo', 'financial_manager']   # Owner can handle approvals
+}
+
+
+def assignee_roles_for(role: str) -> List[str]:
+    """Assignee roles a user with this role works on"""
+    return ROLE_ASSIGNEE_MAPPING.get(role, [role])
+
+
+# ============================================================================
+# INBOX QUERY
+# ============================================================================
+
+# $1 organization, $2 assignee roles
+INBOX_SQL = """
+SELECT quote_id, idn_quote, customer_name, total_amount, workflow_state, assigned_at,
+       floor(extract(epoch FROM now() - assigned_at) / 3600)::int AS age_hours
+FROM workflow_task_inbox
+WHERE organization_id = $1::uuid AND assignee_role = ANY($2::text[])
+ORDER BY assigned_at DESC
+"""
+
+
+async def fetch_inbox(
+    conn: asyncpg.Connection,
+    organization_id: str,
+    assignee_roles: Sequence[str]
+) -> List[Dict[str, Any]]:
+    """Tasks of these roles, newest assignment first"""
+    rows = await conn.fetch(INBOX_SQL, str(organization_id), list(assignee_roles))
+    return [dict(r) for r in rows]
+
+
+async def get_inbox(
+    organization_id: str,
+    assignee_roles: Sequence[str],
+    pool: Optional[asyncpg.Pool] = None
+) -> List[Dict[str, Any]]:
+    """fetch_inbox on a pooled connection"""
+    if pool is None:
+        pool = await init_db_pool()
+    async with pool.acquire() as conn:
+        return await fetch_inbox(conn, organization_id, assignee_roles)
+
+
+def to_my_task(row: Dict[str, Any]) -> MyTask:
+    """Inbox row as served by GET /my-tasks and the task stream"""
+    return MyTask(
+        quote_id=str(row["quote_id"]),
+        idn_quote=row["idn_quote"],
+        customer_name=row["customer_name"] or "Unknown",
+        total_amount=Decimal(str(row["total_amount"])),
+        workflow_state=row["workflow_state"],
+        assigned_at=row["assigned_at"],
+        age_hours=row["age_hours"]
+    )
+
+
+# ============================================================================
+# BROKER
+# ============================================================================
+
+class InboxSubscription:
+    """One open stream: wakes when an inbox of its organization and roles changes"""
+
+    def __init__(self, organization_id: str, assignee_roles: Sequence[str]):
+        self.organization_id = str(organization_id)
+        self.assignee_roles = set(assignee_roles)
+        self.changed = asyncio.Event()
+
+    async def wait(self, timeout: float) -> bool:
+        """True if the inbox changed within timeout (and clear the flag)"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+
+class InboxBroker:
+    """Routes inbox change notifications to open streams (per process)"""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[InboxSubscription]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return sum(len(subs) for subs in self._subscriptions.values())
+
+    def subscribe(self, organization_id: str, assignee_roles: Sequence[str]) -> InboxSubscription:
+        subscription = InboxSubscription(organization_id, assignee_roles)
+        self._subscriptions[subscription.organization_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: InboxSubscription) -> None:
+        subs = self._subscriptions.get(subscription.organization_id)
+        if subs is not None:
+            subs.discard(subscription)
+            if not subs:
+                del self._subscriptions[subscription.organization_id]
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        """
+        Wake the streams an inbox change affects.
+
+        Args:
+            event: {"organization_id", "assignee_roles", "quote_id"} as sent
+                by the trigger
+
+        Returns:
+            Number of streams woken
+        """
+        roles = set(event.get("assignee_roles") or ())
+        woken = 0
+        for subscription in self._subscriptions.get(str(event.get("organization_id")), ()):
+            if subscription.assignee_roles & roles:
+                subscription.changed.set()
+                woken += 1
+        return woken
+
+    def wake_all(self) -> int:
+        """Wake every stream (changes may have been missed); returns how many"""
+        woken = 0
+        for subs in self._subscriptions.values():
+            for subscription in subs:
+                subscription.changed.set()
+                woken += 1
+        return woken
+
+
+_inbox_broker: Optional[InboxBroker] = None
+
+
+def get_inbox_broker() -> InboxBroker:
+    """Get or create the global inbox broker"""
+    global _inbox_broker
+    if _inbox_broker is None:
+        _inbox_broker = InboxBroker()
+    return _inbox_broker
+
+
+# ============================================================================
+# LISTENER
+# ============================================================================
+
+class InboxListener:
+    """
+    LISTEN connection forwarding INBOX_CHANNEL notifications to the broker
+
+    A dropped connection is reopened in the background; streams are woken
+    after every reconnect so they reload the inbox.
+    """
+
+    def __init__(self, broker: InboxBroker, dsn: Optional[str] = None):
+        self.broker = broker
+        self.dsn = dsn or os.getenv("POSTGRES_DIRECT_URL")
+        self._conn: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        try:
+            self.broker.publish(json.loads(payload))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring malformed {channel} notification {payload!r}: {e}")
+
+    def _on_terminate(self, conn) -> None:
+        if self._stopping or conn is not self._conn:
+            return
+        logger.warning(f"{INBOX_CHANNEL} connection lost; reconnecting")
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = INBOX_RECONNECT_SECONDS
+        while not self._stopping:
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.warning(f"Reconnecting {INBOX_CHANNEL} failed (retry in {delay:.0f}s): {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, INBOX_RECONNECT_MAX_SECONDS)
+
+    async def _connect(self) -> None:
+        async with self._lock:
+            if self.running:
+                return
+            reconnecting = self._conn is not None
+            # Dedicated connection: a pooled one would be held for the process lifetime
+            conn = await asyncpg.connect(self.dsn)
+            await conn.add_listener(INBOX_CHANNEL, self._on_notify)
+            conn.add_termination_listener(self._on_terminate)
+            self._conn = conn
+            logger.info(f"Listening on {INBOX_CHANNEL}")
+
+        if reconnecting:
+            # Notifications sent while disconnected were lost
+            self.broker.wake_all()
+
+    async def ensure_started(self) -> None:
+        """Open (or reopen after a dropped connection) the LISTEN connection"""
+        self._stopping = False
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        async with self._lock:
+            if self._conn is not None and not self._conn.is_closed():
+                await self._conn.close()
+            self._conn = None
+
+
+_inbox_listener: Optional[InboxListener] = None
+
+
+def get_inbox_listener() -> InboxListener:
+    """Get or create the global inbox listener (not started)"""
+    global _inbox_listener
+    if _inbox_listener is None:
+        _inbox_listener = InboxListener(get_inbox_broker())
+    return _inbox_listener
+
+
+async def stop_inbox_listener() -> None:
+    """Close the LISTEN connection on application shutdown"""
+    if _inbox_listener is not None:
+        await _inbox_listener.stop()
+
+
+# ============================================================================
+# SERVER-SENT EVENTS
+# ============================================================================
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default, ensure_ascii=False)}\n\n"
+
+
+async def inbox_event_stream(
+    organization_id: str,
+    assignee_roles: Sequence[str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    load_inbox: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None,
+    broker: Optional[InboxBroker] = None,
+    keepalive_seconds: float = INBOX_KEEPALIVE_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Server-sent events for one user's inbox.
+
+    Sends a "tasks" event ({"tasks", "count"}, tasks as in GET /my-tasks)
+    on connect and after every change to the inbox, and a comment line
+    while idle.
+
+    Args:
+        is_disconnected: Request.is_disconnected
+        load_inbox: Reads the current inbox rows (default: get_inbox)
+    """
+    if broker is None:
+        broker = get_inbox_broker()
+    if load_inbox is None:
+        async def load_inbox():
+            return await get_inbox(organization_id, assignee_roles)
+
+    subscription = broker.subscribe(organization_id, assignee_roles)
+    try:
+        changed = True
+        while not await is_disconnected():
+            if changed:
+                tasks = [to_my_task(row).model_dump(mode="json") for row in await load_inbox()]
+                yield format_sse("tasks", {"tasks": tasks, "count": len(tasks)})
+            else:
+                yield ": keepalive\n\n"
+            changed = await subscription.wait(keepalive_seconds)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,400 @@
+"""
+Chunked Upload Session Service
+
+Resumable uploads for large quote workbooks. The client opens a session
+with the file size (and optionally its SHA-256), then sends the file in
+chunks at explicit offsets. Each chunk is streamed straight to a spool file
+on disk while the running SHA-256 is updated, so worker memory stays flat
+regardless of workbook size. After a network failure the client asks for
+the current offset and continues from there instead of starting over.
+
+Validation starts with the first bytes: the Excel signature and declared
+size are checked before the rest of the file is accepted. XLSX is a ZIP
+archive whose directory sits at the end, so the parse itself starts once
+the last chunk lands, reading the spool file in read-only mode.
+
+Session state is a small JSON file next to the spool file, so any worker
+on the same host can resume a session. Appends are serialized across
+workers with an fcntl lock on the spool file, and a worker's running hash
+is only reused while it covers exactly the received bytes; otherwise it is
+rebuilt from the spool file.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+UPLOAD_SESSION_DIR = os.getenv(
+    "UPLOAD_SESSION_DIR", os.path.join(tempfile.gettempdir(), "kvota_uploads")
+)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "100")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 5 * 1024 * 1024  # Suggested chunk size returned to clients
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600
+UPLOAD_LOCK_POLL_SECONDS = 0.05
+
+ALLOWED_EXTENSIONS = ('.xlsx', '.xls')
+# ZIP (xlsx) and OLE (xls) signatures
+EXCEL_SIGNATURES = (b'PK\x03\x04', b'\xd0\xcf\x11\xe0')
+SIGNATURE_LENGTH = 4
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+# ============================================================================
+# ERRORS
+# ============================================================================
+
+class UploadError(Exception):
+    """Base class for upload session errors"""
+    pass
+
+
+class UploadNotFoundError(UploadError):
+    """Raised when a session does not exist, expired or belongs to another user"""
+    pass
+
+
+class UploadValidationError(UploadError):
+    """Raised when the file or a chunk is rejected"""
+    pass
+
+
+class UploadTooLargeError(UploadValidationError):
+    """Raised when the declared or received size exceeds the limit"""
+    pass
+
+
+class UploadOffsetError(UploadError):
+    """Raised when a chunk does not start at the current offset"""
+
+    def __init__(self, expected_offset: int):
+        super().__init__(f"Chunk must start at offset {expected_offset}")
+        self.expected_offset = expected_offset
+
+
+# ============================================================================
+# SESSION STORE
+# ============================================================================
+
+@dataclass
+class UploadSession:
+    """State of one chunked upload"""
+    upload_id: str
+    user_id: str
+    organization_id: Optional[str]
+    filename: str
+    size: int
+    sha256: Optional[str]
+    received: int = 0
+    created_at: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return self.received == self.size
+
+
+class UploadSessionStore:
+    """Disk-backed chunked upload sessions"""
+
+    def __init__(
+        self,
+        root: str = UPLOAD_SESSION_DIR,
+        max_bytes: int = UPLOAD_MAX_BYTES,
+        ttl_seconds: int = UPLOAD_SESSION_TTL_SECONDS
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+        # Running hashes with the number of bytes each covers. Chunks of one
+        # upload may land on different workers, so a hash is rebuilt from
+        # disk whenever it does not cover exactly session.received bytes.
+        self._hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.json")
+
+    def _save(self, session: UploadSession):
+        tmp_path = self._meta_path(session.upload_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(session), f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path(session.upload_id))
+
+    @asynccontextmanager
+    async def _locked_spool(self, upload_id: str) -> AsyncIterator[BinaryIO]:
+        """
+        Spool file opened for writing under an exclusive fcntl lock
+
+        The lock is shared by all workers on the host. It is polled rather
+        than waited on so a chunk streaming in another request does not
+        block the event loop.
+        """
+        try:
+            f = open(self._data_path(upload_id), "r+b")
+        except FileNotFoundError:
+            raise UploadNotFoundError("Upload not found")
+        try:
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(UPLOAD_LOCK_POLL_SECONDS)
+            yield f
+        finally:
+            # Closing the file releases the lock
+            f.close()
+
+    def _hasher(self, session: UploadSession):
+        """Running SHA-256 of the received bytes"""
+        covered, hasher = self._hashers.get(session.upload_id, (None, None))
+        if covered != session.received:
+            hasher = hashlib.sha256()
+            with open(self._data_path(session.upload_id), "rb") as f:
+                remaining = session.received
+                while remaining > 0:
+                    block = f.read(min(UPLOAD_CHUNK_BYTES, remaining))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+            self._hashers[session.upload_id] = (session.received, hasher)
+        return hasher
+
+    def create(
+        self,
+        user_id: str,
+        organization_id: Optional[str],
+        filename: str,
+        size: int,
+        sha256: Optional[str] = None
+    ) -> UploadSession:
+        """
+        Open a new upload session.
+
+        Args:
+            user_id: Uploading user
+            organization_id: User's current organization
+            filename: Original file name (.xlsx / .xls)
+            size: Total file size in bytes
+            sha256: Optional hex SHA-256 of the whole file, verified on completion
+
+        Returns:
+            UploadSession: New session with offset 0
+
+        Raises:
+            UploadValidationError: Unsupported file type or malformed checksum
+            UploadTooLargeError: Size above the configured limit
+        """
+        if not filename or not filename.lower().endswith(ALLOWED_EXTENSIONS):
+            raise UploadValidationError("Invalid file type. Please upload an Excel file (.xlsx)")
+        if size <= 0:
+            raise UploadValidationError("File size must be positive")
+        if size > self.max_bytes:
+            raise UploadTooLargeError(
+                f"File too large. Maximum size: {self.max_bytes // 1024 // 1024}MB"
+            )
+        if sha256 is not None:
+            sha256 = sha256.lower()
+            if not SHA256_PATTERN.match(sha256):
+                raise UploadValidationError("sha256 must be 64 hex characters")
+
+        self.expire()
+
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            user_id=str(user_id),
+            organization_id=str(organization_id) if organization_id else None,
+            filename=os.path.basename(filename),
+            size=size,
+            sha256=sha256,
+            created_at=time.time(),
+        )
+        open(self._data_path(session.upload_id), "wb").close()
+        self._save(session)
+        self._hashers[session.upload_id] = (0, hashlib.sha256())
+        return session
+
+    def get(self, upload_id: str, user_id: str) -> UploadSession:
+        """
+        Load a session owned by user_id.
+
+        Raises:
+            UploadNotFoundError: Unknown, expired or foreign session
+        """
+        if not UPLOAD_ID_PATTERN.match(upload_id or ""):
+            raise UploadNotFoundError("Upload not found")
+        try:
+            with open(self._meta_path(upload_id), encoding="utf-8") as f:
+                session = UploadSession(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            raise UploadNotFoundError("Upload not found")
+
+        if session.user_id != str(user_id):
+            raise UploadNotFoundError("Upload not found")
+        return session
+
+    async def append(
+        self,
+        upload_id: str,
+        user_id: str,
+        offset: int,
+        chunks: AsyncIterable[bytes],
+        chunk_sha256: Optional[str] = None
+    ) -> UploadSession:
+        """
+        Stream one chunk to disk at offset.
+
+        The chunk is written as it arrives. If it fails validation or the
+        connection drops, the spool file is truncated back to offset, so the
+        client can simply resend the chunk.
+
+        Args:
+            upload_id: Session ID
+            user_id: Owner of the session
+            offset: Byte position the chunk starts at (must equal received bytes)
+            chunks: Body stream of the chunk
+            chunk_sha256: Optional hex SHA-256 of this chunk
+
+        Returns:
+            UploadSession: Session with the new offset
+
+        Raises:
+            UploadOffsetError: offset is not the current end of the upload
+            UploadValidationError: Not an Excel file, or chunk checksum mismatch
+            UploadTooLargeError: Chunk goes past the declared size
+        """
+        self.get(upload_id, user_id)  # Validates upload_id and ownership before touching files
+        async with self._locked_spool(upload_id) as f:
+            # Re-read under the lock: another worker may have appended meanwhile
+            session = self.get(upload_id, user_id)
+            if offset != session.received:
+                raise UploadOffsetError(session.received)
+
+            hasher = self._hasher(session)
+            hasher_before = hasher.copy()
+            chunk_hasher = hashlib.sha256()
+            head = b""
+            position = offset
+
+            f.seek(offset)
+            try:
+                async for piece in chunks:
+                    if not piece:
+                        continue
+                    if position + len(piece) > session.size:
+                        raise UploadTooLargeError("Chunk goes past the declared file size")
+
+                    # Reject non-Excel content on the first bytes
+                    if position < SIGNATURE_LENGTH:
+                        head += piece[:SIGNATURE_LENGTH - position]
+                        if len(head) + offset >= SIGNATURE_LENGTH and not head.startswith(EXCEL_SIGNATURES):
+                            raise UploadValidationError("Invalid Excel file format")
+
+                    f.write(piece)
+                    hasher.update(piece)
+                    chunk_hasher.update(piece)
+                    position += len(piece)
+
+                if chunk_sha256 and chunk_hasher.hexdigest() != chunk_sha256.lower():
+                    raise UploadValidationError("Chunk checksum mismatch")
+
+            except BaseException:
+                f.truncate(offset)
+                self._hashers[upload_id] = (offset, hasher_before)
+                raise
+
+            session.received = position
+            self._save(session)
+            self._hashers[upload_id] = (position, hasher)
+            return session
+
+    def finalize(self, upload_id: str, user_id: str) -> UploadSession:
+        """
+        Verify a fully received upload.
+
+        Returns:
+            UploadSession: Session with sha256 set to the verified file digest
+
+        Raises:
+            UploadValidationError: Upload incomplete or whole-file checksum mismatch
+        """
+        session = self.get(upload_id, user_id)
+        if not session.complete:
+            raise UploadValidationError(
+                f"Upload incomplete: received {session.received} of {session.size} bytes"
+            )
+
+        digest = self._hasher(session).hexdigest()
+        if session.sha256 and digest != session.sha256:
+            raise UploadValidationError("File checksum mismatch, please upload again")
+        session.sha256 = digest
+        return session
+
+    def open(self, session: UploadSession) -> BinaryIO:
+        """Open the spooled file for reading"""
+        return open(self._data_path(session.upload_id), "rb")
+
+    def discard(self, upload_id: str):
+        """Delete a session and its spool file"""
+        for path in (self._data_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._hashers.pop(upload_id, None)
+
+    def expire(self) -> int:
+        """Remove sessions older than the TTL; returns number removed"""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    created_at = json.load(f).get("created_at", 0)
+            except (OSError, ValueError):
+                created_at = 0
+            if created_at < cutoff:
+                self.discard(name[:-len(".json")])
+                removed += 1
+        if removed:
+            logger.info(f"Expired {removed} upload sessions")
+        return removed
+
+
+_upload_store: Optional[UploadSessionStore] = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_session_store() -> UploadSessionStore:
+    """Get process-wide upload session store"""
+    global _upload_store
+    with _upload_store_lock:
+        if _upload_store is None:
+            _upload_store = UploadSessionStore()
+        return _upload_store
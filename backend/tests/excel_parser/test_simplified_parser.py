@@ -248,6 +248,62 @@ class TestProducts:
             ]
 
 
+def _template_with_products(template_v5_path, row_count):
+    """v5 template with row_count generated product rows, as BytesIO"""
+    import io
+    import openpyxl
+
+    wb = openpyxl.load_workbook(template_v5_path)
+    ws = wb["Котировка"]
+    for i in range(row_count):
+        values = ["SKF", f"6{i:05d}", f"Подшипник {i}", i % 7 + 1, 0.5, "USD",
+                  100 + i, "Китай", 0, 8482100000, 5, 15]
+        for col, value in enumerate(values, start=1):
+            ws.cell(row=16 + i, column=col, value=value)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class TestLargeTemplates:
+    """Tests for streaming (read-only) parsing of long product lists"""
+
+    def test_no_row_cap(self, template_v5_path):
+        """Product rows beyond row 1000 should be parsed"""
+        source = _template_with_products(template_v5_path, 2500)
+
+        result = SimplifiedExcelParser(source).parse()
+
+        assert len(result.products) == 2500
+        assert result.products[-1].sku == "602499"
+        assert result.products[-1].base_price_vat == Decimal("2599")
+
+    def test_read_only_matches_full_mode(self, template_v5_path):
+        """Streaming and full workbook modes should produce identical results"""
+        import io
+        content = _template_with_products(template_v5_path, 1200).getvalue()
+
+        streamed = SimplifiedExcelParser(io.BytesIO(content)).parse()
+        loaded = SimplifiedExcelParser(io.BytesIO(content), read_only=False).parse()
+
+        assert streamed == loaded
+
+    def test_invalid_value_reports_cell(self, template_v5_path):
+        """Errors in streamed rows should still name the cell"""
+        import io
+        import openpyxl
+
+        wb = openpyxl.load_workbook(_template_with_products(template_v5_path, 1100))
+        wb["Котировка"]["I1105"] = "пять"
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+
+        with pytest.raises(ValueError, match="Invalid number in cell I1105: пять"):
+            SimplifiedExcelParser(buffer).parse()
+
+
 class TestConvenienceFunction:
     """Tests for parse_simplified_template convenience function"""
 
@@ -0,0 +1,239 @@
+"""
+Activity Log Storage Benchmark
+
+Builds two copies of activity_logs with the same synthetic rows in scratch
+schemas: the old single table with the indexes of migrations/016, and the
+monthly-partitioned table with the composite indexes of migrations/064.
+Then times the list endpoint's reads (old: OFFSET page + exact count;
+new: keyset page from services/activity_log_query_service.py) for each
+filter combination, the stats query, and six-month retention (old: DELETE;
+new: dropping month partitions). The schemas are dropped afterwards.
+
+Needs POSTGRES_DIRECT_URL (any database; nothing outside the scratch
+schemas is touched).
+
+Usage:
+    cd backend && python -m tests.load.bench_activity_logs [rows] [organizations]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date, datetime
+
+import asyncpg
+
+from services.activity_log_query_service import build_filters, build_list_query
+
+SCHEMA = "bench_activity_logs"
+MONTHS = 12
+USERS_PER_ORG = 20
+PAGE = 100
+DEEP_PAGE = 50
+
+ACTIONS = ["created", "updated", "deleted", "exported", "approved", "submitted"]
+ENTITIES = ["quote", "customer", "contact", "user", "lead"]
+
+LEGACY_DDL = """
+CREATE TABLE legacy.activity_logs (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  organization_id UUID NOT NULL,
+  user_id UUID NOT NULL,
+  action VARCHAR(50) NOT NULL,
+  entity_type VARCHAR(50) NOT NULL,
+  entity_id UUID,
+  metadata JSONB,
+  created_at TIMESTAMP DEFAULT NOW()
+);
+"""
+
+LEGACY_INDEXES = """
+CREATE INDEX ON legacy.activity_logs(organization_id, created_at DESC);
+CREATE INDEX ON legacy.activity_logs(entity_type, entity_id);
+CREATE INDEX ON legacy.activity_logs(user_id, created_at DESC);
+CREATE INDEX ON legacy.activity_logs(action, created_at DESC);
+"""
+
+PARTITIONED_DDL = """
+CREATE TABLE partitioned.activity_logs (
+  id UUID NOT NULL DEFAULT gen_random_uuid(),
+  organization_id UUID NOT NULL,
+  user_id UUID NOT NULL,
+  action VARCHAR(50) NOT NULL,
+  entity_type VARCHAR(50) NOT NULL,
+  entity_id UUID,
+  metadata JSONB,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE TABLE partitioned.activity_logs_default PARTITION OF partitioned.activity_logs DEFAULT;
+"""
+
+PARTITIONED_INDEXES = """
+CREATE INDEX ON partitioned.activity_logs(organization_id, created_at DESC, id DESC);
+CREATE INDEX ON partitioned.activity_logs(organization_id, user_id, created_at DESC, id DESC);
+CREATE INDEX ON partitioned.activity_logs(organization_id, entity_type, created_at DESC, id DESC);
+CREATE INDEX ON partitioned.activity_logs(organization_id, action, created_at DESC, id DESC);
+CREATE INDEX ON partitioned.activity_logs(entity_type, entity_id);
+"""
+
+# $1 rows, $2 organizations, $3 first month; orgs and users are derived from n
+# so both tables get identical data
+FILL_SQL = """
+INSERT INTO {{table}} (id, organization_id, user_id, action, entity_type, entity_id, metadata, created_at)
+SELECT
+  md5('log' || n)::uuid,
+  md5('org' || n % $2::int)::uuid,
+  md5('user' || n % $2::int || '-' || n / $2::int % {users})::uuid,
+  (ARRAY{actions})[1 + n / 7 % {n_actions}],
+  (ARRAY{entities})[1 + n / 3 % {n_entities}],
+  md5('entity' || n % 50000)::uuid,
+  jsonb_build_object('n', n),
+  $3::timestamp + (n::float8 / $1::int) * INTERVAL '{months} months'
+FROM generate_series(1, $1::int) AS n
+""".format(
+    users=USERS_PER_ORG,
+    actions=ACTIONS, n_actions=len(ACTIONS),
+    entities=ENTITIES, n_entities=len(ENTITIES),
+    months=MONTHS,
+)
+
+
+def month_start(months_back: int) -> date:
+    today = date.today().replace(day=1)
+    year, month = divmod(today.year * 12 + today.month - 1 - months_back, 12)
+    return date(year, month + 1, 1)
+
+
+async def setup(conn, rows: int, organizations: int) -> None:
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA}_legacy CASCADE")
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA}_partitioned CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}_legacy; CREATE SCHEMA {SCHEMA}_partitioned")
+    await conn.execute(LEGACY_DDL.replace("legacy.", f"{SCHEMA}_legacy."))
+    await conn.execute(PARTITIONED_DDL.replace("partitioned.", f"{SCHEMA}_partitioned."))
+
+    first = datetime.combine(month_start(MONTHS - 1), datetime.min.time())
+    for m in range(MONTHS + 1):
+        start = month_start(MONTHS - 1 - m)
+        end = month_start(MONTHS - 2 - m)
+        await conn.execute(
+            f"CREATE TABLE {SCHEMA}_partitioned.activity_logs_{start:%Y_%m} "
+            f"PARTITION OF {SCHEMA}_partitioned.activity_logs "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+    for schema in ("legacy", "partitioned"):
+        start = time.perf_counter()
+        await conn.execute(
+            FILL_SQL.format(table=f"{SCHEMA}_{schema}.activity_logs"), rows, organizations, first
+        )
+        ddl = LEGACY_INDEXES if schema == "legacy" else PARTITIONED_INDEXES
+        await conn.execute(ddl.replace(f"{schema}.", f"{SCHEMA}_{schema}."))
+        await conn.execute(f"VACUUM ANALYZE {SCHEMA}_{schema}.activity_logs")
+        print(f"{schema}: {rows:,} rows loaded and indexed in {time.perf_counter() - start:.1f}s")
+
+
+async def timed(conn, sql: str, args, repeat: int = 5) -> float:
+    """Best of repeat runs, milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await conn.fetch(sql, *args)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+async def deep_cursor(conn, conditions, args, pages: int):
+    """(created_at, id) of the last row before page `pages` (walks the keyset pages)"""
+    cursor = None
+    for _ in range(pages - 1):
+        sql, sql_args = build_list_query(conditions, args, PAGE, cursor=cursor)
+        rows = await conn.fetch(sql, *sql_args)
+        if len(rows) < PAGE:
+            break
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+    return cursor
+
+
+async def bench_reads(conn, organization_id: str, user_id: str) -> None:
+    recent = month_start(2)
+    cases = {
+        "org": {},
+        "org+dates": {"date_from": recent, "date_to": date.today()},
+        "org+user": {"user_id": user_id},
+        "org+entity": {"entity_type": "quote"},
+        "org+action": {"action": "exported"},
+        "org+user+action+dates": {"user_id": user_id, "action": "exported", "date_from": recent},
+    }
+
+    print(f"\n{'filters':<24} {'page':>5} {'old: offset+count':>18} {'new: keyset':>12}")
+    for name, filters in cases.items():
+        conditions, args = build_filters(organization_id, **filters)
+        count_sql = f"SELECT count(*) FROM activity_logs WHERE {' AND '.join(conditions)}"
+        for page in (1, DEEP_PAGE):
+            await conn.execute(f"SET search_path = {SCHEMA}_legacy")
+            sql, sql_args = build_list_query(conditions, args, PAGE + 1, offset=(page - 1) * PAGE)
+            old = await timed(conn, sql, sql_args) + await timed(conn, count_sql, args)
+
+            await conn.execute(f"SET search_path = {SCHEMA}_partitioned")
+            cursor = await deep_cursor(conn, conditions, args, page)
+            sql, sql_args = build_list_query(conditions, args, PAGE + 1, cursor=cursor)
+            new = await timed(conn, sql, sql_args)
+            print(f"{name:<24} {page:>5} {old:>16.1f}ms {new:>10.1f}ms")
+
+    conditions, args = build_filters(organization_id, date_from=recent)
+    stats_sql = (
+        f"SELECT action, entity_type, count(*) FROM activity_logs "
+        f"WHERE {' AND '.join(conditions)} GROUP BY action, entity_type"
+    )
+    for schema in ("legacy", "partitioned"):
+        await conn.execute(f"SET search_path = {SCHEMA}_{schema}")
+        print(f"{'stats (3 months)':<24} {schema:>12} {await timed(conn, stats_sql, args):>10.1f}ms")
+    await conn.execute("RESET search_path")
+
+
+async def bench_retention(conn) -> None:
+    cutoff = datetime.combine(month_start(6), datetime.min.time())
+
+    start = time.perf_counter()
+    deleted = await conn.execute(
+        f"DELETE FROM {SCHEMA}_legacy.activity_logs WHERE created_at < $1", cutoff
+    )
+    old = time.perf_counter() - start
+
+    partitions = await conn.fetch(
+        """
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::text::regclass AND c.relname <> 'activity_logs_default'
+          AND substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \\(''([^'']+)''\\)')::timestamp <= $2
+        """,
+        f"{SCHEMA}_partitioned.activity_logs", cutoff
+    )
+    start = time.perf_counter()
+    for p in partitions:
+        await conn.execute(f"DROP TABLE {SCHEMA}_partitioned.{p['relname']}")
+    new = time.perf_counter() - start
+
+    print(f"\nretention (6 months): DELETE {deleted.split()[-1]} rows {old:.2f}s, "
+          f"drop {len(partitions)} partitions {new:.3f}s")
+
+
+async def main(rows: int, organizations: int):
+    conn = await asyncpg.connect(os.getenv("POSTGRES_DIRECT_URL"), command_timeout=None)
+    try:
+        await setup(conn, rows, organizations)
+        # One organization and one of its users
+        organization_id = await conn.fetchval("SELECT md5('org' || 0)::uuid")
+        user_id = await conn.fetchval("SELECT md5('user' || 0 || '-' || 0)::uuid")
+        await bench_reads(conn, organization_id, user_id)
+        await bench_retention(conn)
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA}_legacy CASCADE")
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA}_partitioned CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    org_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(main(row_count, org_count))
@@ -0,0 +1,108 @@
+"""
+Excel Grid Export Benchmark
+
+Compares rows/sec of the shared-style row writer used by QuoteExcelService
+against the previous per-cell styling approach (new Font/PatternFill objects
+and number_format assigned cell by cell).
+
+Usage:
+    cd backend && python -m tests.load.bench_excel_grid [rows ...]
+"""
+import sys
+import time
+from decimal import Decimal
+from io import BytesIO
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment, PatternFill
+
+from services.excel_service import QuoteExcelService, MONEY_FORMAT
+from services.export_data_mapper import ExportData
+
+
+CALC_KEYS = [
+    'sales_price_per_unit', 'sales_price_per_unit_no_vat', 'sales_price_total_no_vat',
+    'vat_amount', 'vat_net_payable', 'sales_price_per_unit_with_vat', 'sales_price_total_with_vat',
+    'purchase_price_no_vat', 'purchase_price_total_quote_currency', 'logistics_total',
+    'customs_fee', 'util_fee', 'recycling_fee', 'excise_tax_amount', 'transit_commission',
+]
+
+
+def make_export_data(row_count: int) -> ExportData:
+    """Synthetic quote with row_count calculated items"""
+    items = [
+        {
+            'brand': 'SKF',
+            'product_code': f'6{i:05d}',
+            'product_name': f'Подшипник SKF 6{i:05d}',
+            'quantity': i % 50 + 1,
+            'customs_code': '8482100000',
+            'import_tariff': 5.0,
+            'excise_tax': 0,
+            'calculation_results': {key: 100.0 + i * 1.37 for key in CALC_KEYS},
+        }
+        for i in range(row_count)
+    ]
+    return ExportData(
+        quote={'quote_date': '2025-10-24', 'delivery_terms': ''},
+        items=items,
+        customer={'name': 'ООО "Тест"'},
+        contact=None,
+        manager=None,
+        organization={'name': 'Test Org'},
+        variables={'currency_of_base_price': 'USD', 'import_tariff': 5.0},
+        calculations={},
+    )
+
+
+def legacy_supply_grid(export_data: ExportData) -> bytes:
+    """Previous implementation of the КП поставка table: every cell styled individually"""
+    wb = Workbook()
+    ws = wb.active
+    for col_idx, header in enumerate(['Бренд', 'Артикул', 'Наименование', 'Кол-во', 'E', 'F', 'G', 'H', 'I'], 1):
+        cell = ws.cell(row=1, column=col_idx)
+        cell.value = header
+        cell.font = Font(bold=True, size=11, color="FFFFFFFF")
+        cell.fill = PatternFill(start_color="FF2C5AA0", end_color="FF2C5AA0", fill_type="solid")
+        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+    row = 2
+    for item in export_data.items:
+        calc_results = item.get('calculation_results', {})
+        ws.cell(row=row, column=1).value = item.get('brand', '')
+        ws.cell(row=row, column=2).value = item.get('product_code', '')
+        ws.cell(row=row, column=3).value = item.get('product_name', '')
+        ws.cell(row=row, column=4).value = item.get('quantity', 0)
+        for col, key in enumerate(['sales_price_per_unit_no_vat', 'sales_price_total_no_vat', 'vat_net_payable',
+                                   'sales_price_per_unit_with_vat', 'sales_price_total_with_vat'], 5):
+            ws.cell(row=row, column=col).value = float(Decimal(str(calc_results.get(key, 0))))
+            ws.cell(row=row, column=col).number_format = MONEY_FORMAT
+        row += 1
+
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def measure(fn, export_data: ExportData, repeats: int = 3) -> float:
+    """Best-of-N rows/sec for a generator function"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(export_data)
+        best = min(best, time.perf_counter() - start)
+    return len(export_data.items) / best
+
+
+def main(row_counts):
+    print(f"{'rows':>8} {'legacy rows/s':>15} {'supply rows/s':>15} {'openbook rows/s':>16} {'speedup':>8}")
+    for row_count in row_counts:
+        export_data = make_export_data(row_count)
+        legacy = measure(legacy_supply_grid, export_data)
+        supply = measure(QuoteExcelService.generate_supply_grid_export, export_data)
+        openbook = measure(QuoteExcelService.generate_openbook_grid_export, export_data)
+        print(f"{row_count:>8} {legacy:>15,.0f} {supply:>15,.0f} {openbook:>16,.0f} {supply / legacy:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 500, 2000, 10000])
@@ -0,0 +1,111 @@
+"""
+Outbound HTTP Benchmark
+
+Measures CBR refresh latency against the replay server
+(tests/load/replay_server.py) over real sockets, comparing a new
+AsyncClient per refresh (the old behaviour) with the shared pooled client
+from http_pool.py, sequentially and concurrently. A second server that
+fails every request shows how many upstream calls the retry budget lets
+through during an outage.
+
+Runs fully offline; rates are not stored.
+
+Usage:
+    cd backend && python -m tests.load.bench_outbound_http [refreshes] [latency_ms]
+"""
+import asyncio
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import uvicorn
+
+import http_pool
+from http_pool import RetryBudget, get_retry_budget
+from services.exchange_rate_service import MAX_RETRIES, ExchangeRateService
+from tests.load.replay_server import create_replay_app, replay_client
+
+
+def start_server(app) -> tuple:
+    """Run app with uvicorn in a background thread; return (server, base_url)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def noop_store(rates):
+    pass
+
+
+async def refresh(client) -> float:
+    """One CBR refresh; return milliseconds"""
+    service = ExchangeRateService(http_client=client)
+    service._store_rates = noop_store
+    start = time.perf_counter()
+    rates = await service.fetch_cbr_rates()
+    elapsed = (time.perf_counter() - start) * 1000
+    assert rates, "refresh failed"
+    return elapsed
+
+
+async def per_call_client(base_url: str) -> float:
+    async with replay_client(base_url=base_url) as client:
+        return await refresh(client)
+
+
+def report(label: str, timings) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<34} mean {statistics.mean(timings):7.2f}ms  p95 {p95:7.2f}ms")
+
+
+async def main(refreshes: int, latency_ms: float):
+    server, base_url = start_server(create_replay_app(latency_ms=latency_ms))
+    failing, failing_url = start_server(create_replay_app(fail_rate=1.0))
+    try:
+        print(f"{refreshes} CBR refreshes, {latency_ms}ms server latency\n")
+
+        report("sequential, client per refresh", [await per_call_client(base_url) for _ in range(refreshes)])
+        async with replay_client(base_url=base_url) as shared:
+            await refresh(shared)  # open the pooled connection
+            report("sequential, shared pooled client", [await refresh(shared) for _ in range(refreshes)])
+
+            report(
+                "concurrent, shared pooled client",
+                await asyncio.gather(*(refresh(shared) for _ in range(refreshes)))
+            )
+        report(
+            "concurrent, client per refresh",
+            await asyncio.gather(*(per_call_client(base_url) for _ in range(refreshes)))
+        )
+
+        # Concurrent, so the real retry backoff (1s + 2s) is paid once
+        print(f"\nOutage: {refreshes} concurrent refreshes against a server failing every request")
+        for label, budget in (
+            ("unlimited retries", RetryBudget(max_tokens=float("inf"))),
+            ("retry budget", RetryBudget()),
+        ):
+            http_pool._retry_budgets["cbr"] = budget
+            async with replay_client(base_url=failing_url) as client:
+                service = ExchangeRateService(http_client=client)
+                await asyncio.gather(*(service.fetch_cbr_rates() for _ in range(refreshes)))
+            calls = refreshes + get_retry_budget("cbr").retries
+            print(f"{label:<34} {calls:5d} upstream calls (max {refreshes * MAX_RETRIES})")
+    finally:
+        server.should_exit = True
+        failing.should_exit = True
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    asyncio.run(main(count, latency))
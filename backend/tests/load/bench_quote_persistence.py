@@ -0,0 +1,112 @@
+"""
+Quote Persistence Benchmark
+
+Measures insert time per 100 quote lines for the single-transaction bulk
+writer (services/quote_persistence_service.py) against row-by-row inserts
+(one statement per item and per calculation result, as the old Supabase
+code did). Everything runs inside an outer transaction that is rolled
+back, so no data is left behind.
+
+Needs POSTGRES_DIRECT_URL and an existing organization, customer and user.
+
+Usage:
+    cd backend && python -m tests.load.bench_quote_persistence ORG_ID CUSTOMER_ID USER_ID [lines ...]
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+import asyncpg
+
+from services.quote_persistence_service import (
+    QuoteBundle,
+    build_insert_sql,
+    save_quote_bundle,
+    to_json,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_bundle(organization_id: str, customer_id: str, user_id: str, lines: int) -> QuoteBundle:
+    return QuoteBundle(
+        quote={
+            "organization_id": organization_id,
+            "customer_id": customer_id,
+            "idn_quote": f"BENCH-{uuid.uuid4().hex[:12]}",
+            "title": "Benchmark",
+            "status": "draft",
+            "created_by": user_id,
+            "currency": "USD",
+        },
+        items=[
+            {
+                "position": i,
+                "product_name": f"Подшипник SKF 6{i:05d}",
+                "product_code": f"6{i:05d}",
+                "base_price_vat": 100 + i,
+                "quantity": i % 50 + 1,
+                "weight_in_kg": 0.75,
+                "customs_code": "8482100000",
+                "supplier_country": "Китай",
+                "custom_fields": {"markup": 15, "supplier_discount": 0},
+            }
+            for i in range(lines)
+        ],
+        variables={"variables": {"currency_of_quote": "USD", "markup": 15}},
+        results=[{"phase_results": {"profit": i * 1.5}, "phase_results_quote_currency": {}} for i in range(lines)],
+        summary={"calc_s16_total_purchase_price": 100 * lines},
+    )
+
+
+async def save_row_by_row(conn, bundle: QuoteBundle):
+    """Baseline: one INSERT per row"""
+    quote = {**bundle.quote, "id": str(uuid.uuid4())}
+    await conn.execute(build_insert_sql("quotes", list(quote), many=False), to_json(quote))
+    for item, result in zip(bundle.items, bundle.results):
+        item = {**item, "id": str(uuid.uuid4()), "quote_id": quote["id"]}
+        await conn.execute(build_insert_sql("quote_items", list(item), many=False), to_json(item))
+        result = {**result, "quote_id": quote["id"], "quote_item_id": item["id"]}
+        await conn.execute(build_insert_sql("quote_calculation_results", list(result), many=False), to_json(result))
+
+
+async def timed(conn, write) -> float:
+    """Run write inside a rolled-back transaction; return milliseconds"""
+    start = time.perf_counter()
+    try:
+        async with conn.transaction():
+            await write()
+            elapsed = (time.perf_counter() - start) * 1000
+            raise Rollback()
+    except Rollback:
+        pass
+    return elapsed
+
+
+async def main(organization_id: str, customer_id: str, user_id: str, line_counts):
+    conn = await asyncpg.connect(os.getenv("POSTGRES_DIRECT_URL"))
+    try:
+        print(f"{'lines':>6} {'mode':>12} {'ms':>9} {'ms/100 lines':>13}")
+        for lines in line_counts:
+            bundle = make_bundle(organization_id, customer_id, user_id, lines)
+            modes = {
+                "row-by-row": lambda: save_row_by_row(conn, bundle),
+                "bulk": lambda: save_quote_bundle(conn, bundle, user_id, organization_id),
+            }
+            for mode, write in modes.items():
+                elapsed = await timed(conn, write)
+                print(f"{lines:>6} {mode:>12} {elapsed:>9.1f} {elapsed * 100 / lines:>13.1f}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    counts = [int(arg) for arg in sys.argv[4:]] or [10, 100, 1000]
+    asyncio.run(main(sys.argv[1], sys.argv[2], sys.argv[3], counts))
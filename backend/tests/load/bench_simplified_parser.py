@@ -0,0 +1,64 @@
+"""
+Simplified Template Parser Benchmark
+
+Measures rows/sec and peak Python memory of SimplifiedExcelParser on
+generated tenders, comparing the streaming (read-only) mode with the
+full workbook load.
+
+Usage:
+    cd backend && python -m tests.load.bench_simplified_parser [rows ...]
+"""
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+import openpyxl
+
+from excel_parser.simplified_parser import SimplifiedExcelParser
+
+
+TEMPLATE_PATH = Path(__file__).parent.parent.parent.parent / "validation_data" / "template_quote_input_v5.xlsx"
+
+
+def make_template(row_count: int) -> bytes:
+    """v5 template with row_count product rows"""
+    wb = openpyxl.load_workbook(TEMPLATE_PATH)
+    ws = wb["Котировка"]
+    for i in range(row_count):
+        values = ["SKF", f"6{i:05d}", f"Подшипник SKF 6{i:05d}", i % 50 + 1, 0.75, "USD",
+                  100 + i * 1.37, "Китай", 0, 8482100000, 5, 15]
+        for col, value in enumerate(values, start=1):
+            ws.cell(row=16 + i, column=col, value=value)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(content: bytes, read_only: bool):
+    """Parse twice (timed, then traced); return (seconds, peak traced bytes, product count)"""
+    start = time.perf_counter()
+    result = SimplifiedExcelParser(BytesIO(content), read_only=read_only).parse()
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows parsing several times over, so memory is a separate run
+    tracemalloc.start()
+    SimplifiedExcelParser(BytesIO(content), read_only=read_only).parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(result.products)
+
+
+def main(row_counts):
+    print(f"{'rows':>8} {'mode':>10} {'seconds':>9} {'rows/sec':>10} {'peak MB':>9}")
+    for row_count in row_counts:
+        content = make_template(row_count)
+        for read_only in (False, True):
+            elapsed, peak, parsed = measure(content, read_only)
+            mode = "streaming" if read_only else "full"
+            print(f"{parsed:>8} {mode:>10} {elapsed:>9.2f} {parsed / elapsed:>10.0f} {peak / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
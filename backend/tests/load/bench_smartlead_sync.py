@@ -0,0 +1,120 @@
+"""
+SmartLead Sync Benchmark
+
+Syncs N synthetic campaigns from the replay server
+(tests/load/replay_server.py) over real sockets: one worker (the old
+sequential sync) against the worker pool, then the default SmartLead rate
+limit, then an incremental run where only active campaigns are due.
+
+Runs fully offline; campaign_data is not written.
+
+Usage:
+    cd backend && python -m tests.load.bench_smartlead_sync [campaigns] [latency_ms]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from http_pool import RateLimiter
+from services.smartlead_service import (
+    SMARTLEAD_RATE_BURST,
+    SMARTLEAD_RATE_PER_SECOND,
+    SMARTLEAD_SYNC_CONCURRENCY,
+    SmartLeadService,
+)
+from tests.load.bench_outbound_http import start_server
+from tests.load.replay_server import create_replay_app, replay_client
+
+
+def synthetic_recordings(count: int) -> dict:
+    """Campaign list plus analytics / lead statistics / one leads page per campaign"""
+    updated = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+    recordings = {"GET /api/v1/campaigns": {"json": [
+        {"id": i, "name": f"Campaign {i}", "status": "ACTIVE" if i % 4 == 0 else "COMPLETED",
+         "created_at": updated, "updated_at": updated}
+        for i in range(count)
+    ]}}
+    for i in range(count):
+        recordings[f"GET /api/v1/campaigns/{i}/analytics"] = {"json": {"sent_count": 900, "unique_open_count": 400}}
+        recordings[f"GET /api/v1/campaigns/{i}/lead-statistics"] = {"json": {"completed": 450}}
+        recordings[f"GET /api/v1/campaigns/{i}/leads"] = {"json": {
+            "total_leads": 450, "data": [{"lead_category_id": 1 + n % 9} for n in range(40)]
+        }}
+    return {"smartlead": recordings}
+
+
+async def run(base_url: str, count: int, concurrency: int, limiter: RateLimiter, synced_at=None) -> tuple:
+    """
+    One sync without the database; return (seconds, campaigns fetched).
+
+    synced_at: last sync of every campaign (None = force refresh)
+    """
+    organization_id = uuid4()
+    async with replay_client(base_url=base_url) as client:
+        service = SmartLeadService(
+            api_key="bench", http_client=client, rate_limiter=limiter, concurrency=concurrency
+        )
+
+        async def load_sync_state(org):
+            return {str(i): synced_at for i in range(count)}
+
+        async def store_campaign_data(org, entries):
+            return []
+
+        service.load_sync_state = load_sync_state
+        service.store_campaign_data = store_campaign_data
+        synced = []
+        service._fetch_all_metrics = _counting(service._fetch_all_metrics, synced)
+
+        start = time.perf_counter()
+        result = await service.sync_all_campaigns(organization_id, force_refresh=synced_at is None)
+        elapsed = time.perf_counter() - start
+        assert not result.errors, result.errors
+        return elapsed, len(synced)
+
+
+def _counting(fetch_all, synced: list):
+    async def wrapper(campaigns):
+        results = await fetch_all(campaigns)
+        synced.extend(results)
+        return results
+    return wrapper
+
+
+def unlimited() -> RateLimiter:
+    return RateLimiter(rate=1e9, burst=1e9)
+
+
+async def main(count: int, latency_ms: float):
+    server, base_url = start_server(create_replay_app(synthetic_recordings(count), latency_ms=latency_ms))
+    try:
+        print(f"{count} campaigns, {latency_ms}ms server latency\n")
+        for label, concurrency, limiter in (
+            ("sequential (1 worker)", 1, unlimited()),
+            (f"worker pool ({SMARTLEAD_SYNC_CONCURRENCY} workers)", SMARTLEAD_SYNC_CONCURRENCY, unlimited()),
+            (
+                f"worker pool, {SMARTLEAD_RATE_PER_SECOND:g} req/s limit",
+                SMARTLEAD_SYNC_CONCURRENCY,
+                RateLimiter(SMARTLEAD_RATE_PER_SECOND, SMARTLEAD_RATE_BURST),
+            ),
+        ):
+            elapsed, synced = await run(base_url, count, concurrency, limiter)
+            print(f"{label:<40} {elapsed:7.2f}s  {synced} campaigns")
+
+        # Last synced an hour ago: only ACTIVE campaigns (1 in 4) are due
+        last_sync = datetime.now(timezone.utc) - timedelta(hours=1)
+        elapsed, synced = await run(
+            base_url, count, SMARTLEAD_SYNC_CONCURRENCY,
+            RateLimiter(SMARTLEAD_RATE_PER_SECOND, SMARTLEAD_RATE_BURST), synced_at=last_sync
+        )
+        print(f"{'incremental, rate limited':<40} {elapsed:7.2f}s  {synced} campaigns")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    asyncio.run(main(campaigns, latency))
@@ -0,0 +1,153 @@
+"""
+Replay Server for Outbound APIs
+
+Serves recorded CBR / DaData / SmartLead responses from
+tests/fixtures/http_replay/*.json, with optional latency and failure
+injection, so refresh latency and retry behaviour can be measured offline.
+
+Requests are routed by upstream host: ReplayTransport rewrites
+https://www.cbr-xml-daily.ru/daily_json.js to <base>/cbr/daily_json.js,
+so the services run unchanged with an injected client.
+
+Usage:
+    cd backend && python -m tests.load.replay_server [--port 8765] [--latency-ms 50] [--fail-rate 0.2]
+
+In tests (in-process, no sockets):
+    app = create_replay_app()
+    service = ExchangeRateService(http_client=replay_client(app))
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from typing import Dict, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from http_pool import create_http_client, create_transport
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), "..", "fixtures", "http_replay")
+
+# Upstream host -> recordings file (without .json)
+UPSTREAM_HOSTS = {
+    "www.cbr-xml-daily.ru": "cbr",
+    "suggestions.dadata.ru": "dadata",
+    "server.smartlead.ai": "smartlead",
+}
+
+
+def load_recordings(directory: str = RECORDINGS_DIR) -> Dict[str, Dict[str, dict]]:
+    """{upstream: {"METHOD /path": {"status": int, "json": ...}}}"""
+    recordings = {}
+    for upstream in UPSTREAM_HOSTS.values():
+        path = os.path.join(directory, f"{upstream}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                recordings[upstream] = json.load(f)
+    return recordings
+
+
+def create_replay_app(
+    recordings: Optional[Dict[str, Dict[str, dict]]] = None,
+    latency_ms: float = 0.0,
+    fail_rate: float = 0.0,
+    fail_status: int = 503,
+    seed: int = 0
+) -> Starlette:
+    """
+    ASGI app replaying recorded responses.
+
+    Args:
+        recordings: Recorded responses (default: load_recordings())
+        latency_ms: Delay added to every response
+        fail_rate: Share of requests answered with fail_status
+        fail_status: Status code of injected failures
+        seed: Seed for failure injection (reproducible runs)
+
+    app.state.hits counts requests per "upstream METHOD /path".
+    """
+    recordings = load_recordings() if recordings is None else recordings
+    rng = random.Random(seed)
+
+    async def replay(request: Request):
+        upstream = request.path_params["upstream"]
+        key = f"{request.method} /{request.path_params['path']}"
+        request.app.state.hits[f"{upstream} {key}"] += 1
+
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if fail_rate and rng.random() < fail_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=fail_status)
+
+        recording = recordings.get(upstream, {}).get(key)
+        if recording is None:
+            return JSONResponse({"error": f"no recording for {upstream} {key}"}, status_code=404)
+        return JSONResponse(recording.get("json"), status_code=recording.get("status", 200))
+
+    app = Starlette(routes=[Route("/{upstream}/{path:path}", replay, methods=["GET", "POST"])])
+    app.state.hits = Counter()
+    return app
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Sends requests for known upstream hosts to the replay server"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, base_url: str):
+        self.inner = inner
+        self.base_url = httpx.URL(base_url)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        upstream = UPSTREAM_HOSTS.get(request.url.host)
+        if upstream is None:
+            raise httpx.ConnectError(f"No replay for host {request.url.host}", request=request)
+
+        request.url = request.url.copy_with(
+            scheme=self.base_url.scheme,
+            host=self.base_url.host,
+            port=self.base_url.port,
+            path=f"/{upstream}{request.url.path}",
+        )
+        request.headers["Host"] = self.base_url.netloc.decode("ascii")
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def replay_client(app: Optional[Starlette] = None, base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Outbound client that hits the replay server.
+
+    Pass app for an in-process client, or base_url of a running server
+    (uses the same pooled transport as production).
+    """
+    if app is not None:
+        transport = ReplayTransport(httpx.ASGITransport(app=app), "http://replay")
+    else:
+        transport = ReplayTransport(create_transport(), base_url)
+    return create_http_client(transport=transport)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Replay recorded CBR/DaData/SmartLead responses")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_replay_app(latency_ms=args.latency_ms, fail_rate=args.fail_rate, fail_status=args.fail_status),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
@@ -0,0 +1,213 @@
+"""
+Tests for the parallel bulk importer pipeline
+
+Uses an in-memory stand-in for the asyncpg pool; parsing runs in a real
+process pool with a lightweight parse function.
+"""
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from migration.parallel_importer import (
+    ImportCheckpoint,
+    ParallelQuoteImporter,
+    ParsedQuote,
+    quote_number_for,
+)
+from migration.progress_tracker import ProgressTracker
+
+
+def fake_parse(filepath: str) -> ParsedQuote:
+    """Files hold JSON: {"number": ..., "items": n} or {"error": ...}"""
+    with open(filepath, encoding="utf-8") as f:
+        data = json.load(f)
+    if "error" in data:
+        raise ValueError(data["error"])
+    items = [(f"Product {i+1}", 1, 100, i + 1) for i in range(data["items"])]
+    return ParsedQuote(filepath, data["number"], "МАСТЕР БЭРИНГ ООО", items)
+
+
+class FakeDatabase:
+    def __init__(self, existing=(), broken=()):
+        self.tables = {"quotes": [], "quote_items": []}
+        self.existing = set(existing)
+        self.broken = set(broken)
+        self.active = 0
+        self.max_active = 0
+        self.copies = 0
+
+
+class FakeConnection:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.staged = None
+
+    async def fetch(self, query, organization_id, numbers):
+        committed = {row[3] for row in self.db.tables["quotes"]}
+        return [{"idn_quote": n} for n in numbers if n in self.db.existing or n in committed]
+
+    async def fetchrow(self, query, *args):
+        return {"id": "customer-1"}
+
+    async def execute(self, query, *args):
+        return None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.staged = {"quotes": [], "quote_items": []}
+        try:
+            yield
+        except Exception:
+            self.staged = None
+            raise
+        for table, records in self.staged.items():
+            self.db.tables[table].extend(records)
+        self.staged = None
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.db.copies += 1
+        if table == "quotes" and any(record[3] in self.db.broken for record in records):
+            raise ValueError("invalid input syntax")
+        self.staged[table].extend(records)
+
+
+class FakePool:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.db.active += 1
+        self.db.max_active = max(self.db.max_active, self.db.active)
+        try:
+            yield FakeConnection(self.db)
+        finally:
+            self.db.active -= 1
+
+
+def write_files(tmp_path, specs):
+    paths = []
+    for name, data in specs:
+        path = tmp_path / name
+        path.write_text(json.dumps(data), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def make_importer(**kwargs):
+    options = dict(
+        organization_id="org-1",
+        user_id="user-1",
+        batch_size=3,
+        parse_workers=2,
+        writers=2,
+        queue_size=4,
+        parse_func=fake_parse,
+    )
+    options.update(kwargs)
+    return ParallelQuoteImporter(**options)
+
+
+@pytest.mark.asyncio
+async def test_imports_all_files_with_copy(tmp_path):
+    paths = write_files(tmp_path, [(f"quote_{i:03d}.xlsx", {"number": f"КП-{i:03d}", "items": 2}) for i in range(10)])
+    db = FakeDatabase()
+
+    results = await make_importer().import_files(paths, pool=FakePool(db))
+
+    assert results["successful"] == 10
+    assert results["failed"] == results["skipped"] == 0
+    assert len(db.tables["quotes"]) == 10
+    assert len(db.tables["quote_items"]) == 20
+    # Items point at the generated quote ids
+    quote_ids = {row[0] for row in db.tables["quotes"]}
+    assert {row[0] for row in db.tables["quote_items"]} == quote_ids
+    assert db.max_active == 2
+    # Batched: far fewer COPY calls than files
+    assert db.copies < 20
+
+
+@pytest.mark.asyncio
+async def test_duplicates_are_skipped(tmp_path):
+    paths = write_files(tmp_path, [
+        ("quote_001.xlsx", {"number": "КП-001", "items": 1}),
+        ("quote_002.xlsx", {"number": "КП-002", "items": 1}),
+        ("copy_of_002.xlsx", {"number": "КП-002", "items": 1}),
+    ])
+    db = FakeDatabase(existing={"КП-001"})
+
+    results = await make_importer().import_files(paths, pool=FakePool(db))
+
+    assert results["successful"] == 1
+    assert results["skipped"] == 2
+    assert [row[3] for row in db.tables["quotes"]] == ["КП-002"]
+
+
+@pytest.mark.asyncio
+async def test_failures_are_isolated(tmp_path):
+    paths = write_files(tmp_path, [
+        ("quote_001.xlsx", {"number": "КП-001", "items": 1}),
+        ("quote_002.xlsx", {"error": "Cannot find calculation sheet"}),
+        ("quote_003.xlsx", {"number": "КП-003", "items": 1}),
+        ("quote_004.xlsx", {"number": "КП-004", "items": 1}),
+    ])
+    db = FakeDatabase(broken={"КП-003"})
+
+    results = await make_importer(writers=1, batch_size=10).import_files(paths, pool=FakePool(db))
+
+    assert results["successful"] == 2
+    assert results["failed"] == 2
+    assert sorted(error["file"] for error in results["errors"]) == ["quote_002.xlsx", "quote_003.xlsx"]
+    assert sorted(row[3] for row in db.tables["quotes"]) == ["КП-001", "КП-004"]
+
+
+@pytest.mark.asyncio
+async def test_resume_from_checkpoint(tmp_path):
+    specs = [(f"quote_{i:03d}.xlsx", {"number": f"КП-{i:03d}", "items": 1}) for i in range(6)]
+    paths = write_files(tmp_path, specs)
+    checkpoint = str(tmp_path / "import.checkpoint")
+    db = FakeDatabase()
+
+    # First run only got through half of the archive
+    await make_importer(checkpoint_path=checkpoint).import_files(paths[:3], pool=FakePool(db))
+    results = await make_importer(checkpoint_path=checkpoint).import_files(paths, pool=FakePool(db))
+
+    assert results["resumed"] == 3
+    assert results["successful"] == 3
+    assert len(db.tables["quotes"]) == 6
+
+
+def test_checkpoint_ignores_partial_line_and_changed_files(tmp_path):
+    path = tmp_path / "quote_001.xlsx"
+    path.write_text("{}")
+    checkpoint_file = tmp_path / "import.checkpoint"
+
+    ImportCheckpoint(str(checkpoint_file)).record([(str(path), "imported", "КП-001")])
+    with open(checkpoint_file, "a", encoding="utf-8") as f:
+        f.write('{"key": "trunc')
+
+    assert ImportCheckpoint(str(checkpoint_file)).is_done(str(path))
+
+    path.write_text('{"changed": true}')
+    assert not ImportCheckpoint(str(checkpoint_file)).is_done(str(path))
+
+
+def test_quote_number_is_stable():
+    assert quote_number_for("/data/quote_017.xlsx", "ab" * 32) == "КП-017"
+    assert quote_number_for("/data/КП Ромашка.xlsx", "ab" * 32) == "КП-IMP-abababababab"
+
+
+def test_tracker_throughput_and_eta(capsys):
+    tracker = ProgressTracker()
+    tracker.start(10)
+    tracker.start_time = datetime.now() - timedelta(seconds=4)
+
+    tracker.increment(rows=30)
+    tracker.increment(rows=10)
+
+    assert tracker.throughput() == pytest.approx(0.5, rel=0.05)
+    assert tracker.rows_throughput() == pytest.approx(10, rel=0.05)
+    assert tracker.eta().total_seconds() == pytest.approx(16, rel=0.05)
+    assert "files/s" in capsys.readouterr().out
@@ -195,3 +195,33 @@ class TestParseExcel:
         )
 
         assert response.status_code == 400
+
+
+class TestExchangeRateMatrix:
+    """Cross rates from the precomputed matrix match the per-call formula"""
+
+    @pytest.mark.asyncio
+    async def test_matrix_rates_match_formula(self):
+        from decimal import Decimal
+        from routes.quotes_upload import calculate_exchange_rate, get_exchange_rates
+        from services.exchange_rate_service import ExchangeRateService
+
+        service = ExchangeRateService()
+        service._cached_rates = {
+            "USD": Decimal("95.4567"),
+            "EUR": Decimal("103.789"),
+            "CNY": Decimal("13.245"),
+            "TRY": Decimal("2.8123"),
+            "RUB": Decimal("1.0"),
+        }
+        with patch("routes.quotes_upload.get_exchange_rate_service", return_value=service):
+            rates = await get_exchange_rates("EUR", ["CNY", "TRY", "RUB", "KZT"])
+
+        assert rates["KZT/RUB"] == Decimal("1.0")  # Fallback for unknown currency
+        plain = dict(rates)
+        currencies = ["USD", "EUR", "CNY", "TRY", "RUB", "KZT", "GBP"]
+        for from_currency in currencies:
+            for to_currency in currencies:
+                for for_division in (False, True):
+                    assert calculate_exchange_rate(from_currency, to_currency, rates, for_division) == \
+                        calculate_exchange_rate(from_currency, to_currency, plain, for_division)
@@ -0,0 +1,133 @@
+"""
+Tests for activity log reads: filter building, keyset cursors and stats
+"""
+import json
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from uuid import UUID
+
+import pytest
+
+from services.activity_log_query_service import (
+    LOG_USERS_SQL,
+    build_filters,
+    build_list_query,
+    decode_cursor,
+    encode_cursor,
+    get_log_stats,
+    get_log_user_ids,
+    list_logs,
+)
+
+ORG = "11111111-1111-1111-1111-111111111111"
+USER = "22222222-2222-2222-2222-222222222222"
+
+
+def make_log(n: int) -> dict:
+    return {
+        "id": UUID(int=n), "user_id": UUID(USER), "action": "created", "entity_type": "quote",
+        "entity_id": None, "metadata": json.dumps({"n": n}), "created_at": datetime(2025, 3, 10, 9, 0, n),
+    }
+
+
+class FakeConnection:
+    def __init__(self, rows, count=None):
+        self.rows = rows
+        self.count = count
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows
+
+    async def fetchval(self, query, *args):
+        self.calls.append((query, args))
+        return self.count
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def test_filters_number_parameters_in_order():
+    conditions, args = build_filters(
+        ORG, date_from=date(2025, 3, 1), date_to=date(2025, 3, 31), user_id=USER, action="exported"
+    )
+
+    assert conditions == [
+        "organization_id = $1::uuid",
+        "created_at >= $2::timestamp",
+        "created_at < $3::timestamp",
+        "user_id = $4::uuid",
+        "action = $5",
+    ]
+    # date_to covers the whole last day
+    assert args == [ORG, datetime(2025, 3, 1), datetime(2025, 4, 1), USER, "exported"]
+
+
+def test_cursor_round_trip_and_keyset_condition():
+    cursor = encode_cursor(datetime(2025, 3, 10, 9, 0, 5, 123456), UUID(int=5))
+    assert decode_cursor(cursor) == (datetime(2025, 3, 10, 9, 0, 5, 123456), UUID(int=5))
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+    sql, args = build_list_query(["organization_id = $1::uuid"], [ORG], 11, cursor=decode_cursor(cursor))
+    assert "(created_at, id) < ($2::timestamp, $3::uuid)" in sql
+    assert sql.endswith("ORDER BY created_at DESC, id DESC LIMIT 11")
+    assert "OFFSET" not in sql
+    assert args == [ORG, datetime(2025, 3, 10, 9, 0, 5, 123456), UUID(int=5)]
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_skips_count_and_returns_next_cursor():
+    conn = FakeConnection([make_log(n) for n in (9, 8, 7)])
+    cursor = encode_cursor(datetime(2025, 3, 10, 9, 0, 10), UUID(int=10))
+
+    page = await list_logs(ORG, entity_type="quote", cursor=cursor, per_page=2, pool=FakePool(conn))
+
+    assert [item["id"] for item in page["items"]] == [UUID(int=9), UUID(int=8)]
+    assert page["items"][0]["metadata"] == {"n": 9}
+    assert page["total"] is None and page["page"] is None
+    assert decode_cursor(page["next_cursor"]) == (datetime(2025, 3, 10, 9, 0, 8), UUID(int=8))
+    # One query, fetching one row more than the page
+    assert len(conn.calls) == 1
+    assert conn.calls[0][0].endswith("LIMIT 3")
+
+
+@pytest.mark.asyncio
+async def test_numbered_page_counts_matches():
+    conn = FakeConnection([make_log(1)], count=201)
+
+    page = await list_logs(ORG, page=3, per_page=100, pool=FakePool(conn))
+
+    assert (page["total"], page["page"], page["next_cursor"]) == (201, 3, None)
+    assert conn.calls[0][0].endswith("LIMIT 101 OFFSET 200")
+    assert conn.calls[1] == ("SELECT count(*) FROM activity_logs WHERE organization_id = $1::uuid", (ORG,))
+
+
+@pytest.mark.asyncio
+async def test_stats_and_users_are_computed_in_sql():
+    conn = FakeConnection([
+        {"action": "created", "entity_type": "quote", "n": 5},
+        {"action": "created", "entity_type": "customer", "n": 2},
+        {"action": "exported", "entity_type": "quote", "n": 1},
+    ])
+
+    stats = await get_log_stats(ORG, date_from=date(2025, 3, 1), pool=FakePool(conn))
+
+    assert stats == {
+        "total_logs": 8,
+        "by_action": {"created": 7, "exported": 1},
+        "by_entity": {"quote": 6, "customer": 2},
+    }
+    assert "GROUP BY action, entity_type" in conn.calls[0][0]
+
+    conn = FakeConnection([{"user_id": UUID(USER)}])
+    assert await get_log_user_ids(ORG, pool=FakePool(conn)) == [USER]
+    assert conn.calls == [(LOG_USERS_SQL, (ORG,))]
@@ -533,3 +533,82 @@ def test_generate_grid_export_missing_optional_fields():
     sku_value = ws1.cell(row=2, column=2).value
     assert brand_value in ['', None]  # Brand
     assert sku_value in ['', None]  # SKU
+
+
+# ============================================================================
+# TESTS: Shared Style Registry
+# ============================================================================
+
+def _many_items(count):
+    return [
+        {
+            'brand': 'SKF',
+            'product_code': f'{i}',
+            'product_name': f'Item {i}',
+            'quantity': 1,
+            'calculation_results': {'sales_price_per_unit_no_vat': 10.0 + i, 'sales_price_total_with_vat': 12.0},
+        }
+        for i in range(count)
+    ]
+
+
+def test_register_grid_styles_adds_named_styles():
+    """All shared grid styles are registered on the workbook"""
+    from openpyxl import Workbook
+    from services.excel_service import register_grid_styles, GRID_STYLE_SPECS
+
+    wb = Workbook()
+    styles = register_grid_styles(wb)
+
+    assert set(styles) == set(GRID_STYLE_SPECS)
+    for name in GRID_STYLE_SPECS:
+        assert name in wb.named_styles
+
+
+def test_grid_row_writer_applies_template():
+    """Row writer applies the per-column style template to appended rows"""
+    from openpyxl import Workbook
+    from services.excel_service import register_grid_styles, GridRowWriter
+
+    wb = Workbook()
+    ws = wb.active
+    styles = register_grid_styles(wb)
+    writer = GridRowWriter(ws, styles, [None, 'kvota_money', 'kvota_percent'])
+
+    writer.append(['A', 1.5, 0.2])
+    writer.append(['B', 2.5, 0.3])
+
+    assert ws['A2'].value == 'B'
+    assert ws['B1'].number_format == '#,##0.00 ₽'
+    assert ws['B2'].style == 'kvota_money'
+    assert ws['C2'].number_format == '0.00%'
+    assert ws['A1'].style == 'Normal'
+
+
+def test_supply_grid_style_table_does_not_grow_with_rows(sample_export_data):
+    """Style table size is independent of the number of rows"""
+    small = sample_export_data.model_copy(update={'items': _many_items(2)})
+    large = sample_export_data.model_copy(update={'items': _many_items(300)})
+
+    wb_small = load_workbook(BytesIO(QuoteExcelService.generate_supply_grid_export(small)))
+    wb_large = load_workbook(BytesIO(QuoteExcelService.generate_supply_grid_export(large)))
+
+    assert len(wb_large._cell_styles) == len(wb_small._cell_styles)
+
+
+def test_supply_grid_export_rows_and_totals(sample_export_data):
+    """Data rows follow the header row and totals row is bold"""
+    export_data = sample_export_data.model_copy(update={'items': _many_items(3)})
+    wb = load_workbook(BytesIO(QuoteExcelService.generate_supply_grid_export(export_data)))
+    ws = wb['КП поставка']
+
+    header_row = int(ws.freeze_panes[1:]) - 1
+    assert ws.cell(row=header_row, column=1).value == 'Бренд'
+    assert ws.cell(row=header_row + 1, column=3).value == 'Item 0'
+    assert ws.cell(row=header_row + 1, column=5).value == 10.0
+    assert ws.cell(row=header_row + 1, column=5).number_format == '#,##0.00 ₽'
+
+    totals_row = header_row + 4
+    assert ws.cell(row=totals_row, column=3).value == 'ИТОГО:'
+    assert ws.cell(row=totals_row, column=4).value == 3
+    assert ws.cell(row=totals_row, column=5).font.bold is True
@@ -4,9 +4,9 @@ Tests for Exchange Rate Service
 import pytest
 import asyncio
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from unittest.mock import AsyncMock, patch, MagicMock
-from services.exchange_rate_service import ExchangeRateService
+from services.exchange_rate_service import ExchangeRateService, RateHistory, RateMatrix
 import httpx
 
 
@@ -62,13 +62,13 @@ class TestCBRAPIIntegration:
     @pytest.mark.asyncio
     async def test_fetch_cbr_rates_success(self, service, mock_cbr_response):
         """Test successful CBR API fetch and parsing"""
-        # Mock httpx client
-        with patch('httpx.AsyncClient') as mock_client:
+        # Mock the injected httpx client
+        with patch.object(service, '_http_client', MagicMock()) as mock_client:
             mock_response = MagicMock()
             mock_response.json.return_value = mock_cbr_response
             mock_response.raise_for_status = MagicMock()
 
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
+            mock_client.get = AsyncMock(
                 return_value=mock_response
             )
 
@@ -89,9 +89,9 @@ class TestCBRAPIIntegration:
     @pytest.mark.asyncio
     async def test_fetch_cbr_rates_retry_on_timeout(self, service):
         """Test retry mechanism on timeout"""
-        with patch('httpx.AsyncClient') as mock_client:
+        with patch.object(service, '_http_client', MagicMock()) as mock_client:
             # First two attempts timeout, third succeeds
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
+            mock_client.get = AsyncMock(
                 side_effect=[
                     httpx.TimeoutException("Timeout 1"),
                     httpx.TimeoutException("Timeout 2"),
@@ -109,9 +109,9 @@ class TestCBRAPIIntegration:
     @pytest.mark.asyncio
     async def test_fetch_cbr_rates_all_retries_fail(self, service):
         """Test when all retries are exhausted"""
-        with patch('httpx.AsyncClient') as mock_client:
+        with patch.object(service, '_http_client', MagicMock()) as mock_client:
             # All attempts fail
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
+            mock_client.get = AsyncMock(
                 side_effect=httpx.TimeoutException("Persistent timeout")
             )
 
@@ -264,6 +264,132 @@ class TestRateConversion:
         pass
 
 
+class TestRateMatrix:
+    """Test N×N cross-rate matrix"""
+
+    RUB_RATES = {
+        "USD": Decimal("95.4567"),
+        "EUR": Decimal("103.789"),
+        "CNY": Decimal("13.245"),
+        "RUB": Decimal("1.0"),
+    }
+
+    def test_matrix_matches_cross_rate_formula(self):
+        """Every cell equals (from/RUB) / (to/RUB) at 4 decimals"""
+        currencies = ["USD", "EUR", "CNY", "RUB"]
+        matrix = RateMatrix(self.RUB_RATES, currencies)
+
+        for from_currency in currencies:
+            for to_currency in currencies:
+                if from_currency == to_currency:
+                    continue
+                expected = (self.RUB_RATES[from_currency] / self.RUB_RATES[to_currency]).quantize(Decimal("0.0001"))
+                assert matrix.rate(from_currency, to_currency) == expected
+
+        assert matrix.rate("EUR", "EUR") == Decimal("1.0")
+        assert matrix.rate("USD", "RUB") == Decimal("95.4567")
+        assert len(matrix) == 16
+
+    def test_missing_or_zero_leg_is_absent(self):
+        rates = {**self.RUB_RATES, "TRY": Decimal("0")}
+        matrix = RateMatrix(rates, ["USD", "TRY", "KZT"])
+
+        assert matrix.rate("USD", "TRY") is None
+        assert matrix.rate("KZT", "USD") is None
+        assert matrix.rate("KZT", "KZT") == Decimal("1.0")
+        assert matrix.to_dict() == {
+            "USD": {"USD": Decimal("1.0")},
+            "TRY": {"TRY": Decimal("1.0")},
+            "KZT": {"KZT": Decimal("1.0")},
+        }
+
+    @pytest.mark.asyncio
+    async def test_get_rate_matrix_is_reused_until_refresh(self, service):
+        service._cached_rates = dict(self.RUB_RATES)
+
+        first = await service.get_rate_matrix(["USD", "EUR"])
+        again = await service.get_rate_matrix(["EUR", "USD", "EUR"])
+        finer = await service.get_rate_matrix(["USD", "EUR"], precision=Decimal("0.000001"))
+
+        assert again is first
+        assert finer is not first
+        assert finer.rate("EUR", "USD") == Decimal("1.087289")
+
+        # Daily refresh replaces the cached dict
+        service._cached_rates = {**self.RUB_RATES, "EUR": Decimal("110.0")}
+        refreshed = await service.get_rate_matrix(["USD", "EUR"])
+
+        assert refreshed is not first
+        assert refreshed.rate("EUR", "RUB") is None
+        assert refreshed.rate("EUR", "USD") == Decimal("1.1524")
+
+    @pytest.mark.asyncio
+    async def test_get_rate_matrix_loads_rates_once(self, service):
+        async def load():
+            service._cached_rates = dict(self.RUB_RATES)
+
+        with patch.object(service, '_load_from_db', side_effect=load) as mock_load:
+            await service.get_rate_matrix(["USD", "EUR"])
+            await service.get_rate_matrix(["CNY", "RUB"])
+
+        mock_load.assert_called_once()
+
+
+class TestRateHistory:
+    """Test date-indexed rate history"""
+
+    ROWS = [
+        {"from_currency": "USD", "rate": 90.0, "fetched_at": "2025-01-09T11:00:00+00:00"},
+        {"from_currency": "USD", "rate": 91.0, "fetched_at": "2025-01-10T11:00:00+00:00"},
+        {"from_currency": "EUR", "rate": 99.0, "fetched_at": "2025-01-10T11:00:00+00:00"},
+        # Manual refresh later the same day wins
+        {"from_currency": "USD", "rate": 91.5, "fetched_at": "2025-01-10T15:30:00Z"},
+        {"from_currency": "USD", "rate": 93.0, "fetched_at": "2025-01-13T11:00:00+00:00"},
+    ]
+
+    def test_days_without_publication_use_previous_snapshot(self):
+        history = RateHistory.from_rows(self.ROWS)
+
+        assert len(history) == 3
+        assert history.first_date == date(2025, 1, 9)
+        assert history.last_date == date(2025, 1, 13)
+        assert history.rates_on(date(2025, 1, 8)) is None
+        assert history.rates_on(date(2025, 1, 10))["USD"] == Decimal("91.5")
+        # Weekend keeps Friday's rates
+        assert history.rates_on(date(2025, 1, 12))["USD"] == Decimal("91.5")
+        assert history.rates_on(date(2025, 2, 1))["USD"] == Decimal("93.0")
+        assert history.matrix_on(date(2025, 1, 11)).rate("EUR", "USD") == Decimal("1.0820")
+
+    def test_add_extends_and_replaces(self):
+        history = RateHistory({date(2025, 1, 9): {"USD": Decimal("90")}})
+
+        history.add(date(2025, 1, 9), {"USD": Decimal("90.5")})
+        history.add(date(2025, 1, 11), {"USD": Decimal("92")})
+
+        assert len(history) == 2
+        assert history.rates_on(date(2025, 1, 10))["USD"] == Decimal("90.5")
+        assert history.matrix_on(date(2025, 1, 11)).rate("RUB", "USD") == Decimal("0.0109")
+        with pytest.raises(ValueError):
+            history.add(date(2025, 1, 10), {"USD": Decimal("91")})
+
+    @pytest.mark.asyncio
+    async def test_get_rate_on_date(self, service):
+        service._cached_rates = {"USD": Decimal("95.0"), "EUR": Decimal("100.0"), "RUB": Decimal("1.0")}
+        history = RateHistory.from_rows(self.ROWS)
+
+        with patch.object(service, '_load_history', new_callable=AsyncMock, return_value=history) as mock_load:
+            past = await service.get_rate("USD", "RUB", on_date=date(2025, 1, 11))
+            before_history = await service.get_rate("USD", "RUB", on_date=date(2024, 12, 1))
+            missing_in_past = await service.get_rate("EUR", "RUB", on_date=date(2025, 1, 9))
+            current = await service.get_rate("USD", "RUB")
+
+        mock_load.assert_called_once()
+        assert past == Decimal("91.5")
+        assert before_history == Decimal("95.0")
+        assert missing_in_past == Decimal("100.0")
+        assert current == Decimal("95.0")
+
+
 class TestDatabaseOperations:
     """Test database storage and cleanup"""
 
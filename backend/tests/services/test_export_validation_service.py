@@ -0,0 +1,134 @@
+"""
+Tests for Export Validation Service template snapshot
+
+Uses a small synthetic template (with a table and a расчет sheet) instead of
+the production .xlsm, which takes several seconds to parse.
+"""
+import io
+import pytest
+import openpyxl
+from openpyxl.worksheet.table import Table
+
+from services.export_validation_service import (
+    ExportValidationService,
+    ValidationTemplateSnapshot,
+    QUOTE_REFERENCE_FORMULAS,
+    PRODUCT_INPUT_COLUMNS,
+    _product_count_bucket,
+    _product_reference_formulas,
+)
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    """Minimal template with a расчет sheet and an Excel table"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "расчет"
+    ws["D5"] = "template value"
+    lists = wb.create_sheet("helpsheet")
+    lists.append(["Валюта"])
+    for code in ["USD", "EUR", "RUB"]:
+        lists.append([code])
+    lists.add_table(Table(displayName="list_curr", ref="A1:A4"))
+    path = tmp_path / "template.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def _export(template_path, num_products=2):
+    service = ExportValidationService(template_path)
+    return service.generate_validation_export(
+        quote_inputs={"seller_company": "МАСТЕР БЭРИНГ ООО", "advance_from_client": 100},
+        product_inputs=[{"brand": "SKF", "quantity": i + 1} for i in range(num_products)],
+        api_results={"total_cogs": 100},
+        product_results=[{"profit": 10} for _ in range(num_products)],
+    )
+
+
+def test_snapshot_clones_are_independent(template_path):
+    """Modifying one clone does not affect the snapshot or other clones"""
+    snapshot = ValidationTemplateSnapshot(template_path)
+
+    first = snapshot.clone()
+    first["расчет"]["D5"] = "changed"
+    second = snapshot.clone()
+
+    assert second["расчет"]["D5"].value == "template value"
+    for wb in (first, second):
+        wb.vba_archive.close()
+
+
+def test_snapshot_clone_preserves_tables(template_path):
+    """Tables survive cloning and the clone can be saved"""
+    clone = ValidationTemplateSnapshot(template_path).clone()
+
+    assert "list_curr" in clone["helpsheet"].tables
+    output = io.BytesIO()
+    clone.save(output)
+    clone.vba_archive.close()
+    reloaded = openpyxl.load_workbook(io.BytesIO(output.getvalue()))
+    assert "list_curr" in reloaded["helpsheet"].tables
+
+
+def test_export_matches_disk_template(template_path):
+    """Snapshot-based export produces the same cells as loading from disk"""
+    from_snapshot = openpyxl.load_workbook(io.BytesIO(_export(template_path)))
+    from_disk = openpyxl.load_workbook(io.BytesIO(
+        ExportValidationService(template_path, use_snapshot=False).generate_validation_export(
+            quote_inputs={"seller_company": "МАСТЕР БЭРИНГ ООО", "advance_from_client": 100},
+            product_inputs=[{"brand": "SKF", "quantity": i + 1} for i in range(2)],
+            api_results={"total_cogs": 100},
+            product_results=[{"profit": 10} for _ in range(2)],
+        )
+    ))
+
+    assert from_snapshot.sheetnames == from_disk.sheetnames
+    for name in from_snapshot.sheetnames:
+        snapshot_cells = {k: c.value for k, c in from_snapshot[name]._cells.items()}
+        disk_cells = {k: c.value for k, c in from_disk[name]._cells.items()}
+        assert snapshot_cells == disk_cells, name
+
+
+def test_export_rewrites_raschet_references(template_path):
+    """расчет cells reference API_Inputs for quote and product inputs"""
+    wb = openpyxl.load_workbook(io.BytesIO(_export(template_path, num_products=3)))
+    ws = wb["расчет"]
+    inputs = wb["API_Inputs"]
+
+    assert ws["D5"].value == "='API_Inputs'!D6"
+    assert inputs["C6"].value == "МАСТЕР БЭРИНГ ООО"
+    assert ws["D10"].value == "100% предоплата"
+
+    # Brand column of the third product points at the third product row in API_Inputs
+    formula = ws["B18"].value
+    inputs_row = int(formula.rsplit("B", 1)[1])
+    assert inputs[f"B{inputs_row}"].value == "SKF"
+    assert inputs[f"E{inputs_row}"].value == 3
+    # No references beyond the last product
+    assert ws["B19"].value is None
+
+
+def test_product_count_bucket():
+    """Product counts are rounded up to power-of-two buckets"""
+    assert _product_count_bucket(0) == 16
+    assert _product_count_bucket(16) == 16
+    assert _product_count_bucket(17) == 32
+    assert _product_count_bucket(1000) == 1024
+
+
+def test_product_reference_formulas_are_cached():
+    """Reference tables are built once per bucket"""
+    first = _product_reference_formulas(40, 32)
+    second = _product_reference_formulas(40, 32)
+
+    assert first is second
+    assert len(first) == 32
+    assert len(first[0]) == len(PRODUCT_INPUT_COLUMNS)
+    assert first[1][0] == ("B17", "='API_Inputs'!B41")
+
+
+def test_quote_reference_formulas_start_at_row_6():
+    """Quote-level formulas reference API_Inputs column D from row 6"""
+    assert QUOTE_REFERENCE_FORMULAS[0] == ("D5", "='API_Inputs'!D6")
+    assert QUOTE_REFERENCE_FORMULAS[-1][1].endswith(f"D{5 + len(QUOTE_REFERENCE_FORMULAS)}")
@@ -8,6 +8,8 @@ from datetime import datetime
 import json
 
 from services.idn_service import (
+    RESERVE_IDN_BLOCK_SQL,
+    IDNBlockAllocator,
     IDNService,
     IDNValidationError,
     IDNGenerationError,
@@ -217,12 +219,9 @@ class TestIDNService:
         """Generate quote IDN with mocked database"""
         mock_conn = AsyncMock()
 
-        # Mock fetchrow to return org with supplier_code and empty counters
-        mock_conn.fetchrow.return_value = {
-            'supplier_code': 'CMT',
-            'idn_counters': {}
-        }
-        mock_conn.execute = AsyncMock()
+        # Mock fetchrow to return org with supplier_code; first number of the year
+        mock_conn.fetchrow.return_value = {'supplier_code': 'CMT'}
+        mock_conn.fetchval.return_value = 1
 
         async def run_test():
             with patch('services.idn_service.datetime') as mock_datetime:
@@ -242,12 +241,9 @@ class TestIDNService:
         """Counter should increment on each call"""
         mock_conn = AsyncMock()
 
-        # First call: counter at 4524
-        mock_conn.fetchrow.return_value = {
-            'supplier_code': 'CMT',
-            'idn_counters': {"2025": 4524}
-        }
-        mock_conn.execute = AsyncMock()
+        # Counter was at 4524; the UPSERT returns the incremented value
+        mock_conn.fetchrow.return_value = {'supplier_code': 'CMT'}
+        mock_conn.fetchval.return_value = 4525
 
         async def run_test():
             with patch('services.idn_service.datetime') as mock_datetime:
@@ -262,6 +258,9 @@ class TestIDNService:
 
         result = asyncio.run(run_test())
         assert result == "CMT-1234567890-2025-4525"
+        # One counter round trip, no organization row lock
+        mock_conn.fetchval.assert_awaited_once_with(RESERVE_IDN_BLOCK_SQL, str(org_id), 2025, "idn", 1)
+        assert "FOR UPDATE" not in mock_conn.fetchrow.await_args.args[0]
 
     def test_generate_quote_idn_invalid_inn_format(self, service, org_id):
         """Should raise error for invalid INN format"""
@@ -319,11 +318,8 @@ class TestIDNService:
     def test_generate_quote_idn_different_years(self, service, org_id):
         """Counters should be separate per year"""
         mock_conn = AsyncMock()
-        mock_conn.fetchrow.return_value = {
-            'supplier_code': 'CMT',
-            'idn_counters': {"2024": 3200, "2025": 100}  # Multi-year counters
-        }
-        mock_conn.execute = AsyncMock()
+        mock_conn.fetchrow.return_value = {'supplier_code': 'CMT'}
+        mock_conn.fetchval.return_value = 101  # 2025 counter was at 100
 
         async def run_test():
             with patch('services.idn_service.datetime') as mock_datetime:
@@ -340,15 +336,13 @@ class TestIDNService:
         result = asyncio.run(run_test())
         # Should use 2025 counter (100 + 1 = 101)
         assert result == "CMT-1234567890-2025-101"
+        assert mock_conn.fetchval.await_args.args[2] == 2025
 
     def test_generate_quote_idn_12_digit_inn(self, service, org_id):
         """Should work with 12-digit INN (individual)"""
         mock_conn = AsyncMock()
-        mock_conn.fetchrow.return_value = {
-            'supplier_code': 'MBR',
-            'idn_counters': {"2025": 0}
-        }
-        mock_conn.execute = AsyncMock()
+        mock_conn.fetchrow.return_value = {'supplier_code': 'MBR'}
+        mock_conn.fetchval.return_value = 1
 
         async def run_test():
             with patch('services.idn_service.datetime') as mock_datetime:
@@ -451,6 +445,76 @@ class TestIDNService:
         assert "Invalid supplier_code format" in str(exc_info.value)
 
 
+class TestIDNBlockAllocator:
+    """Test counter blocks reserved per process"""
+
+    def test_block_served_from_memory_until_exhausted(self):
+        """One counter round trip per block; concurrent callers get distinct numbers"""
+        org_id = uuid4()
+        mock_conn = AsyncMock()
+        # Another process already took 1-3: blocks come back as 4-6, then 7-9
+        mock_conn.fetchval.side_effect = [6, 9]
+        allocator = IDNBlockAllocator(block_size=3)
+
+        async def run_test():
+            return await asyncio.gather(*[
+                allocator.next_value(mock_conn, org_id, 2025, "idn") for _ in range(5)
+            ])
+
+        results = asyncio.run(run_test())
+
+        assert sorted(results) == [4, 5, 6, 7, 8]
+        assert mock_conn.fetchval.await_count == 2
+        mock_conn.fetchval.assert_awaited_with(RESERVE_IDN_BLOCK_SQL, str(org_id), 2025, "idn", 3)
+
+    def test_series_and_years_are_separate_counters(self):
+        """Each (organization, year, series) has its own block"""
+        org_id = uuid4()
+        mock_conn = AsyncMock()
+        mock_conn.fetchval.side_effect = [10, 20, 30]
+        allocator = IDNBlockAllocator(block_size=10)
+
+        async def run_test():
+            return [
+                await allocator.next_value(mock_conn, org_id, 2025, "idn"),
+                await allocator.next_value(mock_conn, org_id, 2025, "kp"),
+                await allocator.next_value(mock_conn, org_id, 2026, "idn"),
+                await allocator.next_value(mock_conn, org_id, 2025, "idn"),
+            ]
+
+        assert asyncio.run(run_test()) == [1, 11, 21, 2]
+
+    def test_kp_number_format(self):
+        """Quote numbers are КП{YY}-{NNNN} from the 'kp' series"""
+        org_id = uuid4()
+        mock_conn = AsyncMock()
+        mock_conn.fetchval.return_value = 42
+
+        async def run_test():
+            with patch('services.idn_service.datetime') as mock_datetime:
+                mock_datetime.now.return_value = datetime(2025, 12, 14)
+                return await IDNService().generate_kp_number(org_id, conn=mock_conn)
+
+        assert asyncio.run(run_test()) == "КП25-0042"
+        mock_conn.fetchval.assert_awaited_once_with(RESERVE_IDN_BLOCK_SQL, str(org_id), 2025, "kp", 1)
+
+    def test_missing_supplier_code_does_not_take_a_number(self):
+        """Validation failures leave the counter alone"""
+        mock_conn = AsyncMock()
+        mock_conn.fetchrow.return_value = {'supplier_code': None}
+
+        async def run_test():
+            await IDNService().generate_quote_idn(
+                organization_id=uuid4(),
+                customer_inn="1234567890",
+                conn=mock_conn
+            )
+
+        with pytest.raises(IDNGenerationError):
+            asyncio.run(run_test())
+        mock_conn.fetchval.assert_not_awaited()
+
+
 class TestGetIdnServiceSingleton:
     """Test singleton pattern for IDNService"""
 
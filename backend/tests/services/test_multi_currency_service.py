@@ -1,11 +1,13 @@
 """Tests for MultiCurrencyService"""
 import pytest
+import time
 from decimal import Decimal
 from unittest.mock import AsyncMock, patch, MagicMock
 from uuid import uuid4
 from datetime import datetime, timezone
 
-from services.multi_currency_service import MultiCurrencyService
+from services.exchange_rate_service import ExchangeRateService
+from services.multi_currency_service import MultiCurrencyService, ORG_RATE_POLICY_ERROR_TTL_SECONDS
 from domain_models.monetary import MonetaryValue
 
 
@@ -226,3 +228,156 @@ class TestGetAllRatesForOrg:
             assert "USD" in rates
             assert "EUR" in rates
             assert "CNY" not in rates  # Should be missing, not raise
+
+
+class TestCbrRateToUsd:
+    """Test CBR-derived X/USD rates"""
+
+    @pytest.fixture
+    def rate_service(self):
+        rate_service = ExchangeRateService()
+        rate_service._cached_rates = {
+            "USD": Decimal("95.4567"),
+            "EUR": Decimal("103.789"),
+            "RUB": Decimal("1.0"),
+        }
+        return rate_service
+
+    @pytest.mark.asyncio
+    async def test_cbr_rates_from_shared_matrix(self, rate_service):
+        service = MultiCurrencyService()
+
+        with patch('services.multi_currency_service.get_exchange_rate_service', return_value=rate_service):
+            eur = await service._get_cbr_rate_to_usd("EUR")
+            rub = await service._get_cbr_rate_to_usd("RUB")
+            cny = await service._get_cbr_rate_to_usd("CNY")
+
+        assert eur == (Decimal("103.789") / Decimal("95.4567")).quantize(Decimal("0.000001"))
+        assert rub == (Decimal("1") / Decimal("95.4567")).quantize(Decimal("0.000001"))
+        assert cny is None
+        # All snapshot currencies share one matrix
+        assert len(rate_service._matrices) == 1
+
+
+class TestOrgRatePolicy:
+    """Test the cached org rate policy and batch conversion"""
+
+    @pytest.fixture
+    def supabase(self):
+        """Settings row with manual rates on, plus two manual rates"""
+        tables = {
+            "calculation_settings": [{"use_manual_exchange_rates": True}],
+            "organization_exchange_rates": [
+                {"from_currency": "EUR", "to_currency": "USD", "rate": 1.08},
+                {"from_currency": "TRY", "to_currency": "USD", "rate": "0.0303"},
+            ],
+        }
+        client = MagicMock()
+
+        def table(name):
+            query = MagicMock()
+            query.select.return_value = query
+            query.eq.return_value = query
+            query.limit.return_value = query
+            query.execute.return_value = MagicMock(data=tables[name])
+            return query
+
+        client.table.side_effect = table
+        return client
+
+    @pytest.fixture
+    def service(self, supabase):
+        service = MultiCurrencyService()
+        service._supabase = supabase
+        return service
+
+    @pytest.mark.asyncio
+    async def test_policy_loaded_once(self, service, supabase):
+        org_id = uuid4()
+
+        policy = await service.get_rate_policy(org_id)
+        assert await service._get_org_uses_manual_rates(org_id) is True
+        assert await service._get_manual_rate(org_id, "TRY", "USD") == Decimal("0.0303")
+        assert await service._get_manual_rate(org_id, "CNY", "USD") is None
+
+        assert policy.manual_rate("EUR", "USD") == Decimal("1.08")
+        # One settings query + one rate table query
+        assert supabase.table.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_policy_expires_and_invalidates(self, service, supabase):
+        org_id = uuid4()
+
+        await service.get_rate_policy(org_id)
+        service.invalidate_rate_policy(org_id)
+        await service.get_rate_policy(org_id)
+        assert supabase.table.call_count == 4
+
+        service.policy_ttl_seconds = 0
+        service.invalidate_rate_policy()
+        await service.get_rate_policy(org_id)
+        await service.get_rate_policy(org_id)
+        assert supabase.table.call_count == 8
+
+    @pytest.mark.asyncio
+    async def test_settings_failure_falls_back_to_cbr(self, service, supabase):
+        supabase.table.side_effect = Exception("connection refused")
+
+        policy = await service.get_rate_policy(uuid4())
+
+        assert policy.use_manual is False
+
+    @pytest.mark.asyncio
+    async def test_settings_failure_is_not_cached_for_full_ttl(self, service, supabase):
+        org_id = uuid4()
+        tables = supabase.table.side_effect
+        supabase.table.side_effect = Exception("connection refused")
+
+        assert (await service.get_rate_policy(org_id)).use_manual is False
+        expires_at, _ = service._policies[str(org_id)]
+        assert expires_at - time.monotonic() <= ORG_RATE_POLICY_ERROR_TTL_SECONDS
+
+        # Database back: the next read after the short TTL sees manual rates
+        supabase.table.side_effect = tables
+        service._policies[str(org_id)] = (time.monotonic() - 1, service._policies[str(org_id)][1])
+        assert (await service.get_rate_policy(org_id)).use_manual is True
+
+    @pytest.mark.asyncio
+    async def test_convert_many_resolves_each_currency_once(self, service):
+        org_id = uuid4()
+
+        with patch.object(service, '_get_cbr_rate_to_usd', new_callable=AsyncMock, return_value=Decimal("0.0105")) as cbr:
+            results = await service.convert_many_to_usd(
+                [
+                    (Decimal("100"), "EUR"),
+                    (Decimal("1000"), "RUB"),
+                    (Decimal("50"), "USD"),
+                    (Decimal("0"), "TRY"),
+                    (Decimal("200"), "EUR"),
+                    (Decimal("2000"), "RUB"),
+                ],
+                org_id
+            )
+
+        assert [r.value_usd for r in results] == [
+            Decimal("108.00"), Decimal("10.50"), Decimal("50"),
+            Decimal("0"), Decimal("216.00"), Decimal("21.00"),
+        ]
+        assert [r.rate_source for r in results] == ["manual", "cbr", "identity", "identity", "manual", "cbr"]
+        cbr.assert_awaited_once_with("RUB")
+
+    @pytest.mark.asyncio
+    async def test_convert_many_matches_convert_to_usd(self, service):
+        org_id = uuid4()
+
+        single = await service.convert_to_usd(Decimal("123.45"), "TRY", org_id)
+        [batch] = await service.convert_many_to_usd([(Decimal("123.45"), "TRY")], org_id)
+
+        assert (batch.value_usd, batch.rate_used, batch.rate_source) == \
+            (single.value_usd, single.rate_used, single.rate_source)
+
+    @pytest.mark.asyncio
+    async def test_convert_many_no_rate_raises(self, service):
+        with patch.object(service, '_get_cbr_rate_to_usd', new_callable=AsyncMock, return_value=None):
+            with pytest.raises(ValueError, match="CNY/USD"):
+                await service.convert_many_to_usd([(Decimal("10"), "CNY")], uuid4())
@@ -0,0 +1,128 @@
+"""
+Tests for the content-addressed parse result cache
+"""
+import io
+import os
+import stat
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from services.parse_cache_service import (
+    ParseResultCache,
+    _file_name,
+    content_digest,
+    inputs_key,
+    parsed_key,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseResultCache(cache_dir=str(tmp_path), memory_bytes=4000, disk_bytes=20000, ttl_seconds=60)
+
+
+def payload(n: int) -> dict:
+    return {"products": ["x" * 1000], "n": n}
+
+
+def test_roundtrip_returns_independent_copies(cache):
+    cache.put("a", {"products": [1, 2]})
+
+    first = cache.get("a")
+    first["products"].append(3)
+
+    assert cache.get("a") == {"products": [1, 2]}
+    assert cache.hits == 2
+    assert cache.get("missing") is None
+    assert cache.misses == 1
+
+
+def test_memory_overflow_spills_to_disk(cache, tmp_path):
+    for n in range(6):
+        cache.put(f"k{n}", payload(n))
+
+    assert cache.memory_total <= 4000
+    assert cache.disk_total > 0
+    assert any(name.endswith(".pkl") for name in os.listdir(tmp_path))
+
+    # Oldest entries come back from disk
+    assert cache.get("k0") == payload(0)
+    assert cache.get("k5") == payload(5)
+
+
+def test_files_of_other_processes_are_never_unpickled(cache, tmp_path):
+    for n in range(6):
+        cache.put(f"k{n}", payload(n))
+
+    # A restarted process cannot verify the old files, so it does not use them
+    restarted = ParseResultCache(cache_dir=str(tmp_path), memory_bytes=4000, disk_bytes=20000, ttl_seconds=60)
+    assert restarted.get("k0") is None
+
+    # A file replaced on disk fails the signature check
+    name = _file_name("k1")
+    with open(tmp_path / name, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\x00")
+    assert cache.get("k1") is None
+    assert cache.get("k2") == payload(2)
+
+
+def test_shared_cache_directory_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+
+    cache = ParseResultCache(cache_dir=str(shared), memory_bytes=2000, disk_bytes=20000, ttl_seconds=60)
+    for n in range(4):
+        cache.put(f"k{n}", payload(n))
+
+    assert os.listdir(shared) == []
+    assert cache.get("k0") is None
+    assert cache.get("k3") == payload(3)
+
+
+def test_new_cache_directory_is_private(tmp_path):
+    ParseResultCache(cache_dir=str(tmp_path / "new"), memory_bytes=2000, disk_bytes=20000, ttl_seconds=60)
+
+    assert stat.S_IMODE(os.stat(tmp_path / "new").st_mode) == 0o700
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ParseResultCache(cache_dir=str(tmp_path), memory_bytes=2000, disk_bytes=3000, ttl_seconds=60)
+    for n in range(10):
+        cache.put(f"k{n}", payload(n))
+
+    assert cache.disk_total <= 3000
+    assert cache.get("k0") is None
+    assert cache.get("k9") == payload(9)
+
+
+def test_entries_expire(tmp_path):
+    cache = ParseResultCache(cache_dir=str(tmp_path), memory_bytes=4000, disk_bytes=20000, ttl_seconds=0)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+
+
+def test_oversized_values_are_not_cached(cache):
+    cache.put("big", "x" * 10000)
+
+    assert cache.get("big") is None
+
+
+def test_keys():
+    stream = io.BytesIO(b"PK\x03\x04 workbook")
+    stream.seek(5)
+
+    digest = content_digest(stream)
+
+    assert stream.tell() == 0
+    assert parsed_key(digest) != parsed_key(content_digest(io.BytesIO(b"other")))
+
+    rates = {"USD/RUB": Decimal("90.1"), "EUR/RUB": Decimal("99.5")}
+    today = date(2026, 1, 10)
+    assert inputs_key(digest, rates, today) == inputs_key(digest, dict(reversed(list(rates.items()))), today)
+    assert inputs_key(digest, rates, today) != inputs_key(digest, {**rates, "USD/RUB": Decimal("91")}, today)
+    assert inputs_key(digest, rates, today) != inputs_key(digest, rates, date(2026, 1, 11))
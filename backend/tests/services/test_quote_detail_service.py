@@ -0,0 +1,136 @@
+"""
+Tests for the single-query quote detail loader and its versioned cache
+"""
+import json
+from decimal import Decimal
+from uuid import uuid4
+
+import asyncpg
+import pytest
+
+from services import quote_detail_service
+from services.quote_detail_service import (
+    QUOTE_COLUMNS,
+    QUOTE_DETAIL_SQL,
+    QUOTE_DETAIL_UNVERSIONED_SQL,
+    QUOTE_DETAIL_VERSION_SQL,
+    QuoteDetailCache,
+    get_quote_detail,
+)
+
+QUOTE_ID = uuid4()
+ORG_ID = "org-1"
+
+
+def detail_row(version=1):
+    row = {c: None for c in QUOTE_COLUMNS}
+    row.update({"id": QUOTE_ID, "organization_id": ORG_ID, "status": "draft"})
+    row.update({
+        "detail_version": version,
+        "customer": json.dumps({"id": "c-1", "name": "ООО Ромашка"}),
+        "items": json.dumps([{
+            "id": "i-1", "position": 0, "quantity": 3,
+            "calculation_results": {"sales_price_per_unit_with_vat_quote": 12.35},
+            "calculated_at": "2025-03-10T09:30:00+00:00",
+        }]),
+        "calculation_variables": json.dumps({"markup": 15.5, "currency_of_quote": "EUR"}),
+        "has_approvals": False,
+    })
+    return row
+
+
+class FakeConnection:
+    """Serves QUOTE_DETAIL_SQL / QUOTE_DETAIL_VERSION_SQL and records calls"""
+
+    def __init__(self, version=1, versions_table=True):
+        self.version = version
+        self.versions_table = versions_table
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append(query)
+        if query == QUOTE_DETAIL_SQL and not self.versions_table:
+            raise asyncpg.UndefinedTableError('relation "quote_detail_versions" does not exist')
+        if query == QUOTE_DETAIL_UNVERSIONED_SQL:
+            return detail_row(version=None)
+        return detail_row(self.version)
+
+    async def fetchval(self, query, *args):
+        self.calls.append(query)
+        return self.version
+
+
+@pytest.fixture(autouse=True)
+def versions_available(monkeypatch):
+    monkeypatch.setattr(quote_detail_service, "_versions_available", True)
+
+
+@pytest.mark.asyncio
+async def test_detail_decoded_in_one_query():
+    conn = FakeConnection()
+
+    detail = await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=QuoteDetailCache())
+
+    assert conn.calls == [QUOTE_DETAIL_SQL]
+    assert detail["quote"]["status"] == "draft"
+    assert detail["customer"]["name"] == "ООО Ромашка"
+    # JSON numbers come back exact
+    assert detail["items"][0]["calculation_results"]["sales_price_per_unit_with_vat_quote"] == Decimal("12.35")
+    assert detail["calculation_variables"]["markup"] == Decimal("15.5")
+
+
+@pytest.mark.asyncio
+async def test_cached_detail_served_while_version_unchanged():
+    cache = QuoteDetailCache()
+    conn = FakeConnection(version=4)
+
+    first = await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=cache)
+    second = await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=cache)
+
+    assert second is first
+    assert conn.calls == [QUOTE_DETAIL_SQL, QUOTE_DETAIL_VERSION_SQL]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Item edit / recalculation / transition bumped the version
+    conn.version = 5
+    third = await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=cache)
+
+    assert third is not first
+    assert conn.calls[2:] == [QUOTE_DETAIL_VERSION_SQL, QUOTE_DETAIL_SQL]
+
+
+@pytest.mark.asyncio
+async def test_cached_detail_not_shared_across_organizations():
+    cache = QuoteDetailCache()
+    conn = FakeConnection()
+    await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=cache)
+
+    assert cache.peek(QUOTE_ID, "org-2") is None
+
+
+@pytest.mark.asyncio
+async def test_without_versions_table_details_load_uncached():
+    cache = QuoteDetailCache()
+    conn = FakeConnection(versions_table=False)
+
+    await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=cache)
+    detail = await get_quote_detail(conn, QUOTE_ID, ORG_ID, cache=cache)
+
+    assert detail["quote"]["id"] == QUOTE_ID
+    assert conn.calls == [QUOTE_DETAIL_SQL, QUOTE_DETAIL_UNVERSIONED_SQL, QUOTE_DETAIL_UNVERSIONED_SQL]
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_viewed():
+    cache = QuoteDetailCache(max_entries=2)
+    cache.set("q-1", ORG_ID, 1, {})
+    cache.set("q-2", ORG_ID, 1, {})
+    cache.touch("q-1")
+    cache.set("q-3", ORG_ID, 1, {})
+
+    assert cache.peek("q-2", ORG_ID) is None
+    assert cache.peek("q-1", ORG_ID) == (1, {})
+
+    expired = QuoteDetailCache(ttl_seconds=0)
+    expired.set("q-1", ORG_ID, 1, {})
+    assert expired.peek("q-1", ORG_ID) is None
@@ -0,0 +1,119 @@
+"""
+Tests for single-transaction quote persistence
+"""
+import json
+from contextlib import asynccontextmanager
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from services.quote_persistence_service import (
+    QuoteBundle,
+    build_insert_sql,
+    save_quote_bundle,
+)
+
+
+class FakeConnection:
+    """Records statements; rows only become visible when the transaction commits"""
+
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+        self.statements = []
+        self.committed = {}
+        self._staged = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self._staged = {}
+        try:
+            yield
+        except Exception:
+            self._staged = None
+            raise
+        for table, rows in self._staged.items():
+            self.committed.setdefault(table, []).extend(rows)
+        self._staged = None
+
+    async def execute(self, query, *args):
+        assert self._staged is not None, "statement outside transaction"
+        self.statements.append(query)
+        if not query.startswith("INSERT INTO"):
+            return
+        table = query.split()[2]
+        if table == self.fail_on:
+            raise RuntimeError(f"insert into {table} failed")
+        rows = json.loads(args[0])
+        self._staged.setdefault(table, []).extend(rows if isinstance(rows, list) else [rows])
+
+
+def make_bundle(lines: int) -> QuoteBundle:
+    return QuoteBundle(
+        quote={"organization_id": "org-1", "idn_quote": "КП25-0001", "quote_date": date(2025, 1, 15), "subtotal": Decimal("10.50")},
+        items=[{"position": i, "product_name": f"Болт {i}", "quantity": i + 1, "custom_fields": {"markup": 15}} for i in range(lines)],
+        variables={"variables": {"currency_of_quote": "USD"}},
+        results=[{"phase_results": {"profit": i}} for i in range(lines)],
+        summary={"calc_s16_total_purchase_price": Decimal("100.25")},
+    )
+
+
+@pytest.mark.asyncio
+async def test_fixed_statement_count_regardless_of_lines():
+    small, large = FakeConnection(), FakeConnection()
+
+    await save_quote_bundle(small, make_bundle(3), "user-1", "org-1")
+    await save_quote_bundle(large, make_bundle(500), "user-1", "org-1")
+
+    # RLS context + quote + items + variables + results + summary
+    assert len(small.statements) == len(large.statements) == 6
+    assert len(large.committed["quote_items"]) == 500
+
+
+@pytest.mark.asyncio
+async def test_rows_are_linked():
+    conn = FakeConnection()
+
+    saved = await save_quote_bundle(conn, make_bundle(3), "user-1", "org-1")
+
+    quote = conn.committed["quotes"][0]
+    assert quote["id"] == saved.quote_id
+    assert quote["quote_date"] == "2025-01-15"
+    assert quote["subtotal"] == "10.50"
+    assert [item["id"] for item in conn.committed["quote_items"]] == saved.item_ids
+    assert all(item["quote_id"] == saved.quote_id for item in conn.committed["quote_items"])
+    assert [r["quote_item_id"] for r in conn.committed["quote_calculation_results"]] == saved.item_ids
+    assert conn.committed["quote_calculation_variables"][0]["quote_id"] == saved.quote_id
+    assert conn.committed["quote_calculation_summaries"][0]["quote_id"] == saved.quote_id
+    assert saved.ms_per_100_lines >= 0
+
+
+@pytest.mark.asyncio
+async def test_failure_rolls_back_everything():
+    conn = FakeConnection(fail_on="quote_calculation_results")
+
+    with pytest.raises(RuntimeError):
+        await save_quote_bundle(conn, make_bundle(3), "user-1", "org-1")
+
+    assert conn.committed == {}
+
+
+@pytest.mark.asyncio
+async def test_results_must_match_items():
+    bundle = make_bundle(3)
+    bundle.results = bundle.results[:2]
+
+    with pytest.raises(ValueError):
+        await save_quote_bundle(FakeConnection(), bundle, "user-1", "org-1")
+
+
+def test_insert_sql():
+    sql = build_insert_sql("quote_items", ["id", "position"])
+
+    assert sql == (
+        'INSERT INTO quote_items ("id", "position") '
+        'SELECT "id", "position" FROM jsonb_populate_recordset(NULL::quote_items, $1::jsonb)'
+    )
+    assert "jsonb_populate_record(" in build_insert_sql("quotes", ["id"], many=False)
+    with pytest.raises(ValueError):
+        build_insert_sql("quotes; DROP TABLE quotes", ["id"])
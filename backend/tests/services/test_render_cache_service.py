@@ -0,0 +1,176 @@
+"""
+Tests for Document Render Cache Service
+"""
+import os
+
+import pytest
+
+import services.render_cache_service as render_cache_service
+from services.render_cache_service import (
+    RenderCache,
+    RenderCacheKey,
+    RenderedDocument,
+    get_or_render_document,
+    get_quote_version_token,
+    get_template_version,
+    prewarm_quote_documents,
+)
+
+
+def _key(quote_id="q1", version="v1", doc_format="pdf_supply"):
+    return RenderCacheKey(quote_id, version, doc_format, "t1")
+
+
+def _doc(content=b"%PDF-1.4 data", filename="kvota_supply_20250101_25-0001_Клиент.pdf"):
+    return RenderedDocument(filename, content, "application/pdf")
+
+
+class TestRenderCache:
+    def test_roundtrip(self, tmp_path):
+        cache = RenderCache(str(tmp_path), max_bytes=1024 * 1024)
+
+        assert cache.get(_key()) is None
+        cache.put(_key(), _doc())
+
+        assert cache.get(_key()) == _doc()
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_key_includes_version_and_format(self, tmp_path):
+        cache = RenderCache(str(tmp_path), max_bytes=1024 * 1024)
+        cache.put(_key(), _doc())
+
+        assert cache.get(_key(version="v2")) is None
+        assert cache.get(_key(doc_format="pdf_openbook")) is None
+
+    def test_lru_eviction(self, tmp_path):
+        doc = _doc(content=b"x" * 400)
+        entry_size = len(render_cache_service._encode_entry(doc))
+        cache = RenderCache(str(tmp_path), max_bytes=entry_size * 2)
+
+        cache.put(_key("q1"), doc)
+        cache.put(_key("q2"), doc)
+        cache.get(_key("q1"))  # q1 becomes most recently used
+        cache.put(_key("q3"), doc)
+
+        assert cache.get(_key("q2")) is None
+        assert cache.get(_key("q1")) == doc
+        assert cache.get(_key("q3")) == doc
+        assert cache.total_bytes == entry_size * 2
+        assert len(os.listdir(tmp_path)) == 2
+
+    def test_survives_restart(self, tmp_path):
+        RenderCache(str(tmp_path), max_bytes=1024 * 1024).put(_key(), _doc())
+
+        reopened = RenderCache(str(tmp_path), max_bytes=1024 * 1024)
+
+        assert len(reopened) == 1
+        assert reopened.get(_key()) == _doc()
+
+    def test_invalidate_quote(self, tmp_path):
+        cache = RenderCache(str(tmp_path), max_bytes=1024 * 1024)
+        cache.put(_key("q1"), _doc())
+        cache.put(_key("q1", doc_format="excel_supply-grid"), _doc())
+        cache.put(_key("q2"), _doc())
+
+        assert cache.invalidate_quote("q1") == 2
+        assert cache.get(_key("q1")) is None
+        assert cache.get(_key("q2")) == _doc()
+
+    def test_invalidate_quote_removes_other_workers_entries(self, tmp_path):
+        cache = RenderCache(str(tmp_path), max_bytes=1024 * 1024)
+        other_worker = RenderCache(str(tmp_path), max_bytes=1024 * 1024)
+        other_worker.put(_key("q1"), _doc())
+
+        assert cache.invalidate_quote("q1") == 1
+        assert os.listdir(tmp_path) == []
+        assert other_worker.get(_key("q1")) is None
+
+    def test_oversized_document_not_stored(self, tmp_path):
+        cache = RenderCache(str(tmp_path), max_bytes=10)
+        cache.put(_key(), _doc())
+
+        assert len(cache) == 0
+
+
+class TestVersions:
+    def test_only_frozen_quotes_get_token(self):
+        base = {"current_version_id": "ver-1", "updated_at": "2025-01-01T10:00:00+00:00"}
+
+        assert get_quote_version_token({**base, "workflow_state": "draft", "status": "draft"}) is None
+        assert get_quote_version_token({**base, "workflow_state": "approved"}) == "ver-1:2025-01-01T10:00:00+00:00"
+        assert get_quote_version_token({**base, "workflow_state": "draft", "status": "sent"}) is not None
+
+    def test_template_version_changes_with_templates(self, tmp_path):
+        template = tmp_path / "supply_quote.html"
+        template.write_text("<html></html>")
+        before = get_template_version(str(tmp_path))
+
+        template.write_text("<html><body></body></html>")
+
+        assert get_template_version(str(tmp_path)) != before
+
+
+@pytest.fixture
+def render_calls(monkeypatch):
+    """Stub quote lookup, export data and renderers; record render calls"""
+    calls = {"fetch": 0, "render": []}
+
+    async def fake_fetch_export_data(quote_id, organization_id):
+        calls["fetch"] += 1
+        return object()
+
+    async def fake_fetch_quote_version(quote_id, organization_id):
+        return calls.get("version")
+
+    def fake_renderer(kind):
+        def render(export_data, format):
+            calls["render"].append(f"{kind}_{format}")
+            return _doc(content=f"{kind}_{format}".encode())
+        return render
+
+    monkeypatch.setattr(render_cache_service, "_fetch_quote_version", fake_fetch_quote_version)
+    monkeypatch.setattr(render_cache_service, "fetch_export_data", fake_fetch_export_data)
+    monkeypatch.setattr(render_cache_service, "RENDERERS", {"pdf": fake_renderer("pdf"), "excel": fake_renderer("excel")})
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_repeat_download_of_frozen_quote_is_cache_read(tmp_path, render_calls):
+    render_calls["version"] = "ver-1:2025-01-01"
+    cache = RenderCache(str(tmp_path))
+
+    first = await get_or_render_document("q1", "org1", "pdf", "supply", cache=cache)
+    second = await get_or_render_document("q1", "org1", "pdf", "supply", cache=cache)
+
+    assert first == second
+    assert render_calls["render"] == ["pdf_supply"]
+    assert render_calls["fetch"] == 1
+
+
+@pytest.mark.asyncio
+async def test_editable_quote_is_always_rendered(tmp_path, render_calls):
+    render_calls["version"] = None
+    cache = RenderCache(str(tmp_path))
+
+    await get_or_render_document("q1", "org1", "pdf", "supply", cache=cache)
+    await get_or_render_document("q1", "org1", "pdf", "supply", cache=cache)
+
+    assert render_calls["render"] == ["pdf_supply", "pdf_supply"]
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_prewarm_fetches_export_data_once(tmp_path, render_calls):
+    render_calls["version"] = "ver-1:2025-01-01"
+    cache = RenderCache(str(tmp_path))
+    documents = [("pdf", "supply"), ("excel", "supply-grid")]
+
+    assert await prewarm_quote_documents("q1", "org1", documents, cache=cache) == 2
+    assert render_calls["fetch"] == 1
+
+    # Already cached: nothing to render
+    assert await prewarm_quote_documents("q1", "org1", documents, cache=cache) == 0
+    document = await get_or_render_document("q1", "org1", "excel", "supply-grid", cache=cache)
+    assert document.content == b"excel_supply-grid"
+    assert render_calls["render"] == ["pdf_supply", "excel_supply-grid"]
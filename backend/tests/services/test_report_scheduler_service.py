@@ -0,0 +1,132 @@
+"""
+Tests for the scheduled report scheduler: next-run heap, change
+notifications, per-organization limits and retries
+"""
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.report_scheduler_service import ReportScheduler, ScheduleQueue
+
+NOW = datetime(2025, 3, 10, 9, 0, tzinfo=timezone.utc)
+
+
+def test_queue_returns_due_schedules_earliest_first():
+    queue = ScheduleQueue()
+    queue.upsert("s-1", "org-1", NOW + timedelta(minutes=5))
+    queue.upsert("s-2", "org-1", NOW - timedelta(minutes=1))
+    queue.upsert("s-3", "org-2", NOW - timedelta(minutes=2))
+
+    # Rescheduled and removed schedules leave outdated heap entries behind
+    queue.upsert("s-1", "org-1", NOW + timedelta(minutes=30))
+    queue.upsert("s-4", "org-2", NOW - timedelta(minutes=3))
+    queue.remove("s-4")
+
+    assert queue.pop_due(NOW) == [("s-3", "org-2"), ("s-2", "org-1")]
+    assert queue.next_run_at() == NOW + timedelta(minutes=30)
+    assert len(queue) == 1
+
+    queue.upsert("s-1", "org-1", None)
+    assert queue.next_run_at() is None
+
+
+def test_notifications_update_the_queue():
+    scheduler = ReportScheduler(run_report=None, dsn="postgresql://unused")
+
+    scheduler._on_notify(None, 1, "scheduled_reports", json.dumps({
+        "op": "INSERT", "id": "s-1", "organization_id": "org-1",
+        "is_active": True, "next_run_at": "2025-03-10T09:30:00+00:00",
+    }))
+    scheduler._on_notify(None, 1, "scheduled_reports", json.dumps({
+        "op": "INSERT", "id": "s-2", "organization_id": "org-1",
+        "is_active": True, "next_run_at": "2025-03-10T09:10:00+00:00",
+    }))
+    assert scheduler.queue.next_run_at() == datetime(2025, 3, 10, 9, 10, tzinfo=timezone.utc)
+
+    # Deactivated / deleted schedules leave the queue; malformed payloads are ignored
+    scheduler._on_notify(None, 1, "scheduled_reports", json.dumps({
+        "op": "UPDATE", "id": "s-2", "organization_id": "org-1", "is_active": False, "next_run_at": None,
+    }))
+    scheduler._on_notify(None, 1, "scheduled_reports", json.dumps({"op": "DELETE", "id": "s-1"}))
+    scheduler._on_notify(None, 1, "scheduled_reports", "not json")
+
+    assert len(scheduler.queue) == 0
+
+
+async def lead_until(scheduler: ReportScheduler, done) -> None:
+    """Dispatch until done() holds (or fail after a second)"""
+    stop = asyncio.Event()
+    leading = asyncio.create_task(scheduler._lead(stop))
+    try:
+        for _ in range(200):
+            if done():
+                return
+            await asyncio.sleep(0.005)
+        pytest.fail("scheduler did not finish in time")
+    finally:
+        stop.set()
+        await leading
+
+
+@pytest.mark.asyncio
+async def test_due_reports_run_with_per_organization_limit():
+    running = Counter()
+    peak = Counter()
+    ran = []
+
+    async def run_report(schedule_id):
+        org = schedule_id.split(":")[0]
+        running[org] += 1
+        peak[org] = max(peak[org], running[org])
+        await asyncio.sleep(0.01)
+        running[org] -= 1
+        ran.append(schedule_id)
+        return None
+
+    scheduler = ReportScheduler(run_report=run_report, workers=4, per_org_limit=1, dsn="postgresql://unused")
+    due = datetime.now(timezone.utc) - timedelta(seconds=1)
+    scheduler.load([
+        {"id": f"{org}:{n}", "organization_id": org, "next_run_at": due}
+        for org, n in (("org-1", 1), ("org-1", 2), ("org-1", 3), ("org-2", 1))
+    ])
+
+    await lead_until(scheduler, lambda: len(ran) == 4)
+
+    assert sorted(ran) == ["org-1:1", "org-1:2", "org-1:3", "org-2:1"]
+    assert peak == Counter({"org-1": 1, "org-2": 1})
+    # org-2 did not wait behind org-1's queue
+    assert ran.index("org-2:1") == 0 or ran.index("org-2:1") == 1
+
+
+@pytest.mark.asyncio
+async def test_reschedules_after_run_and_retries_failures():
+    calls = []
+    next_week = datetime.now(timezone.utc) + timedelta(days=7)
+
+    async def run_report(schedule_id):
+        calls.append(schedule_id)
+        if schedule_id == "broken":
+            raise ValueError("No data found for report")
+        return next_week
+
+    scheduler = ReportScheduler(run_report=run_report, retry_seconds=60, dsn="postgresql://unused")
+    scheduler.load([])
+
+    async def changed_soon():
+        # A schedule created while dispatching wakes the dispatcher
+        await asyncio.sleep(0.01)
+        soon = datetime.now(timezone.utc) + timedelta(milliseconds=20)
+        scheduler.schedule_changed({"id": "weekly", "organization_id": "org-1", "is_active": True, "next_run_at": soon})
+        scheduler.schedule_changed({"id": "broken", "organization_id": "org-2", "is_active": True, "next_run_at": soon})
+
+    asyncio.create_task(changed_soon())
+    await lead_until(scheduler, lambda: scheduler.runs + scheduler.failures == 2)
+
+    assert sorted(calls) == ["broken", "weekly"]
+    assert (scheduler.runs, scheduler.failures) == (1, 1)
+    retry_at = scheduler.queue.next_run_at()
+    assert timedelta(seconds=50) < retry_at - datetime.now(timezone.utc) <= timedelta(seconds=60)
+    assert scheduler.queue.pop_due(next_week) == [("broken", "org-2"), ("weekly", "org-1")]
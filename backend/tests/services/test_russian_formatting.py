@@ -0,0 +1,279 @@
+"""
+Tests for Russian formatting module (amounts in words, number formatting)
+
+Correctness suite for the unified implementation:
+- integer conversion is checked against num2words (used by specification export before)
+- invoice-style amounts are checked against a frozen copy of the previous
+  pdf_service.number_to_words_ru implementation
+"""
+import random
+from decimal import Decimal
+
+import pytest
+from num2words import num2words
+
+from services.russian_formatting import (
+    currency_name_russian,
+    cents_word,
+    format_columns,
+    format_ru_currency,
+    format_ru_currency_code,
+    format_ru_currency_column,
+    format_ru_number,
+    format_ru_number_column,
+    integer_to_words,
+    number_to_russian_words,
+    number_to_words_ru,
+    plural_form,
+)
+
+
+CURRENCIES = ['RUB', 'EUR', 'USD', 'TRY', 'CNY', 'KZT']
+
+
+def legacy_number_to_words_ru(number, currency='RUB'):
+    """Previous pdf_service.number_to_words_ru, kept as reference"""
+    ones = ['', 'один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
+    ones_fem = ['', 'одна', 'две', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять']
+    teens = ['десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать',
+             'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать']
+    tens = ['', '', 'двадцать', 'тридцать', 'сорок', 'пятьдесят',
+            'шестьдесят', 'семьдесят', 'восемьдесят', 'девяносто']
+    hundreds = ['', 'сто', 'двести', 'триста', 'четыреста', 'пятьсот',
+                'шестьсот', 'семьсот', 'восемьсот', 'девятьсот']
+    currency_forms = {
+        'RUB': (['рубль', 'рубля', 'рублей'], ['копейка', 'копейки', 'копеек'], False, True),
+        'EUR': (['евро', 'евро', 'евро'], ['цент', 'цента', 'центов'], False, False),
+        'USD': (['доллар', 'доллара', 'долларов'], ['цент', 'цента', 'центов'], False, False),
+        'TRY': (['лира', 'лиры', 'лир'], ['куруш', 'куруша', 'курушей'], True, False),
+        'CNY': (['юань', 'юаня', 'юаней'], ['фэнь', 'фэня', 'фэней'], False, False),
+    }
+
+    def get_form(n, forms):
+        if 11 <= n % 100 <= 19:
+            return forms[2]
+        elif n % 10 == 1:
+            return forms[0]
+        elif 2 <= n % 10 <= 4:
+            return forms[1]
+        return forms[2]
+
+    def convert_group(n, feminine=False):
+        result = []
+        if n >= 100:
+            result.append(hundreds[n // 100])
+            n %= 100
+        if 10 <= n <= 19:
+            result.append(teens[n - 10])
+        else:
+            if n >= 10:
+                result.append(tens[n // 10])
+                n %= 10
+            if n > 0:
+                result.append(ones_fem[n] if feminine else ones[n])
+        return ' '.join(filter(None, result))
+
+    main_forms, cent_forms, main_fem, _ = currency_forms.get(
+        currency, (['единица', 'единицы', 'единиц'], ['сотая', 'сотых', 'сотых'], True, True)
+    )
+    integer_part = int(abs(number))
+    decimal_part = int(round((abs(number) - integer_part) * 100))
+
+    if integer_part == 0:
+        words = ['ноль']
+    else:
+        words = []
+        if integer_part >= 1000000:
+            millions = integer_part // 1000000
+            words.append(convert_group(millions, False))
+            words.append(get_form(millions, ['миллион', 'миллиона', 'миллионов']))
+            integer_part %= 1000000
+        if integer_part >= 1000:
+            thousands = integer_part // 1000
+            words.append(convert_group(thousands, True))
+            words.append(get_form(thousands, ['тысяча', 'тысячи', 'тысяч']))
+            integer_part %= 1000
+        if integer_part > 0:
+            words.append(convert_group(integer_part, main_fem))
+
+    words.append(get_form(int(abs(number)), main_forms))
+    words.append(f'{decimal_part:02d}')
+    words.append(get_form(decimal_part, cent_forms))
+    return ' '.join(filter(None, words))
+
+
+def legacy_format_number(value):
+    """Previous ru_number filter / format_russian_number"""
+    if value is None:
+        return '0,00'
+    return f"{float(value):,.2f}".replace(',', ' ').replace('.', ',')
+
+
+EDGE_INTEGERS = [
+    0, 1, 2, 5, 10, 11, 19, 20, 21, 99, 100, 101, 111, 999, 1000, 1001, 1999, 2000, 2001,
+    5000, 11000, 21000, 22000, 100000, 999999, 1000000, 1000001, 2000000, 21000000,
+    999999999, 1000000000, 2021001011, 123456789012, 10 ** 12, 10 ** 15 - 1,
+]
+
+
+# ============================================================================
+# INTEGER TO WORDS
+# ============================================================================
+
+class TestIntegerToWords:
+    @pytest.mark.parametrize("n", EDGE_INTEGERS)
+    def test_matches_num2words_edges(self, n):
+        assert integer_to_words(n) == num2words(n, lang='ru')
+
+    def test_matches_num2words_full_range(self):
+        for n in range(0, 20000):
+            assert integer_to_words(n) == num2words(n, lang='ru')
+
+    def test_matches_num2words_random(self):
+        rng = random.Random(42)
+        for _ in range(5000):
+            n = rng.randrange(10 ** 13)
+            assert integer_to_words(n) == num2words(n, lang='ru')
+
+    def test_feminine(self):
+        assert integer_to_words(1, feminine=True) == 'одна'
+        assert integer_to_words(22, feminine=True) == 'двадцать две'
+        assert integer_to_words(2001, feminine=True) == 'две тысячи одна'
+
+    def test_negative(self):
+        assert integer_to_words(-5) == num2words(-5, lang='ru')
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            integer_to_words(10 ** 15)
+
+    @pytest.mark.parametrize("n,expected", [
+        (1, 'рубль'), (2, 'рубля'), (5, 'рублей'), (11, 'рублей'), (14, 'рублей'),
+        (21, 'рубль'), (22, 'рубля'), (111, 'рублей'), (1001, 'рубль'), (0, 'рублей'),
+    ])
+    def test_plural_form(self, n, expected):
+        assert plural_form(n, ('рубль', 'рубля', 'рублей')) == expected
+
+
+# ============================================================================
+# INVOICE STYLE (pdf_service.number_to_words_ru)
+# ============================================================================
+
+class TestNumberToWordsRu:
+    def test_docstring_example(self):
+        assert number_to_words_ru(28576.06, 'EUR') == "двадцать восемь тысяч пятьсот семьдесят шесть евро 06 центов"
+
+    @pytest.mark.parametrize("currency", CURRENCIES)
+    @pytest.mark.parametrize("n", [n for n in EDGE_INTEGERS if n < 10 ** 9])
+    def test_matches_legacy_integers(self, currency, n):
+        assert number_to_words_ru(n, currency) == legacy_number_to_words_ru(n, currency)
+
+    @pytest.mark.parametrize("currency", CURRENCIES)
+    def test_matches_legacy_random_amounts(self, currency):
+        rng = random.Random(currency)
+        for _ in range(2000):
+            amount = round(rng.uniform(0, 999999999), 2)
+            assert number_to_words_ru(amount, currency) == legacy_number_to_words_ru(amount, currency)
+
+    def test_decimal_input(self):
+        assert number_to_words_ru(Decimal('1.01'), 'RUB') == legacy_number_to_words_ru(Decimal('1.01'), 'RUB')
+        assert number_to_words_ru(Decimal('1.01'), 'RUB') == 'один рубль 01 копейка'
+
+    def test_feminine_currency(self):
+        assert number_to_words_ru(21, 'TRY') == 'двадцать одна лира 00 курушей'
+
+    def test_billions(self):
+        # Previous implementation failed above 999 999 999
+        assert number_to_words_ru(2000000000, 'USD') == 'два миллиарда долларов 00 центов'
+
+
+# ============================================================================
+# SPECIFICATION STYLE (number_to_russian_words)
+# ============================================================================
+
+class TestNumberToRussianWords:
+    def test_whole_amount(self):
+        assert number_to_russian_words(Decimal("107000.00"), "USD") == "Сто семь тысяч долларов США"
+
+    def test_with_cents(self):
+        assert number_to_russian_words(Decimal("1500.50"), "USD") == "Одна тысяча пятьсот долларов США пятьдесят центов"
+
+    def test_zero(self):
+        assert number_to_russian_words(Decimal("0.00"), "EUR") == "Ноль евро"
+
+    def test_kopecks_are_feminine(self):
+        assert number_to_russian_words(Decimal("5.01"), "RUB") == "Пять рублей одна копейка"
+        assert number_to_russian_words(Decimal("5.22"), "RUB") == "Пять рублей двадцать две копейки"
+
+    def test_unknown_currency_keeps_code_and_cents(self):
+        assert number_to_russian_words(Decimal("5.21"), "KZT") == "Пять KZT двадцать один цент"
+
+    @pytest.mark.parametrize("currency", ['USD', 'EUR', 'CNY'])
+    def test_integer_part_matches_num2words(self, currency):
+        rng = random.Random(currency)
+        for _ in range(500):
+            integer = rng.randrange(10 ** 10)
+            cents = rng.randrange(100)
+            amount = Decimal(integer) + Decimal(cents) / 100
+            expected = f"{num2words(integer, lang='ru').capitalize()} {currency_name_russian(currency, 'genitive')}"
+            if cents:
+                expected += f" {num2words(cents, lang='ru')} {cents_word(cents, currency)}"
+            assert number_to_russian_words(amount, currency) == expected
+
+    def test_currency_names(self):
+        assert currency_name_russian("USD") == "доллар США"
+        assert currency_name_russian("TRY", "prepositional") == "турецких лирах"
+        assert currency_name_russian("RUB", "unknown-case") == "рубль"
+        assert currency_name_russian("KZT", "genitive") == "KZT"
+
+    @pytest.mark.parametrize("cents,expected", [(1, "цент"), (3, "цента"), (11, "центов"), (21, "цент"), (25, "центов")])
+    def test_cents_word(self, cents, expected):
+        assert cents_word(cents, "USD") == expected
+
+
+# ============================================================================
+# NUMBER FORMATTING
+# ============================================================================
+
+NUMBERS = [None, 0, 1, -1, 0.005, 1234.56, 1234567.89, -9876.5, Decimal('1234.56'), Decimal('0.125'), 10 ** 9, 42]
+
+
+class TestNumberFormatting:
+    @pytest.mark.parametrize("value", NUMBERS)
+    def test_number_matches_legacy(self, value):
+        assert format_ru_number(value) == legacy_format_number(value)
+
+    def test_invalid_value(self):
+        assert format_ru_number("abc") == "0,00"
+        assert format_ru_number(object()) == "0,00"
+
+    def test_currency(self):
+        assert format_ru_currency(Decimal('1234.56')) == "1 234,56 ₽"
+        assert format_ru_currency(None, '$') == "0,00 $"
+
+    @pytest.mark.parametrize("currency,expected", [
+        ('RUB', "1 234,50 ₽"), ('USD', "$1 234,50"), ('EUR', "1 234,50 €"),
+        ('CNY', "1 234,50 ¥"), ('TRY', "1 234,50 TRY"),
+    ])
+    def test_currency_code_placement(self, currency, expected):
+        assert format_ru_currency_code(Decimal('1234.5'), currency) == expected
+
+    def test_currency_code_none(self):
+        assert format_ru_currency_code(None, 'USD') == "0,00 ₽"
+
+    def test_number_column_matches_scalar(self):
+        values = NUMBERS + NUMBERS + [[1, 2]]
+        assert format_ru_number_column(values) == [format_ru_number(v) for v in values]
+
+    def test_currency_column_matches_scalar(self):
+        assert format_ru_currency_column(NUMBERS, '€') == [format_ru_currency(v, '€') for v in NUMBERS]
+
+    def test_format_columns(self):
+        rows = [{'a': 1, 'b': Decimal('2.5')}, {'a': 1000}]
+        columns = (('first', 'a'), ('second', 'b'))
+
+        assert format_columns(rows, columns) == [
+            {'first': '1,00', 'second': '2,50'},
+            {'first': '1 000,00', 'second': '0,00'},
+        ]
+        assert format_columns(rows, columns, '$')[1] == {'first': '1 000,00 $', 'second': '0,00 $'}
@@ -0,0 +1,144 @@
+"""
+Tests for the SmartLead campaign sync: one campaign list per run,
+incremental selection, the worker pool and the bulk upsert
+"""
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+import http_pool
+from domain_models.dashboard import SmartLeadCampaign
+from http_pool import RateLimiter
+from services.smartlead_service import (
+    CAMPAIGN_DATA_UPSERT_SQL,
+    CAMPAIGN_SYNC_STATE_SQL,
+    SmartLeadService,
+    campaign_needs_sync,
+)
+from tests.load.replay_server import create_replay_app, load_recordings, replay_client
+
+ORG_ID = uuid4()
+NOW = datetime(2025, 11, 21, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeConnection:
+    """Serves the sync state and echoes upserted rows like RETURNING"""
+
+    def __init__(self, sync_state=None):
+        self.sync_state = sync_state or {}
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        if query == CAMPAIGN_SYNC_STATE_SQL:
+            return [{"campaign_id": k, "synced_at": v} for k, v in self.sync_state.items()]
+        now = datetime.now(timezone.utc)
+        return [
+            {
+                "id": uuid4(), "organization_id": args[0], "source": "smartlead",
+                "campaign_id": r["campaign_id"], "campaign_name": r["campaign_name"],
+                "metrics": json.dumps(r["metrics"]), "period_start": None, "period_end": None,
+                "synced_at": now, "created_at": now, "updated_at": now,
+            }
+            for r in json.loads(args[1])
+        ]
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def smartlead_app():
+    """Replay app; the recorded leads page reports the campaign's full lead count"""
+    recordings = load_recordings()
+    recordings["smartlead"]["GET /api/v1/campaigns/1201/leads"]["json"]["total_leads"] = "1482"
+    return create_replay_app(recordings)
+
+
+@pytest.fixture(autouse=True)
+def fresh_budgets(monkeypatch):
+    monkeypatch.setattr(http_pool, "_retry_budgets", {})
+    monkeypatch.setattr(http_pool, "_rate_limiters", {})
+
+
+def make_service(client, conn):
+    return SmartLeadService(
+        api_key="test-key", http_client=client, pool=FakePool(conn),
+        rate_limiter=RateLimiter(rate=1000, burst=100),
+    )
+
+
+def test_campaign_needs_sync():
+    active = SmartLeadCampaign(id="1", name="A", status="ACTIVE", updated_at=NOW - timedelta(days=5))
+    paused = SmartLeadCampaign(id="2", name="P", status="PAUSED", updated_at=NOW - timedelta(days=5))
+
+    assert campaign_needs_sync(active, None, NOW)
+    # Within the TTL nothing is refetched
+    assert not campaign_needs_sync(active, NOW - timedelta(seconds=30), NOW)
+    assert campaign_needs_sync(active, NOW - timedelta(hours=1), NOW)
+    # Paused since before the last sync: its metrics were already captured
+    assert not campaign_needs_sync(paused, NOW - timedelta(hours=1), NOW)
+    assert campaign_needs_sync(paused, NOW - timedelta(days=6), NOW)
+
+
+def test_inactive_campaigns_are_refreshed_daily():
+    # Finished before the last sync, but replies keep arriving
+    completed = SmartLeadCampaign(id="3", name="C", status="COMPLETED", updated_at=NOW - timedelta(days=30))
+
+    assert not campaign_needs_sync(completed, NOW - timedelta(hours=23), NOW)
+    assert campaign_needs_sync(completed, NOW - timedelta(hours=25), NOW)
+    assert not campaign_needs_sync(completed, NOW - timedelta(hours=25), NOW, inactive_ttl_seconds=7 * 24 * 3600)
+
+
+@pytest.mark.asyncio
+async def test_sync_fetches_list_once_and_upserts_in_one_statement():
+    app = smartlead_app()
+    conn = FakeConnection()
+
+    async with replay_client(app) as client:
+        result = await make_service(client, conn).sync_all_campaigns(ORG_ID, force_refresh=True)
+
+    assert app.state.hits["smartlead GET /api/v1/campaigns"] == 1
+    assert (result.synced_count, result.failed_count) == (2, 0)
+
+    assert [q for q, _ in conn.calls] == [CAMPAIGN_DATA_UPSERT_SQL]
+    by_id = {c.campaign_id: c for c in result.campaigns}
+    metrics = by_id["1201"].metrics
+    assert (metrics.sent_count, metrics.total_leads, metrics.positive_count) == (1840, 1482, 3)
+    assert by_id["1201"].campaign_name == "Подшипники — дистрибьюторы"
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_skips_unchanged_campaigns():
+    app = smartlead_app()
+    # 1201 is ACTIVE, 1202 PAUSED since 2025-11-02; both synced an hour ago
+    synced_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    conn = FakeConnection(sync_state={"1201": synced_at, "1202": synced_at})
+
+    async with replay_client(app) as client:
+        result = await make_service(client, conn).sync_all_campaigns(ORG_ID)
+
+    assert [c.campaign_id for c in result.campaigns] == ["1201"]
+    assert app.state.hits["smartlead GET /api/v1/campaigns/1202/analytics"] == 0
+    assert [q for q, _ in conn.calls] == [CAMPAIGN_SYNC_STATE_SQL, CAMPAIGN_DATA_UPSERT_SQL]
+
+
+@pytest.mark.asyncio
+async def test_single_campaign_sync_reuses_fetched_campaign():
+    app = smartlead_app()
+    conn = FakeConnection()
+    campaign = SmartLeadCampaign(id="1201", name="Подшипники — дистрибьюторы", status="ACTIVE")
+
+    async with replay_client(app) as client:
+        stored = await make_service(client, conn).sync_campaign("1201", ORG_ID, campaign=campaign)
+
+    assert stored.metrics.reply_count == 57
+    assert app.state.hits["smartlead GET /api/v1/campaigns"] == 0
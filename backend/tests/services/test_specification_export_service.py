@@ -0,0 +1,153 @@
+"""
+Tests for Specification Export Service in-memory DOCX pipeline
+
+Uses a small synthetic template built with python-docx, plus one check
+against the production specification template.
+"""
+import io
+import os
+from decimal import Decimal
+
+import pytest
+from docx import Document
+
+from services.specification_export_service import (
+    TEMPLATE_PATH,
+    SpecificationTemplate,
+    build_placeholder_index,
+    get_specification_template,
+    replace_variables_in_docx,
+)
+
+
+PRODUCTS = [
+    {
+        "name": "Подшипник",
+        "product_code": "6205",
+        "brand": "SKF",
+        "idn_sku": "",
+        "quantity": Decimal("3"),
+        "unit_price_vat": Decimal("100.50"),
+        "total_price_vat": Decimal("301.50"),
+    }
+]
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    """Template with run-level, split and table placeholders and a products table"""
+    doc = Document()
+    p = doc.add_paragraph()
+    p.add_run("Спецификация № ")
+    bold = p.add_run("[specification_number]")
+    bold.bold = True
+    p.add_run(" от [specification_date]")
+
+    split = doc.add_paragraph()
+    split.add_run("Покупатель: [customer_")
+    split.add_run("name]")
+
+    doc.add_paragraph("Без переменных")
+
+    signatures = doc.add_table(rows=1, cols=2)
+    signatures.cell(0, 0).text = "[seller_signatory_name]"
+    signatures.cell(0, 1).text = "[unknown_key]"
+
+    products = doc.add_table(rows=1, cols=8)
+    for idx, title in enumerate(["№", "IDN-SKU", "Наименование", "Артикул", "Бренд", "Кол-во", "Цена", "Сумма"]):
+        products.cell(0, idx).text = title
+
+    path = tmp_path / "specification_template.docx"
+    doc.save(path)
+    return str(path)
+
+
+VARIABLES = {
+    "specification_number": 7,
+    "specification_date": "2025-01-15",
+    "customer_name": "ООО Ромашка",
+    "seller_signatory_name": "Иванов И. И.",
+}
+
+
+def _texts(doc):
+    texts = [p.text for p in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            texts.extend(cell.text for cell in row.cells)
+    return texts
+
+
+class TestPlaceholderIndex:
+    def test_indexes_runs_and_split_paragraphs(self, template_path):
+        index = build_placeholder_index(Document(template_path))
+
+        run_keys = [key for slot in index.runs for key in slot.keys]
+        assert run_keys == ["specification_number", "specification_date", "seller_signatory_name", "unknown_key"]
+        assert [slot.keys for slot in index.paragraphs] == [("customer_name",)]
+
+    def test_run_substitution_keeps_formatting(self, template_path):
+        doc = replace_variables_in_docx(Document(template_path), VARIABLES)
+
+        runs = doc.paragraphs[0].runs
+        assert doc.paragraphs[0].text == "Спецификация № 7 от 2025-01-15"
+        assert runs[1].text == "7"
+        assert runs[1].bold is True
+
+    def test_split_placeholder_and_tables(self, template_path):
+        doc = replace_variables_in_docx(Document(template_path), VARIABLES)
+
+        assert doc.paragraphs[1].text == "Покупатель: ООО Ромашка"
+        assert doc.tables[0].cell(0, 0).text == "Иванов И. И."
+        # Placeholders without a value are left as-is
+        assert doc.tables[0].cell(0, 1).text == "[unknown_key]"
+
+
+class TestSpecificationTemplate:
+    def test_render_returns_docx_bytes(self, template_path):
+        template = SpecificationTemplate(template_path)
+
+        output = template.render(VARIABLES, PRODUCTS)
+        doc = Document(io.BytesIO(output))
+
+        assert doc.paragraphs[0].text == "Спецификация № 7 от 2025-01-15"
+        products_table = doc.tables[1]
+        # IDN-SKU column is removed because it is blank for all products
+        assert [cell.text for cell in products_table.rows[1].cells] == [
+            "1", "Подшипник", "6205", "SKF", "3", "100.50", "301.50"
+        ]
+
+    def test_renders_do_not_share_state(self, template_path):
+        template = SpecificationTemplate(template_path)
+
+        first = Document(io.BytesIO(template.render(VARIABLES, PRODUCTS)))
+        second = Document(io.BytesIO(template.render({**VARIABLES, "specification_number": 8}, PRODUCTS)))
+
+        assert first.paragraphs[0].runs[1].text == "7"
+        assert second.paragraphs[0].runs[1].text == "8"
+        assert len(second.tables[1].rows) == 2
+        assert _texts(template.clone()) == _texts(Document(template_path))
+
+    def test_cache_reloads_on_file_change(self, template_path):
+        first = get_specification_template(template_path)
+        assert get_specification_template(template_path) is first
+
+        stat = os.stat(template_path)
+        os.utime(template_path, (stat.st_atime, stat.st_mtime + 10))
+
+        assert get_specification_template(template_path) is not first
+
+    def test_missing_template(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            get_specification_template(str(tmp_path / "missing.docx"))
+
+    def test_production_template_fills_all_placeholders(self):
+        template = get_specification_template(TEMPLATE_PATH)
+        keys = {key for slot in template.placeholder_index.runs for key in slot.keys}
+        keys |= {key for slot in template.placeholder_index.paragraphs for key in slot.keys}
+        variables = {key: f"<{key}>" for key in keys}
+
+        rendered = Document(io.BytesIO(template.render(variables, PRODUCTS)))
+
+        assert keys
+        assert not any("[" in text for text in _texts(rendered))
@@ -0,0 +1,149 @@
+"""
+Tests for database-side dashboard and customer statistics
+"""
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from services import stats_service
+from services.stats_service import (
+    CAMPAIGN_TOTALS_SQL,
+    CUSTOMER_KPI_SQL,
+    DASHBOARD_KPI_SQL,
+    REBUILD_ROLLUPS_SQL,
+    StatsCache,
+    fetch_customer_kpis,
+    get_campaign_totals,
+    get_dashboard_kpis,
+    month_bounds,
+    rebuild_kpi_rollups,
+)
+
+
+class FakeConnection:
+    """Returns canned rows per query and records the parameters"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows[query]
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows.get(query, [])
+
+    async def execute(self, query, *args):
+        self.calls.append((query, args))
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.acquired = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.acquired += 1
+        yield self.conn
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(stats_service, "_stats_cache", None)
+
+
+def test_month_bounds_wraps_year():
+    assert month_bounds(date(2025, 1, 20)) == (date(2025, 1, 1), date(2024, 12, 1))
+    assert month_bounds(date(2025, 7, 1)) == (date(2025, 7, 1), date(2025, 6, 1))
+
+
+def test_stats_cache_ttl_and_lru():
+    cache = StatsCache(ttl_seconds=60, max_entries=2)
+    cache.set("dashboard", "org-1", 1)
+    cache.set("customers", "org-1", 2)
+    cache.get("dashboard", "org-1")
+    cache.set("dashboard", "org-2", 3)
+
+    # customers/org-1 was least recently used
+    assert cache.get("customers", "org-1") is None
+    assert cache.get("dashboard", "org-1") == 1
+
+    cache.invalidate("org-1")
+    assert cache.get("dashboard", "org-1") is None
+    assert len(cache) == 1
+
+    expired = StatsCache(ttl_seconds=0)
+    expired.set("dashboard", "org-1", 1)
+    assert expired.get("dashboard", "org-1") is None
+
+
+@pytest.mark.asyncio
+async def test_dashboard_kpis_one_query_per_cache_window():
+    created = datetime(2025, 3, 10, 9, 30, tzinfo=timezone.utc)
+    conn = FakeConnection({
+        DASHBOARD_KPI_SQL: {
+            "total_quotes": 12, "draft_quotes": 5, "sent_quotes": 4, "accepted_quotes": 3,
+            "revenue_this_month": Decimal("1500.00"), "revenue_last_month": Decimal("0"),
+        },
+        stats_service.RECENT_QUOTES_SQL: [
+            {"id": "q-1", "idn_quote": "КП25-0001", "total_amount": Decimal("1500.00"),
+             "status": "accepted", "created_at": created, "customer_name": None},
+        ],
+    })
+    pool = FakePool(conn)
+
+    first = await get_dashboard_kpis("org-1", pool=pool, today=date(2025, 3, 15))
+    second = await get_dashboard_kpis("org-1", pool=pool, today=date(2025, 3, 15))
+
+    assert first is second
+    assert pool.acquired == 1
+    assert first["accepted_quotes"] == 3
+    assert first["recent_quotes"][0]["created_at"] == created
+    assert conn.calls[0][1] == ("org-1", date(2025, 3, 1), date(2025, 2, 1))
+
+
+@pytest.mark.asyncio
+async def test_customer_kpis_decode_top_regions():
+    conn = FakeConnection({
+        CUSTOMER_KPI_SQL: {
+            "total_customers": 3, "active_customers": 2, "inactive_customers": 1,
+            "organizations": 2, "entrepreneurs": 1, "moscow_customers": 2,
+            "avg_credit_limit": Decimal("150000.00"), "total_credit_limit": Decimal("300000.00"),
+            "top_regions": '[{"region": "Москва", "count": 2}, {"region": "Казань", "count": 1}]',
+        },
+    })
+
+    kpis = await fetch_customer_kpis(conn, "org-1")
+
+    assert kpis["top_regions"] == [{"region": "Москва", "count": 2}, {"region": "Казань", "count": 1}]
+    assert conn.calls == [(CUSTOMER_KPI_SQL, ("org-1", stats_service.TOP_REGIONS_LIMIT))]
+
+
+@pytest.mark.asyncio
+async def test_campaign_totals_cached_per_source():
+    conn = FakeConnection({CAMPAIGN_TOTALS_SQL: {"sent_count": 100, "campaign_count": 2}})
+    pool = FakePool(conn)
+
+    await get_campaign_totals("org-1", pool=pool)
+    await get_campaign_totals("org-1", "smartlead", pool=pool)
+    await get_campaign_totals("org-1", "smartlead", pool=pool)
+
+    assert [args for _, args in conn.calls] == [("org-1", None), ("org-1", "smartlead")]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_drops_cached_stats():
+    conn = FakeConnection({CAMPAIGN_TOTALS_SQL: {"sent_count": 100, "campaign_count": 2}})
+    pool = FakePool(conn)
+    await get_campaign_totals("org-1", pool=pool)
+
+    await rebuild_kpi_rollups("org-1", pool=pool)
+    await get_campaign_totals("org-1", pool=pool)
+
+    assert [query for query, _ in conn.calls] == [CAMPAIGN_TOTALS_SQL, REBUILD_ROLLUPS_SQL, CAMPAIGN_TOTALS_SQL]
+    assert conn.calls[1][1] == ("org-1",)
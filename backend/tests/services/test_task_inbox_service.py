@@ -0,0 +1,203 @@
+"""
+Tests for the workflow task inbox: projection reads, change routing and
+the server-sent-event stream
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from services.task_inbox_service import (
+    INBOX_SQL,
+    InboxBroker,
+    InboxListener,
+    assignee_roles_for,
+    get_inbox,
+    inbox_event_stream,
+    to_my_task,
+)
+from services import task_inbox_service
+
+TASK = {
+    "quote_id": "q-1", "idn_quote": "КП25-0001", "customer_name": "ООО Ромашка",
+    "total_amount": Decimal("1500.00"), "workflow_state": "awaiting_financial_approval",
+    "assigned_at": datetime(2025, 3, 10, 9, 30, tzinfo=timezone.utc), "age_hours": 5,
+}
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def test_assignee_roles_for_known_and_unknown_roles():
+    assert assignee_roles_for("cfo") == ["ceo", "cfo", "top_sales_manager"]
+    assert assignee_roles_for("quality_manager") == ["quality_manager"]
+
+
+@pytest.mark.asyncio
+async def test_inbox_read_from_projection():
+    conn = FakeConnection([TASK])
+
+    tasks = await get_inbox("org-1", ["ceo", "financial_manager"], pool=FakePool(conn))
+
+    assert tasks == [TASK]
+    assert conn.calls == [(INBOX_SQL, ("org-1", ["ceo", "financial_manager"]))]
+
+
+def test_broker_wakes_only_matching_organization_and_roles():
+    broker = InboxBroker()
+    finance = broker.subscribe("org-1", ["financial_manager"])
+    sales = broker.subscribe("org-1", ["sales_manager"])
+    other_org = broker.subscribe("org-2", ["financial_manager"])
+
+    woken = broker.publish({
+        "organization_id": "org-1",
+        "assignee_roles": ["sales_manager", "financial_manager"],
+        "quote_id": "q-1",
+    })
+
+    assert woken == 2
+    assert finance.changed.is_set() and sales.changed.is_set()
+    assert not other_org.changed.is_set()
+
+    broker.unsubscribe(finance)
+    broker.unsubscribe(sales)
+    assert len(broker) == 1
+
+
+def test_listener_forwards_notifications_and_skips_malformed():
+    broker = InboxBroker()
+    subscription = broker.subscribe("org-1", ["ceo"])
+    listener = InboxListener(broker, dsn="postgresql://unused")
+
+    listener._on_notify(None, 1, "workflow_inbox", "not json")
+    assert not subscription.changed.is_set()
+
+    listener._on_notify(None, 1, "workflow_inbox", json.dumps({
+        "organization_id": "org-1", "assignee_roles": ["ceo"], "quote_id": "q-1"
+    }))
+    assert subscription.changed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_snapshot_then_changes():
+    broker = InboxBroker()
+    loads = []
+    disconnected = False
+
+    async def load_inbox():
+        loads.append(1)
+        return [TASK] if len(loads) > 1 else []
+
+    async def is_disconnected():
+        return disconnected
+
+    stream = inbox_event_stream(
+        "org-1", ["financial_manager"], is_disconnected,
+        load_inbox=load_inbox, broker=broker, keepalive_seconds=0.01
+    )
+
+    first = await stream.__anext__()
+    assert first.startswith("event: tasks\n")
+    assert json.loads(first.split("data: ", 1)[1]) == {"tasks": [], "count": 0}
+
+    assert await stream.__anext__() == ": keepalive\n\n"
+
+    broker.publish({"organization_id": "org-1", "assignee_roles": ["financial_manager"]})
+    pushed = await asyncio.wait_for(stream.__anext__(), 1)
+    data = json.loads(pushed.split("data: ", 1)[1])
+    assert data["count"] == 1
+    # Same serialization as GET /my-tasks
+    assert data["tasks"] == [to_my_task(TASK).model_dump(mode="json")]
+    assert data["tasks"][0]["total_amount"] == "1500.00"
+
+    disconnected = True
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert len(broker) == 0
+
+
+def test_rows_map_to_my_tasks():
+    task = to_my_task({**TASK, "customer_name": None, "total_amount": 1500})
+
+    assert task.customer_name == "Unknown"
+    assert task.total_amount == Decimal("1500")
+    assert task.quote_id == "q-1"
+
+
+class ListenConnection:
+    """LISTEN connection that the test can drop"""
+
+    def __init__(self):
+        self.closed = False
+        self.termination_listeners = []
+
+    async def add_listener(self, channel, callback):
+        pass
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+    def drop(self):
+        self.closed = True
+        for callback in self.termination_listeners:
+            callback(self)
+
+
+@pytest.mark.asyncio
+async def test_listener_reconnects_and_wakes_streams(monkeypatch):
+    connections = []
+    failures = []
+
+    async def connect(dsn):
+        if failures:
+            raise failures.pop()
+        connections.append(ListenConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(task_inbox_service.asyncpg, "connect", connect)
+    monkeypatch.setattr(task_inbox_service, "INBOX_RECONNECT_SECONDS", 0.01)
+    broker = InboxBroker()
+    subscription = broker.subscribe("org-1", ["ceo"])
+    listener = InboxListener(broker, dsn="postgresql://unused")
+
+    await listener.ensure_started()
+    assert not subscription.changed.is_set()
+
+    # The first reconnect attempt fails, the second succeeds
+    failures.append(ConnectionRefusedError("database is restarting"))
+    connections[0].drop()
+    for _ in range(100):
+        if listener.running:
+            break
+        await asyncio.sleep(0.01)
+
+    assert listener.running and len(connections) == 2
+    assert subscription.changed.is_set()
+
+    await listener.stop()
+    assert connections[1].closed
@@ -0,0 +1,197 @@
+"""
+Tests for chunked resumable upload sessions
+"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from services.upload_session_service import (
+    UploadNotFoundError,
+    UploadOffsetError,
+    UploadSessionStore,
+    UploadTooLargeError,
+    UploadValidationError,
+)
+
+
+USER = "user-1"
+PAYLOAD = b"PK\x03\x04" + bytes(range(256)) * 40
+
+
+async def stream(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+async def broken_stream(*pieces):
+    for piece in pieces:
+        yield piece
+    raise ConnectionResetError("client disconnected")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadSessionStore(root=str(tmp_path), max_bytes=1024 * 1024)
+
+
+def new_session(store, data=PAYLOAD, **kwargs):
+    return store.create(USER, "org-1", "quote.xlsx", len(data), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_chunks_assemble_and_verify(store):
+    session = new_session(store, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+
+    for offset in range(0, len(PAYLOAD), 4000):
+        chunk = PAYLOAD[offset:offset + 4000]
+        session = await store.append(
+            session.upload_id, USER, offset, stream(chunk[:100], chunk[100:]),
+            chunk_sha256=hashlib.sha256(chunk).hexdigest(),
+        )
+
+    finalized = store.finalize(session.upload_id, USER)
+    assert finalized.complete
+    assert finalized.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    with store.open(finalized) as f:
+        assert f.read() == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_wrong_offset_reports_resume_point(store):
+    session = new_session(store)
+    await store.append(session.upload_id, USER, 0, stream(PAYLOAD[:1000]))
+
+    with pytest.raises(UploadOffsetError) as exc:
+        await store.append(session.upload_id, USER, 2000, stream(PAYLOAD[2000:3000]))
+
+    assert exc.value.expected_offset == 1000
+
+
+@pytest.mark.asyncio
+async def test_interrupted_chunk_is_rolled_back(store):
+    session = new_session(store)
+    await store.append(session.upload_id, USER, 0, stream(PAYLOAD[:1000]))
+
+    with pytest.raises(ConnectionResetError):
+        await store.append(session.upload_id, USER, 1000, broken_stream(PAYLOAD[1000:1500]))
+
+    assert store.get(session.upload_id, USER).received == 1000
+    assert os.path.getsize(store._data_path(session.upload_id)) == 1000
+
+    await store.append(session.upload_id, USER, 1000, stream(PAYLOAD[1000:]))
+    assert store.finalize(session.upload_id, USER).complete
+
+
+@pytest.mark.asyncio
+async def test_resume_after_restart_keeps_checksum(store, tmp_path):
+    session = new_session(store, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+    await store.append(session.upload_id, USER, 0, stream(PAYLOAD[:5000]))
+
+    restarted = UploadSessionStore(root=str(tmp_path), max_bytes=1024 * 1024)
+    offset = restarted.get(session.upload_id, USER).received
+    await restarted.append(session.upload_id, USER, offset, stream(PAYLOAD[offset:]))
+
+    assert restarted.finalize(session.upload_id, USER).complete
+
+
+@pytest.mark.asyncio
+async def test_chunks_alternating_between_workers(store, tmp_path):
+    other_worker = UploadSessionStore(root=str(tmp_path), max_bytes=1024 * 1024)
+    session = new_session(store, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+
+    workers = [store, other_worker]
+    for n, offset in enumerate(range(0, len(PAYLOAD), 3000)):
+        await workers[n % 2].append(session.upload_id, USER, offset, stream(PAYLOAD[offset:offset + 3000]))
+
+    # Both workers hold a running hash that covers only part of the file
+    assert store.finalize(session.upload_id, USER).sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert other_worker.finalize(session.upload_id, USER).sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_are_serialized(store, tmp_path):
+    other_worker = UploadSessionStore(root=str(tmp_path), max_bytes=1024 * 1024)
+    session = new_session(store)
+    release = asyncio.Event()
+
+    async def slow_stream():
+        yield PAYLOAD[:500]
+        await release.wait()
+        yield PAYLOAD[500:1000]
+
+    first = asyncio.create_task(store.append(session.upload_id, USER, 0, slow_stream()))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(other_worker.append(session.upload_id, USER, 0, stream(PAYLOAD[:1000])))
+    await asyncio.sleep(0.1)
+    assert not second.done()
+
+    release.set()
+    assert (await first).received == 1000
+    # The second append sees the first one's result once it gets the lock
+    with pytest.raises(UploadOffsetError) as exc:
+        await second
+    assert exc.value.expected_offset == 1000
+
+
+@pytest.mark.asyncio
+async def test_chunk_checksum_mismatch_is_rejected(store):
+    session = new_session(store)
+
+    with pytest.raises(UploadValidationError, match="Chunk checksum"):
+        await store.append(session.upload_id, USER, 0, stream(PAYLOAD[:1000]), chunk_sha256="0" * 64)
+
+    assert store.get(session.upload_id, USER).received == 0
+
+
+@pytest.mark.asyncio
+async def test_non_excel_rejected_on_first_bytes(store):
+    data = b"%PDF-1.7" + b"x" * 100
+    session = new_session(store, data)
+
+    with pytest.raises(UploadValidationError, match="Invalid Excel"):
+        await store.append(session.upload_id, USER, 0, stream(b"%P", b"DF-1.7"))
+
+
+@pytest.mark.asyncio
+async def test_chunk_past_declared_size(store):
+    session = new_session(store)
+
+    with pytest.raises(UploadTooLargeError):
+        await store.append(session.upload_id, USER, 0, stream(PAYLOAD, b"extra"))
+
+
+def test_create_validation(store):
+    with pytest.raises(UploadTooLargeError):
+        store.create(USER, None, "quote.xlsx", 2 * 1024 * 1024)
+    with pytest.raises(UploadValidationError):
+        store.create(USER, None, "quote.pdf", 100)
+    with pytest.raises(UploadValidationError):
+        store.create(USER, None, "quote.xlsx", 100, sha256="not-a-hash")
+
+
+@pytest.mark.asyncio
+async def test_finalize_checks(store):
+    session = new_session(store, sha256=hashlib.sha256(b"other").hexdigest())
+
+    with pytest.raises(UploadValidationError, match="incomplete"):
+        store.finalize(session.upload_id, USER)
+
+    await store.append(session.upload_id, USER, 0, stream(PAYLOAD))
+    with pytest.raises(UploadValidationError, match="checksum"):
+        store.finalize(session.upload_id, USER)
+
+
+def test_sessions_are_private_and_expire(store):
+    session = new_session(store)
+
+    with pytest.raises(UploadNotFoundError):
+        store.get(session.upload_id, "someone-else")
+    with pytest.raises(UploadNotFoundError):
+        store.get("../" + session.upload_id, USER)
+
+    store.ttl_seconds = -1
+    assert store.expire() == 1
+    with pytest.raises(UploadNotFoundError):
+        store.get(session.upload_id, USER)
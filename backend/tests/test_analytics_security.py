@@ -213,3 +213,38 @@ def test_build_analytics_query_margin_percent_calculation():
     assert 'margin_percent' in sql
     assert 'CASE WHEN' in sql  # Should have division by zero protection
     assert 'profit' in sql
+
+
+def test_build_analytics_query_from_facts_table():
+    """Test that use_facts reads typed columns without JOINs or JSONB"""
+    org_id = uuid4()
+    fields = ['idn_quote', 'seller_company', 'markup', 'calc_ak16_final_price_total']
+    filters = {'seller_company': 'МАСТЕР БЭРИНГ ООО', 'markup': '15'}
+
+    sql, params = build_analytics_query(org_id, filters, fields, use_facts=True)
+
+    assert 'FROM analytics_quote_facts q' in sql
+    assert 'JOIN' not in sql
+    assert 'variables->>' not in sql
+    assert 'q.calc_ak16_final_price_total' in sql
+    assert 'q.seller_company = $2' in sql
+    assert 'q.markup::text = $3' in sql
+    assert params == [str(org_id), 'МАСТЕР БЭРИНГ ООО', '15', 1000, 0]
+
+
+def test_build_aggregation_query_from_facts_table():
+    """Test that use_facts aggregates numeric columns directly"""
+    org_id = uuid4()
+    aggregations = {
+        'quote_count': {'function': 'count'},
+        'agg_markup': {'function': 'avg', 'field': 'markup'},
+        'avg_margin_percent': {'function': 'avg', 'field': 'calc_af16_profit_margin'},
+    }
+
+    sql, params = build_aggregation_query(org_id, {}, aggregations, use_facts=True)
+
+    assert 'FROM analytics_quote_facts q' in sql
+    assert 'JOIN' not in sql
+    assert 'COALESCE(AVG(q.markup), 0) as agg_markup' in sql
+    assert 'SUM(q.calc_ak16_final_price_total)' in sql
+    assert params == [str(org_id)]
@@ -0,0 +1,143 @@
+"""
+Tests for columnar product-file ingestion
+
+Covers CSV dialect sniffing, SecureFileProcessor column processing and the
+upload_products_file DataFrame parser in quotes_calc.py.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from file_service import SecureFileProcessor, read_csv_content, sniff_csv_format
+from routes.quotes_calc import ProductFromFile, _products_from_dataframe
+
+
+# ============================================================================
+# CSV SNIFFING
+# ============================================================================
+
+class TestSniffCsvFormat:
+    def test_semicolon_cp1251(self):
+        content = "Наименование;Количество;Цена\nБолт;2;10,5\n".encode('cp1251')
+        assert sniff_csv_format(content) == ('cp1251', ';')
+
+    def test_tab_utf8(self):
+        content = "name\tqty\nBolt\t2\n".encode('utf-8')
+        assert sniff_csv_format(content) == ('utf-8', '\t')
+
+    def test_bom_is_stripped(self):
+        content = "﻿product_name,quantity\nBolt,2\n".encode('utf-8')
+
+        df = read_csv_content(content)
+
+        assert sniff_csv_format(content)[0] == 'utf-8-sig'
+        assert list(df.columns) == ['product_name', 'quantity']
+
+    def test_only_prefix_is_inspected(self):
+        # Invalid UTF-8 after the sniffed prefix: parse falls back to the next encoding
+        content = "name,qty\n".encode('utf-8') + b"a,1\n" * 100 + "Болт,2\n".encode('cp1251')
+
+        assert sniff_csv_format(content, sample_size=64) == ('utf-8', ',')
+        df = read_csv_content(content)
+        assert df['name'].iloc[-1] == 'Болт'
+
+
+# ============================================================================
+# SECURE FILE PROCESSOR
+# ============================================================================
+
+@pytest.fixture
+def processor():
+    return SecureFileProcessor()
+
+
+class TestProcessDataframe:
+    def test_normalizes_and_computes_totals(self, processor):
+        df = pd.DataFrame({
+            'Наименование': ['Болт', '', '=HYPERLINK()', 'Гайка <b>'],
+            'Кол-во': ['2', '5', '1', '3'],
+            'Цена': ['1 234,50 ₽', '1', '0,1', '$10'],
+            'Сумма': ['', '', '', '31'],
+        }, dtype=str)
+
+        items = processor._process_dataframe(df)
+
+        assert [item['description'] for item in items] == ['Болт', "'=HYPERLINK()", 'Гайка &lt;b&gt;']
+        assert items[0]['unit_price'] == 1234.5
+        assert items[0]['line_total'] == 2469.0
+        # Computed in Decimal: 1 * 0.1 is exactly 0.1
+        assert items[1]['line_total'] == 0.1
+        assert items[2]['line_total'] == 31.0
+        assert items[0]['unit'] == 'шт.'
+
+    def test_invalid_rows_are_reported_together(self, processor, capsys):
+        df = pd.DataFrame({
+            'name': ['A', 'B', 'C'],
+            'qty': ['1.2.3', '2', '--'],
+            'price': ['1', '2', '3'],
+        }, dtype=str)
+
+        items = processor._process_dataframe(df)
+
+        assert [item['description'] for item in items] == ['B']
+        warnings = capsys.readouterr().out
+        assert "Row 1: Error processing row data: Invalid numeric value in field 'quantity': 1.2.3" in warnings
+        assert "Row 3:" in warnings
+
+    def test_no_valid_rows(self, processor):
+        df = pd.DataFrame({'name': ['A'], 'price': ['abc.1.1']}, dtype=str)
+
+        with pytest.raises(HTTPException) as exc:
+            processor._process_dataframe(df)
+
+        assert exc.value.status_code == 400
+        assert "unit_price" in exc.value.detail
+
+    def test_column_matches_scalar_helpers(self, processor):
+        values = pd.Series(['1 234,56', '1,234.5', '€ 7', '0,5', '1,2345', '', None, ' <x> ', '@cmd'], dtype=object)
+
+        cleaned, invalid = processor.parse_numeric_column(values)
+
+        assert not invalid.any()
+        assert [float(v) for v in cleaned] == [float(processor.parse_numeric_value(v, 'f')) for v in values]
+        assert processor.sanitize_column(values).tolist() == [processor.sanitize_cell_content(v) for v in values]
+
+
+# ============================================================================
+# UPLOAD PRODUCTS PARSER
+# ============================================================================
+
+class TestProductsFromDataframe:
+    def test_aliases_and_types(self):
+        df = read_csv_content(
+            "product_name;base_price_vat;quantity;weight_per_unit;duty_pct;hs_code;sku\n"
+            "Болт;10.5;3;0.2;5;8482100000;B-1\n"
+            "Гайка;1;2;;;8482200000;\n".encode('cp1251')
+        )
+
+        products, errors = _products_from_dataframe(df)
+
+        assert errors == []
+        assert products[0].model_dump() == ProductFromFile(
+            product_name="Болт", base_price_vat=10.5, quantity=3, weight_in_kg=0.2,
+            import_tariff=5.0, customs_code="8482100000", product_code="B-1",
+        ).model_dump()
+        assert products[1].weight_in_kg == 0.0
+        assert products[1].import_tariff is None
+        assert isinstance(products[1].quantity, int)
+
+    def test_all_invalid_rows_reported(self):
+        df = pd.DataFrame({
+            'product_name': ['A', 'B', 'C'],
+            'base_price_vat': [1.0, 'x', 2.0],
+            'quantity': [1, 2, np.nan],
+        })
+
+        products, errors = _products_from_dataframe(df)
+
+        assert products == []
+        assert errors == [
+            "Error parsing row 3: could not convert string to float: 'x'",
+            "Error parsing row 4: cannot convert float NaN to integer",
+        ]
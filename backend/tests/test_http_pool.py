@@ -0,0 +1,130 @@
+"""
+Tests for the shared outbound HTTP client
+
+Services run against the replay server (tests/load/replay_server.py)
+in-process, with recorded CBR / DaData / SmartLead responses.
+"""
+import time
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import http_pool
+from http_pool import RateLimiter, RetryBudget, get_http_client, get_retry_budget
+from services.dadata_service import DaDataService
+from services.exchange_rate_service import ExchangeRateService
+from services.smartlead_service import SmartLeadService
+from tests.load.replay_server import create_replay_app, replay_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_budgets(monkeypatch):
+    monkeypatch.setattr(http_pool, "_retry_budgets", {})
+    monkeypatch.setattr(http_pool, "_rate_limiters", {})
+
+
+# ============================================================================
+# RETRY BUDGET / SHARED CLIENT
+# ============================================================================
+
+def test_retry_budget_refills_from_requests():
+    budget = RetryBudget(ratio=0.5, max_tokens=2)
+
+    assert budget.try_retry() and budget.try_retry()
+    assert not budget.try_retry()
+
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_retry()
+    assert (budget.retries, budget.rejected) == (3, 1)
+
+    for _ in range(10):
+        budget.record_request()
+    assert budget.tokens == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_allows_burst_then_paces():
+    limiter = RateLimiter(rate=100, burst=3)
+
+    start = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+    assert limiter.waited_seconds == 0
+
+    for _ in range(3):
+        await limiter.acquire()
+    assert time.monotonic() - start >= 0.025
+
+    limiter.pause(0.05)
+    paused = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - paused >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused():
+    client = get_http_client()
+
+    assert get_http_client() is client
+    assert get_retry_budget("cbr") is get_retry_budget("cbr")
+    await http_pool.close_http_client()
+    assert client.is_closed
+
+
+# ============================================================================
+# SERVICES AGAINST REPLAYED RESPONSES
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_cbr_refresh_from_replay():
+    app = create_replay_app()
+    async with replay_client(app) as client:
+        service = ExchangeRateService(http_client=client)
+        with patch.object(service, '_store_rates', new_callable=AsyncMock):
+            rates = await service.fetch_cbr_rates()
+
+    assert rates["USD"] == Decimal("78.2284")
+    assert rates["TRY"] == Decimal("1.8417")  # Nominal 10
+    assert app.state.hits["cbr GET /daily_json.js"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cbr_retries_stop_when_budget_spent():
+    app = create_replay_app(fail_rate=1.0)
+    get_retry_budget("cbr")._tokens = 1
+
+    async with replay_client(app) as client:
+        service = ExchangeRateService(http_client=client)
+        with patch('asyncio.sleep', new_callable=AsyncMock):
+            assert await service.fetch_cbr_rates() == {}
+            assert await service.fetch_cbr_rates() == {}
+
+    # First refresh: 1 try + 1 budgeted retry; second: no retries left
+    assert app.state.hits["cbr GET /daily_json.js"] == 3
+    assert get_retry_budget("cbr").rejected == 2
+
+
+@pytest.mark.asyncio
+async def test_dadata_lookup_from_replay(monkeypatch):
+    monkeypatch.setenv("DADATA_API_KEY", "test-key")
+    async with replay_client(create_replay_app()) as client:
+        company = await DaDataService(http_client=client).find_by_inn("7707083893")
+
+    assert company.name == "ПАО СБЕРБАНК"
+    assert company.postal_code == "117312"
+    assert company.director_name == "Греф Герман Оскарович"
+
+
+@pytest.mark.asyncio
+async def test_smartlead_requests_from_replay():
+    async with replay_client(create_replay_app()) as client:
+        service = SmartLeadService(api_key="test-key", http_client=client)
+        campaigns = await service.get_campaigns()
+        leads = await service.get_campaign_leads("1201")
+        missing = await service.get_campaign_analytics("9999")
+
+    assert [c.id for c in campaigns] == ["1201", "1202"]
+    assert leads["total_leads"] == 5
+    assert missing == {}
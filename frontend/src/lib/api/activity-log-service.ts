@@ -34,6 +34,7 @@ export interface ActivityLogFilters {
   user_id?: string;
   entity_type?: string;
   action?: string;
+  cursor?: string;
   page?: number;
   per_page?: number;
 }
@@ -47,6 +48,8 @@ export interface PaginatedActivityLogs {
   page: number;
   per_page: number;
   pages: number;
+  // Keyset cursor of the next page; with cursor set, total and page come back null
+  next_cursor?: string | null;
 }
 
 /**
@@ -133,6 +136,7 @@ export class ActivityLogService {
     if (filters.user_id) params.append('user_id', filters.user_id);
     if (filters.entity_type) params.append('entity_type', filters.entity_type);
     if (filters.action) params.append('action', filters.action);
+    if (filters.cursor) params.append('cursor', filters.cursor);
     if (filters.page) params.append('page', filters.page.toString());
     if (filters.per_page) params.append('per_page', filters.per_page.toString());
 
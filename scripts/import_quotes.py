@@ -8,6 +8,11 @@ Usage:
         --user-id "uuid" \
         --batch-size 50 \
         --dry-run
+
+    # Parallel import of a large archive, resumable after interruption
+    python scripts/import_quotes.py archive/*.xlsx \
+        --org-id "uuid" --user-id "uuid" \
+        --parallel --workers 8 --writers 4 --checkpoint import.checkpoint
 """
 import sys
 import argparse
@@ -19,6 +24,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
 
 from migration.bulk_importer import BulkQuoteImporter
+from migration.parallel_importer import ParallelQuoteImporter
 
 
 async def main():
@@ -39,6 +45,10 @@ Examples:
   # Import all Excel files in directory
   python scripts/import_quotes.py validation_data/*.xlsx \\
     --org-id "abc-123" --user-id "xyz-789" --batch-size 100
+
+  # Parallel import with resume checkpoint
+  python scripts/import_quotes.py archive/*.xlsx \\
+    --org-id "abc-123" --user-id "xyz-789" --parallel --checkpoint import.checkpoint
         """
     )
 
@@ -73,6 +83,28 @@ Examples:
         action="store_true",
         help="Simulate import without writing to database (for testing)"
     )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Parse in a process pool and load with COPY (large imports)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parser processes for --parallel (default: CPU count)"
+    )
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=4,
+        help="Concurrent database writers for --parallel (default: 4)"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file for --parallel; rerun with the same file to resume"
+    )
 
     args = parser.parse_args()
 
@@ -107,6 +139,9 @@ Examples:
     print(f"User ID:          {args.user_id}")
     print(f"Batch size:       {args.batch_size}")
     print(f"Mode:             {'DRY RUN (no database writes)' if args.dry_run else 'LIVE IMPORT'}")
+    if args.parallel:
+        print(f"Pipeline:         {args.workers or 'auto'} parsers, {args.writers} writers")
+        print(f"Checkpoint:       {args.checkpoint or '(none)'}")
     print("=" * 60)
     print()
 
@@ -131,12 +166,23 @@ Examples:
         print()
 
     # Create importer
-    importer = BulkQuoteImporter(
-        organization_id=args.org_id,
-        user_id=args.user_id,
-        batch_size=args.batch_size,
-        dry_run=args.dry_run
-    )
+    if args.parallel:
+        importer = ParallelQuoteImporter(
+            organization_id=args.org_id,
+            user_id=args.user_id,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            parse_workers=args.workers,
+            writers=args.writers,
+            checkpoint_path=args.checkpoint
+        )
+    else:
+        importer = BulkQuoteImporter(
+            organization_id=args.org_id,
+            user_id=args.user_id,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run
+        )
 
     # Run import
     try:
@@ -163,6 +209,8 @@ Examples:
     print(f"✅ Successful:     {results['successful']}")
     print(f"⏭️  Skipped:        {results['skipped']} (duplicates)")
     print(f"❌ Failed:         {results['failed']}")
+    if results.get('resumed'):
+        print(f"⏩ Resumed:        {results['resumed']} (already in checkpoint)")
     print("=" * 60)
 
     # Print errors if any